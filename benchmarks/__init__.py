@@ -0,0 +1 @@
+"""The package responsible for benchmarks of the services."""
@@ -0,0 +1,125 @@
+"""
+Benchmark of the codecs of the queue payloads.
+
+Usage:
+    python -m benchmarks.codecs
+    python -m benchmarks.codecs --redis-url redis://localhost --backlog 100000
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from dataclasses import asdict
+from typing import Any, Callable, Dict, Optional
+
+import redis.asyncio
+
+from producer_consumer.codecs.base import BaseCodec
+from producer_consumer.codecs.versioned_codec import (
+    get_message_codec,
+    get_moderation_result_codec,
+)
+from schemas.messages import MessageSchema, ModerationResultSchema
+
+BACKLOG_KEY = "benchmark:codecs"
+
+SHORT_TEXT = "Привет) Чем занят вечером?"
+LONG_TEXT = (
+    "Здравствуйте! Благодарю вас за ваш вопрос. Пожалуйста, дайте мне немного "
+    "времени, чтобы подготовить для вас максимально подробный ответ. "
+) * 10
+
+
+class LegacyJSONCodec(BaseCodec[Any]):
+    """The format before the codecs: json.dumps(asdict(...))."""
+
+    def __init__(self, schema: Callable[..., Any]):
+        """Init class."""
+        self.__schema = schema
+
+    def encode(self, item: Any) -> bytes:
+        """Encode the item."""
+        return json.dumps(asdict(item)).encode()
+
+    def decode(self, data: Any) -> Any:
+        """Decode the item."""
+        return self.__schema(**json.loads(data))
+
+
+def ns_per_op(func: Callable[[], Any], ops: int) -> float:
+    """Return the time of one call in nanoseconds."""
+    start: int = time.perf_counter_ns()
+    for _ in range(ops):
+        func()
+    return (time.perf_counter_ns() - start) / ops
+
+
+async def backlog_memory(
+    client: redis.asyncio.Redis, payload: bytes, backlog: int
+) -> float:
+    """Return the memory of the list with backlog payloads in bytes per item."""
+    await client.delete(BACKLOG_KEY)
+    for _ in range(0, backlog, 1000):
+        await client.rpush(BACKLOG_KEY, *([payload] * 1000))
+    memory: Optional[int] = await client.memory_usage(BACKLOG_KEY, samples=0)
+    await client.delete(BACKLOG_KEY)
+    return (memory or 0) / backlog
+
+
+async def main(args: argparse.Namespace) -> None:
+    """Run the benchmark."""
+    client: Optional[redis.asyncio.Redis] = (
+        redis.asyncio.Redis.from_url(args.redis_url) if args.redis_url else None
+    )
+    items: Dict[str, Any] = {
+        "short msg": MessageSchema("1234567", SHORT_TEXT, chat_id="-1001234567890"),
+        "long msg": MessageSchema("1234567", LONG_TEXT, chat_id="-1001234567890"),
+        "result": ModerationResultSchema(
+            "1234567", False, True, chat_id="-1001234567890"
+        ),
+    }
+    codecs: Dict[str, Callable[[Any], BaseCodec[Any]]] = {
+        "legacy json": lambda item: LegacyJSONCodec(type(item)),
+        "json": lambda item: (
+            get_message_codec("json")
+            if isinstance(item, MessageSchema)
+            else get_moderation_result_codec("json")
+        ),
+        "binary": lambda item: (
+            get_message_codec("binary", args.compress_threshold)
+            if isinstance(item, MessageSchema)
+            else get_moderation_result_codec("binary")
+        ),
+    }
+
+    header: str = f"{'item':<10} {'codec':<12} {'encode ns':>10} {'decode ns':>10}"
+    header += f" {'bytes':>6}" + (" redis B/item" if client is not None else "")
+    print(header)
+    try:
+        for item_name, item in items.items():
+            for codec_name, make_codec in codecs.items():
+                codec: BaseCodec[Any] = make_codec(item)
+                payload: bytes = codec.encode(item)
+                line: str = (
+                    f"{item_name:<10} {codec_name:<12}"
+                    f" {ns_per_op(lambda: codec.encode(item), args.ops):>10.0f}"
+                    f" {ns_per_op(lambda: codec.decode(payload), args.ops):>10.0f}"
+                    f" {len(payload):>6}"
+                )
+                if client is not None:
+                    memory: float = await backlog_memory(client, payload, args.backlog)
+                    line += f" {memory:>12.1f}"
+                print(line)
+    finally:
+        if client is not None:
+            await client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--ops", type=int, default=100_000)
+    parser.add_argument("--compress-threshold", type=int, default=512)
+    parser.add_argument("--redis-url", default=None)
+    parser.add_argument("--backlog", type=int, default=100_000)
+    asyncio.run(main(parser.parse_args()))
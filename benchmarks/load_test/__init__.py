@@ -0,0 +1 @@
+"""Package responsible for the offline end-to-end load test."""
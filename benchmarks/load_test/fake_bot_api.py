@@ -0,0 +1,92 @@
+"""The module responsible for the local stub of the Telegram Bot API."""
+
+import random
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from aiohttp import web
+
+
+@dataclass
+class ReactionCall(object):
+    """The recorded setMessageReaction call."""
+
+    chat_id: str
+    message_id: str
+    reaction: str
+    time: float
+
+
+class FakeBotAPI(object):
+    """
+    Local stub of the Bot API that records setMessageReaction calls.
+
+    A share of the calls (rate_429) is answered with flood control,
+    so the retries of the reaction dispatcher are exercised too.
+    The other methods are answered with an empty successful result.
+    """
+
+    def __init__(
+        self, rate_429: float = 0, retry_after: int = 1, seed: Optional[int] = None
+    ):
+        """
+        Init class.
+
+        :param rate_429: The share of the calls answered with flood control.
+        :param retry_after: retry_after of the flood control in seconds.
+        :param seed: Seed of the random generator.
+        """
+        self.__rate_429 = rate_429
+        self.__retry_after = retry_after
+        self.__random = random.Random(seed)
+        self.__runner: Optional[web.AppRunner] = None
+
+        self.calls: List[ReactionCall] = []
+        self.flood_controls: int = 0
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Start the server and return its base URL for TelegramAPIServer."""
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self.__handle)
+        self.__runner = web.AppRunner(app, access_log=None)
+        await self.__runner.setup()
+        site = web.TCPSite(self.__runner, host, port)
+        await site.start()
+        bound_host, bound_port = self.__runner.addresses[0][:2]
+        return f"http://{bound_host}:{bound_port}"
+
+    async def close(self) -> None:
+        """Stop the server."""
+        if self.__runner is not None:
+            await self.__runner.cleanup()
+            self.__runner = None
+
+    async def __handle(self, request: web.Request) -> web.Response:
+        """Answer the method of the Bot API."""
+        if request.match_info["method"] != "setMessageReaction":
+            return web.json_response({"ok": True, "result": True})
+
+        if self.__random.random() < self.__rate_429:
+            self.flood_controls += 1
+            return web.json_response(
+                {
+                    "ok": False,
+                    "error_code": 429,
+                    "description": "Too Many Requests: retry after "
+                    f"{self.__retry_after}",
+                    "parameters": {"retry_after": self.__retry_after},
+                },
+                status=429,
+            )
+
+        data: Dict[str, Any] = dict(await request.post())
+        self.calls.append(
+            ReactionCall(
+                chat_id=str(data.get("chat_id")),
+                message_id=str(data.get("message_id")),
+                reaction=str(data.get("reaction")),
+                time=time.perf_counter(),
+            )
+        )
+        return web.json_response({"ok": True, "result": True})
@@ -0,0 +1,212 @@
+"""The module responsible for the local stand-in of YandexGPT and IAM."""
+
+import asyncio
+import json
+import random
+import re
+import uuid
+import zlib
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Set
+
+from aiohttp import web
+
+from server.services.prompts import PROMPTS
+
+TOXIC_WORDS = ("идиот", "тупой", "дурак", "позоришься")
+GENERATED_MARKERS = ("Здравствуйте!", "Благодарю вас", "Вот три причины")
+
+USER_MSG = re.compile(
+    r"=== Начало сообщени[яй] для анализа ===\n(.*)\n=== Конец сообщени[яй] ===",
+    re.DOTALL,
+)
+
+
+@dataclass
+class FaultConfig(object):
+    """
+    Config of the behaviour of the stand-in.
+
+    The latency of the completion is log-normal with the given median
+    and sigma. The rates are the shares of the requests answered with 429,
+    401 (the token is revoked), 500 and a malformed answer.
+    The models ending with "-lite" answer lite_latency times faster,
+    and lite_uncertain of the texts get a low confidence from them.
+    """
+
+    latency_median: float = 0.3
+    latency_sigma: float = 0.5
+    rate_429: float = 0
+    rate_401: float = 0
+    rate_5xx: float = 0
+    rate_malformed: float = 0
+    token_lifetime: float = 12 * 60 * 60
+    lite_latency: float = 0.4
+    lite_uncertain: float = 0.2
+
+
+def verdict(text: str) -> Dict[str, bool]:
+    """Return the deterministic verdict of the stand-in for the text."""
+    lowered: str = text.lower()
+    return {
+        "generated_by_llm": any(marker in text for marker in GENERATED_MARKERS),
+        "toxic": any(word in lowered for word in TOXIC_WORDS),
+    }
+
+
+class FakeYandexGPT(object):
+    """
+    Local HTTP stand-in of the completion and IAM endpoints of YandexGPT.
+
+    The answers follow the prompts of the moderator: one JSON object
+    for a single message and a JSON array for a batch. The usage of tokens
+    is estimated by the length of the texts and summed up in tokens.
+    """
+
+    def __init__(self, faults: FaultConfig, seed: Optional[int] = None):
+        """
+        Init class.
+
+        :param faults: Latency and errors of the stand-in.
+        :param seed: Seed of the random generator.
+        """
+        self.__faults = faults
+        self.__random = random.Random(seed)
+        self.__valid_tokens: Set[str] = set()
+        self.__runner: Optional[web.AppRunner] = None
+
+        self.stats: Counter = Counter()
+        self.tokens: int = 0
+        self.tokens_by_model: Counter = Counter()
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Start the server and return its base URL."""
+        app = web.Application()
+        app.router.add_post("/iam/v1/tokens", self.__iam)
+        app.router.add_post("/foundationModels/v1/completion", self.__completion)
+        self.__runner = web.AppRunner(app, access_log=None)
+        await self.__runner.setup()
+        site = web.TCPSite(self.__runner, host, port)
+        await site.start()
+        bound_host, bound_port = self.__runner.addresses[0][:2]
+        return f"http://{bound_host}:{bound_port}"
+
+    async def close(self) -> None:
+        """Stop the server."""
+        if self.__runner is not None:
+            await self.__runner.cleanup()
+            self.__runner = None
+
+    async def __iam(self, request: web.Request) -> web.Response:
+        """Issue a new IAM token."""
+        self.stats["iam"] += 1
+        token: str = uuid.uuid4().hex
+        self.__valid_tokens.add(token)
+        expires_at = datetime.now(timezone.utc) + timedelta(
+            seconds=self.__faults.token_lifetime
+        )
+        return web.json_response(
+            {"iamToken": token, "expiresAt": expires_at.isoformat()}
+        )
+
+    async def __completion(self, request: web.Request) -> web.Response:
+        """Answer the moderation prompts after a random latency."""
+        self.stats["requests"] += 1
+        token: str = request.headers.get("Authorization", "").removeprefix("Bearer ")
+        if token not in self.__valid_tokens:
+            self.stats["401"] += 1
+            return web.json_response({"error": "unauthorized"}, status=401)
+
+        body: Dict[str, Any] = await request.json()
+        model: str = str(body.get("modelUri", "")).rsplit("/", 1)[-1]
+        lite: bool = model.endswith("-lite")
+        self.stats[f"requests_{model}"] += 1
+
+        faults: FaultConfig = self.__faults
+        await asyncio.sleep(
+            faults.latency_median
+            * (faults.lite_latency if lite else 1)
+            * self.__random.lognormvariate(0, faults.latency_sigma)
+        )
+
+        chance: float = self.__random.random()
+        for status, rate in (
+            (429, faults.rate_429),
+            (401, faults.rate_401),
+            (500, faults.rate_5xx),
+        ):
+            if chance < rate:
+                self.stats[str(status)] += 1
+                if status == 401:
+                    # the token is revoked, the client has to refresh it
+                    self.__valid_tokens.discard(token)
+                return web.json_response({"error": "injected"}, status=status)
+            chance -= rate
+
+        messages: List[Dict[str, str]] = body["messages"]
+        if chance < faults.rate_malformed:
+            self.stats["malformed"] += 1
+            answer: str = "Извините, я не могу ответить на этот вопрос."
+        else:
+            answer = self.__answer(messages, lite)
+
+        input_tokens: int = sum(len(message["text"]) for message in messages) // 4
+        completion_tokens: int = len(answer) // 4
+        self.tokens += input_tokens + completion_tokens
+        self.tokens_by_model[model] += input_tokens + completion_tokens
+        return web.json_response(
+            {
+                "result": {
+                    "alternatives": [
+                        {
+                            "message": {"role": "assistant", "text": answer},
+                            "status": "ALTERNATIVE_STATUS_FINAL",
+                        }
+                    ],
+                    "usage": {
+                        "inputTextTokens": str(input_tokens),
+                        "completionTokens": str(completion_tokens),
+                        "totalTokens": str(input_tokens + completion_tokens),
+                    },
+                    "modelVersion": "fake",
+                }
+            }
+        )
+
+    def __verdict(self, text: str, confidence: bool, lite: bool) -> Dict[str, Any]:
+        """Return the verdict with the confidence if it is asked for."""
+        result: Dict[str, Any] = dict(verdict(text))
+        if confidence:
+            uncertain: bool = (
+                lite
+                and zlib.crc32(text.encode()) < self.__faults.lite_uncertain * 2**32
+            )
+            result["confidence"] = 0.5 if uncertain else 0.95
+        return result
+
+    def __answer(self, messages: List[Dict[str, str]], lite: bool) -> str:
+        """Return the answer on the moderation prompts."""
+        match = USER_MSG.search(messages[-1]["text"])
+        user_text: str = match.group(1) if match else messages[-1]["text"]
+        system: str = messages[0]["text"]
+        confidence: bool = system in (
+            PROMPTS["confidence_moderation_prompt"].text,
+            PROMPTS["batch_confidence_moderation_prompt"].text,
+        )
+        if system not in (
+            PROMPTS["batch_moderation_prompt"].text,
+            PROMPTS["batch_confidence_moderation_prompt"].text,
+        ):
+            return json.dumps(
+                self.__verdict(user_text, confidence, lite), ensure_ascii=False
+            )
+        items: List[Dict[str, Any]] = json.loads(user_text)
+        return json.dumps(
+            [
+                {"id": item["id"], **self.__verdict(item["text"], confidence, lite)}
+                for item in items
+            ],
+            ensure_ascii=False,
+        )
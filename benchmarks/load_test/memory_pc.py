@@ -0,0 +1,100 @@
+"""The module responsible for the in-process queues of the load test."""
+
+import asyncio
+import time
+from typing import Dict, List, Tuple
+
+from producer_consumer.messages.base import BaseMessageConsumer, BaseMessageProducer
+from producer_consumer.moderation_results.base import (
+    BaseModerationResultConsumer,
+    BaseModerationResultProducer,
+)
+from schemas.messages import MessageSchema, ModerationResultSchema
+
+
+class MemoryMessageQueue(BaseMessageProducer, BaseMessageConsumer):
+    """In-process message queue, used instead of Redis without --redis-url."""
+
+    def __init__(self):
+        """Init class."""
+        self.__queue: asyncio.Queue[MessageSchema] = asyncio.Queue()
+
+    async def upload(self, msg: MessageSchema) -> None:
+        """Upload message."""
+        self.__queue.put_nowait(msg)
+
+    async def extract(self) -> MessageSchema:
+        """Extract message."""
+        return await self.__queue.get()
+
+    async def extract_many(
+        self, max_items: int, max_wait: float = 0
+    ) -> List[MessageSchema]:
+        """Extract up to max_items messages."""
+        msgs: List[MessageSchema] = [await self.__queue.get()]
+        while len(msgs) < max_items and not self.__queue.empty():
+            msgs.append(self.__queue.get_nowait())
+        return msgs
+
+
+class MemoryModerationResultQueue(
+    BaseModerationResultProducer, BaseModerationResultConsumer
+):
+    """In-process moderation results queue."""
+
+    def __init__(self):
+        """Init class."""
+        self.__queue: asyncio.Queue[ModerationResultSchema] = asyncio.Queue()
+
+    async def upload(self, mod_result: ModerationResultSchema) -> None:
+        """Upload moderation result."""
+        self.__queue.put_nowait(mod_result)
+
+    async def extract(self) -> ModerationResultSchema:
+        """Extract moderation result."""
+        return await self.__queue.get()
+
+    async def extract_many(
+        self, max_items: int, max_wait: float = 0
+    ) -> List[ModerationResultSchema]:
+        """Extract up to max_items moderation results."""
+        results: List[ModerationResultSchema] = [await self.__queue.get()]
+        while len(results) < max_items and not self.__queue.empty():
+            results.append(self.__queue.get_nowait())
+        return results
+
+
+class RecordingConsumer(BaseModerationResultConsumer):
+    """
+    Moderation results consumer that records when every result is done.
+
+    The bot acknowledges a result after its reaction is set (or at once
+    if there is no reaction), so the time of ack is the end
+    of the end-to-end path of the message.
+    """
+
+    def __init__(self, consumer: BaseModerationResultConsumer):
+        """
+        Init class.
+
+        :param consumer: The consumer of the bot.
+        """
+        self.__consumer = consumer
+        self.done: Dict[Tuple[str, str], float] = dict()
+
+    async def extract(self) -> ModerationResultSchema:
+        """Extract moderation result."""
+        return await self.__consumer.extract()
+
+    async def extract_many(
+        self, max_items: int, max_wait: float = 0
+    ) -> List[ModerationResultSchema]:
+        """Extract up to max_items moderation results."""
+        return await self.__consumer.extract_many(max_items, max_wait)
+
+    async def ack(self, mod_result: ModerationResultSchema) -> None:
+        """Acknowledge the result and record the time."""
+        self.done.setdefault(
+            (mod_result.chat_id, mod_result.msg_id), time.perf_counter()
+        )
+        await self.__consumer.ack(mod_result)
@@ -0,0 +1,402 @@
+"""
+End-to-end load test of the bot and the server without network access.
+
+The traffic generator drives the handler of the bot, the messages go
+through the queues to the moderation server, which talks to a local
+stand-in of YandexGPT, and the reactions are set through a local stub
+of the Bot API. Every combination of the server concurrency and the message
+rate is run as a separate scenario.
+
+Usage:
+    python -m benchmarks.load_test.run --concurrency 1,4,16 --rate 20,100
+    python -m benchmarks.load_test.run --rate-429 0.05 --rate-5xx 0.01 --stages
+    python -m benchmarks.load_test.run --rate-5xx 0.5 --circuit-breaker
+    python -m benchmarks.load_test.run --latency-sigma 1 --hedging
+    python -m benchmarks.load_test.run --cascade --lite-uncertain 0.2
+    python -m benchmarks.load_test.run --redis-url redis://localhost --batch-size 10
+"""
+
+import argparse
+import asyncio
+import logging
+import statistics
+import time
+from dataclasses import replace
+from typing import Dict, List, Optional, Tuple
+
+import redis.asyncio
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.types import Message
+
+from bot.config.bot_config import BotConfig
+from bot.config.bot_config import get_config as get_bot_config
+from bot.handlers.moderation import moderate_message
+from bot.services.post_moderation import PostModerationManager
+from bot.services.reaction_dispatcher import ReactionDispatcher
+from producer_consumer.messages.base import BaseMessageConsumer, BaseMessageProducer
+from producer_consumer.messages.redis_pc import (
+    RedisMessageConsumer,
+    RedisMessageProducer,
+)
+from producer_consumer.moderation_results.base import (
+    BaseModerationResultConsumer,
+    BaseModerationResultProducer,
+)
+from producer_consumer.moderation_results.redis_pc import (
+    RedisModerationResultsConsumer,
+    RedisModerationResultsProducer,
+)
+from server.config.app_config import Config, get_config
+from server.services.api.llm.base import BaseLLMAPI
+from server.services.api.llm.circuit_breaker import CircuitBreakerLLMAPI
+from server.services.api.llm.hedging import HedgedLLMAPI
+from server.services.api.llm.yandex_gpt import YandexGPTAPI
+from server.services.circuit_breakers.local_breaker import LocalCircuitBreaker
+from server.services.moderation import ModerationManager
+from server.services.moderators.base import BaseModerator, iter_stages
+from server.services.moderators.cached_moderator import CachedModerator
+from server.services.moderators.cascade_moderator import CascadeModerator
+from server.services.moderators.llm_moderator import LLMModerator
+from server.services.moderators.near_duplicate_moderator import (
+    NearDuplicateModerator,
+)
+from server.services.moderators.prefilter_moderator import PrefilterModerator
+from server.services.near_duplicates.local_index import LocalNearDuplicateIndex
+from server.services.prefilters.lexicon import load_lexicon
+from server.services.rate_limiters.local_rate_limiter import LocalRateLimiter
+from server.services.schedulers.local_scheduler import LocalRetryScheduler
+from server.services.verdict_caches.lru_cache import LRUVerdictCache
+from server.services.verdict_caches.two_level_cache import TwoLevelVerdictCache
+
+from .fake_bot_api import FakeBotAPI
+from .fake_yandex_gpt import FakeYandexGPT, FaultConfig
+from .memory_pc import (
+    MemoryMessageQueue,
+    MemoryModerationResultQueue,
+    RecordingConsumer,
+)
+from .traffic import TrafficGenerator
+
+MESSAGES_QUEUE = "load_test:messages"
+RESULTS_QUEUE = "load_test:moderation_results"
+
+
+def percentile(values: List[float], share: float) -> float:
+    """Return the percentile of the sorted values."""
+    if not values:
+        return 0
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+def get_queues(
+    client: Optional[redis.asyncio.Redis],
+) -> Tuple[
+    BaseMessageProducer,
+    BaseMessageConsumer,
+    BaseModerationResultProducer,
+    BaseModerationResultConsumer,
+]:
+    """Return the queues of messages and results: in-process or Redis lists."""
+    if client is None:
+        messages = MemoryMessageQueue()
+        results = MemoryModerationResultQueue()
+        return messages, messages, results, results
+    return (
+        RedisMessageProducer(client, MESSAGES_QUEUE),
+        RedisMessageConsumer(client, MESSAGES_QUEUE),
+        RedisModerationResultsProducer(client, RESULTS_QUEUE),
+        RedisModerationResultsConsumer(client, RESULTS_QUEUE),
+    )
+
+
+def get_guarded_llm_api(
+    config: Config, llm_api: BaseLLMAPI, args: argparse.Namespace
+) -> BaseLLMAPI:
+    """Return LLM API with the hedging and the circuit breaker if they are enabled."""
+    if args.hedging:
+        llm_api = HedgedLLMAPI(llm_api, config.hedging)
+    if args.circuit_breaker:
+        llm_api = CircuitBreakerLLMAPI(
+            llm_api, LocalCircuitBreaker(config.circuit_breaker)
+        )
+    return llm_api
+
+
+def get_moderator(
+    config: Config,
+    llm_api: BaseLLMAPI,
+    args: argparse.Namespace,
+    lite_api: Optional[BaseLLMAPI] = None,
+) -> BaseModerator:
+    """Return LLM moderator with the in-process stages if they are enabled."""
+    rate_limiter = LocalRateLimiter(config.rate_limit) if args.rate_limit else None
+    moderator: BaseModerator = LLMModerator(
+        get_guarded_llm_api(config, llm_api, args),
+        config.moderation_config,
+        rate_limiter=rate_limiter,
+    )
+    if lite_api is not None:
+        moderator = CascadeModerator(
+            LLMModerator(
+                get_guarded_llm_api(config, lite_api, args),
+                config.moderation_config,
+                rate_limiter=rate_limiter,
+                with_confidence=True,
+            ),
+            moderator,
+            config.cascade,
+        )
+    if args.stages:
+        moderator = NearDuplicateModerator(
+            moderator,
+            LocalNearDuplicateIndex(
+                threshold=config.near_duplicates.threshold,
+                ttl=config.near_duplicates.ttl,
+                max_size=config.near_duplicates.local_size,
+            ),
+            min_features=config.near_duplicates.min_features,
+        )
+        moderator = CachedModerator(
+            moderator,
+            TwoLevelVerdictCache(
+                LRUVerdictCache(config.verdict_cache.local_size), shared=None
+            ),
+        )
+        moderator = PrefilterModerator(
+            moderator,
+            load_lexicon(),
+            max_short_words=config.prefilter.max_short_words,
+        )
+    return moderator
+
+
+def find_cascade(moderator: BaseModerator) -> Optional[CascadeModerator]:
+    """Return the cascade of LLM models behind the stages or None."""
+    for stage in iter_stages(moderator):
+        moderator = stage.next_moderator
+    return moderator if isinstance(moderator, CascadeModerator) else None
+
+
+async def wait_done(
+    consumer: RecordingConsumer, sent: int, drain: float, idle: float = 3
+) -> None:
+    """Wait until all messages are done, or no progress for idle seconds."""
+    deadline: float = time.monotonic() + drain
+    last_done, last_progress = len(consumer.done), time.monotonic()
+    while len(consumer.done) < sent and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+        if len(consumer.done) != last_done:
+            last_done, last_progress = len(consumer.done), time.monotonic()
+        elif time.monotonic() - last_progress > idle:
+            return
+
+
+async def run_scenario(
+    args: argparse.Namespace, concurrency: int, rate: float
+) -> Dict[str, float]:
+    """Run one scenario and return its metrics."""
+    llm = FakeYandexGPT(
+        FaultConfig(
+            latency_median=args.latency_median,
+            latency_sigma=args.latency_sigma,
+            rate_429=args.rate_429,
+            rate_401=args.rate_401,
+            rate_5xx=args.rate_5xx,
+            rate_malformed=args.rate_malformed,
+            lite_latency=args.lite_latency,
+            lite_uncertain=args.lite_uncertain,
+        ),
+        seed=args.seed,
+    )
+    bot_api = FakeBotAPI(rate_429=args.bot_rate_429, seed=args.seed)
+    llm_url: str = await llm.start()
+    bot_api_url: str = await bot_api.start()
+
+    config: Config = get_config()
+    config = replace(
+        config,
+        yandex_gpt=replace(
+            config.yandex_gpt,
+            oauth_token="fake",
+            catalog_id="fake",
+            completion_url=f"{llm_url}/foundationModels/v1/completion",
+            iam_url=f"{llm_url}/iam/v1/tokens",
+        ),
+        moderation_config=replace(
+            config.moderation_config,
+            concurrency=concurrency,
+            batch_size=args.batch_size,
+            random_delay_limits=(args.retry_delay, args.retry_delay),
+        ),
+    )
+    bot_config: BotConfig = replace(get_bot_config(), chats=dict(), instance="")
+
+    client: Optional[redis.asyncio.Redis] = (
+        redis.asyncio.Redis.from_url(args.redis_url) if args.redis_url else None
+    )
+    if client is not None:
+        await client.delete(MESSAGES_QUEUE, RESULTS_QUEUE)
+    msg_producer, msg_consumer, mod_res_producer, mod_res_consumer = get_queues(client)
+    recorder = RecordingConsumer(mod_res_consumer)
+
+    llm_api = YandexGPTAPI(config)
+    lite_api: Optional[YandexGPTAPI] = (
+        YandexGPTAPI(config, model=config.cascade.lite_model) if args.cascade else None
+    )
+    moderator: BaseModerator = get_moderator(config, llm_api, args, lite_api)
+    bot = Bot(
+        token="123456:load-test",
+        session=AiohttpSession(api=TelegramAPIServer.from_base(bot_api_url)),
+    )
+    manager = ModerationManager(
+        msg_consumer,
+        mod_res_producer,
+        moderator,
+        concurrency=concurrency,
+        retry_scheduler=LocalRetryScheduler(
+            msg_producer=msg_producer,
+            delay_limits=config.moderation_config.random_delay_limits,
+            delay_denominator=config.moderation_config.delay_denominator,
+            max_num_retries=config.moderation_config.max_num_retries,
+        ),
+        batch_size=config.moderation_config.batch_size,
+        batch_timeout=config.moderation_config.batch_timeout,
+    )
+    post_moderation_manager = PostModerationManager(
+        ReactionDispatcher(
+            bot,
+            concurrency=bot_config.bot_api.concurrency,
+            global_rate=bot_config.bot_api.global_rate,
+            chat_rate=bot_config.bot_api.chat_rate,
+            chat_burst=bot_config.bot_api.chat_burst,
+            max_retries=bot_config.bot_api.max_retries,
+            max_backlog=bot_config.bot_api.max_backlog,
+            stats_interval=bot_config.bot_api.stats_interval,
+        ),
+        bot_config,
+        recorder,
+    )
+
+    sent_at: Dict[Tuple[str, str], float] = dict()
+
+    async def send(msg: Message) -> None:
+        sent_at[(str(msg.chat.id), str(msg.message_id))] = time.perf_counter()
+        await moderate_message(msg, msg_producer=msg_producer)
+
+    await llm_api.start()
+    if lite_api is not None:
+        await lite_api.start()
+    server = asyncio.create_task(manager.run())
+    post_moderation = asyncio.create_task(post_moderation_manager.run())
+    try:
+        start: float = time.perf_counter()
+        sent: int = await TrafficGenerator(rate, chats=args.chats, seed=args.seed).run(
+            args.duration, send
+        )
+        await wait_done(recorder, sent, args.drain)
+    finally:
+        manager.stop()
+        await server
+        post_moderation.cancel()
+        await asyncio.gather(post_moderation, return_exceptions=True)
+        await llm_api.close()
+        if lite_api is not None:
+            await lite_api.close()
+        await bot.session.close()
+        await llm.close()
+        await bot_api.close()
+        if client is not None:
+            await client.delete(MESSAGES_QUEUE, RESULTS_QUEUE)
+            await client.close()
+
+    latencies: List[float] = sorted(
+        (done - sent_at[key]) * 1000
+        for key, done in recorder.done.items()
+        if key in sent_at
+    )
+    elapsed: float = max(recorder.done.values(), default=start) - start
+    metrics: Dict[str, float] = {
+        "concurrency": concurrency,
+        "rate": rate,
+        "sent": sent,
+        "done": len(latencies),
+        "msgs/sec": len(latencies) / elapsed if elapsed > 0 else 0,
+        "p50 ms": percentile(latencies, 0.5),
+        "p95 ms": percentile(latencies, 0.95),
+        "p99 ms": percentile(latencies, 0.99),
+        "mean ms": statistics.fmean(latencies) if latencies else 0,
+        "llm reqs": llm.stats["requests"],
+        "tokens": llm.tokens,
+        "tokens/msg": llm.tokens / len(latencies) if latencies else 0,
+        "errors": sum(llm.stats[key] for key in ("429", "401", "500", "malformed")),
+        "reactions": len(bot_api.calls),
+        "flood": bot_api.flood_controls,
+    }
+    cascade: Optional[CascadeModerator] = find_cascade(moderator)
+    if cascade is not None:
+        # the share of the messages answered by the lite model
+        # and the tokens spent on every model
+        metrics["lite %"] = cascade.stats()["lite_fraction"] * 100
+        metrics["lite tokens"] = llm.tokens_by_model[config.cascade.lite_model]
+        metrics["full tokens"] = llm.tokens - metrics["lite tokens"]
+    return metrics
+
+
+def print_row(metrics: Dict[str, float], header: bool) -> None:
+    """Print the metrics of the scenario as a row of the table."""
+    if header:
+        print(" ".join(f"{name:>11}" for name in metrics))
+    print(
+        " ".join(
+            f"{value:>11.1f}" if isinstance(value, float) else f"{value:>11}"
+            for value in metrics.values()
+        )
+    )
+
+
+async def main(args: argparse.Namespace) -> None:
+    """Run all scenarios."""
+    header: bool = True
+    for concurrency in args.concurrency:
+        for rate in args.rate:
+            print_row(await run_scenario(args, concurrency, rate), header)
+            header = False
+
+
+def numbers(value: str) -> List[float]:
+    """Parse the comma-separated numbers."""
+    return [float(item) for item in value.split(",") if item]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--concurrency", type=numbers, default=[1, 4, 16])
+    parser.add_argument("--rate", type=numbers, default=[20, 100])
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--drain", type=float, default=30)
+    parser.add_argument("--chats", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--stages", action="store_true")
+    parser.add_argument("--rate-limit", action="store_true")
+    parser.add_argument("--circuit-breaker", action="store_true")
+    parser.add_argument("--hedging", action="store_true")
+    parser.add_argument("--cascade", action="store_true")
+    parser.add_argument("--lite-latency", type=float, default=0.4)
+    parser.add_argument("--lite-uncertain", type=float, default=0.2)
+    parser.add_argument("--retry-delay", type=float, default=0.5)
+    parser.add_argument("--latency-median", type=float, default=0.3)
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--rate-429", type=float, default=0)
+    parser.add_argument("--rate-401", type=float, default=0)
+    parser.add_argument("--rate-5xx", type=float, default=0)
+    parser.add_argument("--rate-malformed", type=float, default=0)
+    parser.add_argument("--bot-rate-429", type=float, default=0)
+    parser.add_argument("--redis-url", default=None)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--log-level", default="ERROR")
+    parsed = parser.parse_args()
+    parsed.concurrency = [int(value) for value in parsed.concurrency]
+    logging.basicConfig(level=parsed.log_level)
+    asyncio.run(main(parsed))
@@ -0,0 +1,110 @@
+"""The module responsible for the generator of chat traffic."""
+
+import asyncio
+import random
+from datetime import datetime
+from itertools import count
+from typing import Awaitable, Callable, Dict, Optional
+
+from aiogram.types import Chat, Message
+
+NORMAL = (
+    "Привет) Чем занят вечером? {n}",
+    "Кто идёт завтра на встречу в {n}?",
+    "Скинул отчёт за {n} квартал в общий чат",
+    "Погода сегодня ясная, градусов {n}",
+)
+TOXIC = (
+    "Ты вообще тупой? Уже {n} раз объясняю",
+    "Какой идиотский вопрос, {n} раз позоришься",
+)
+GENERATED = (
+    "Здравствуйте! Благодарю вас за ваш вопрос номер {n}. Пожалуйста, дайте мне "
+    "немного времени, чтобы подготовить для вас максимально подробный ответ.",
+)
+SPAM = "Заработок от 100000 руб в день без вложений! Пиши в лс https://bit.ly/abc"
+
+
+class TrafficGenerator(object):
+    """
+    Generator of the messages of several chats with Poisson arrivals.
+
+    The messages are a mix of ordinary, toxic, generated messages
+    and repeated spam (for the cache and near-duplicate stages).
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        chats: int = 10,
+        toxic_share: float = 0.1,
+        generated_share: float = 0.05,
+        duplicate_share: float = 0.1,
+        seed: Optional[int] = None,
+    ):
+        """
+        Init class.
+
+        :param rate: Messages per second.
+        :param chats: The number of chats.
+        :param toxic_share: The share of toxic messages.
+        :param generated_share: The share of generated messages.
+        :param duplicate_share: The share of repeated spam.
+        :param seed: Seed of the random generator.
+        """
+        self.__rate = rate
+        self.__chats = [-1001000000000 - i for i in range(max(1, chats))]
+        self.__toxic_share = toxic_share
+        self.__generated_share = generated_share
+        self.__duplicate_share = duplicate_share
+        self.__random = random.Random(seed)
+        self.__message_ids: Dict[int, count] = {
+            chat_id: count(1) for chat_id in self.__chats
+        }
+
+    def __text(self) -> str:
+        """Return the text of the next message."""
+        chance: float = self.__random.random()
+        n: int = self.__random.randint(1, 1_000_000)
+        if chance < self.__duplicate_share:
+            return SPAM
+        chance -= self.__duplicate_share
+        if chance < self.__toxic_share:
+            return self.__random.choice(TOXIC).format(n=n)
+        chance -= self.__toxic_share
+        if chance < self.__generated_share:
+            return self.__random.choice(GENERATED).format(n=n)
+        return self.__random.choice(NORMAL).format(n=n)
+
+    def make_message(self) -> Message:
+        """Return the next message of a random chat."""
+        chat_id: int = self.__random.choice(self.__chats)
+        return Message(
+            message_id=next(self.__message_ids[chat_id]),
+            date=datetime.now(),
+            chat=Chat(id=chat_id, type="supergroup"),
+            text=self.__text(),
+        )
+
+    async def run(
+        self, duration: float, send: Callable[[Message], Awaitable[None]]
+    ) -> int:
+        """
+        Send the messages for duration seconds.
+
+        The arrival times are planned on the absolute timeline,
+        so a slow send does not lower the rate.
+
+        :return: The number of the sent messages.
+        """
+        loop = asyncio.get_running_loop()
+        start: float = loop.time()
+        due: float = start
+        sent: int = 0
+        while True:
+            due += self.__random.expovariate(self.__rate)
+            if due - start > duration:
+                return sent
+            await asyncio.sleep(max(0.0, due - loop.time()))
+            await send(self.make_message())
+            sent += 1
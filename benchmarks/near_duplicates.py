@@ -0,0 +1,120 @@
+"""
+Benchmark of lookups in the near-duplicate index.
+
+Usage:
+    python -m benchmarks.near_duplicates --size 1000000
+    python -m benchmarks.near_duplicates --size 100000 --redis-url redis://localhost
+"""
+
+import argparse
+import asyncio
+import random
+import resource
+import statistics
+import time
+from typing import List, Optional, Tuple
+
+import redis.asyncio
+
+from server.services.near_duplicates.base import BaseNearDuplicateIndex
+from server.services.near_duplicates.local_index import LocalNearDuplicateIndex
+from server.services.near_duplicates.redis_index import RedisNearDuplicateIndex
+from server.services.near_duplicates.simhash import SIGNATURE_BITS, features, simhash
+from server.services.verdict_caches.base import Verdict
+
+SPAM = (
+    "Заработок от 100000 руб в день без вложений! Пиши мне в лс "
+    "https://bit.ly/abc123 Только сегодня, места ограничены."
+)
+
+
+def percentile(values: List[float], share: float) -> float:
+    """Return the percentile of the sorted values."""
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+def near_signature(signature: int, max_distance: int) -> int:
+    """Return the signature with up to max_distance flipped bits."""
+    for bit in random.sample(range(SIGNATURE_BITS), random.randint(0, max_distance)):
+        signature ^= 1 << bit
+    return signature
+
+
+async def fill(index: BaseNearDuplicateIndex, signatures: List[int]) -> float:
+    """Add the signatures to the index and return the elapsed time."""
+    verdict = Verdict(generated_by_llm=False, toxic=True)
+    start: float = time.perf_counter()
+    for signature in signatures:
+        await index.add(signature, verdict)
+    return time.perf_counter() - start
+
+
+async def measure(
+    index: BaseNearDuplicateIndex, queries: List[int]
+) -> Tuple[List[float], int]:
+    """Return the sorted latencies of the queries in microseconds and the hits."""
+    latencies: List[float] = []
+    hits: int = 0
+    for query in queries:
+        start: float = time.perf_counter()
+        verdict: Optional[Verdict] = await index.find(query)
+        latencies.append((time.perf_counter() - start) * 1e6)
+        hits += verdict is not None
+    return sorted(latencies), hits
+
+
+async def run(args: argparse.Namespace) -> None:
+    """Run the benchmark."""
+    random.seed(args.seed)
+    client: Optional[redis.asyncio.Redis] = None
+    index: BaseNearDuplicateIndex
+    if args.redis_url:
+        client = redis.asyncio.Redis.from_url(args.redis_url)
+        index = RedisNearDuplicateIndex(
+            client, args.threshold, ttl=3600, prefix="benchmark:near_duplicates:"
+        )
+    else:
+        index = LocalNearDuplicateIndex(args.threshold, ttl=3600, max_size=args.size)
+    max_distance: int = int((1 - args.threshold) * SIGNATURE_BITS)
+
+    start: float = time.perf_counter()
+    for _ in range(1000):
+        simhash(features(SPAM))
+    print(f"simhash: {(time.perf_counter() - start) * 1000:.1f} us per message")
+
+    signatures: List[int] = [
+        random.getrandbits(SIGNATURE_BITS) for _ in range(args.size)
+    ]
+    elapsed: float = await fill(index, signatures)
+    print(f"added {args.size} signatures in {elapsed:.1f} s")
+    print(f"max RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024} MB")
+
+    near: List[int] = [
+        near_signature(random.choice(signatures), max_distance)
+        for _ in range(args.queries)
+    ]
+    unknown: List[int] = [
+        random.getrandbits(SIGNATURE_BITS) for _ in range(args.queries)
+    ]
+    for name, queries in (("near duplicates", near), ("unknown", unknown)):
+        latencies, hits = await measure(index, queries)
+        print(
+            f"{name}: hits {hits}/{len(queries)}, "
+            f"mean {statistics.fmean(latencies):.1f} us, "
+            f"p50 {percentile(latencies, 0.5):.1f} us, "
+            f"p95 {percentile(latencies, 0.95):.1f} us, "
+            f"p99 {percentile(latencies, 0.99):.1f} us"
+        )
+
+    if client is not None:
+        await client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--size", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=10_000)
+    parser.add_argument("--threshold", type=float, default=0.95)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--redis-url", default="")
+    asyncio.run(run(parser.parse_args()))
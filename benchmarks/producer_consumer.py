@@ -0,0 +1,104 @@
+"""
+Microbenchmark of the single-item and bulk paths of the message P/C.
+
+Usage:
+    python -m benchmarks.producer_consumer --redis-url redis://localhost:6379
+    python -m benchmarks.producer_consumer --backend streams --batch 100
+"""
+
+import argparse
+import asyncio
+import time
+from typing import Awaitable, Callable, List, Tuple
+
+import redis.asyncio
+
+from producer_consumer.messages.base import BaseMessageConsumer, BaseMessageProducer
+from producer_consumer.messages.redis_pc import (
+    RedisMessageConsumer,
+    RedisMessageProducer,
+)
+from producer_consumer.messages.redis_streams_pc import (
+    RedisStreamMessageConsumer,
+    RedisStreamMessageProducer,
+)
+from schemas.messages import MessageSchema
+
+QUEUE_NAME = "benchmark:messages"
+
+
+def get_pc(
+    client: redis.asyncio.Redis, backend: str
+) -> Tuple[BaseMessageProducer, BaseMessageConsumer]:
+    """Return the producer and the consumer of the backend."""
+    if backend == "streams":
+        return (
+            RedisStreamMessageProducer(client, QUEUE_NAME, max_len=10_000_000),
+            RedisStreamMessageConsumer(client, QUEUE_NAME, group="benchmark"),
+        )
+    return RedisMessageProducer(client, QUEUE_NAME), RedisMessageConsumer(
+        client, QUEUE_NAME
+    )
+
+
+async def measure(name: str, items: int, run: Callable[[], Awaitable[None]]) -> None:
+    """Print the number of items per second."""
+    start: float = time.perf_counter()
+    await run()
+    elapsed: float = time.perf_counter() - start
+    print(f"{name:<14} {items / elapsed:>10.0f} items/sec")
+
+
+async def main(args: argparse.Namespace) -> None:
+    """Run the benchmark."""
+    client = redis.asyncio.Redis.from_url(args.redis_url)
+    producer, consumer = get_pc(client, args.backend)
+    msgs: List[MessageSchema] = [
+        MessageSchema(id=str(i), text=f"benchmark message {i}")
+        for i in range(args.items)
+    ]
+    chunks: List[List[MessageSchema]] = [
+        msgs[start:stop]
+        for start, stop in zip(
+            range(0, len(msgs), args.batch),
+            range(args.batch, len(msgs) + args.batch, args.batch),
+        )
+    ]
+
+    async def upload() -> None:
+        for msg in msgs:
+            await producer.upload(msg)
+
+    async def extract() -> None:
+        for _ in msgs:
+            await consumer.ack(await consumer.extract())
+
+    async def upload_many() -> None:
+        for chunk in chunks:
+            await producer.upload_many(chunk)
+
+    async def extract_many() -> None:
+        extracted: int = 0
+        while extracted < len(msgs):
+            for msg in await consumer.extract_many(args.batch):
+                await consumer.ack(msg)
+                extracted += 1
+
+    try:
+        await client.delete(QUEUE_NAME)
+        await measure("upload", args.items, upload)
+        await measure("extract", args.items, extract)
+        await measure("upload_many", args.items, upload_many)
+        await measure("extract_many", args.items, extract_many)
+    finally:
+        await client.delete(QUEUE_NAME)
+        await client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--redis-url", default="redis://localhost:6379")
+    parser.add_argument("--backend", choices=("list", "streams"), default="list")
+    parser.add_argument("--items", type=int, default=10_000)
+    parser.add_argument("--batch", type=int, default=100)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,112 @@
+"""
+Load test of the webhook of the bot with recorded or generated updates.
+
+The updates are POSTed to the running bot (BOT_WEBHOOK_ENABLED=1) the same
+way Telegram does it, and the time until the update is acknowledged is measured.
+The recorded updates are read from a file with one JSON update per line,
+their update ids are renumbered, so every update is handled as a new one.
+
+Usage:
+    python -m benchmarks.webhook --count 10000 --concurrency 100
+    python -m benchmarks.webhook --updates updates.jsonl --secret <BOT_WEBHOOK_SECRET>
+    python -m benchmarks.webhook --count 1000 --record updates.jsonl
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from collections import Counter
+from typing import Any, Dict, Iterator, List
+
+import aiohttp
+from aiogram.types import Update
+
+from bot.services.webhook import SECRET_HEADER
+
+from .load_test.run import percentile
+from .load_test.traffic import TrafficGenerator
+
+
+def read_updates(path: str) -> List[Dict[str, Any]]:
+    """Read the recorded updates, one JSON update per line."""
+    with open(path, encoding="utf-8") as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def generate_updates(count: int, chats: int) -> List[Dict[str, Any]]:
+    """Generate the updates with the messages of the chats."""
+    generator = TrafficGenerator(rate=1, chats=chats, seed=0)
+    return [
+        json.loads(
+            Update(update_id=i, message=generator.make_message()).model_dump_json(
+                exclude_none=True
+            )
+        )
+        for i in range(count)
+    ]
+
+
+def iter_updates(updates: List[Dict[str, Any]], count: int) -> Iterator[bytes]:
+    """Iterate over count updates with unique update ids, repeating the updates."""
+    for i in range(count):
+        yield json.dumps({**updates[i % len(updates)], "update_id": i}).encode()
+
+
+async def main(args: argparse.Namespace) -> None:
+    """Run the load test."""
+    updates: List[Dict[str, Any]] = (
+        read_updates(args.updates)
+        if args.updates
+        else generate_updates(args.count, args.chats)
+    )
+    if args.record:
+        with open(args.record, "w", encoding="utf-8") as file:
+            file.writelines(json.dumps(update) + "\n" for update in updates)
+
+    headers: Dict[str, str] = {"Content-Type": "application/json"}
+    if args.secret:
+        headers[SECRET_HEADER] = args.secret
+    payloads: Iterator[bytes] = iter_updates(updates, args.count)
+    statuses: Counter[str] = Counter()
+    latencies: List[float] = []
+
+    async def post(session: aiohttp.ClientSession) -> None:
+        for payload in payloads:
+            start: float = time.perf_counter()
+            try:
+                async with session.post(
+                    args.url, data=payload, headers=headers
+                ) as response:
+                    await response.read()
+                    statuses[str(response.status)] += 1
+            except aiohttp.ClientError as exc:
+                statuses[type(exc).__name__] += 1
+                continue
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    connector = aiohttp.TCPConnector(limit=args.concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        start: float = time.perf_counter()
+        await asyncio.gather(*(post(session) for _ in range(args.concurrency)))
+        elapsed: float = time.perf_counter() - start
+
+    latencies.sort()
+    print(f"updates/s: {args.count / elapsed:.0f}, statuses: {dict(statuses)}")
+    print(
+        f"ack ms: p50 {percentile(latencies, 0.5):.1f},"
+        f" p95 {percentile(latencies, 0.95):.1f},"
+        f" p99 {percentile(latencies, 0.99):.1f}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--url", default="http://localhost:8080/webhook")
+    parser.add_argument("--secret", default="")
+    parser.add_argument("--updates", default=None, help="file with recorded updates")
+    parser.add_argument("--record", default=None, help="save the updates to file")
+    parser.add_argument("--count", type=int, default=10_000)
+    parser.add_argument("--chats", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=100)
+    asyncio.run(main(parser.parse_args()))
@@ -1,7 +1,8 @@
 """The module responsible for getting the configuration from the env variables."""
 
 import os
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from typing import Dict
 
 
 @dataclass
@@ -11,25 +12,205 @@ class RedisConfig(object):
     url: str
 
 
+@dataclass
+class MetricsConfig(object):
+    """Config for the HTTP endpoint of the metrics."""
+
+    enabled: bool
+    host: str
+    port: int
+
+
+@dataclass
+class WebhookConfig(object):
+    """
+    Config for receiving the updates through the webhook instead of polling.
+
+    url is the public URL of the webhook registered in Telegram
+    (empty - the webhook is registered outside of the bot).
+    """
+
+    enabled: bool
+    url: str
+    path: str
+    secret_token: str
+    host: str
+    port: int
+    workers: int
+    max_pending: int
+
+
+@dataclass
+class ProducerConfig(object):
+    """
+    Config for uploading the messages into the queue.
+
+    With buffered the messages are uploaded in batches in the background:
+    every max_batch messages or max_delay seconds, and the handlers wait
+    only when max_buffer messages are not uploaded yet.
+    """
+
+    buffered: bool
+    max_batch: int
+    max_delay: float
+    max_buffer: int
+
+
+@dataclass
+class QueueConfig(object):
+    """Config for the queues of messages and moderation results."""
+
+    backend: str
+    max_len: int
+    claim_idle: float
+    codec: str
+    compress_threshold: int
+
+
+@dataclass
+class BotAPIConfig(object):
+    """Config for the calls of the Bot API."""
+
+    concurrency: int
+    global_rate: float
+    chat_rate: float
+    chat_burst: float
+    max_retries: int
+    max_backlog: int
+    stats_interval: float
+
+
+@dataclass
+class ChatConfig(object):
+    """
+    Config for one chat.
+
+    max_age is the time in seconds after which the result of moderation
+    of a message of the chat is useless (0 - no deadline).
+    """
+
+    is_premium: bool
+    max_age: float = 0.0
+
+
 @dataclass
 class BotConfig(object):
-    """Config class for bot."""
+    """
+    Config class for bot.
+
+    The bot serves the chats from chats, or all chats if it is empty.
+    chat_id is the chat of the results without the chat id
+    (sent before the chat id was added to the results).
+    instance is the name of the bot instance, every named instance
+    gets the results of its messages in a separate queue.
+    max_age is the deadline of the messages of the chats without their own.
+    """
 
     debug: bool
     token: str
     chat_id: str
     is_premium: bool
+    bot_api: BotAPIConfig
     redis: RedisConfig
+    queue: QueueConfig
+    metrics: MetricsConfig
+    webhook: WebhookConfig
+    producer: ProducerConfig
+    instance: str = ""
+    chats: Dict[str, ChatConfig] = field(default_factory=dict)
+    max_age: float = 0.0
+
+    def get_chat(self, chat_id: str) -> ChatConfig:
+        """Return the config of the chat, the chats not in chats get the default."""
+        return self.chats.get(chat_id) or ChatConfig(
+            is_premium=self.is_premium, max_age=self.max_age
+        )
+
+
+def parse_chats(
+    value: str, is_premium: bool, max_age: float = 0.0
+) -> Dict[str, ChatConfig]:
+    """
+    Parse the list of chats.
+
+    :param value: Comma-separated chat ids, every id can be followed
+    by ":premium" or ":basic" to set the style of the reactions in the chat
+    and by one more ":" with the deadline of the messages in seconds,
+    e.g. "-1001:premium,-1002:basic:600,-1003,-1004::60".
+    :param is_premium: The style of the reactions in the chats without the style.
+    :param max_age: The deadline of the messages in the chats without the deadline.
+    """
+    chats: Dict[str, ChatConfig] = dict()
+    for item in value.split(","):
+        chat_id, _, options = item.strip().partition(":")
+        if not chat_id:
+            continue
+        style, _, chat_max_age = options.partition(":")
+        if style not in ("", "premium", "basic"):
+            raise ValueError(f"Unknown reaction style {style!r} of chat {chat_id}.")
+        chats[chat_id] = ChatConfig(
+            is_premium=style == "premium" if style else is_premium,
+            max_age=abs(float(chat_max_age)) if chat_max_age else max_age,
+        )
+    return chats
 
 
 def get_config() -> BotConfig:
     """Return app config."""
+    chat_id: str = os.getenv("BOT_CHAT_ID", "")
+    is_premium: bool = os.getenv("BOT_IS_PREMIUM", "1") == "1"
+    max_age: float = abs(float(os.getenv("BOT_MESSAGE_MAX_AGE", 0)))
+    chats: Dict[str, ChatConfig] = parse_chats(
+        os.getenv("BOT_CHATS", ""), is_premium, max_age
+    )
+    if chats and chat_id:
+        chats.setdefault(chat_id, ChatConfig(is_premium=is_premium, max_age=max_age))
     return BotConfig(
         debug=os.getenv("BOT_DEBUG", "1") == "1",
         token=os.getenv("BOT_TOKEN", ""),
-        chat_id=os.getenv("BOT_CHAT_ID", ""),
-        is_premium=os.getenv("BOT_IS_PREMIUM", "1") == "1",
+        chat_id=chat_id,
+        is_premium=is_premium,
+        instance=os.getenv("BOT_INSTANCE", ""),
+        chats=chats,
+        max_age=max_age,
+        bot_api=BotAPIConfig(
+            concurrency=max(1, int(os.getenv("BOT_API_CONCURRENCY", 8))),
+            global_rate=abs(float(os.getenv("BOT_API_GLOBAL_RATE", 30))),
+            chat_rate=abs(float(os.getenv("BOT_API_CHAT_RATE", 1))),
+            chat_burst=abs(float(os.getenv("BOT_API_CHAT_BURST", 20))),
+            max_retries=abs(int(os.getenv("BOT_API_MAX_RETRIES", 3))),
+            max_backlog=max(1, int(os.getenv("BOT_API_MAX_BACKLOG", 1000))),
+            stats_interval=abs(float(os.getenv("BOT_API_STATS_INTERVAL", 60))),
+        ),
         redis=RedisConfig(
             url=os.getenv("REDIS_URL", "redis://localhost"),
         ),
+        queue=QueueConfig(
+            backend=os.getenv("QUEUE_BACKEND", "list"),
+            max_len=max(1, int(os.getenv("QUEUE_MAX_LEN", 100000))),
+            claim_idle=abs(float(os.getenv("QUEUE_CLAIM_IDLE", 60))),
+            codec=os.getenv("QUEUE_CODEC", "json"),
+            compress_threshold=abs(int(os.getenv("QUEUE_COMPRESS_THRESHOLD", 512))),
+        ),
+        metrics=MetricsConfig(
+            enabled=os.getenv("METRICS_ENABLED", "0") == "1",
+            host=os.getenv("METRICS_HOST", "0.0.0.0"),
+            port=int(os.getenv("METRICS_PORT", 8001)),
+        ),
+        webhook=WebhookConfig(
+            enabled=os.getenv("BOT_WEBHOOK_ENABLED", "0") == "1",
+            url=os.getenv("BOT_WEBHOOK_URL", ""),
+            path=os.getenv("BOT_WEBHOOK_PATH", "/webhook"),
+            secret_token=os.getenv("BOT_WEBHOOK_SECRET", ""),
+            host=os.getenv("BOT_WEBHOOK_HOST", "0.0.0.0"),
+            port=int(os.getenv("BOT_WEBHOOK_PORT", 8080)),
+            workers=max(1, int(os.getenv("BOT_WEBHOOK_WORKERS", 1))),
+            max_pending=max(1, int(os.getenv("BOT_WEBHOOK_MAX_PENDING", 100))),
+        ),
+        producer=ProducerConfig(
+            buffered=os.getenv("BOT_PRODUCER_BUFFERED", "0") == "1",
+            max_batch=max(1, int(os.getenv("BOT_PRODUCER_MAX_BATCH", 100))),
+            max_delay=abs(float(os.getenv("BOT_PRODUCER_MAX_DELAY", 0.01))),
+            max_buffer=max(1, int(os.getenv("BOT_PRODUCER_MAX_BUFFER", 10000))),
+        ),
     )
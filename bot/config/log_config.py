@@ -34,6 +34,11 @@ LOG_CONFIG = {
             "handlers": ["file", "console"],
             "propagate": False,
         },
+        "producer_consumer": {
+            "level": "INFO",
+            "handlers": ["file", "console"],
+            "propagate": False,
+        },
     },
 }
 
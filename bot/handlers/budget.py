@@ -0,0 +1,44 @@
+"""The module responsible for the handlers for the token budget."""
+
+from datetime import datetime, timezone
+from logging import getLogger
+from typing import Optional
+
+from aiogram import Bot, Router
+from aiogram.enums import ChatMemberStatus
+from aiogram.filters import Command
+from aiogram.types import Message
+
+from schemas.budgets import TokenBudgetSchema
+
+from ..services.token_budget import TokenBudgetReader
+
+router: Router = Router()
+logger = getLogger("bot.handlers.budget")
+
+
+def format_budget(budget: Optional[TokenBudgetSchema]) -> str:
+    """Return the text of the answer about the budget of the chat."""
+    if budget is None:
+        return "No LLM tokens have been spent on this chat recently."
+    window_end: str = datetime.fromtimestamp(budget.window_end, timezone.utc).strftime(
+        "%Y-%m-%d %H:%M UTC"
+    )
+    if budget.remaining is None:
+        return f"{budget.spent} LLM tokens spent until {window_end}, no limit."
+    return (
+        f"{budget.remaining} of {budget.limit} LLM tokens left until {window_end}"
+        f" ({budget.spent_fraction:.0%} spent)."
+    )
+
+
+@router.message(Command("budget"))
+async def show_budget(msg: Message, bot: Bot, token_budget: TokenBudgetReader):
+    """Answer the administrators of the chat with the remaining token budget."""
+    if msg.from_user is None:
+        return
+    member = await bot.get_chat_member(msg.chat.id, msg.from_user.id)
+    if member.status not in (ChatMemberStatus.CREATOR, ChatMemberStatus.ADMINISTRATOR):
+        logger.debug("User %s is not an administrator.", msg.from_user.id)
+        return
+    await msg.reply(format_budget(await token_budget.get(str(msg.chat.id))))
@@ -1,5 +1,6 @@
 """The module responsible for the handlers for moderation."""
 
+import time
 from logging import getLogger
 
 from aiogram import Router
@@ -13,12 +14,26 @@ logger = getLogger("bot.handlers")
 
 
 @router.message()
-async def moderate_message(msg: Message, msg_producer: BaseMessageProducer):
-    """Add a message to the moderation queue."""
+async def moderate_message(
+    msg: Message,
+    msg_producer: BaseMessageProducer,
+    reply_to: str = "",
+    max_age: float = 0,
+):
+    """Add a message to the moderation queue with the deadline of its chat."""
     logger.info("Add msg into queue for moderation")
     logger.debug("Chat id: %s", str(msg.chat.id))
     if msg.text:
-        msg_schema: MessageSchema = MessageSchema(id=str(msg.message_id), text=msg.text)
+        enqueued_at: float = time.time()
+        msg_schema: MessageSchema = MessageSchema(
+            id=str(msg.message_id),
+            text=msg.text,
+            chat_id=str(msg.chat.id),
+            reply_to=reply_to,
+            user_id=str(msg.from_user.id) if msg.from_user else "",
+            enqueued_at=enqueued_at,
+            deadline=enqueued_at + max_age if max_age else 0.0,
+        )
         await msg_producer.upload(msg_schema)
     else:
         logger.debug("No msg text.")
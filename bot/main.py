@@ -3,21 +3,255 @@
 import asyncio
 import logging
 import logging.config
-from typing import Any, Dict
+import multiprocessing
+import signal
+from contextlib import suppress
+from typing import Any, Awaitable, Callable, Dict, List, Optional
 
 import redis.asyncio
-from aiogram import Bot, Dispatcher
+from aiogram import Bot, Dispatcher, F
 from aiogram.client.default import DefaultBotProperties
 from dotenv import load_dotenv
 
+from metrics.http_server import MetricsServer
+from metrics.registry import REGISTRY
+from producer_consumer.codecs.versioned_codec import (
+    get_message_codec,
+    get_moderation_result_codec,
+)
+from producer_consumer.messages.base import BaseMessageProducer
+from producer_consumer.messages.buffered_pc import BufferedMessageProducer
 from producer_consumer.messages.redis_pc import RedisMessageProducer
+from producer_consumer.messages.redis_streams_pc import RedisStreamMessageProducer
+from producer_consumer.moderation_results.base import BaseModerationResultConsumer
 from producer_consumer.moderation_results.redis_pc import RedisModerationResultsConsumer
+from producer_consumer.moderation_results.redis_streams_pc import (
+    RedisStreamModerationResultsConsumer,
+)
+from producer_consumer.queue_depth import QUEUE_DEPTH, queue_depth
 
 from .config.bot_config import BotConfig, get_config
 from .config.log_config import get_log_config
+from .handlers.budget import router as budget_router
 from .handlers.moderation import router as moderation_router
 from .middlewares.msg_producer_middleware import MsgProducerMiddleware
 from .services.post_moderation import PostModerationManager
+from .services.reaction_dispatcher import ReactionDispatcher
+from .services.token_budget import TokenBudgetReader
+from .services.webhook import WebhookServer
+
+REACTIONS_BACKLOG = REGISTRY.gauge(
+    "bot_reactions_backlog", "Reactions waiting to be set or being set."
+)
+
+
+def get_results_queue(config: BotConfig) -> str:
+    """
+    Return the name of the queue of the moderation results of the bot instance.
+
+    The unnamed instances share the default queue.
+    """
+    queue: str = (
+        "moderation_results:stream"
+        if config.queue.backend == "streams"
+        else "moderation_results"
+    )
+    return f"{queue}:{config.instance}" if config.instance else queue
+
+
+def get_msg_producer(
+    config: BotConfig, client: redis.asyncio.Redis
+) -> BaseMessageProducer:
+    """
+    Return the message producer of the queue backend chosen in the config.
+
+    The buffered producer must be started and closed by the caller.
+    """
+    codec = get_message_codec(config.queue.codec, config.queue.compress_threshold)
+    producer: BaseMessageProducer = (
+        RedisStreamMessageProducer(client, max_len=config.queue.max_len, codec=codec)
+        if config.queue.backend == "streams"
+        else RedisMessageProducer(redis_client=client, codec=codec)
+    )
+    if config.producer.buffered:
+        return BufferedMessageProducer(
+            producer,
+            max_batch=config.producer.max_batch,
+            max_delay=config.producer.max_delay,
+            max_buffer=config.producer.max_buffer,
+        )
+    return producer
+
+
+def get_mod_res_consumer(
+    config: BotConfig, client: redis.asyncio.Redis
+) -> BaseModerationResultConsumer:
+    """Return the consumer of the moderation results queue of the bot instance."""
+    codec = get_moderation_result_codec(config.queue.codec)
+    if config.queue.backend == "streams":
+        return RedisStreamModerationResultsConsumer(
+            client,
+            get_results_queue(config),
+            claim_idle=config.queue.claim_idle,
+            codec=codec,
+        )
+    return RedisModerationResultsConsumer(
+        redis_client=client, queue_name=get_results_queue(config), codec=codec
+    )
+
+
+def get_metrics_collector(
+    config: BotConfig, client: redis.asyncio.Redis, dispatcher: ReactionDispatcher
+) -> Callable[[], Awaitable[None]]:
+    """Return the collector of the depth of the queues and the reactions backlog."""
+    streams: bool = config.queue.backend == "streams"
+
+    async def collect() -> None:
+        QUEUE_DEPTH.set(
+            await (
+                queue_depth(client, "messages:stream", "moderation")
+                if streams
+                else queue_depth(client, "messages")
+            ),
+            "messages",
+        )
+        QUEUE_DEPTH.set(
+            await queue_depth(
+                client, get_results_queue(config), "bot" if streams else None
+            ),
+            "moderation_results",
+        )
+        REACTIONS_BACKLOG.set(dispatcher.stats()["backlog"])
+
+    return collect
+
+
+def get_bot(config: BotConfig) -> Bot:
+    """Return the aiogram bot object."""
+    return Bot(
+        token=config.token,
+        default=DefaultBotProperties(parse_mode="HTML"),
+    )
+
+
+def get_dispatcher(
+    config: BotConfig, client: redis.asyncio.Redis, msg_producer: BaseMessageProducer
+) -> Dispatcher:
+    """Return the dispatcher with the routers and middlewares of the bot."""
+    dp: Dispatcher = Dispatcher()
+
+    # init middlewares
+    reply_to: str = get_results_queue(config) if config.instance else ""
+    msg_producer_middleware = MsgProducerMiddleware(msg_producer, reply_to, config)
+
+    # register routers, the commands are handled before moderation
+    dp["token_budget"] = TokenBudgetReader(client)
+    dp.include_router(budget_router)
+    dp.include_router(moderation_router)
+
+    # serve only the configured chats
+    if config.chats:
+        for router in (budget_router, moderation_router):
+            router.message.filter(
+                F.chat.id.in_({int(chat_id) for chat_id in config.chats})
+            )
+
+    # register middlewares for routers
+    moderation_router.message.middleware(msg_producer_middleware)
+    return dp
+
+
+def get_webhook_server(config: BotConfig, dp: Dispatcher, bot: Bot) -> WebhookServer:
+    """Return the webhook server, sharing the port with other workers if any."""
+    return WebhookServer(
+        dp,
+        bot,
+        path=config.webhook.path,
+        secret_token=config.webhook.secret_token,
+        host=config.webhook.host,
+        port=config.webhook.port,
+        max_pending=config.webhook.max_pending,
+        reuse_port=config.webhook.workers > 1,
+    )
+
+
+async def run_until_stopped(coro: Awaitable[Any]) -> None:
+    """Run the coroutine until it returns or SIGINT or SIGTERM is received."""
+    task = asyncio.ensure_future(coro)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        with suppress(NotImplementedError):
+            loop.add_signal_handler(sig, task.cancel)
+    with suppress(asyncio.CancelledError):
+        await task
+
+
+async def run_webhook_worker() -> None:
+    """
+    Receive the updates through the webhook in a worker process.
+
+    The worker only puts the messages into the moderation queue,
+    the reactions are set by the main process.
+    """
+    load_dotenv()
+    config: BotConfig = get_config()
+    logging.config.dictConfig(get_log_config(config))
+    logger = logging.getLogger("bot.webhook")
+
+    bot: Bot = get_bot(config)
+    client = None
+    pool = None
+    msg_producer: Optional[BaseMessageProducer] = None
+    webhook_server: Optional[WebhookServer] = None
+    try:
+        pool = redis.asyncio.ConnectionPool.from_url(config.redis.url)
+        client = redis.asyncio.Redis(connection_pool=pool)
+        msg_producer = get_msg_producer(config, client)
+        if isinstance(msg_producer, BufferedMessageProducer):
+            await msg_producer.start()
+        webhook_server = get_webhook_server(
+            config, get_dispatcher(config, client, msg_producer), bot
+        )
+        await webhook_server.start()
+        logger.info("Start webhook worker.")
+        await run_until_stopped(asyncio.Event().wait())
+    finally:
+        if webhook_server is not None:
+            await webhook_server.close()
+        if isinstance(msg_producer, BufferedMessageProducer):
+            await msg_producer.close()
+        await bot.session.close()
+        if client is not None:
+            await client.close()
+        if pool is not None:
+            await pool.aclose()
+
+
+def webhook_worker() -> None:
+    """Run the webhook worker process."""
+    asyncio.run(run_webhook_worker())
+
+
+def start_webhook_workers(count: int) -> List[multiprocessing.Process]:
+    """Start the worker processes receiving the updates on the same port."""
+    # spawn, so the workers do not inherit the event loop and the connections
+    context = multiprocessing.get_context("spawn")
+    workers: List[multiprocessing.Process] = [
+        context.Process(target=webhook_worker, name=f"webhook-worker-{i}")
+        for i in range(count)
+    ]
+    for worker in workers:
+        worker.start()
+    return workers
+
+
+async def stop_webhook_workers(workers: List[multiprocessing.Process]) -> None:
+    """Ask the worker processes to stop (SIGTERM) and wait for them."""
+    for worker in workers:
+        worker.terminate()
+    await asyncio.gather(
+        *(asyncio.to_thread(worker.join, timeout=30) for worker in workers)
+    )
 
 
 async def main():
@@ -32,42 +266,80 @@ async def main():
     logger = logging.getLogger("bot")
 
     # bot
-    bot: Bot = Bot(
-        token=config.token,
-        default=DefaultBotProperties(parse_mode="HTML"),
-    )
-    dp: Dispatcher = Dispatcher()
+    bot: Bot = get_bot(config)
 
     # Redis client
     client = None
     pool = None
+    msg_producer: Optional[BaseMessageProducer] = None
+    metrics_server: Optional[MetricsServer] = None
+    webhook_server: Optional[WebhookServer] = None
+    workers: List[multiprocessing.Process] = []
     try:
         pool = redis.asyncio.ConnectionPool.from_url(config.redis.url)
         client = redis.asyncio.Redis(connection_pool=pool)
 
-        # message producer
-        msg_producer = RedisMessageProducer(redis_client=client)
+        # dispatcher with the message producer
+        msg_producer = get_msg_producer(config, client)
+        if isinstance(msg_producer, BufferedMessageProducer):
+            await msg_producer.start()
+        dp: Dispatcher = get_dispatcher(config, client, msg_producer)
 
         # moderation results consumer
-        mod_res_consumer = RedisModerationResultsConsumer(redis_client=client)
+        mod_res_consumer = get_mod_res_consumer(config, client)
 
         # post-moderation
-        post_moderation_manager = PostModerationManager(bot, config, mod_res_consumer)
-
-        # init middlewares
-        msg_producer_middleware = MsgProducerMiddleware(msg_producer)
+        dispatcher = ReactionDispatcher(
+            bot,
+            concurrency=config.bot_api.concurrency,
+            global_rate=config.bot_api.global_rate,
+            chat_rate=config.bot_api.chat_rate,
+            chat_burst=config.bot_api.chat_burst,
+            max_retries=config.bot_api.max_retries,
+            max_backlog=config.bot_api.max_backlog,
+            stats_interval=config.bot_api.stats_interval,
+        )
+        post_moderation_manager = PostModerationManager(
+            dispatcher, config, mod_res_consumer
+        )
 
-        # register routers
-        dp.include_router(moderation_router)
+        # metrics
+        if config.metrics.enabled:
+            REGISTRY.add_collector(get_metrics_collector(config, client, dispatcher))
+            metrics_server = MetricsServer(config.metrics.host, config.metrics.port)
+            await metrics_server.start()
 
-        # register middlewares for routers
-        moderation_router.message.middleware(msg_producer_middleware)
+        if not config.webhook.enabled:
+            # launch bot and launch post-moderation
+            await bot.delete_webhook(drop_pending_updates=True)
+            logger.info("Start bot.")
+            await asyncio.gather(dp.start_polling(bot), post_moderation_manager.run())
+            return
 
-        # launch bot and launch post-moderation
-        await bot.delete_webhook(drop_pending_updates=True)
-        logger.info("Start bot.")
-        await asyncio.gather(dp.start_polling(bot), post_moderation_manager.run())
+        # receive updates through the webhook in this process and in the workers,
+        # set reactions only in this process, so the limits of Bot API are kept
+        webhook_server = get_webhook_server(config, dp, bot)
+        await webhook_server.start()
+        workers = start_webhook_workers(config.webhook.workers - 1)
+        if config.webhook.url:
+            await bot.set_webhook(
+                config.webhook.url,
+                secret_token=config.webhook.secret_token or None,
+                allowed_updates=dp.resolve_used_update_types(),
+                drop_pending_updates=True,
+            )
+        logger.info("Start bot with webhook on port %s.", config.webhook.port)
+        await run_until_stopped(post_moderation_manager.run())
     finally:
+        if webhook_server is not None:
+            await webhook_server.close()
+        await stop_webhook_workers(workers)
+        # the updates are handled, upload the rest of their messages
+        if isinstance(msg_producer, BufferedMessageProducer):
+            await msg_producer.close()
+        if metrics_server is not None:
+            await metrics_server.close()
+        await bot.session.close()
         if client is not None:
             await client.close()
         if pool is not None:
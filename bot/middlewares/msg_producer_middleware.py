@@ -1,23 +1,36 @@
 """Module responsible with middlewares for forwarding msg_producer inside handlers."""
 
-from typing import Any, Awaitable, Callable, Dict
+from typing import Any, Awaitable, Callable, Dict, Optional
 
 from aiogram import BaseMiddleware
 from aiogram.types import Message
 
-from producer_consumer.messages.redis_pc import RedisMessageProducer
+from producer_consumer.messages.base import BaseMessageProducer
+
+from ..config.bot_config import BotConfig
 
 
 class MsgProducerMiddleware(BaseMiddleware):
     """Middleware for forwarding msg_producer inside handlers."""
 
-    def __init__(self, msg_producer: RedisMessageProducer):
+    def __init__(
+        self,
+        msg_producer: BaseMessageProducer,
+        reply_to: str = "",
+        config: Optional[BotConfig] = None,
+    ):
         """
         Init class.
 
         :param msg_producer: Message Producer.
+        :param reply_to: The name of the queue for the results of moderation
+        of the messages. Empty string means the default queue.
+        :param config: Bot config with the deadlines of the messages
+        of the chats. If None, the messages have no deadline.
         """
         self.__msg_producer = msg_producer
+        self.__reply_to = reply_to
+        self.__config = config
 
     async def __call__(
         self,
@@ -25,6 +38,9 @@ class MsgProducerMiddleware(BaseMiddleware):
         event: Message,
         data: Dict[str, Any],
     ) -> Any:
-        """Forward msg_producer inside handler."""
+        """Forward msg_producer, reply_to and max_age of the chat inside handler."""
         data["msg_producer"] = self.__msg_producer
+        data["reply_to"] = self.__reply_to
+        if self.__config is not None:
+            data["max_age"] = self.__config.get_chat(str(event.chat.id)).max_age
         return await handler(event, data)
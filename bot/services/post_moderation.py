@@ -1,15 +1,16 @@
 """The module responsible for processing the results of moderation."""
 
+import asyncio
 from logging import getLogger
 from typing import List
 
-from aiogram import Bot
 from aiogram.types.reaction_type_emoji import ReactionTypeEmoji
 
 from bot.config.bot_config import BotConfig
 from producer_consumer.moderation_results.base import BaseModerationResultConsumer
 from schemas.messages import ModerationResultSchema
 
+from .reaction_dispatcher import ReactionDispatcher
 from .reactions import REACTION
 
 logger = getLogger("bot.services")
@@ -20,21 +21,27 @@ class PostModerationManager(object):
 
     def __init__(
         self,
-        bot: Bot,
+        dispatcher: ReactionDispatcher,
         config: BotConfig,
         mod_res_consumer: BaseModerationResultConsumer,
+        batch_size: int = 100,
     ):
         """
         Init class.
 
-        :param bot: Aiogram bot object.
+        :param dispatcher: Dispatcher of reactions through the Bot API.
         :param config: Config for bot.
         :param mod_res_consumer: Moderation result Consumer.
+        :param batch_size: The maximum number of results extracted at once.
         """
-        self.__bot = bot
-        self.__chat_id = config.chat_id
-        self.__is_premium = config.is_premium
+        self.__dispatcher = dispatcher
+        self.__config = config
         self.__mod_res_consumer = mod_res_consumer
+        self.__batch_size = max(1, batch_size)
+
+    def __get_chat_id(self, mod_result: ModerationResultSchema) -> str:
+        """Return the chat of the message, the default chat for the old results."""
+        return mod_result.chat_id or self.__config.chat_id
 
     def __get_reaction_depending_on_moderation(
         self,
@@ -43,13 +50,15 @@ class PostModerationManager(object):
         """
         Return the reaction depending on the moderation.
 
+        The style of the reactions depends on the chat of the message.
+
         :param mod_result: Moderation result.
 
         :return: Reaction.
         """
         reactions: List[ReactionTypeEmoji] = list()
 
-        if self.__is_premium:
+        if self.__config.get_chat(self.__get_chat_id(mod_result)).is_premium:
             if mod_result.generated_by_llm:
                 logger.debug("Message is generated.")
                 reactions.append(REACTION["generated_by_llm"])
@@ -70,33 +79,53 @@ class PostModerationManager(object):
         self,
         mod_result: ModerationResultSchema,
     ) -> None:
-        """Set reaction depends on moderation result."""
+        """
+        Set reaction depends on moderation result.
+
+        The reaction is handed over to the dispatcher, and the result
+        is acknowledged after the reaction is set or dropped.
+        """
         reactions: List[ReactionTypeEmoji] = (
             self.__get_reaction_depending_on_moderation(mod_result)
         )
+        try:
+            message_id: int = int(mod_result.msg_id)
+        except ValueError:
+            logger.error("Invalid id %r of the moderated message.", mod_result.msg_id)
+            await self.__mod_res_consumer.ack(mod_result)
+            return
         if reactions:
-            await self.__bot.set_message_reaction(
-                chat_id=self.__chat_id,
-                message_id=int(mod_result.msg_id),
-                reaction=reactions,
+            await self.__dispatcher.submit(
+                chat_id=self.__get_chat_id(mod_result),
+                message_id=message_id,
+                reactions=reactions,
+                on_done=lambda: self.__mod_res_consumer.ack(mod_result),
             )
         else:
             logger.debug("No reactions.")
+            await self.__mod_res_consumer.ack(mod_result)
+
+    async def __process_results(self) -> None:
+        """Extract the moderation results and hand the reactions over."""
+        while True:
+            # extract
+            logger.debug("Extract moderation results.")
+            moderation_results: List[ModerationResultSchema] = (
+                await self.__mod_res_consumer.extract_many(self.__batch_size)
+            )
+
+            # process
+            for moderation_result in moderation_results:
+                await self.__set_reaction(moderation_result)
 
     async def run(self):
         """
         Run post-moderation process.
 
         The function extracts the moderation results from the queue in an infinite loop,
-        and depending on these results, sets a reaction to the message.
+        and depending on these results, sets a reaction to the message
+        through the dispatcher. The extraction waits while the backlog
+        of the dispatcher is full.
         :return: None.
         """
-        while True:
-            # extract
-            logger.debug("Extract moderation result.")
-            moderation_result: ModerationResultSchema = (
-                await self.__mod_res_consumer.extract()
-            )
-
-            # process
-            await self.__set_reaction(moderation_result)
+        await asyncio.gather(self.__dispatcher.run(), self.__process_results())
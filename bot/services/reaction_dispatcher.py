@@ -0,0 +1,261 @@
+"""The module responsible for sending reactions through the Bot API."""
+
+import asyncio
+import statistics
+import time
+from collections import deque
+from dataclasses import dataclass
+from logging import getLogger
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Set, Union
+
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramBadRequest,
+    TelegramForbiddenError,
+    TelegramNetworkError,
+    TelegramRetryAfter,
+    TelegramServerError,
+)
+from aiogram.types.reaction_type_emoji import ReactionTypeEmoji
+
+from metrics.registry import REGISTRY
+
+from .token_bucket import TokenBucket
+
+logger = getLogger("bot.services.reactions")
+
+BOT_API_CALL_SECONDS = REGISTRY.histogram(
+    "bot_api_call_seconds",
+    "Latency of the calls of the Bot API.",
+    ("method", "outcome"),
+)
+
+
+@dataclass
+class ReactionTask(object):
+    """Reaction to set on the message."""
+
+    chat_id: Union[int, str]
+    message_id: int
+    reactions: List[ReactionTypeEmoji]
+    on_done: Optional[Callable[[], Awaitable[None]]] = None
+    attempt: int = 0
+
+
+class ReactionDispatcher(object):
+    """
+    Outbound dispatcher of reactions.
+
+    The reactions are set by concurrency workers. Every call takes a token
+    from the bucket of the chat and from the global bucket, so the limits
+    of Telegram are respected. A reaction to a chat whose bucket is empty
+    is put aside until the token is expected, so a busy chat does not hold
+    the workers and the global tokens while the other chats wait.
+    On TelegramRetryAfter the buckets are paused for retry_after seconds
+    and the reaction is retried; network and server
+    errors are retried up to max_retries times; the rest of the failures
+    (e.g. the message is deleted) are logged and the reaction is dropped.
+    After the reaction is set or dropped, its on_done callback is called.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        concurrency: int = 8,
+        global_rate: float = 30,
+        chat_rate: float = 1,
+        chat_burst: float = 20,
+        max_retries: int = 3,
+        max_backlog: int = 1000,
+        stats_interval: float = 60,
+    ):
+        """
+        Init class.
+
+        :param bot: Aiogram bot object.
+        :param concurrency: The maximum number of Bot API calls at the same time.
+        :param global_rate: The maximum number of calls per second (0 - no limit).
+        :param chat_rate: The maximum number of calls per second in one chat.
+        :param chat_burst: The number of calls in one chat allowed at once.
+        :param max_retries: The maximum number of retries of a reaction.
+        :param max_backlog: The maximum number of reactions waiting to be set,
+        submit waits when the backlog is full.
+        :param stats_interval: Interval of logging the stats in seconds (0 - never).
+        """
+        self.__bot = bot
+        self.__concurrency = max(1, concurrency)
+        self.__global_bucket = TokenBucket(global_rate, global_rate)
+        self.__chat_rate = chat_rate
+        self.__chat_burst = chat_burst
+        self.__chat_buckets: Dict[Union[int, str], TokenBucket] = dict()
+        self.__max_retries = max_retries
+        self.__stats_interval = stats_interval
+
+        self.__queue: asyncio.Queue[ReactionTask] = asyncio.Queue(max_backlog)
+        self.__in_flight: int = 0
+        self.__deferred: Set[asyncio.Task] = set()
+        self.__latencies: Deque[float] = deque(maxlen=1000)
+        self.sent: int = 0
+        self.retried: int = 0
+        self.dropped: int = 0
+        self.throttled: int = 0
+
+    def stats(self) -> Dict[str, float]:
+        """Return the backlog, the counters and the latency of calls in seconds."""
+        latencies: List[float] = sorted(self.__latencies)
+        return {
+            "backlog": self.__queue.qsize() + self.__in_flight + len(self.__deferred),
+            "sent": self.sent,
+            "throttled": self.throttled,
+            "retried": self.retried,
+            "dropped": self.dropped,
+            "latency_avg": statistics.fmean(latencies) if latencies else 0.0,
+            "latency_p95": latencies[int(len(latencies) * 0.95)] if latencies else 0.0,
+            "latency_max": latencies[-1] if latencies else 0.0,
+        }
+
+    async def submit(
+        self,
+        chat_id: Union[int, str],
+        message_id: int,
+        reactions: List[ReactionTypeEmoji],
+        on_done: Optional[Callable[[], Awaitable[None]]] = None,
+    ) -> None:
+        """
+        Add the reaction to the backlog.
+
+        :param chat_id: Chat id.
+        :param message_id: Message id.
+        :param reactions: Reactions to set.
+        :param on_done: Coroutine function called when the reaction is set
+        or dropped.
+        """
+        await self.__queue.put(ReactionTask(chat_id, message_id, reactions, on_done))
+
+    def __get_chat_bucket(self, chat_id: Union[int, str]) -> TokenBucket:
+        """Return the bucket of the chat."""
+        bucket: Optional[TokenBucket] = self.__chat_buckets.get(chat_id)
+        if bucket is None:
+            # forget the chats without recent calls
+            if len(self.__chat_buckets) >= 10000:
+                self.__chat_buckets = {
+                    key: value
+                    for key, value in self.__chat_buckets.items()
+                    if not value.is_idle()
+                }
+            bucket = TokenBucket(self.__chat_rate, self.__chat_burst)
+            self.__chat_buckets[chat_id] = bucket
+        return bucket
+
+    async def __done(self, task: ReactionTask) -> None:
+        """Call on_done of the task."""
+        if task.on_done is None:
+            return
+        try:
+            await task.on_done()
+        except Exception as exc:
+            logger.error("Callback of the reaction failed.\nexc: %s", exc)
+
+    async def __retry(self, task: ReactionTask, delay: float) -> bool:
+        """Return the task into the backlog after the delay if it has attempts left."""
+        if task.attempt >= self.__max_retries:
+            return False
+        self.retried += 1
+        task.attempt += 1
+        # the worker waits, so the retried reaction does not wait for the backlog
+        await asyncio.sleep(delay)
+        await self.__send(task)
+        return True
+
+    async def __set_reaction(self, task: ReactionTask) -> None:
+        """Call setMessageReaction, observing the latency of the call."""
+        start: float = time.perf_counter()
+        outcome: str = "ok"
+        try:
+            await self.__bot.set_message_reaction(
+                chat_id=task.chat_id,
+                message_id=task.message_id,
+                reaction=[*task.reactions],
+            )
+        except Exception as exc:
+            outcome = type(exc).__name__
+            raise
+        finally:
+            BOT_API_CALL_SECONDS.observe(
+                time.perf_counter() - start, "setMessageReaction", outcome
+            )
+
+    async def __requeue(self, task: ReactionTask, delay: float) -> None:
+        """Return the reaction into the backlog after the delay."""
+        await asyncio.sleep(delay)
+        await self.__queue.put(task)
+
+    def __defer(self, task: ReactionTask, delay: float) -> None:
+        """Put the reaction aside while the bucket of its chat is empty."""
+        self.throttled += 1
+        deferred: asyncio.Task = asyncio.create_task(self.__requeue(task, delay))
+        self.__deferred.add(deferred)
+        deferred.add_done_callback(self.__deferred.discard)
+
+    async def __send(self, task: ReactionTask) -> None:
+        """Set the reaction handling the errors of the Bot API."""
+        chat_bucket: TokenBucket = self.__get_chat_bucket(task.chat_id)
+        delay: float = chat_bucket.try_acquire()
+        if delay > 0:
+            self.__defer(task, delay)
+            return
+        await self.__global_bucket.acquire()
+
+        start: float = time.monotonic()
+        try:
+            await self.__set_reaction(task)
+        except TelegramRetryAfter as exc:
+            logger.warning("Flood control, retry after %s seconds.", exc.retry_after)
+            self.__global_bucket.pause(exc.retry_after)
+            chat_bucket.pause(exc.retry_after)
+            if await self.__retry(task, 0):
+                return
+        except (TelegramNetworkError, TelegramServerError) as exc:
+            logger.warning("Bot API is unavailable.\nexc: %s", exc)
+            if await self.__retry(task, 2**task.attempt):
+                return
+        except (TelegramBadRequest, TelegramForbiddenError) as exc:
+            # e.g. the message is deleted or the bot is removed from the chat
+            logger.warning(
+                "Can't set reaction on message %s.\nexc: %s", task.message_id, exc
+            )
+        except Exception as exc:
+            logger.error("Unexpected error of Bot API.\nexc: %s", exc)
+        else:
+            self.__latencies.append(time.monotonic() - start)
+            self.sent += 1
+            await self.__done(task)
+            return
+        self.dropped += 1
+        await self.__done(task)
+
+    async def __work(self) -> None:
+        """Set the reactions from the backlog."""
+        while True:
+            task: ReactionTask = await self.__queue.get()
+            self.__in_flight += 1
+            try:
+                await self.__send(task)
+            finally:
+                self.__in_flight -= 1
+                self.__queue.task_done()
+
+    async def __log_stats(self) -> None:
+        """Log the stats periodically."""
+        while True:
+            await asyncio.sleep(self.__stats_interval)
+            logger.info("Reactions: %s", self.stats())
+
+    async def run(self) -> None:
+        """Run the workers."""
+        workers: List[Awaitable[None]] = [
+            self.__work() for _ in range(self.__concurrency)
+        ]
+        if self.__stats_interval > 0:
+            workers.append(self.__log_stats())
+        await asyncio.gather(*workers)
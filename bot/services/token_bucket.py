@@ -0,0 +1,81 @@
+"""The module responsible for the token bucket rate limiter."""
+
+import asyncio
+import time
+
+
+class TokenBucket(object):
+    """
+    Token bucket: up to capacity calls at once, then rate calls per second.
+
+    The waiting callers are served in the order of arrival.
+    The bucket can be paused, e.g. for retry_after seconds from Telegram.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        """
+        Init class.
+
+        :param rate: The number of tokens added per second (0 - no limit).
+        :param capacity: The maximum number of tokens (burst).
+        """
+        self.__rate = rate
+        self.__capacity = max(1.0, capacity)
+        self.__tokens = self.__capacity
+        self.__updated_at = time.monotonic()
+        self.__paused_until: float = 0
+        self.__lock = asyncio.Lock()
+
+    def pause(self, delay: float) -> None:
+        """Do not give out tokens for delay seconds."""
+        self.__paused_until = max(self.__paused_until, time.monotonic() + delay)
+
+    def is_idle(self) -> bool:
+        """Check that the bucket is full and nobody waits for it."""
+        self.__refill()
+        return not self.__lock.locked() and self.__tokens >= self.__capacity
+
+    def try_acquire(self) -> float:
+        """
+        Take a token if it is available without waiting.
+
+        :return: 0 if the token is taken, otherwise the time in seconds
+        after which a token is expected.
+        """
+        pause: float = self.__paused_until - time.monotonic()
+        if pause > 0:
+            return pause
+        if self.__rate <= 0:
+            return 0.0
+        if self.__lock.locked():
+            # the waiting callers are served first
+            return 1 / self.__rate
+        self.__refill()
+        if self.__tokens >= 1:
+            self.__tokens -= 1
+            return 0.0
+        return (1 - self.__tokens) / self.__rate
+
+    def __refill(self) -> None:
+        """Add the tokens accumulated since the last update."""
+        now: float = time.monotonic()
+        self.__tokens = min(
+            self.__capacity, self.__tokens + (now - self.__updated_at) * self.__rate
+        )
+        self.__updated_at = now
+
+    async def acquire(self) -> None:
+        """Take a token, waiting for it if the bucket is empty or paused."""
+        async with self.__lock:
+            while True:
+                pause: float = self.__paused_until - time.monotonic()
+                if pause > 0:
+                    await asyncio.sleep(pause)
+                    continue
+                if self.__rate <= 0:
+                    return
+                self.__refill()
+                if self.__tokens >= 1:
+                    self.__tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.__tokens) / self.__rate)
@@ -0,0 +1,53 @@
+"""The module responsible for reading the token budgets of the chats."""
+
+import time
+from typing import Any, Dict, Optional
+
+import redis.asyncio
+
+from producer_consumer.redis_values import decode_value
+from schemas.budgets import TokenBudgetSchema
+
+
+class TokenBudgetReader(object):
+    """
+    Reader of the budgets of LLM tokens of the chats.
+
+    The server counts the tokens spent on the messages of every chat
+    in the Redis hash prefix + chat id (see RedisTokenBudget).
+    """
+
+    def __init__(
+        self, redis_client: redis.asyncio.Redis, prefix: str = "token_budget:"
+    ):
+        """
+        Init class.
+
+        :param redis_client: Redis client.
+        :param prefix: Prefix of the keys in Redis.
+        """
+        self.__client = redis_client
+        self.__prefix = prefix
+
+    async def get(self, chat_id: str) -> Optional[TokenBudgetSchema]:
+        """Return the budget of the chat or None if nothing is spent recently."""
+        response: Dict[Any, Any] = await self.__client.hgetall(self.__prefix + chat_id)
+        if not response:
+            return None
+        state: Dict[str, str] = {
+            decode_value(key): decode_value(value) for key, value in response.items()
+        }
+        spent: int = int(state["spent"])
+        window: float = float(state["window"])
+        window_end: float = float(state["window_end"])
+        now: float = time.time()
+        if window_end <= now:
+            # the window is over, the budget is renewed
+            spent = 0
+            window_end += ((now - window_end) // window + 1) * window
+        return TokenBudgetSchema(
+            chat_id=chat_id,
+            spent=spent,
+            limit=int(state["limit"]),
+            window_end=window_end,
+        )
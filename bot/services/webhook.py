@@ -0,0 +1,123 @@
+"""The module responsible for receiving the updates through the webhook."""
+
+import asyncio
+import json
+import secrets
+from logging import getLogger
+from typing import Any, Dict, Optional, Set
+
+from aiogram import Bot, Dispatcher
+from aiohttp import web
+
+from metrics.registry import REGISTRY
+
+logger = getLogger("bot.services.webhook")
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+WEBHOOK_UPDATES = REGISTRY.counter(
+    "bot_webhook_updates_total",
+    "Updates received through the webhook by outcome: accepted, rejected or failed.",
+    ("outcome",),
+)
+
+
+class WebhookServer(object):
+    """
+    HTTP server receiving the updates from Telegram.
+
+    The update is acknowledged as soon as it is parsed, and it is handled
+    (e.g. put into the moderation queue) in the background, so Telegram
+    does not wait for Redis. At most max_pending updates are handled
+    at the same time; when all of them are busy, the answer to Telegram
+    waits for a free slot, so Telegram slows down instead of the process
+    running out of memory. On close the server stops accepting the updates
+    and waits for the updates already acknowledged.
+    With reuse_port several processes listen on the same port,
+    and the kernel spreads the connections between them.
+    """
+
+    def __init__(
+        self,
+        dp: Dispatcher,
+        bot: Bot,
+        path: str = "/webhook",
+        secret_token: str = "",
+        host: str = "0.0.0.0",
+        port: int = 8080,
+        max_pending: int = 100,
+        reuse_port: bool = False,
+    ):
+        """
+        Init class.
+
+        :param dp: Dispatcher handling the updates.
+        :param bot: Aiogram bot object.
+        :param path: The path of the webhook.
+        :param secret_token: The secret token that Telegram sends in the header
+        of every update (empty - the header is not checked).
+        :param host: The host to listen on.
+        :param port: The port to listen on.
+        :param max_pending: The maximum number of updates handled at the same time.
+        :param reuse_port: Allow other processes to listen on the same port.
+        """
+        self.__dp = dp
+        self.__bot = bot
+        self.__path = path
+        self.__secret_token = secret_token
+        self.__host = host
+        self.__port = port
+        self.__reuse_port = reuse_port
+
+        self.__slots = asyncio.Semaphore(max(1, max_pending))
+        self.__pending: Set[asyncio.Task] = set()
+        self.__runner: Optional[web.AppRunner] = None
+
+    async def __feed(self, update: Dict[str, Any]) -> None:
+        """Handle the update."""
+        try:
+            await self.__dp.feed_raw_update(self.__bot, update)
+        except Exception as exc:
+            WEBHOOK_UPDATES.inc("failed")
+            logger.error("Can't handle update.\nexc: %s", exc)
+        finally:
+            self.__slots.release()
+
+    async def __handle(self, request: web.Request) -> web.Response:
+        """Acknowledge the update and handle it in the background."""
+        if self.__secret_token and not secrets.compare_digest(
+            request.headers.get(SECRET_HEADER, ""), self.__secret_token
+        ):
+            WEBHOOK_UPDATES.inc("rejected")
+            return web.Response(status=401)
+        try:
+            update: Dict[str, Any] = await request.json()
+        except json.JSONDecodeError:
+            WEBHOOK_UPDATES.inc("rejected")
+            return web.Response(status=400)
+
+        await self.__slots.acquire()
+        task = asyncio.create_task(self.__feed(update))
+        self.__pending.add(task)
+        task.add_done_callback(self.__pending.discard)
+        WEBHOOK_UPDATES.inc("accepted")
+        return web.json_response({})
+
+    async def start(self) -> None:
+        """Start the server."""
+        app = web.Application()
+        app.router.add_post(self.__path, self.__handle)
+        self.__runner = web.AppRunner(app, access_log=None)
+        await self.__runner.setup()
+        await web.TCPSite(
+            self.__runner, self.__host, self.__port, reuse_port=self.__reuse_port
+        ).start()
+
+    async def close(self) -> None:
+        """Stop the server and wait for the updates already acknowledged."""
+        if self.__runner is not None:
+            await self.__runner.cleanup()
+            self.__runner = None
+        if self.__pending:
+            logger.info("Wait for %s updates.", len(self.__pending))
+            await asyncio.gather(*self.__pending, return_exceptions=True)
@@ -0,0 +1 @@
+"""The package responsible for testing the service layer."""
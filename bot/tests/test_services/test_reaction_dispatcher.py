@@ -0,0 +1,130 @@
+"""The module responsible for testing reaction_dispatcher.py."""
+
+import asyncio
+import time
+from typing import Dict, List, Tuple, cast
+
+import pytest
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramBadRequest,
+    TelegramForbiddenError,
+    TelegramNetworkError,
+    TelegramRetryAfter,
+)
+from aiogram.methods import SetMessageReaction
+from aiogram.types.reaction_type_emoji import ReactionTypeEmoji
+
+from bot.services.reaction_dispatcher import ReactionDispatcher
+
+METHOD = SetMessageReaction(chat_id=1, message_id=1, reaction=[])
+REACTIONS = [ReactionTypeEmoji(emoji="👍")]
+
+
+class FakeBot(object):
+    """Bot that raises the given errors one by one and then sets the reactions."""
+
+    def __init__(self, errors: List[Exception]):
+        """Init class."""
+        self.errors = list(errors)
+        self.calls: List[Tuple[int, float]] = []
+
+    async def set_message_reaction(self, chat_id, message_id, reaction) -> bool:
+        """Remember the call and raise the next error if any."""
+        self.calls.append((message_id, time.monotonic()))
+        if self.errors:
+            raise self.errors.pop(0)
+        return True
+
+
+def run_dispatcher(
+    bot: FakeBot, msgs: List[Tuple[int, int]], **kwargs
+) -> Tuple[ReactionDispatcher, List[int]]:
+    """
+    Submit the reactions on the messages (chat id, message id) and run the dispatcher.
+
+    :return: The dispatcher and the ids of the messages whose on_done is called.
+    """
+    dispatcher = ReactionDispatcher(cast(Bot, bot), stats_interval=0, **kwargs)
+    done: List[int] = []
+
+    async def run() -> None:
+        finished = asyncio.Event()
+        worker = asyncio.create_task(dispatcher.run())
+        for chat_id, message_id in msgs:
+
+            async def on_done(message_id: int = message_id) -> None:
+                done.append(message_id)
+                if len(done) == len(msgs):
+                    finished.set()
+
+            await dispatcher.submit(chat_id, message_id, REACTIONS, on_done)
+        await asyncio.wait_for(finished.wait(), timeout=5)
+        worker.cancel()
+
+    asyncio.run(run())
+    return dispatcher, done
+
+
+def test_retry_after_pauses_buckets_and_retries() -> None:
+    """Test that flood control pauses all calls and the reaction is set later."""
+    bot = FakeBot([TelegramRetryAfter(METHOD, "flood", retry_after=1)])
+
+    dispatcher, done = run_dispatcher(bot, [(1, 1), (2, 2)], concurrency=2)
+
+    calls: Dict[int, List[float]] = dict()
+    for message_id, at in bot.calls:
+        calls.setdefault(message_id, []).append(at)
+    assert len(calls[1]) == 2 and len(calls[2]) == 1
+    # the retry and the reaction in another chat wait for the pause
+    assert calls[1][1] - calls[1][0] >= 0.9
+    assert calls[2][0] - calls[1][0] >= 0.9
+    assert sorted(done) == [1, 2]
+    assert (dispatcher.sent, dispatcher.retried, dispatcher.dropped) == (2, 1, 0)
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        TelegramBadRequest(METHOD, "message to react not found"),
+        TelegramForbiddenError(METHOD, "bot was kicked from the chat"),
+    ],
+)
+def test_rejected_reaction_is_dropped_and_acked(error: Exception) -> None:
+    """Test that the reaction rejected by Telegram is not retried but acked."""
+    bot = FakeBot([error])
+
+    dispatcher, done = run_dispatcher(bot, [(1, 1)])
+
+    assert len(bot.calls) == 1
+    assert done == [1]
+    assert (dispatcher.sent, dispatcher.retried, dispatcher.dropped) == (0, 0, 1)
+
+
+def test_retries_stop_at_max_retries() -> None:
+    """Test that the reaction is dropped after max_retries failed retries."""
+    bot = FakeBot([TelegramNetworkError(METHOD, "timeout") for _ in range(5)])
+
+    dispatcher, done = run_dispatcher(bot, [(1, 1)], max_retries=1)
+
+    assert len(bot.calls) == 2
+    assert done == [1]
+    assert (dispatcher.sent, dispatcher.retried, dispatcher.dropped) == (0, 1, 1)
+
+
+def test_busy_chat_does_not_block_other_chats() -> None:
+    """Test that the reactions of a throttled chat are put aside for the others."""
+    bot = FakeBot([])
+
+    dispatcher, done = run_dispatcher(
+        bot,
+        [(1, 1), (1, 2), (1, 3), (2, 4)],
+        concurrency=1,
+        global_rate=0,
+        chat_rate=10,
+        chat_burst=1,
+    )
+
+    assert [message_id for message_id, _ in bot.calls][:2] == [1, 4]
+    assert sorted(done) == [1, 2, 3, 4]
+    assert dispatcher.sent == 4 and dispatcher.throttled >= 2
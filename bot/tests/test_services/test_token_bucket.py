@@ -0,0 +1,51 @@
+"""The module responsible for testing token_bucket.py."""
+
+import asyncio
+import time
+
+from bot.services.token_bucket import TokenBucket
+
+
+def test_burst_then_rate() -> None:
+    """Test that capacity calls pass at once and the next ones wait for the rate."""
+
+    async def run() -> None:
+        bucket = TokenBucket(rate=20, capacity=5)
+        start = time.monotonic()
+        for _ in range(5):
+            await bucket.acquire()
+        assert time.monotonic() - start < 0.02
+
+        for _ in range(4):
+            await bucket.acquire()
+        # 4 tokens at 20 per second
+        assert 0.18 <= time.monotonic() - start < 0.3
+
+    asyncio.run(run())
+
+
+def test_pause_delays_tokens() -> None:
+    """Test that a paused bucket gives out no tokens until the pause ends."""
+
+    async def run() -> None:
+        bucket = TokenBucket(rate=0, capacity=1)
+        assert bucket.is_idle()
+        bucket.pause(0.1)
+        start = time.monotonic()
+        await bucket.acquire()
+        assert 0.09 <= time.monotonic() - start < 0.2
+
+    asyncio.run(run())
+
+
+def test_try_acquire_does_not_wait() -> None:
+    """Test that try_acquire takes a free token or returns the time to wait."""
+
+    async def run() -> None:
+        bucket = TokenBucket(rate=10, capacity=1)
+        assert bucket.try_acquire() == 0
+        assert 0.09 <= bucket.try_acquire() <= 0.1
+        bucket.pause(1)
+        assert bucket.try_acquire() > 0.9
+
+    asyncio.run(run())
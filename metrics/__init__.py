@@ -0,0 +1 @@
+"""Package responsible for the metrics in the Prometheus text format."""
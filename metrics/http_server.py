@@ -0,0 +1,51 @@
+"""The module responsible for exposing the metrics over HTTP."""
+
+from typing import Optional
+
+from aiohttp import web
+
+from .registry import REGISTRY, Registry
+
+
+class MetricsServer(object):
+    """HTTP server answering GET /metrics with the metrics of the registry."""
+
+    def __init__(
+        self,
+        host: str = "0.0.0.0",
+        port: int = 8000,
+        registry: Registry = REGISTRY,
+    ):
+        """
+        Init class.
+
+        :param host: The host to listen on.
+        :param port: The port to listen on.
+        :param registry: The registry of the metrics.
+        """
+        self.__host = host
+        self.__port = port
+        self.__registry = registry
+        self.__runner: Optional[web.AppRunner] = None
+
+    async def __metrics(self, request: web.Request) -> web.Response:
+        """Return the metrics in the text format."""
+        return web.Response(
+            text=await self.__registry.render(),
+            content_type="text/plain",
+            headers={"X-Content-Type-Options": "nosniff"},
+        )
+
+    async def start(self) -> None:
+        """Start the server."""
+        app = web.Application()
+        app.router.add_get("/metrics", self.__metrics)
+        self.__runner = web.AppRunner(app, access_log=None)
+        await self.__runner.setup()
+        await web.TCPSite(self.__runner, self.__host, self.__port).start()
+
+    async def close(self) -> None:
+        """Stop the server."""
+        if self.__runner is not None:
+            await self.__runner.cleanup()
+            self.__runner = None
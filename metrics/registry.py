@@ -0,0 +1,271 @@
+"""The module responsible for the metrics and their registry."""
+
+import bisect
+from logging import getLogger
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = getLogger("metrics")
+
+# seconds, from a cache hit to a slow LLM answer
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    30,
+)
+
+
+def _escape(value: str) -> str:
+    """Escape the label value."""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    """Format the labels of the sample."""
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return f"{{{pairs}}}"
+
+
+def _format_value(value: float) -> str:
+    """Format the value of the sample."""
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Metric(object):
+    """
+    Base metric.
+
+    The label values are passed positionally in the order of labelnames,
+    so the hot path is one dict lookup by a tuple.
+    """
+
+    kind: str = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        """
+        Init class.
+
+        :param name: The name of the metric.
+        :param documentation: The description of the metric.
+        :param labelnames: The names of the labels.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames: Tuple[str, ...] = tuple(labelnames)
+
+    def samples(self) -> List[str]:
+        """Return the lines of the samples in the text format."""
+        raise NotImplementedError
+
+    def render(self) -> str:
+        """Return the metric in the text format."""
+        lines: List[str] = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+            *self.samples(),
+        ]
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    """Monotonically increasing counter."""
+
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        """Init class. The arguments are the same as in Metric."""
+        super().__init__(*args, **kwargs)
+        self.__values: Dict[Tuple[str, ...], float] = dict()
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        """Increase the counter with the label values by amount."""
+        self.__values[labels] = self.__values.get(labels, 0) + amount
+
+    def get(self, *labels: str) -> float:
+        """Return the value of the counter with the label values."""
+        return self.__values.get(labels, 0)
+
+    def samples(self) -> List[str]:
+        """Return the lines of the samples in the text format."""
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)}"
+            f" {_format_value(value)}"
+            for labels, value in self.__values.items()
+        ]
+
+
+class Gauge(Metric):
+    """Value that can go up and down."""
+
+    kind = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        """Init class. The arguments are the same as in Metric."""
+        super().__init__(*args, **kwargs)
+        self.__values: Dict[Tuple[str, ...], float] = dict()
+
+    def set(self, value: float, *labels: str) -> None:
+        """Set the value of the gauge with the label values."""
+        self.__values[labels] = value
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        """Increase the gauge with the label values by amount."""
+        self.__values[labels] = self.__values.get(labels, 0) + amount
+
+    def get(self, *labels: str) -> float:
+        """Return the value of the gauge with the label values."""
+        return self.__values.get(labels, 0)
+
+    def samples(self) -> List[str]:
+        """Return the lines of the samples in the text format."""
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)}"
+            f" {_format_value(value)}"
+            for labels, value in self.__values.items()
+        ]
+
+
+class Histogram(Metric):
+    """
+    Histogram of the observed values.
+
+    The counts are kept per bucket and accumulated only on render,
+    so observe is a binary search and two additions.
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        """
+        Init class.
+
+        :param name: The name of the metric.
+        :param documentation: The description of the metric.
+        :param labelnames: The names of the labels.
+        :param buckets: The upper bounds of the buckets.
+        """
+        super().__init__(name, documentation, labelnames)
+        self.buckets: Tuple[float, ...] = tuple(sorted(buckets)) + (float("inf"),)
+        # the counts of the buckets, the sum and the count of the values
+        self.__values: Dict[Tuple[str, ...], List[float]] = dict()
+
+    def observe(self, value: float, *labels: str) -> None:
+        """Observe the value with the label values."""
+        values: Optional[List[float]] = self.__values.get(labels)
+        if values is None:
+            values = self.__values[labels] = [0] * (len(self.buckets) + 2)
+        values[bisect.bisect_left(self.buckets, value)] += 1
+        values[-2] += value
+        values[-1] += 1
+
+    def get_count(self, *labels: str) -> int:
+        """Return the number of the observed values with the label values."""
+        values: Optional[List[float]] = self.__values.get(labels)
+        return int(values[-1]) if values is not None else 0
+
+    def samples(self) -> List[str]:
+        """Return the lines of the samples in the text format."""
+        bucket_labels: Tuple[str, ...] = self.labelnames + ("le",)
+        lines: List[str] = []
+        for labels, values in self.__values.items():
+            cumulative: float = 0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                le: str = _format_value(bound)
+                lines.append(
+                    f"{self.name}_bucket"
+                    f"{_format_labels(bucket_labels, labels + (le,))}"
+                    f" {_format_value(cumulative)}"
+                )
+            formatted: str = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{formatted} {_format_value(values[-2])}")
+            lines.append(f"{self.name}_count{formatted} {_format_value(values[-1])}")
+        return lines
+
+
+class Registry(object):
+    """
+    Registry of the metrics of the process.
+
+    The metrics are created once by name, so the modules can declare them
+    at import. The collectors are called on every scrape to update
+    the metrics that are expensive to track on the hot path
+    (e.g. the depth of the queues).
+    """
+
+    def __init__(self):
+        """Init class."""
+        self.__metrics: Dict[str, Metric] = dict()
+        self.__collectors: List[Callable[[], Awaitable[None]]] = []
+
+    def __get(self, metric: Metric) -> Metric:
+        """Register the metric or return the registered one with the same name."""
+        registered: Optional[Metric] = self.__metrics.get(metric.name)
+        if registered is None:
+            self.__metrics[metric.name] = metric
+            return metric
+        if type(registered) is not type(metric):
+            raise ValueError(f"Metric {metric.name} is already registered.")
+        return registered
+
+    def counter(
+        self, name: str, documentation: str, labelnames: Sequence[str] = ()
+    ) -> Counter:
+        """Return the counter with the name."""
+        metric = self.__get(Counter(name, documentation, labelnames))
+        assert isinstance(metric, Counter)
+        return metric
+
+    def gauge(
+        self, name: str, documentation: str, labelnames: Sequence[str] = ()
+    ) -> Gauge:
+        """Return the gauge with the name."""
+        metric = self.__get(Gauge(name, documentation, labelnames))
+        assert isinstance(metric, Gauge)
+        return metric
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        """Return the histogram with the name."""
+        metric = self.__get(Histogram(name, documentation, labelnames, buckets))
+        assert isinstance(metric, Histogram)
+        return metric
+
+    def add_collector(self, collector: Callable[[], Awaitable[None]]) -> None:
+        """Add the coroutine function called before every scrape."""
+        self.__collectors.append(collector)
+
+    async def render(self) -> str:
+        """Run the collectors and return all metrics in the text format."""
+        for collector in self.__collectors:
+            try:
+                await collector()
+            except Exception as exc:
+                logger.warning("Can't collect metrics.\nexc: %s", exc)
+        return "\n".join(metric.render() for metric in self.__metrics.values()) + "\n"
+
+
+REGISTRY = Registry()
@@ -0,0 +1 @@
+"""Package responsible for the codecs of the queue payloads."""
@@ -0,0 +1,26 @@
+"""The module responsible for the interface of the codecs."""
+
+from abc import ABC, abstractmethod
+from typing import Generic, TypeVar, Union
+
+T = TypeVar("T")
+
+
+class BaseCodec(ABC, Generic[T]):
+    """
+    Base codec interface.
+
+    The codec converts the items into the payloads stored in the queues
+    and back. The payloads returned by Redis are bytes, a client
+    with decode_responses returns str, so decode accepts both.
+    """
+
+    @abstractmethod
+    def encode(self, item: T) -> bytes:
+        """Encode the item."""
+        pass
+
+    @abstractmethod
+    def decode(self, data: Union[bytes, str]) -> T:
+        """Decode the item."""
+        pass
@@ -0,0 +1,184 @@
+"""The module responsible for the compact binary codecs of the schemas."""
+
+import struct
+import zlib
+from typing import Dict, List, Tuple, Union
+
+from schemas.messages import MessageSchema, ModerationResultSchema
+
+from .base import BaseCodec
+
+# The first byte of every binary payload. A JSON payload starts with "{",
+# so the decoders tell the formats apart during a rollout.
+# The version is bumped on every change of the layout, the payloads
+# of the previous versions are still decoded.
+MESSAGE_BINARY_VERSION = 2
+RESULT_BINARY_VERSION = 1
+
+FLAG_COMPRESSED = 1
+FLAG_USER_ID = 2
+FLAG_TIMES = 4
+FLAG_GENERATED_BY_LLM = 1
+FLAG_TOXIC = 2
+# The flags known in every version of the layout. A payload with other flags
+# has a layout the decoder does not know, so it is rejected instead of being misread.
+# Version 2 of the messages adds the user id and the times.
+MESSAGE_FLAGS: Dict[int, int] = {
+    1: FLAG_COMPRESSED,
+    2: FLAG_COMPRESSED | FLAG_USER_ID | FLAG_TIMES,
+}
+RESULT_FLAGS: Dict[int, int] = {1: FLAG_GENERATED_BY_LLM | FLAG_TOXIC}
+
+# version, flags, attempt
+MESSAGE_HEADER = struct.Struct("<BBI")
+# version, flags
+RESULT_HEADER = struct.Struct("<BB")
+# enqueued_at, deadline
+MESSAGE_TIMES = struct.Struct("<dd")
+STR_LEN = struct.Struct("<H")
+
+
+def _pack_strs(values: Tuple[str, ...]) -> List[bytes]:
+    """Pack the short strings with their lengths."""
+    parts: List[bytes] = []
+    for value in values:
+        data: bytes = value.encode()
+        parts.append(STR_LEN.pack(len(data)))
+        parts.append(data)
+    return parts
+
+
+def _unpack_strs(data: bytes, offset: int, count: int) -> Tuple[List[str], int]:
+    """Unpack count short strings starting at offset."""
+    values: List[str] = []
+    for _ in range(count):
+        (length,) = STR_LEN.unpack_from(data, offset)
+        offset += STR_LEN.size
+        stop: int = offset + length
+        values.append(data[offset:stop].decode())
+        offset = stop
+    return values, offset
+
+
+def _to_bytes(data: Union[bytes, str]) -> bytes:
+    """Return the payload as bytes."""
+    return data.encode() if isinstance(data, str) else data
+
+
+def _check_version(data: bytes, known_flags: Dict[int, int]) -> None:
+    """Raise ValueError if the payload is not of the known version and flags."""
+    if not data or data[0] not in known_flags:
+        raise ValueError(f"Unknown version {data[:1]!r} of the binary payload.")
+    if len(data) < 2 or data[1] & ~known_flags[data[0]]:
+        raise ValueError(f"Unknown flags {data[1:2]!r} of the binary payload.")
+
+
+class MessageBinaryCodec(BaseCodec[MessageSchema]):
+    """
+    Struct-packed codec of the messages.
+
+    The payload is the header (version, flags, attempt), the id,
+    the chat id and reply_to with their lengths, the user id
+    with its length if it is set (flagged), the enqueue time and the deadline
+    if any of them is set (flagged), and the text up to the end of the payload.
+    The text longer than compress_threshold bytes is compressed with zlib
+    if it gets shorter.
+    """
+
+    def __init__(self, compress_threshold: int = 512):
+        """
+        Init class.
+
+        :param compress_threshold: The minimum length of the text in bytes
+        to compress it. 0 disables compression.
+        """
+        self.__compress_threshold = compress_threshold
+
+    def encode(self, item: MessageSchema) -> bytes:
+        """Encode the message."""
+        flags: int = 0
+        text: bytes = item.text.encode()
+        if self.__compress_threshold and len(text) >= self.__compress_threshold:
+            compressed: bytes = zlib.compress(text)
+            if len(compressed) < len(text):
+                text = compressed
+                flags |= FLAG_COMPRESSED
+        strs: Tuple[str, ...] = (item.id, item.chat_id, item.reply_to)
+        if item.user_id:
+            strs += (item.user_id,)
+            flags |= FLAG_USER_ID
+        times: bytes = b""
+        if item.enqueued_at or item.deadline:
+            times = MESSAGE_TIMES.pack(item.enqueued_at, item.deadline)
+            flags |= FLAG_TIMES
+        return b"".join(
+            [
+                MESSAGE_HEADER.pack(MESSAGE_BINARY_VERSION, flags, item.attempt),
+                *_pack_strs(strs),
+                times,
+                text,
+            ]
+        )
+
+    def decode(self, data: Union[bytes, str]) -> MessageSchema:
+        """Decode the message."""
+        data = _to_bytes(data)
+        _check_version(data, MESSAGE_FLAGS)
+        _, flags, attempt = MESSAGE_HEADER.unpack_from(data)
+        strs, offset = _unpack_strs(
+            data, MESSAGE_HEADER.size, 4 if flags & FLAG_USER_ID else 3
+        )
+        msg_id, chat_id, reply_to = strs[:3]
+        enqueued_at: float = 0.0
+        deadline: float = 0.0
+        if flags & FLAG_TIMES:
+            enqueued_at, deadline = MESSAGE_TIMES.unpack_from(data, offset)
+            offset += MESSAGE_TIMES.size
+        text: bytes = data[offset:]
+        if flags & FLAG_COMPRESSED:
+            text = zlib.decompress(text)
+        return MessageSchema(
+            id=msg_id,
+            text=text.decode(),
+            attempt=attempt,
+            chat_id=chat_id,
+            reply_to=reply_to,
+            user_id=strs[3] if flags & FLAG_USER_ID else "",
+            enqueued_at=enqueued_at,
+            deadline=deadline,
+        )
+
+
+class ModerationResultBinaryCodec(BaseCodec[ModerationResultSchema]):
+    """
+    Struct-packed codec of the moderation results.
+
+    The payload is the header (version, flags of the verdict), the id
+    of the message, the chat id and reply_to with their lengths.
+    """
+
+    def encode(self, item: ModerationResultSchema) -> bytes:
+        """Encode the moderation result."""
+        flags: int = (FLAG_GENERATED_BY_LLM if item.generated_by_llm else 0) | (
+            FLAG_TOXIC if item.toxic else 0
+        )
+        return b"".join(
+            [
+                RESULT_HEADER.pack(RESULT_BINARY_VERSION, flags),
+                *_pack_strs((item.msg_id, item.chat_id, item.reply_to)),
+            ]
+        )
+
+    def decode(self, data: Union[bytes, str]) -> ModerationResultSchema:
+        """Decode the moderation result."""
+        data = _to_bytes(data)
+        _check_version(data, RESULT_FLAGS)
+        _, flags = RESULT_HEADER.unpack_from(data)
+        (msg_id, chat_id, reply_to), _ = _unpack_strs(data, RESULT_HEADER.size, 3)
+        return ModerationResultSchema(
+            msg_id=msg_id,
+            generated_by_llm=bool(flags & FLAG_GENERATED_BY_LLM),
+            toxic=bool(flags & FLAG_TOXIC),
+            chat_id=chat_id,
+            reply_to=reply_to,
+        )
@@ -0,0 +1,47 @@
+"""The module responsible for the JSON codec."""
+
+import json
+from dataclasses import fields
+from typing import Any, Dict, Tuple, Type, TypeVar, Union
+
+from .base import BaseCodec
+
+T = TypeVar("T")
+
+
+class JSONCodec(BaseCodec[T]):
+    """
+    JSON codec of the dataclass schemas.
+
+    The payload is a JSON object with the fields of the schema,
+    so it always starts with "{". The unknown fields are ignored,
+    so a worker can read the payloads of a newer version of the schema.
+    """
+
+    def __init__(self, schema: Type[T]):
+        """
+        Init class.
+
+        :param schema: Dataclass of the items.
+        """
+        self.__schema = schema
+        self.__fields: Tuple[str, ...] = tuple(
+            field.name for field in fields(schema)  # type: ignore[arg-type]
+        )
+
+    def encode(self, item: T) -> bytes:
+        """Encode the item into JSON without the deep copy of asdict."""
+        return json.dumps(
+            {name: getattr(item, name) for name in self.__fields}, ensure_ascii=False
+        ).encode()
+
+    def decode(self, data: Union[bytes, str]) -> T:
+        """Decode the item from JSON."""
+        payload: Dict[str, Any] = json.loads(data)
+        try:
+            return self.__schema(**payload)
+        except TypeError:
+            # the payload of a newer version of the schema with extra fields
+            return self.__schema(
+                **{name: payload[name] for name in self.__fields if name in payload}
+            )
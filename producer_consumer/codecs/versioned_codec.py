@@ -0,0 +1,85 @@
+"""The module responsible for the codecs that read all known formats."""
+
+from typing import Dict, Union
+
+from schemas.messages import MessageSchema, ModerationResultSchema
+
+from .base import BaseCodec, T
+from .binary_codec import (
+    MESSAGE_FLAGS,
+    RESULT_FLAGS,
+    MessageBinaryCodec,
+    ModerationResultBinaryCodec,
+)
+from .json_codec import JSONCodec
+
+JSON_VERSION = ord("{")
+
+CODECS = ("json", "binary")
+
+
+class VersionedCodec(BaseCodec[T]):
+    """
+    Codec that writes one format and reads all known formats.
+
+    The format of the payload is chosen by its first byte, so the workers
+    writing JSON and the workers writing the binary format can share
+    the queues during a rollout. To switch the format, the readers
+    are updated first and the writers are switched after that.
+    """
+
+    def __init__(self, encoder: BaseCodec[T], decoders: Dict[int, BaseCodec[T]]):
+        """
+        Init class.
+
+        :param encoder: Codec of the written payloads.
+        :param decoders: Codecs of the read payloads by their first byte.
+        """
+        self.__encoder = encoder
+        self.__decoders = decoders
+
+    def encode(self, item: T) -> bytes:
+        """Encode the item with the chosen codec."""
+        return self.__encoder.encode(item)
+
+    def decode(self, data: Union[bytes, str]) -> T:
+        """Decode the item with the codec of its format."""
+        version: int = (
+            (data[0] if isinstance(data, bytes) else ord(data[0])) if data else -1
+        )
+        decoder = self.__decoders.get(version)
+        if decoder is None:
+            raise ValueError(f"Unknown format {version} of the payload.")
+        return decoder.decode(data)
+
+
+def get_message_codec(
+    codec: str = "json", compress_threshold: int = 512
+) -> BaseCodec[MessageSchema]:
+    """
+    Return the codec of the messages.
+
+    :param codec: The written format: json or binary.
+    :param compress_threshold: The minimum length of the text in bytes
+    to compress it in the binary format. 0 disables compression.
+    """
+    json_codec: BaseCodec[MessageSchema] = JSONCodec(MessageSchema)
+    binary_codec: BaseCodec[MessageSchema] = MessageBinaryCodec(compress_threshold)
+    decoders: Dict[int, BaseCodec[MessageSchema]] = {JSON_VERSION: json_codec}
+    decoders.update((version, binary_codec) for version in MESSAGE_FLAGS)
+    return VersionedCodec(binary_codec if codec == "binary" else json_codec, decoders)
+
+
+def get_moderation_result_codec(
+    codec: str = "json",
+) -> BaseCodec[ModerationResultSchema]:
+    """
+    Return the codec of the moderation results.
+
+    :param codec: The written format: json or binary.
+    """
+    json_codec: BaseCodec[ModerationResultSchema] = JSONCodec(ModerationResultSchema)
+    binary_codec: BaseCodec[ModerationResultSchema] = ModerationResultBinaryCodec()
+    decoders: Dict[int, BaseCodec[ModerationResultSchema]] = {JSON_VERSION: json_codec}
+    decoders.update((version, binary_codec) for version in RESULT_FLAGS)
+    return VersionedCodec(binary_codec if codec == "binary" else json_codec, decoders)
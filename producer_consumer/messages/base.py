@@ -1,6 +1,7 @@
 """The module responsible for the interfaces Producer/Consumer messages."""
 
 from abc import ABC, abstractmethod
+from typing import List
 
 from schemas.messages import MessageSchema
 
@@ -13,6 +14,16 @@ class BaseMessageProducer(ABC):
         """Upload message."""
         pass
 
+    async def upload_many(self, msgs: List[MessageSchema]) -> None:
+        """
+        Upload several messages.
+
+        By default, the messages are uploaded one by one,
+        the implementations upload them in one round-trip.
+        """
+        for msg in msgs:
+            await self.upload(msg)
+
 
 class BaseMessageConsumer(ABC):
     """Base message Consumer interface."""
@@ -21,3 +32,28 @@ class BaseMessageConsumer(ABC):
     async def extract(self) -> MessageSchema:
         """Extract message."""
         pass
+
+    async def extract_many(
+        self, max_items: int, max_wait: float = 0
+    ) -> List[MessageSchema]:
+        """
+        Extract up to max_items messages.
+
+        The method blocks until the first message is available and then waits
+        up to max_wait seconds for the rest. By default, one message is extracted,
+        the implementations extract several messages in one round-trip.
+
+        :param max_items: The maximum number of messages.
+        :param max_wait: The maximum time to wait for more messages in seconds.
+        :return: At least one message.
+        """
+        return [await self.extract()]
+
+    async def ack(self, msg: MessageSchema) -> None:
+        """
+        Acknowledge that the extracted message is processed.
+
+        The consumers with at-least-once delivery redeliver the messages
+        that are not acknowledged. By default, nothing is done.
+        """
+        pass
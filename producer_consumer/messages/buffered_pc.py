@@ -0,0 +1,147 @@
+"""The module responsible for uploading the messages in batches in the background."""
+
+import asyncio
+from logging import getLogger
+from typing import List, Optional
+
+from metrics.registry import REGISTRY
+from schemas.messages import MessageSchema
+
+from .base import BaseMessageProducer
+
+logger = getLogger("producer_consumer.messages.buffered")
+
+PRODUCER_FLUSHES = REGISTRY.counter(
+    "message_producer_flushes_total",
+    "Flushes of the buffered message producer by outcome: ok or failed.",
+    ("outcome",),
+)
+PRODUCER_BUFFER = REGISTRY.gauge(
+    "message_producer_buffer", "Messages waiting in the buffer of the producer."
+)
+
+
+class BufferedMessageProducer(BaseMessageProducer):
+    """
+    Message Producer uploading the messages in batches.
+
+    upload only puts the message into the buffer, and the buffer is flushed
+    with upload_many of the wrapped producer every max_batch messages
+    or max_delay seconds after the first buffered message, so the handlers
+    do not wait for Redis. When max_buffer messages are waiting, upload waits
+    for the flush (backpressure). A failed flush is retried with the same
+    messages, so they are not lost while Redis is unavailable.
+    start must be called before uploading, and close flushes the rest.
+    """
+
+    def __init__(
+        self,
+        producer: BaseMessageProducer,
+        max_batch: int = 100,
+        max_delay: float = 0.01,
+        max_buffer: int = 10000,
+        retry_delay: float = 1,
+    ):
+        """
+        Init class.
+
+        :param producer: The producer uploading the batches.
+        :param max_batch: The maximum number of messages in one flush.
+        :param max_delay: The maximum time in seconds a message waits in the buffer.
+        :param max_buffer: The maximum number of messages in the buffer.
+        :param retry_delay: The delay in seconds before retrying a failed flush.
+        """
+        self.__producer = producer
+        self.__max_batch = max(1, max_batch)
+        self.__max_delay = max_delay
+        self.__retry_delay = retry_delay
+
+        self.__buffer: List[MessageSchema] = []
+        self.__slots = asyncio.Semaphore(max(self.__max_batch, max_buffer))
+        self.__batch_ready = asyncio.Event()
+        self.__not_empty = asyncio.Event()
+        self.__task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        """Return the number of messages waiting in the buffer."""
+        return len(self.__buffer)
+
+    async def upload(self, msg: MessageSchema) -> None:
+        """Put the message into the buffer, waiting if the buffer is full."""
+        await self.__slots.acquire()
+        self.__buffer.append(msg)
+        PRODUCER_BUFFER.set(len(self.__buffer))
+        if len(self.__buffer) == 1:
+            self.__not_empty.set()
+        if len(self.__buffer) >= self.__max_batch:
+            self.__batch_ready.set()
+
+    async def upload_many(self, msgs: List[MessageSchema]) -> None:
+        """Put the messages into the buffer."""
+        for msg in msgs:
+            await self.upload(msg)
+
+    async def flush(self, full_only: bool = False) -> None:
+        """
+        Upload the buffered messages in batches of max_batch.
+
+        :param full_only: Upload only the full batches, the rest stays buffered.
+        """
+        while len(self.__buffer) >= (self.__max_batch if full_only else 1):
+            batch: List[MessageSchema] = self.__buffer[: self.__max_batch]
+            try:
+                await self.__producer.upload_many(batch)
+            except Exception:
+                PRODUCER_FLUSHES.inc("failed")
+                raise
+            del self.__buffer[: len(batch)]
+            for _ in batch:
+                self.__slots.release()
+            PRODUCER_FLUSHES.inc("ok")
+            PRODUCER_BUFFER.set(len(self.__buffer))
+
+    async def __run(self) -> None:
+        """Flush the buffer when a batch is full or max_delay passes."""
+        while True:
+            full_only: bool = True
+            if not self.__buffer:
+                # the first message into the empty buffer starts the max_delay
+                self.__not_empty.clear()
+                await self.__not_empty.wait()
+                continue
+            if len(self.__buffer) < self.__max_batch:
+                try:
+                    await asyncio.wait_for(
+                        self.__batch_ready.wait(), timeout=self.__max_delay
+                    )
+                except asyncio.TimeoutError:
+                    full_only = False
+            self.__batch_ready.clear()
+            try:
+                await self.flush(full_only)
+            except Exception as exc:
+                logger.error(
+                    "Can't upload %s messages, retry in %s seconds.\nexc: %s",
+                    len(self.__buffer),
+                    self.__retry_delay,
+                    exc,
+                )
+                await asyncio.sleep(self.__retry_delay)
+
+    async def start(self) -> None:
+        """Start flushing the buffer in the background."""
+        if self.__task is None:
+            self.__task = asyncio.create_task(self.__run())
+
+    async def close(self) -> None:
+        """Stop flushing in the background and upload the rest of the messages."""
+        if self.__task is not None:
+            self.__task.cancel()
+            try:
+                await self.__task
+            except asyncio.CancelledError:
+                pass
+            self.__task = None
+        if self.__buffer:
+            logger.info("Upload %s buffered messages.", len(self.__buffer))
+            await self.flush()
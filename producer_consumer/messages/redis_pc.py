@@ -1,47 +1,101 @@
 """The module responsible for implementing the Redis-based moderation results P/C."""
 
-import json
-from dataclasses import asdict
+from typing import List, Optional
 
 import redis.asyncio
 
+from producer_consumer.codecs.base import BaseCodec
+from producer_consumer.codecs.versioned_codec import get_message_codec
+from producer_consumer.redis_lists import pop_many
 from schemas.messages import MessageSchema
 
 from .base import BaseMessageConsumer, BaseMessageProducer
 
 
 class RedisMessageConsumer(BaseMessageConsumer):
-    """Redis-based message Consumer."""
+    """
+    Redis-based message Consumer.
 
-    def __init__(self, redis_client: redis.asyncio.Redis, queue_name: str = "messages"):
+    The messages are taken in FIFO order, or the newest first
+    with newest_first, so after a downtime the fresh messages are moderated
+    before the backlog (which expires meanwhile).
+    """
+
+    def __init__(
+        self,
+        redis_client: redis.asyncio.Redis,
+        queue_name: str = "messages",
+        codec: Optional[BaseCodec[MessageSchema]] = None,
+        newest_first: bool = False,
+    ):
         """
         Init class.
 
         :param redis_client: Redis client.
         :param queue_name: The names of the queue in which the messages will be stored.
+        :param codec: Codec of the messages. JSON by default.
+        :param newest_first: Take the messages from the tail of the queue.
         """
         self.__client = redis_client
         self.__queue_name = queue_name
+        self.__codec = codec or get_message_codec()
+        self.__newest_first = newest_first
 
     async def extract(self) -> MessageSchema:
         """Extract the message from the repository."""
-        _, msg = await self.__client.blpop([self.__queue_name], timeout=None)
-        return MessageSchema(**json.loads(msg))
+        if self.__newest_first:
+            result = await self.__client.brpop([self.__queue_name], timeout=None)
+        else:
+            result = await self.__client.blpop([self.__queue_name], timeout=None)
+        if result is None:
+            raise ValueError("No message received from Redis queue.")
+
+        msg = result[1]
+        return self.__codec.decode(msg)
+
+    async def extract_many(
+        self, max_items: int, max_wait: float = 0
+    ) -> List[MessageSchema]:
+        """Extract up to max_items messages with LPOP (RPOP) count."""
+        return [
+            self.__codec.decode(msg)
+            for msg in await pop_many(
+                self.__client,
+                self.__queue_name,
+                max_items,
+                max_wait,
+                from_tail=self.__newest_first,
+            )
+        ]
 
 
 class RedisMessageProducer(BaseMessageProducer):
     """Redis-based message Producer."""
 
-    def __init__(self, redis_client: redis.asyncio.Redis, queue_name: str = "messages"):
+    def __init__(
+        self,
+        redis_client: redis.asyncio.Redis,
+        queue_name: str = "messages",
+        codec: Optional[BaseCodec[MessageSchema]] = None,
+    ):
         """
         Init class.
 
         :param redis_client: Redis client.
         :param queue_name: The names of the queue in which the messages will be stored.
+        :param codec: Codec of the messages. JSON by default.
         """
         self.__client = redis_client
         self.__queue_name = queue_name
+        self.__codec = codec or get_message_codec()
 
     async def upload(self, msg: MessageSchema) -> None:
         """Upload message."""
-        await self.__client.rpush(self.__queue_name, json.dumps(asdict(msg)))
+        await self.__client.rpush(self.__queue_name, self.__codec.encode(msg))
+
+    async def upload_many(self, msgs: List[MessageSchema]) -> None:
+        """Upload several messages with one RPUSH."""
+        if msgs:
+            await self.__client.rpush(
+                self.__queue_name, *(self.__codec.encode(msg) for msg in msgs)
+            )
@@ -0,0 +1,99 @@
+"""The module responsible for implementing the Redis Streams-based messages P/C."""
+
+from typing import Dict, List, Optional
+
+import redis.asyncio
+
+from producer_consumer.codecs.base import BaseCodec
+from producer_consumer.codecs.versioned_codec import get_message_codec
+from producer_consumer.redis_streams import RedisStreamConsumer, RedisStreamProducer
+from schemas.messages import MessageSchema
+
+from .base import BaseMessageConsumer, BaseMessageProducer
+
+
+class RedisStreamMessageConsumer(BaseMessageConsumer):
+    """
+    Redis Streams-based message Consumer.
+
+    All server replicas read one stream in one consumer group, every message
+    is delivered to one replica and is redelivered if it is not acknowledged
+    within claim_idle seconds.
+    """
+
+    def __init__(
+        self,
+        redis_client: redis.asyncio.Redis,
+        stream_name: str = "messages:stream",
+        group: str = "moderation",
+        consumer: Optional[str] = None,
+        claim_idle: float = 60,
+        codec: Optional[BaseCodec[MessageSchema]] = None,
+    ):
+        """
+        Init class.
+
+        :param redis_client: Redis client.
+        :param stream_name: The name of the stream in which the messages are stored.
+        :param group: The name of the consumer group.
+        :param consumer: The name of the consumer unique in the group.
+        :param claim_idle: Idle time in seconds after which the messages
+        that are not acknowledged are redelivered.
+        :param codec: Codec of the messages. JSON by default.
+        """
+        self.__stream = RedisStreamConsumer(
+            redis_client,
+            stream_name,
+            group,
+            decode=(codec or get_message_codec()).decode,
+            consumer=consumer,
+            claim_idle=claim_idle,
+        )
+
+    async def extract(self) -> MessageSchema:
+        """Extract the message from the stream."""
+        return await self.__stream.extract()
+
+    async def extract_many(
+        self, max_items: int, max_wait: float = 0
+    ) -> List[MessageSchema]:
+        """Extract up to max_items messages with XREADGROUP count."""
+        return await self.__stream.extract_many(max_items, max_wait)
+
+    async def ack(self, msg: MessageSchema) -> None:
+        """Acknowledge that the message is processed."""
+        await self.__stream.ack(msg)
+
+    async def lag(self) -> Dict[str, int]:
+        """Return the backlog of the consumer group (see RedisStreamConsumer.lag)."""
+        return await self.__stream.lag()
+
+
+class RedisStreamMessageProducer(BaseMessageProducer):
+    """Redis Streams-based message Producer."""
+
+    def __init__(
+        self,
+        redis_client: redis.asyncio.Redis,
+        stream_name: str = "messages:stream",
+        max_len: int = 100000,
+        codec: Optional[BaseCodec[MessageSchema]] = None,
+    ):
+        """
+        Init class.
+
+        :param redis_client: Redis client.
+        :param stream_name: The name of the stream in which the messages are stored.
+        :param max_len: The maximum length of the stream.
+        :param codec: Codec of the messages. JSON by default.
+        """
+        self.__stream = RedisStreamProducer(redis_client, stream_name, max_len)
+        self.__codec = codec or get_message_codec()
+
+    async def upload(self, msg: MessageSchema) -> None:
+        """Upload message."""
+        await self.__stream.add(self.__codec.encode(msg))
+
+    async def upload_many(self, msgs: List[MessageSchema]) -> None:
+        """Upload several messages in one pipelined round-trip."""
+        await self.__stream.add_many([self.__codec.encode(msg) for msg in msgs])
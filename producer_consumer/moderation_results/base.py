@@ -1,6 +1,7 @@
 """The module responsible for the interfaces Producer/Consumer moderation results."""
 
 from abc import ABC, abstractmethod
+from typing import List
 
 from schemas.messages import ModerationResultSchema
 
@@ -13,6 +14,16 @@ class BaseModerationResultProducer(ABC):
         """Upload moderation result."""
         pass
 
+    async def upload_many(self, mod_results: List[ModerationResultSchema]) -> None:
+        """
+        Upload several moderation results.
+
+        By default, the results are uploaded one by one,
+        the implementations upload them in one round-trip.
+        """
+        for mod_result in mod_results:
+            await self.upload(mod_result)
+
 
 class BaseModerationResultConsumer(ABC):
     """Base moderation results Consumer interface."""
@@ -21,3 +32,28 @@ class BaseModerationResultConsumer(ABC):
     async def extract(self) -> ModerationResultSchema:
         """Extract moderation result."""
         pass
+
+    async def extract_many(
+        self, max_items: int, max_wait: float = 0
+    ) -> List[ModerationResultSchema]:
+        """
+        Extract up to max_items moderation results.
+
+        The method blocks until the first result is available and then waits
+        up to max_wait seconds for the rest. By default, one result is extracted,
+        the implementations extract several results in one round-trip.
+
+        :param max_items: The maximum number of results.
+        :param max_wait: The maximum time to wait for more results in seconds.
+        :return: At least one result.
+        """
+        return [await self.extract()]
+
+    async def ack(self, mod_result: ModerationResultSchema) -> None:
+        """
+        Acknowledge that the extracted moderation result is processed.
+
+        The consumers with at-least-once delivery redeliver the results
+        that are not acknowledged. By default, nothing is done.
+        """
+        pass
@@ -1,10 +1,12 @@
 """The module responsible for implementing the Redis-based P/C moderation results."""
 
-import json
-from dataclasses import asdict
+from typing import List, Optional
 
 import redis.asyncio
 
+from producer_consumer.codecs.base import BaseCodec
+from producer_consumer.codecs.versioned_codec import get_moderation_result_codec
+from producer_consumer.redis_lists import pop_many
 from schemas.messages import ModerationResultSchema
 
 from .base import BaseModerationResultConsumer, BaseModerationResultProducer
@@ -14,16 +16,21 @@ class RedisModerationResultsConsumer(BaseModerationResultConsumer):
     """Redis-based moderation results Consumer."""
 
     def __init__(
-        self, redis_client: redis.asyncio.Redis, queue_name: str = "moderation_results"
+        self,
+        redis_client: redis.asyncio.Redis,
+        queue_name: str = "moderation_results",
+        codec: Optional[BaseCodec[ModerationResultSchema]] = None,
     ):
         """
         Init class.
 
         :param redis_client: Redis client.
         :param queue_name: The names of the queue in which the messages will be stored.
+        :param codec: Codec of the moderation results. JSON by default.
         """
         self.__client = redis_client
         self.__queue_name = queue_name
+        self.__codec = codec or get_moderation_result_codec()
 
     async def extract(self) -> ModerationResultSchema:
         """Extract moderation result."""
@@ -32,24 +39,48 @@ class RedisModerationResultsConsumer(BaseModerationResultConsumer):
             raise ValueError("No result received from Redis queue.")
 
         msg = result[1]
-        return ModerationResultSchema(**json.loads(msg))
+        return self.__codec.decode(msg)
+
+    async def extract_many(
+        self, max_items: int, max_wait: float = 0
+    ) -> List[ModerationResultSchema]:
+        """Extract up to max_items moderation results with LPOP count."""
+        return [
+            self.__codec.decode(msg)
+            for msg in await pop_many(
+                self.__client, self.__queue_name, max_items, max_wait
+            )
+        ]
 
 
 class RedisModerationResultsProducer(BaseModerationResultProducer):
     """Redis-based moderation results Producer."""
 
     def __init__(
-        self, redis_client: redis.asyncio.Redis, queue_name: str = "moderation_results"
+        self,
+        redis_client: redis.asyncio.Redis,
+        queue_name: str = "moderation_results",
+        codec: Optional[BaseCodec[ModerationResultSchema]] = None,
     ):
         """
         Init class.
 
         :param redis_client: Redis client.
         :param queue_name: The names of the queue in which the messages will be stored.
+        :param codec: Codec of the moderation results. JSON by default.
         """
         self.__client = redis_client
         self.__queue_name = queue_name
+        self.__codec = codec or get_moderation_result_codec()
 
     async def upload(self, mod_result: ModerationResultSchema) -> None:
         """Upload moderation result."""
-        await self.__client.rpush(self.__queue_name, json.dumps(asdict(mod_result)))
+        await self.__client.rpush(self.__queue_name, self.__codec.encode(mod_result))
+
+    async def upload_many(self, mod_results: List[ModerationResultSchema]) -> None:
+        """Upload several moderation results with one RPUSH."""
+        if mod_results:
+            await self.__client.rpush(
+                self.__queue_name,
+                *(self.__codec.encode(mod_result) for mod_result in mod_results),
+            )
@@ -0,0 +1,100 @@
+"""The module responsible for the Redis Streams-based moderation results P/C."""
+
+from typing import Dict, List, Optional
+
+import redis.asyncio
+
+from producer_consumer.codecs.base import BaseCodec
+from producer_consumer.codecs.versioned_codec import get_moderation_result_codec
+from producer_consumer.redis_streams import RedisStreamConsumer, RedisStreamProducer
+from schemas.messages import ModerationResultSchema
+
+from .base import BaseModerationResultConsumer, BaseModerationResultProducer
+
+
+class RedisStreamModerationResultsConsumer(BaseModerationResultConsumer):
+    """
+    Redis Streams-based moderation results Consumer.
+
+    Every result is delivered to one bot instance of the consumer group and
+    is redelivered if it is not acknowledged within claim_idle seconds.
+    """
+
+    def __init__(
+        self,
+        redis_client: redis.asyncio.Redis,
+        stream_name: str = "moderation_results:stream",
+        group: str = "bot",
+        consumer: Optional[str] = None,
+        claim_idle: float = 60,
+        codec: Optional[BaseCodec[ModerationResultSchema]] = None,
+    ):
+        """
+        Init class.
+
+        :param redis_client: Redis client.
+        :param stream_name: The name of the stream in which the results are stored.
+        :param group: The name of the consumer group.
+        :param consumer: The name of the consumer unique in the group.
+        :param claim_idle: Idle time in seconds after which the results
+        that are not acknowledged are redelivered.
+        :param codec: Codec of the moderation results. JSON by default.
+        """
+        self.__stream = RedisStreamConsumer(
+            redis_client,
+            stream_name,
+            group,
+            decode=(codec or get_moderation_result_codec()).decode,
+            consumer=consumer,
+            claim_idle=claim_idle,
+        )
+
+    async def extract(self) -> ModerationResultSchema:
+        """Extract moderation result."""
+        return await self.__stream.extract()
+
+    async def extract_many(
+        self, max_items: int, max_wait: float = 0
+    ) -> List[ModerationResultSchema]:
+        """Extract up to max_items moderation results with XREADGROUP count."""
+        return await self.__stream.extract_many(max_items, max_wait)
+
+    async def ack(self, mod_result: ModerationResultSchema) -> None:
+        """Acknowledge that the moderation result is processed."""
+        await self.__stream.ack(mod_result)
+
+    async def lag(self) -> Dict[str, int]:
+        """Return the backlog of the consumer group (see RedisStreamConsumer.lag)."""
+        return await self.__stream.lag()
+
+
+class RedisStreamModerationResultsProducer(BaseModerationResultProducer):
+    """Redis Streams-based moderation results Producer."""
+
+    def __init__(
+        self,
+        redis_client: redis.asyncio.Redis,
+        stream_name: str = "moderation_results:stream",
+        max_len: int = 100000,
+        codec: Optional[BaseCodec[ModerationResultSchema]] = None,
+    ):
+        """
+        Init class.
+
+        :param redis_client: Redis client.
+        :param stream_name: The name of the stream in which the results are stored.
+        :param max_len: The maximum length of the stream.
+        :param codec: Codec of the moderation results. JSON by default.
+        """
+        self.__stream = RedisStreamProducer(redis_client, stream_name, max_len)
+        self.__codec = codec or get_moderation_result_codec()
+
+    async def upload(self, mod_result: ModerationResultSchema) -> None:
+        """Upload moderation result."""
+        await self.__stream.add(self.__codec.encode(mod_result))
+
+    async def upload_many(self, mod_results: List[ModerationResultSchema]) -> None:
+        """Upload several moderation results in one pipelined round-trip."""
+        await self.__stream.add_many(
+            [self.__codec.encode(mod_result) for mod_result in mod_results]
+        )
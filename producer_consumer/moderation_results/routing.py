@@ -0,0 +1,64 @@
+"""The module responsible for routing the moderation results to several queues."""
+
+from typing import Callable, Dict, List
+
+from schemas.messages import ModerationResultSchema
+
+from .base import BaseModerationResultProducer
+
+
+class RoutingModerationResultProducer(BaseModerationResultProducer):
+    """
+    Moderation results Producer into the queue named by reply_to of the result.
+
+    Every bot instance (or chat) reads its own results queue, so the instances
+    do not compete for the results of each other. The results without
+    reply_to go to the default queue. Only the queues with the names
+    starting with prefix are allowed, the results with other reply_to
+    go to the default queue too, so a message can't make the server
+    write into an arbitrary key.
+    """
+
+    def __init__(
+        self,
+        default: BaseModerationResultProducer,
+        make_producer: Callable[[str], BaseModerationResultProducer],
+        prefix: str = "moderation_results",
+    ):
+        """
+        Init class.
+
+        :param default: Producer into the default queue.
+        :param make_producer: Function creating the producer by the queue name.
+        :param prefix: Prefix of the names of the allowed queues.
+        """
+        self.__default = default
+        self.__make_producer = make_producer
+        self.__prefix = prefix
+        self.__producers: Dict[str, BaseModerationResultProducer] = dict()
+
+    @property
+    def routes(self) -> List[str]:
+        """Return the names of the queues the results have been routed to."""
+        return list(self.__producers)
+
+    def __get_producer(self, route: str) -> BaseModerationResultProducer:
+        """Return the producer into the queue named route."""
+        if not route.startswith(self.__prefix):
+            return self.__default
+        producer = self.__producers.get(route)
+        if producer is None:
+            producer = self.__producers[route] = self.__make_producer(route)
+        return producer
+
+    async def upload(self, mod_result: ModerationResultSchema) -> None:
+        """Upload moderation result into its queue."""
+        await self.__get_producer(mod_result.reply_to).upload(mod_result)
+
+    async def upload_many(self, mod_results: List[ModerationResultSchema]) -> None:
+        """Upload several moderation results with one call per queue."""
+        routes: Dict[str, List[ModerationResultSchema]] = dict()
+        for mod_result in mod_results:
+            routes.setdefault(mod_result.reply_to, []).append(mod_result)
+        for route, results in routes.items():
+            await self.__get_producer(route).upload_many(results)
@@ -0,0 +1,31 @@
+"""The module responsible for the depth of the Redis-based queues."""
+
+from typing import Dict, Optional
+
+import redis.asyncio
+
+from metrics.registry import REGISTRY
+from producer_consumer.redis_streams import stream_backlog
+
+QUEUE_DEPTH = REGISTRY.gauge(
+    "queue_depth",
+    "Items waiting in the queue (not acknowledged for streams).",
+    ("queue",),
+)
+
+
+async def queue_depth(
+    client: redis.asyncio.Redis, name: str, group: Optional[str] = None
+) -> int:
+    """
+    Return the number of the items waiting in the queue.
+
+    :param client: Redis client.
+    :param name: The name of the list or the stream.
+    :param group: The consumer group of the stream or None for a list.
+    For a stream, the items delivered but not acknowledged are counted too.
+    """
+    if group is None:
+        return await client.llen(name)
+    backlog: Dict[str, int] = await stream_backlog(client, name, group)
+    return backlog["lag"] + backlog["pending"]
@@ -0,0 +1,50 @@
+"""The module responsible for the common logic of Redis lists P/C."""
+
+import time
+from typing import Any, List
+
+import redis.asyncio
+
+
+async def pop_many(
+    redis_client: redis.asyncio.Redis,
+    queue_name: str,
+    max_items: int,
+    max_wait: float,
+    from_tail: bool = False,
+) -> List[Any]:
+    """
+    Pop up to max_items items from the head of the list.
+
+    The function blocks until the first item is available, then takes
+    the available items with one LPOP and waits up to max_wait seconds
+    for the rest.
+
+    :param redis_client: Redis client.
+    :param queue_name: The name of the list.
+    :param max_items: The maximum number of items.
+    :param max_wait: The maximum time to wait for more items in seconds.
+    :param from_tail: Pop the items from the tail of the list (RPOP),
+    so the items pushed last are taken first.
+    :return: At least one item.
+    """
+    bpop = redis_client.brpop if from_tail else redis_client.blpop
+    pop = redis_client.rpop if from_tail else redis_client.lpop
+    result = await bpop([queue_name], timeout=None)
+    if result is None:
+        raise ValueError("No item received from Redis queue.")
+    items: List[Any] = [result[1]]
+    deadline: float = time.monotonic() + max_wait
+    while len(items) < max_items:
+        rest = await pop(queue_name, max_items - len(items))
+        if rest:
+            items.extend(rest)
+            continue
+        remaining: float = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        result = await bpop([queue_name], timeout=remaining)
+        if result is None:
+            break
+        items.append(result[1])
+    return items
@@ -0,0 +1,276 @@
+"""The module responsible for the common logic of Redis Streams P/C."""
+
+import os
+import socket
+import time
+from collections import deque
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Generic,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+    Union,
+)
+
+import redis.asyncio
+from redis.exceptions import ResponseError
+
+from producer_consumer.redis_values import decode_value
+
+T = TypeVar("T")
+
+
+def default_consumer_name() -> str:
+    """Return the name of the consumer unique for the process."""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class RedisStreamProducer(object):
+    """
+    Producer of the entries of Redis Stream.
+
+    The length of the stream is capped (approximately) by max_len,
+    so the oldest entries are trimmed when the consumers fall behind.
+    """
+
+    def __init__(
+        self, redis_client: redis.asyncio.Redis, stream_name: str, max_len: int
+    ):
+        """
+        Init class.
+
+        :param redis_client: Redis client.
+        :param stream_name: The name of the stream.
+        :param max_len: The maximum length of the stream.
+        """
+        self.__client = redis_client
+        self.__stream_name = stream_name
+        self.__max_len = max_len
+
+    async def add(self, data: Union[bytes, str]) -> None:
+        """Add the entry to the stream."""
+        await self.__client.xadd(
+            self.__stream_name, {"data": data}, maxlen=self.__max_len, approximate=True
+        )
+
+    async def add_many(self, items: List[bytes]) -> None:
+        """Add the entries to the stream in one pipelined round-trip."""
+        async with self.__client.pipeline(transaction=False) as pipe:
+            for data in items:
+                pipe.xadd(
+                    self.__stream_name,
+                    {"data": data},
+                    maxlen=self.__max_len,
+                    approximate=True,
+                )
+            await pipe.execute()
+
+
+class RedisStreamConsumer(Generic[T]):
+    """
+    Consumer of the entries of Redis Stream in a consumer group.
+
+    Every entry is delivered to one consumer of the group and stays pending
+    until it is acknowledged with ack. The entries that stay pending longer
+    than claim_idle seconds (e.g. the consumer crashed) are reclaimed
+    with XAUTOCLAIM in batches of claim_count until the whole pending list
+    is scanned, so the delivery is at-least-once.
+    """
+
+    def __init__(
+        self,
+        redis_client: redis.asyncio.Redis,
+        stream_name: str,
+        group: str,
+        decode: Callable[[Union[bytes, str]], T],
+        consumer: Optional[str] = None,
+        claim_idle: float = 60,
+        block: float = 5,
+        count: int = 1,
+        claim_count: int = 100,
+    ):
+        """
+        Init class.
+
+        :param redis_client: Redis client.
+        :param stream_name: The name of the stream.
+        :param group: The name of the consumer group.
+        :param decode: Function decoding the data of the entry.
+        :param consumer: The name of the consumer unique in the group.
+        :param claim_idle: Idle time in seconds after which the pending entries
+        of other consumers are reclaimed.
+        :param block: The maximum time in seconds to wait for new entries
+        before checking the pending ones.
+        :param count: The maximum number of entries read at once.
+        :param claim_count: The maximum number of entries reclaimed by one XAUTOCLAIM.
+        """
+        self.__client = redis_client
+        self.__stream_name = stream_name
+        self.__group = group
+        self.__decode = decode
+        self.__consumer = consumer or default_consumer_name()
+        self.__claim_idle = claim_idle
+        self.__block = block
+        self.__count = max(1, count)
+        self.__claim_count = max(self.__count, claim_count)
+
+        self.__group_exists = False
+        self.__claim_start: str = "0-0"
+        self.__last_claim: float = 0
+        self.__buffer: Deque[Tuple[str, Union[bytes, str]]] = deque()
+        # the extracted items are kept until ack, so their ids are not reused
+        self.__pending: Dict[int, Tuple[T, str]] = dict()
+        self.__pending_entries: Dict[str, int] = dict()
+
+    async def __ensure_group(self) -> None:
+        """Create the stream and the consumer group if they do not exist."""
+        if self.__group_exists:
+            return
+        try:
+            await self.__client.xgroup_create(
+                self.__stream_name, self.__group, id="0", mkstream=True
+            )
+        except ResponseError as exc:
+            if "BUSYGROUP" not in str(exc):
+                raise
+        self.__group_exists = True
+
+    async def __buffer_entries(self, entries: List[Any]) -> None:
+        """Put the entries into the buffer, acknowledging the deleted ones."""
+        for entry_id, fields in entries:
+            entry_id = decode_value(entry_id)
+            fields = fields or dict()
+            data: Any = fields.get(b"data", fields.get("data"))
+            if data is None:
+                # the entry has been trimmed from the stream
+                await self.__client.xack(self.__stream_name, self.__group, entry_id)
+                continue
+            # the payload is kept as is, it can be binary
+            self.__buffer.append((entry_id, data))
+
+    async def __claim(self) -> None:
+        """Reclaim all entries that are pending for too long."""
+        self.__last_claim = time.monotonic()
+        while True:
+            response: List[Any] = await self.__client.xautoclaim(
+                self.__stream_name,
+                self.__group,
+                self.__consumer,
+                min_idle_time=int(self.__claim_idle * 1000),
+                start_id=self.__claim_start,
+                count=self.__claim_count,
+            )
+            self.__claim_start = decode_value(response[0])
+            await self.__buffer_entries(response[1])
+            # the cursor returns to 0-0 when the pending list is scanned
+            if self.__claim_start == "0-0":
+                return
+
+    async def __read(self, count: int, block: float) -> None:
+        """
+        Read up to count new entries, waiting for them for block seconds.
+
+        If block is less than a millisecond, the entries are read without waiting.
+        """
+        block_ms: int = int(block * 1000)
+        response: Any = await self.__client.xreadgroup(
+            self.__group,
+            self.__consumer,
+            {self.__stream_name: ">"},
+            count=count,
+            block=block_ms if block_ms > 0 else None,
+        )
+        for _, entries in response or []:
+            await self.__buffer_entries(entries)
+
+    async def __fill_buffer(self) -> None:
+        """Wait until there is at least one entry in the buffer."""
+        while not self.__buffer:
+            await self.__ensure_group()
+            try:
+                if time.monotonic() - self.__last_claim >= self.__claim_idle / 2:
+                    await self.__claim()
+                if not self.__buffer:
+                    await self.__read(self.__count, self.__block)
+            except ResponseError as exc:
+                if "NOGROUP" not in str(exc):
+                    raise
+                # the stream has been deleted
+                self.__group_exists = False
+
+    def __take(self) -> T:
+        """Take the entry from the buffer and keep it pending until ack."""
+        entry_id, data = self.__buffer.popleft()
+        item: T = self.__decode(data)
+        # the entry is reclaimed after a failure without ack
+        stale: Optional[int] = self.__pending_entries.pop(entry_id, None)
+        if stale is not None:
+            self.__pending.pop(stale, None)
+        self.__pending[id(item)] = (item, entry_id)
+        self.__pending_entries[entry_id] = id(item)
+        return item
+
+    async def extract(self) -> T:
+        """Extract the next item, waiting for it if the stream is empty."""
+        await self.__fill_buffer()
+        return self.__take()
+
+    async def extract_many(self, max_items: int, max_wait: float = 0) -> List[T]:
+        """
+        Extract up to max_items items.
+
+        The method blocks until the first item is available and then waits
+        up to max_wait seconds for the rest.
+        """
+        await self.__fill_buffer()
+        deadline: float = time.monotonic() + max_wait
+        while len(self.__buffer) < max_items:
+            buffered: int = len(self.__buffer)
+            await self.__read(
+                max_items - buffered, max(0.0, deadline - time.monotonic())
+            )
+            if len(self.__buffer) == buffered:
+                break
+        return [self.__take() for _ in range(min(max_items, len(self.__buffer)))]
+
+    async def ack(self, item: T) -> None:
+        """Acknowledge that the extracted item is processed."""
+        pending: Optional[Tuple[T, str]] = self.__pending.pop(id(item), None)
+        if pending is None:
+            return
+        entry_id: str = pending[1]
+        self.__pending_entries.pop(entry_id, None)
+        await self.__client.xack(self.__stream_name, self.__group, entry_id)
+
+    async def lag(self) -> Dict[str, int]:
+        """Return the backlog of the consumer group (see stream_backlog)."""
+        return await stream_backlog(self.__client, self.__stream_name, self.__group)
+
+
+async def stream_backlog(
+    client: redis.asyncio.Redis, stream_name: str, group: str
+) -> Dict[str, int]:
+    """
+    Return the backlog of the consumer group.
+
+    :return: lag - the number of entries not yet delivered to the group,
+    pending - the number of entries delivered but not acknowledged.
+    """
+    try:
+        groups: List[Dict[str, Any]] = await client.xinfo_groups(stream_name)
+    except ResponseError:
+        # the stream does not exist yet
+        return {"lag": 0, "pending": 0}
+    for info in groups:
+        if decode_value(info["name"]) == group:
+            lag: Optional[int] = info.get("lag")
+            if lag is None:
+                # Redis can't calculate the lag after trimming
+                lag = await client.xlen(stream_name)
+            return {"lag": int(lag), "pending": int(info["pending"])}
+    return {"lag": await client.xlen(stream_name), "pending": 0}
@@ -0,0 +1,12 @@
+"""The module responsible for the values returned by Redis."""
+
+from typing import Any
+
+
+def decode_value(value: Any) -> str:
+    """
+    Decode the value returned by Redis.
+
+    The value is bytes or str depending on decode_responses of the client.
+    """
+    return value.decode() if isinstance(value, bytes) else value
@@ -0,0 +1,31 @@
+"""The module responsible for schemas for working with token budgets."""
+
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass(slots=True)
+class TokenBudgetSchema(object):
+    """
+    The state of the budget of LLM tokens of the chat in the current window.
+
+    limit 0 means that the chat has no limit. window_end is the Unix time
+    when the window ends and the budget is renewed.
+    """
+
+    chat_id: str
+    spent: int
+    limit: int
+    window_end: float
+
+    @property
+    def remaining(self) -> Optional[int]:
+        """Return the number of tokens left or None if there is no limit."""
+        if not self.limit:
+            return None
+        return max(0, self.limit - self.spent)
+
+    @property
+    def spent_fraction(self) -> float:
+        """Return the fraction of the budget spent (0 if there is no limit)."""
+        return self.spent / self.limit if self.limit else 0.0
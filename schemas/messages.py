@@ -3,18 +3,36 @@
 from dataclasses import dataclass
 
 
-@dataclass
+@dataclass(slots=True)
 class MessageSchema(object):
-    """The scheme of the message for subsequent moderation."""
+    """
+    The scheme of the message for subsequent moderation.
+
+    chat_id is the chat of the message (the message id is unique only
+    in the chat), reply_to is the name of the queue for the result
+    of moderation. Empty reply_to means the default queue.
+    user_id is the author of the message in the chat (empty if unknown).
+    enqueued_at is the Unix time when the message is put into the queue,
+    deadline is the Unix time after which the result of moderation is useless
+    (0 - unknown or no deadline).
+    """
 
     id: str
     text: str
+    attempt: int = 0
+    chat_id: str = ""
+    reply_to: str = ""
+    user_id: str = ""
+    enqueued_at: float = 0.0
+    deadline: float = 0.0
 
 
-@dataclass
+@dataclass(slots=True)
 class ModerationResultSchema(object):
     """The structure of the LLM response after message moderation."""
 
     msg_id: str
     generated_by_llm: bool
     toxic: bool
+    chat_id: str = ""
+    reply_to: str = ""
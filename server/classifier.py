@@ -0,0 +1,171 @@
+"""
+Train the local classifier on the verdicts of LLM and roll out its versions.
+
+The verdicts are taken from the log kept by the server (CLASSIFIER_LOG_VERDICTS)
+or from a JSON lines file with the fields text, generated_by_llm and toxic.
+A trained model is saved as a new version, the running servers load it
+within CLASSIFIER_RELOAD_INTERVAL seconds after it is activated.
+The config (Redis, classifier) is read from the env as for the server.
+
+Usage:
+    python -m server.classifier train --activate --min-accuracy 0.97
+    python -m server.classifier train --input verdicts.jsonl --epochs 10
+    python -m server.classifier versions
+    python -m server.classifier activate 20261018120000
+"""
+
+import argparse
+import asyncio
+import logging.config
+import random
+import time
+from typing import Dict, List, Optional
+
+import redis.asyncio
+from dotenv import load_dotenv
+
+from .config.app_config import Config, get_config
+from .config.log_config import get_log_config
+from .main import get_classifier_store
+from .services.classifiers.base import BaseClassifierStore
+from .services.classifiers.linear import LinearClassifier, Verdict, evaluate, train
+from .services.normalization import text_key
+
+
+def read_verdicts(path: str) -> List[Verdict]:
+    """Read the verdicts from the JSON lines file."""
+    with open(path, encoding="utf-8") as file:
+        return [Verdict.from_json(line) for line in file if line.strip()]
+
+
+def unique(verdicts: List[Verdict]) -> List[Verdict]:
+    """Return the verdicts without the repeated texts, the first verdict is kept."""
+    seen: Dict[str, Verdict] = dict()
+    for verdict in verdicts:
+        seen.setdefault(text_key(verdict.text), verdict)
+    return list(seen.values())
+
+
+async def train_model(
+    args: argparse.Namespace, config: Config, store: BaseClassifierStore
+) -> None:
+    """Train a new version of the model, save it and activate if asked."""
+    verdicts: List[Verdict] = unique(
+        read_verdicts(args.input) if args.input else await store.verdicts(args.limit)
+    )
+    if len(verdicts) < 2:
+        print(f"Not enough verdicts to train: {len(verdicts)}.")
+        return
+    random.Random(args.seed).shuffle(verdicts)
+    holdout_size: int = max(1, int(len(verdicts) * args.holdout))
+    holdout, train_set = verdicts[:holdout_size], verdicts[holdout_size:]
+
+    start: float = time.perf_counter()
+    model: LinearClassifier = train(
+        train_set,
+        version=time.strftime("%Y%m%d%H%M%S", time.gmtime()),
+        dim=args.dim,
+        epochs=args.epochs,
+        learning_rate=args.learning_rate,
+        seed=args.seed,
+    )
+    print(
+        f"version {model.version}: trained on {len(train_set)} verdicts"
+        f" in {time.perf_counter() - start:.1f} s"
+    )
+
+    start = time.perf_counter()
+    for verdict in holdout:
+        model.predict(verdict.text)
+    print(
+        "inference: "
+        f"{(time.perf_counter() - start) / len(holdout) * 1e6:.0f} us per message"
+    )
+    thresholds: List[float] = sorted({0.9, 0.95, 0.99, config.classifier.threshold})
+    quality: Dict[str, float] = dict()
+    for threshold in thresholds:
+        metrics: Dict[str, float] = evaluate(model, holdout, threshold)
+        print(
+            f"holdout of {len(holdout)}, threshold {threshold}:"
+            f" coverage {metrics['coverage']:.1%}, accuracy {metrics['accuracy']:.1%}"
+        )
+        if threshold == config.classifier.threshold:
+            quality = metrics
+    model.meta["holdout"] = quality
+
+    await store.save_model(model)
+    print(f"saved {model.version}")
+    if not args.activate:
+        return
+    if quality["accuracy"] < args.min_accuracy:
+        print(f"not activated: the accuracy is below {args.min_accuracy:.1%}")
+        return
+    await store.activate(model.version)
+    print(f"activated {model.version}")
+
+
+async def main(args: argparse.Namespace) -> None:
+    """Train the model, list the versions or activate one."""
+    load_dotenv()
+    config: Config = get_config()
+    logging.config.dictConfig(get_log_config(config))
+
+    pool = redis.asyncio.ConnectionPool.from_url(config.redis.url)
+    client = redis.asyncio.Redis(connection_pool=pool)
+    try:
+        if config.classifier.backend == "local":
+            print("The classifiers are not kept in Redis (CLASSIFIER_BACKEND).")
+            return
+        store: BaseClassifierStore = get_classifier_store(config, client)
+        if args.command == "train":
+            await train_model(args, config, store)
+        elif args.command == "activate":
+            try:
+                await store.activate(args.version)
+            except KeyError:
+                print(f"There is no version {args.version}.")
+                return
+            print(f"activated {args.version}")
+        else:
+            active: Optional[str] = await store.active_version()
+            for version in await store.versions():
+                model: Optional[LinearClassifier] = await store.load_model(version)
+                meta = model.meta if model is not None else dict()
+                mark: str = " (active)" if version == active else ""
+                print(
+                    f"{version}{mark}: {meta.get('samples', 0)} verdicts,"
+                    f" holdout {meta.get('holdout', dict())}"
+                )
+            print(f"logged verdicts: {await store.count_verdicts()}")
+    finally:
+        await client.close()
+        await pool.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    commands = parser.add_subparsers(dest="command", required=True)
+    train_parser = commands.add_parser("train", help="train a new version")
+    train_parser.add_argument(
+        "--input", help="JSON lines file with the verdicts (default - the log)"
+    )
+    train_parser.add_argument(
+        "--limit", type=int, default=0, help="the newest verdicts of the log, 0 - all"
+    )
+    train_parser.add_argument("--holdout", type=float, default=0.1)
+    train_parser.add_argument("--dim", type=int, default=2**18)
+    train_parser.add_argument("--epochs", type=int, default=5)
+    train_parser.add_argument("--learning-rate", type=float, default=0.5)
+    train_parser.add_argument("--seed", type=int, default=0)
+    train_parser.add_argument("--activate", action="store_true")
+    train_parser.add_argument(
+        "--min-accuracy",
+        type=float,
+        default=0,
+        help="activate only if the accuracy on the holdout at CLASSIFIER_THRESHOLD"
+        " is not lower",
+    )
+    commands.add_parser("versions", help="the saved versions and their quality")
+    activate_parser = commands.add_parser("activate", help="roll out or roll back")
+    activate_parser.add_argument("version")
+    asyncio.run(main(parser.parse_args()))
@@ -2,7 +2,7 @@
 
 import os
 from dataclasses import dataclass
-from typing import Tuple
+from typing import Dict, List, Tuple
 
 
 @dataclass
@@ -13,6 +13,13 @@ class YandexGPTConfig(object):
     catalog_id: str
     temperature: float
     max_tokens: int
+    connection_limit: int
+    request_timeout: float
+    keepalive_timeout: float
+    iam_refresh_margin: float
+    completion_url: str
+    iam_url: str
+    model: str
 
 
 @dataclass
@@ -29,6 +36,212 @@ class ModerationConfig(object):
     random_delay_limits: Tuple[float, float]
     delay_denominator: float
     max_num_retries: int
+    concurrency: int
+    retry_scheduler: str
+    batch_size: int
+    batch_timeout: float
+
+
+@dataclass
+class RateLimitConfig(object):
+    """Config for the rate limiter of requests to LLM."""
+
+    backend: str
+    requests_per_second: float
+    tokens_per_minute: float
+    decrease_factor: float
+    min_factor: float
+    quiet_period: float
+    recovery_rate: float
+
+
+@dataclass
+class PrefilterConfig(object):
+    """Config for the local pre-moderation of obvious messages."""
+
+    enabled: bool
+    lexicon_path: str
+    max_short_words: int
+
+
+@dataclass
+class VerdictCacheConfig(object):
+    """Config for the cache of moderation verdicts."""
+
+    enabled: bool
+    local_size: int
+    ttl: int
+
+
+@dataclass
+class NearDuplicatesConfig(object):
+    """Config for the index of near-duplicate messages."""
+
+    enabled: bool
+    index: str
+    threshold: float
+    ttl: int
+    local_size: int
+    bucket_size: int
+    min_features: int
+
+
+@dataclass
+class FreshnessConfig(object):
+    """
+    Config for skipping the stale messages.
+
+    max_age is the deadline of the messages without their own deadline
+    (0 - no deadline). stale_path is "drop" to skip the stale messages
+    before all stages, or "cheap" to let the stages in front of LLM answer them.
+    """
+
+    enabled: bool
+    max_age: float
+    stale_path: str
+
+
+@dataclass
+class TokenBudgetConfig(object):
+    """
+    Config for the budgets of LLM tokens of the chats.
+
+    limit is the number of tokens per chat per window (0 - no limit),
+    chat_limits overrides it for the chats. modes are the pairs
+    (the fraction of the budget spent, degradation mode) sorted by the fraction.
+    """
+
+    enabled: bool
+    backend: str
+    window: int
+    limit: int
+    chat_limits: Dict[str, int]
+    modes: List[Tuple[float, str]]
+    sample_rate: float
+    trust_after: int
+    trust_ttl: int
+
+
+@dataclass
+class CircuitBreakerConfig(object):
+    """
+    Config for the circuit breaker of requests to LLM.
+
+    The circuit opens when at least failure_rate of min_requests or more
+    requests in a window of window seconds fail (5xx, network errors, timeouts
+    or answers slower than slow_call seconds). After open_duration seconds
+    probes requests are let through, and the circuit closes if they succeed.
+    While the circuit is open, the messages are parked in the retry scheduler
+    (open_path "park") or moderated by the fallback_model ("fallback").
+    """
+
+    enabled: bool
+    backend: str
+    window: float
+    min_requests: int
+    failure_rate: float
+    slow_call: float
+    open_duration: float
+    probes: int
+    open_path: str
+    fallback_model: str
+
+
+@dataclass
+class CascadeConfig(object):
+    """
+    Config for the cascade of LLM models.
+
+    The messages are moderated by the lite_model first, and the verdicts
+    with the confidence below threshold (chat_thresholds overrides it
+    for the chats) are moderated again by the full model. With trust_check
+    a toxic verdict of the lite model on a trusted user is checked
+    by the full model too.
+    """
+
+    enabled: bool
+    lite_model: str
+    threshold: float
+    chat_thresholds: Dict[str, float]
+    trust_check: bool
+
+
+@dataclass
+class HedgingConfig(object):
+    """
+    Config for the hedged requests to LLM.
+
+    A request not answered within the percentile of the latency of the last
+    samples requests (but not earlier than min_delay seconds) is sent once more.
+    The hedging starts after min_samples requests, and the hedges are at most
+    the budget share of the requests (max_burst of them in a row).
+    """
+
+    enabled: bool
+    percentile: float
+    min_delay: float
+    budget: float
+    max_burst: float
+    samples: int
+    min_samples: int
+
+
+@dataclass
+class ClassifierConfig(object):
+    """
+    Config for the local classifier trained on the verdicts of LLM.
+
+    The classifier answers the messages on which it is confident
+    (the probabilities are not below threshold or not above 1 - threshold),
+    audit_rate of them are checked by LLM anyway. The active model is checked
+    every reload_interval seconds. With log_verdicts the verdicts of LLM
+    are logged as the training data (at most max_verdicts of them),
+    and keep_versions of the trained models are kept.
+    """
+
+    enabled: bool
+    backend: str
+    threshold: float
+    audit_rate: float
+    reload_interval: float
+    log_verdicts: bool
+    max_verdicts: int
+    keep_versions: int
+
+
+@dataclass
+class DeadLetterConfig(object):
+    """
+    Config for the queue of the messages whose moderation failed for good.
+
+    max_len is the maximum number of the kept messages of one error.
+    """
+
+    enabled: bool
+    backend: str
+    max_len: int
+
+
+@dataclass
+class MetricsConfig(object):
+    """Config for the HTTP endpoint of the metrics."""
+
+    enabled: bool
+    host: str
+    port: int
+
+
+@dataclass
+class QueueConfig(object):
+    """Config for the queues of messages and moderation results."""
+
+    backend: str
+    max_len: int
+    claim_idle: float
+    codec: str
+    compress_threshold: int
+    lag_log_interval: float
+    newest_first: bool
 
 
 @dataclass
@@ -37,8 +250,21 @@ class Config(object):
 
     debug: bool
     moderation_config: ModerationConfig
+    rate_limit: RateLimitConfig
+    prefilter: PrefilterConfig
+    verdict_cache: VerdictCacheConfig
+    near_duplicates: NearDuplicatesConfig
+    freshness: FreshnessConfig
+    token_budget: TokenBudgetConfig
+    circuit_breaker: CircuitBreakerConfig
+    cascade: CascadeConfig
+    hedging: HedgingConfig
+    classifier: ClassifierConfig
+    dead_letters: DeadLetterConfig
     yandex_gpt: YandexGPTConfig
     redis: RedisConfig
+    queue: QueueConfig
+    metrics: MetricsConfig
 
 
 def __moderation_random_delay() -> Tuple[float, float]:
@@ -62,6 +288,44 @@ def __moderation_random_delay() -> Tuple[float, float]:
     return moderation_min_delay, moderation_max_delay
 
 
+def __chat_limits(value: str) -> Dict[str, int]:
+    """Parse the limits of the chats in the form "chat_id:limit,..."."""
+    limits: Dict[str, int] = dict()
+    for item in value.split(","):
+        chat_id, _, limit = item.strip().partition(":")
+        if chat_id:
+            limits[chat_id] = abs(int(limit))
+    return limits
+
+
+def __chat_thresholds(value: str) -> Dict[str, float]:
+    """Parse the thresholds of the chats in the form "chat_id:threshold,..."."""
+    thresholds: Dict[str, float] = dict()
+    for item in value.split(","):
+        chat_id, _, threshold = item.strip().partition(":")
+        if chat_id:
+            thresholds[chat_id] = min(1.0, abs(float(threshold)))
+    return thresholds
+
+
+def __budget_modes(value: str) -> List[Tuple[float, str]]:
+    """
+    Parse the degradation modes in the form "fraction:mode,...".
+
+    E.g. "0.8:sample,1:untrusted" - sample the messages after 80% of the budget
+    is spent and moderate only the untrusted users after the whole budget is spent.
+    """
+    modes: List[Tuple[float, str]] = []
+    for item in value.split(","):
+        fraction, _, mode = item.strip().partition(":")
+        if not fraction:
+            continue
+        if mode not in ("sample", "untrusted", "pause"):
+            raise ValueError(f"Unknown degradation mode {mode!r}.")
+        modes.append((abs(float(fraction)), mode))
+    return sorted(modes)
+
+
 def get_config() -> Config:
     """Return app config."""
     return Config(
@@ -70,14 +334,145 @@ def get_config() -> Config:
             random_delay_limits=__moderation_random_delay(),
             delay_denominator=max(1.0, float(os.getenv("DELAY_DENOMINATOR", 2))),
             max_num_retries=abs(int(os.getenv("MAX_NUM_RETRIES", 3))),
+            concurrency=max(1, int(os.getenv("MODERATION_CONCURRENCY", 1))),
+            retry_scheduler=os.getenv("RETRY_SCHEDULER", "redis"),
+            batch_size=max(1, int(os.getenv("MODERATION_BATCH_SIZE", 1))),
+            batch_timeout=abs(float(os.getenv("MODERATION_BATCH_TIMEOUT", 0.5))),
+        ),
+        rate_limit=RateLimitConfig(
+            backend=os.getenv("RATE_LIMIT_BACKEND", "redis"),
+            requests_per_second=abs(float(os.getenv("RATE_LIMIT_RPS", 1))),
+            tokens_per_minute=abs(float(os.getenv("RATE_LIMIT_TPM", 0))),
+            decrease_factor=min(
+                1.0, abs(float(os.getenv("RATE_LIMIT_DECREASE_FACTOR", 0.5)))
+            ),
+            min_factor=min(1.0, abs(float(os.getenv("RATE_LIMIT_MIN_FACTOR", 0.1)))),
+            quiet_period=abs(float(os.getenv("RATE_LIMIT_QUIET_PERIOD", 30))),
+            recovery_rate=abs(float(os.getenv("RATE_LIMIT_RECOVERY_RATE", 0.01))),
+        ),
+        prefilter=PrefilterConfig(
+            enabled=os.getenv("PREFILTER_ENABLED", "0") == "1",
+            lexicon_path=os.getenv("PREFILTER_LEXICON", ""),
+            max_short_words=abs(int(os.getenv("PREFILTER_MAX_SHORT_WORDS", 0))),
+        ),
+        verdict_cache=VerdictCacheConfig(
+            enabled=os.getenv("VERDICT_CACHE_ENABLED", "0") == "1",
+            local_size=abs(int(os.getenv("VERDICT_CACHE_LOCAL_SIZE", 10000))),
+            ttl=abs(int(os.getenv("VERDICT_CACHE_TTL", 86400))),
+        ),
+        near_duplicates=NearDuplicatesConfig(
+            enabled=os.getenv("NEAR_DUPLICATES_ENABLED", "0") == "1",
+            index=os.getenv("NEAR_DUPLICATES_INDEX", "redis"),
+            threshold=min(
+                1.0, abs(float(os.getenv("NEAR_DUPLICATES_THRESHOLD", 0.95)))
+            ),
+            ttl=abs(int(os.getenv("NEAR_DUPLICATES_TTL", 3600))),
+            local_size=abs(int(os.getenv("NEAR_DUPLICATES_LOCAL_SIZE", 100000))),
+            bucket_size=abs(int(os.getenv("NEAR_DUPLICATES_BUCKET_SIZE", 1000))),
+            min_features=abs(int(os.getenv("NEAR_DUPLICATES_MIN_FEATURES", 10))),
+        ),
+        freshness=FreshnessConfig(
+            enabled=os.getenv("FRESHNESS_ENABLED", "1") == "1",
+            max_age=abs(float(os.getenv("FRESHNESS_MAX_AGE", 0))),
+            stale_path=os.getenv("FRESHNESS_STALE_PATH", "drop"),
+        ),
+        token_budget=TokenBudgetConfig(
+            enabled=os.getenv("TOKEN_BUDGET_ENABLED", "0") == "1",
+            backend=os.getenv("TOKEN_BUDGET_BACKEND", "redis"),
+            window=max(1, int(os.getenv("TOKEN_BUDGET_WINDOW", 86400))),
+            limit=abs(int(os.getenv("TOKEN_BUDGET_LIMIT", 0))),
+            chat_limits=__chat_limits(os.getenv("TOKEN_BUDGET_CHAT_LIMITS", "")),
+            modes=__budget_modes(
+                os.getenv("TOKEN_BUDGET_MODES", "0.8:sample,1:untrusted")
+            ),
+            sample_rate=min(
+                1.0, abs(float(os.getenv("TOKEN_BUDGET_SAMPLE_RATE", 0.2)))
+            ),
+            trust_after=abs(int(os.getenv("TOKEN_BUDGET_TRUST_AFTER", 20))),
+            trust_ttl=abs(int(os.getenv("TOKEN_BUDGET_TRUST_TTL", 30 * 86400))),
+        ),
+        circuit_breaker=CircuitBreakerConfig(
+            enabled=os.getenv("CIRCUIT_BREAKER_ENABLED", "0") == "1",
+            backend=os.getenv("CIRCUIT_BREAKER_BACKEND", "redis"),
+            window=max(1.0, abs(float(os.getenv("CIRCUIT_BREAKER_WINDOW", 60)))),
+            min_requests=max(1, int(os.getenv("CIRCUIT_BREAKER_MIN_REQUESTS", 10))),
+            failure_rate=min(
+                1.0, abs(float(os.getenv("CIRCUIT_BREAKER_FAILURE_RATE", 0.5)))
+            ),
+            slow_call=abs(float(os.getenv("CIRCUIT_BREAKER_SLOW_CALL", 0))),
+            open_duration=abs(float(os.getenv("CIRCUIT_BREAKER_OPEN_DURATION", 30))),
+            probes=max(1, int(os.getenv("CIRCUIT_BREAKER_PROBES", 3))),
+            open_path=os.getenv("CIRCUIT_BREAKER_OPEN_PATH", "park"),
+            fallback_model=os.getenv(
+                "CIRCUIT_BREAKER_FALLBACK_MODEL", "yandexgpt-lite"
+            ),
+        ),
+        cascade=CascadeConfig(
+            enabled=os.getenv("CASCADE_ENABLED", "0") == "1",
+            lite_model=os.getenv("CASCADE_LITE_MODEL", "yandexgpt-lite"),
+            threshold=min(1.0, abs(float(os.getenv("CASCADE_THRESHOLD", 0.8)))),
+            chat_thresholds=__chat_thresholds(os.getenv("CASCADE_CHAT_THRESHOLDS", "")),
+            trust_check=os.getenv("CASCADE_TRUST_CHECK", "1") == "1",
+        ),
+        hedging=HedgingConfig(
+            enabled=os.getenv("HEDGING_ENABLED", "0") == "1",
+            percentile=min(1.0, abs(float(os.getenv("HEDGING_PERCENTILE", 0.95)))),
+            min_delay=abs(float(os.getenv("HEDGING_MIN_DELAY", 0.5))),
+            budget=min(1.0, abs(float(os.getenv("HEDGING_BUDGET", 0.05)))),
+            max_burst=max(1.0, abs(float(os.getenv("HEDGING_MAX_BURST", 10)))),
+            samples=max(1, int(os.getenv("HEDGING_SAMPLES", 1000))),
+            min_samples=max(1, int(os.getenv("HEDGING_MIN_SAMPLES", 100))),
+        ),
+        classifier=ClassifierConfig(
+            enabled=os.getenv("CLASSIFIER_ENABLED", "0") == "1",
+            backend=os.getenv("CLASSIFIER_BACKEND", "redis"),
+            threshold=min(1.0, abs(float(os.getenv("CLASSIFIER_THRESHOLD", 0.95)))),
+            audit_rate=min(1.0, abs(float(os.getenv("CLASSIFIER_AUDIT_RATE", 0.05)))),
+            reload_interval=abs(float(os.getenv("CLASSIFIER_RELOAD_INTERVAL", 60))),
+            log_verdicts=os.getenv("CLASSIFIER_LOG_VERDICTS", "1") == "1",
+            max_verdicts=max(1, int(os.getenv("CLASSIFIER_MAX_VERDICTS", 200000))),
+            keep_versions=max(1, int(os.getenv("CLASSIFIER_KEEP_VERSIONS", 10))),
+        ),
+        dead_letters=DeadLetterConfig(
+            enabled=os.getenv("DEAD_LETTERS_ENABLED", "0") == "1",
+            backend=os.getenv("DEAD_LETTERS_BACKEND", "redis"),
+            max_len=max(1, int(os.getenv("DEAD_LETTERS_MAX_LEN", 100000))),
         ),
         yandex_gpt=YandexGPTConfig(
             oauth_token=os.getenv("YANDEXGPT_OAUTH", ""),
             catalog_id=os.getenv("YANDEXGPT_CATALOG_ID", ""),
             temperature=abs(float(os.getenv("YANDEXGPT_TEMPERATURE", 0.3))),
             max_tokens=abs(int(os.getenv("YANDEXGPT_MAX_TOKENS", 2000))),
+            connection_limit=max(1, int(os.getenv("YANDEXGPT_CONNECTION_LIMIT", 10))),
+            request_timeout=abs(float(os.getenv("YANDEXGPT_REQUEST_TIMEOUT", 30))),
+            keepalive_timeout=abs(float(os.getenv("YANDEXGPT_KEEPALIVE_TIMEOUT", 60))),
+            iam_refresh_margin=abs(
+                float(os.getenv("YANDEXGPT_IAM_REFRESH_MARGIN", 3600))
+            ),
+            completion_url=os.getenv(
+                "YANDEXGPT_COMPLETION_URL",
+                "https://llm.api.cloud.yandex.net/foundationModels/v1/completion",
+            ),
+            iam_url=os.getenv(
+                "YANDEXGPT_IAM_URL", "https://iam.api.cloud.yandex.net/iam/v1/tokens"
+            ),
+            model=os.getenv("YANDEXGPT_MODEL", "yandexgpt"),
         ),
         redis=RedisConfig(
             url=os.getenv("REDIS_URL", ""),
         ),
+        queue=QueueConfig(
+            backend=os.getenv("QUEUE_BACKEND", "list"),
+            max_len=max(1, int(os.getenv("QUEUE_MAX_LEN", 100000))),
+            claim_idle=abs(float(os.getenv("QUEUE_CLAIM_IDLE", 60))),
+            codec=os.getenv("QUEUE_CODEC", "json"),
+            compress_threshold=abs(int(os.getenv("QUEUE_COMPRESS_THRESHOLD", 512))),
+            lag_log_interval=abs(float(os.getenv("QUEUE_LAG_LOG_INTERVAL", 60))),
+            newest_first=os.getenv("QUEUE_NEWEST_FIRST", "0") == "1",
+        ),
+        metrics=MetricsConfig(
+            enabled=os.getenv("METRICS_ENABLED", "0") == "1",
+            host=os.getenv("METRICS_HOST", "0.0.0.0"),
+            port=int(os.getenv("METRICS_PORT", 8000)),
+        ),
     )
@@ -0,0 +1,105 @@
+"""
+Inspect and replay the messages whose moderation failed for good.
+
+The messages are put back into the moderation queue at a limited rate,
+so the recovery after an outage of LLM does not overload it again.
+The config (Redis, queue backend) is read from the env as for the server.
+
+Usage:
+    python -m server.dead_letters stats
+    python -m server.dead_letters replay --rate 5 --error TooManyRequests
+    python -m server.dead_letters replay --min-age 600 --max-age 86400 --limit 1000
+"""
+
+import argparse
+import asyncio
+import logging.config
+from typing import Dict, Optional
+
+import redis.asyncio
+from dotenv import load_dotenv
+
+from producer_consumer.queue_depth import queue_depth
+
+from .config.app_config import Config, get_config
+from .config.log_config import get_log_config
+from .main import get_dead_letters, get_msg_producer
+from .services.dead_letters.base import BaseDeadLetterQueue
+from .services.dead_letters.replay import DeadLetterReplayer
+
+
+async def main(args: argparse.Namespace) -> None:
+    """Print the stats of the dead letters or replay them."""
+    load_dotenv()
+    config: Config = get_config()
+    logging.config.dictConfig(get_log_config(config))
+
+    pool = redis.asyncio.ConnectionPool.from_url(config.redis.url)
+    client = redis.asyncio.Redis(connection_pool=pool)
+    try:
+        dead_letters: Optional[BaseDeadLetterQueue] = get_dead_letters(config, client)
+        if dead_letters is None or config.dead_letters.backend == "local":
+            print("The dead letters are not kept in Redis (DEAD_LETTERS_*).")
+            return
+        if args.command == "stats":
+            counts: Dict[str, int] = await dead_letters.count()
+            for error, count in sorted(counts.items()):
+                print(f"{error}: {count}")
+            print(f"total: {sum(counts.values())}")
+            return
+
+        streams: bool = config.queue.backend == "streams"
+
+        async def backlog() -> int:
+            return await (
+                queue_depth(client, "messages:stream", "moderation")
+                if streams
+                else queue_depth(client, "messages")
+            )
+
+        replayer = DeadLetterReplayer(
+            dead_letters,
+            get_msg_producer(config, client),
+            rate=args.rate,
+            batch_size=args.batch_size,
+            backlog=backlog,
+            max_backlog=args.max_backlog,
+        )
+        total: int = await replayer.replay(
+            errors=args.error or None,
+            min_age=args.min_age,
+            max_age=args.max_age,
+            limit=args.limit,
+            drop_deadline=args.drop_deadline,
+        )
+        print(f"replayed: {total} {dict(replayer.replayed)}")
+    finally:
+        await client.close()
+        await pool.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("stats", help="the number of the dead letters by error")
+    replay = commands.add_parser("replay", help="put the dead letters back")
+    replay.add_argument("--rate", type=float, default=1, help="messages per second")
+    replay.add_argument("--batch-size", type=int, default=10)
+    replay.add_argument(
+        "--max-backlog",
+        type=int,
+        default=100,
+        help="wait while the moderation queue holds so many messages (0 - no wait)",
+    )
+    replay.add_argument(
+        "--error", action="append", help="the class of the exception, repeatable"
+    )
+    replay.add_argument("--min-age", type=float, default=0, help="seconds")
+    replay.add_argument("--max-age", type=float, default=0, help="seconds, 0 - any")
+    replay.add_argument("--limit", type=int, default=0, help="0 - all")
+    replay.add_argument(
+        "--drop-deadline",
+        action="store_true",
+        help="moderate the messages even after their deadline",
+    )
+    asyncio.run(main(parser.parse_args()))
@@ -2,20 +2,389 @@
 
 import asyncio
 import logging.config
+import signal
+from contextlib import suppress
 from logging import getLogger
-from typing import Any, Dict
+from typing import Any, Awaitable, Callable, Dict, Optional
 
 import redis.asyncio
 from dotenv import load_dotenv
 
-from producer_consumer.messages.redis_pc import RedisMessageConsumer
+from metrics.http_server import MetricsServer
+from metrics.registry import REGISTRY
+from producer_consumer.codecs.versioned_codec import (
+    get_message_codec,
+    get_moderation_result_codec,
+)
+from producer_consumer.messages.base import BaseMessageConsumer, BaseMessageProducer
+from producer_consumer.messages.redis_pc import (
+    RedisMessageConsumer,
+    RedisMessageProducer,
+)
+from producer_consumer.messages.redis_streams_pc import (
+    RedisStreamMessageConsumer,
+    RedisStreamMessageProducer,
+)
 from producer_consumer.moderation_results.redis_pc import RedisModerationResultsProducer
+from producer_consumer.moderation_results.redis_streams_pc import (
+    RedisStreamModerationResultsProducer,
+)
+from producer_consumer.moderation_results.routing import (
+    RoutingModerationResultProducer,
+)
+from producer_consumer.queue_depth import QUEUE_DEPTH, queue_depth
 
 from .config.app_config import Config, get_config
 from .config.log_config import get_log_config
+from .services.api.llm.base import BaseLLMAPI
+from .services.api.llm.circuit_breaker import CircuitBreakerLLMAPI
+from .services.api.llm.hedging import HedgedLLMAPI
 from .services.api.llm.yandex_gpt import YandexGPTAPI
+from .services.circuit_breakers.base import BaseCircuitBreaker
+from .services.circuit_breakers.local_breaker import LocalCircuitBreaker
+from .services.circuit_breakers.redis_breaker import RedisCircuitBreaker
+from .services.classifiers.base import BaseClassifierStore
+from .services.classifiers.local_store import LocalClassifierStore
+from .services.classifiers.redis_store import RedisClassifierStore
+from .services.dead_letters.base import BaseDeadLetterQueue
+from .services.dead_letters.local_dlq import LocalDeadLetterQueue
+from .services.dead_letters.redis_dlq import RedisDeadLetterQueue
 from .services.moderation import ModerationManager
+from .services.moderators.base import BaseModerator, iter_stages
+from .services.moderators.budget_moderator import BudgetModerator
+from .services.moderators.cached_moderator import CachedModerator
+from .services.moderators.cascade_moderator import CascadeModerator
+from .services.moderators.classifier_moderator import ClassifierModerator
+from .services.moderators.fallback_moderator import FallbackModerator
+from .services.moderators.freshness_moderator import FreshnessModerator
 from .services.moderators.llm_moderator import LLMModerator
+from .services.moderators.near_duplicate_moderator import NearDuplicateModerator
+from .services.moderators.prefilter_moderator import PrefilterModerator
+from .services.near_duplicates.base import BaseNearDuplicateIndex
+from .services.near_duplicates.local_index import LocalNearDuplicateIndex
+from .services.near_duplicates.redis_index import RedisNearDuplicateIndex
+from .services.prefilters.lexicon import DEFAULT_LEXICON_PATH, load_lexicon
+from .services.rate_limiters.base import BaseRateLimiter
+from .services.rate_limiters.local_rate_limiter import LocalRateLimiter
+from .services.rate_limiters.redis_rate_limiter import RedisRateLimiter
+from .services.schedulers.base import BaseRetryScheduler
+from .services.schedulers.local_scheduler import LocalRetryScheduler
+from .services.schedulers.redis_scheduler import RedisRetryScheduler
+from .services.token_budgets.base import BaseTokenBudget
+from .services.token_budgets.local_budget import LocalTokenBudget
+from .services.token_budgets.redis_budget import RedisTokenBudget
+from .services.verdict_caches.lru_cache import LRUVerdictCache
+from .services.verdict_caches.redis_cache import RedisVerdictCache
+from .services.verdict_caches.two_level_cache import TwoLevelVerdictCache
+
+MODERATION_STAGE = REGISTRY.gauge(
+    "moderation_stage", "Stats of the moderation stages.", ("stage", "stat")
+)
+
+
+def get_msg_consumer(
+    config: Config, client: redis.asyncio.Redis
+) -> BaseMessageConsumer:
+    """Return the message consumer of the queue backend chosen in the config."""
+    codec = get_message_codec(config.queue.codec, config.queue.compress_threshold)
+    if config.queue.backend == "streams":
+        return RedisStreamMessageConsumer(
+            client, claim_idle=config.queue.claim_idle, codec=codec
+        )
+    return RedisMessageConsumer(
+        client, codec=codec, newest_first=config.queue.newest_first
+    )
+
+
+def get_msg_producer(
+    config: Config, client: redis.asyncio.Redis
+) -> BaseMessageProducer:
+    """Return the message producer of the queue backend chosen in the config."""
+    codec = get_message_codec(config.queue.codec, config.queue.compress_threshold)
+    if config.queue.backend == "streams":
+        return RedisStreamMessageProducer(
+            client, max_len=config.queue.max_len, codec=codec
+        )
+    return RedisMessageProducer(client, codec=codec)
+
+
+def get_mod_res_producer(
+    config: Config, client: redis.asyncio.Redis
+) -> RoutingModerationResultProducer:
+    """
+    Return the moderation results producer of the queue backend.
+
+    The results are routed to the queues named by reply_to of the messages,
+    so every bot instance gets only the results of its own messages.
+    """
+    codec = get_moderation_result_codec(config.queue.codec)
+    if config.queue.backend == "streams":
+        return RoutingModerationResultProducer(
+            RedisStreamModerationResultsProducer(
+                client, max_len=config.queue.max_len, codec=codec
+            ),
+            lambda stream: RedisStreamModerationResultsProducer(
+                client, stream, max_len=config.queue.max_len, codec=codec
+            ),
+        )
+    return RoutingModerationResultProducer(
+        RedisModerationResultsProducer(client, codec=codec),
+        lambda queue: RedisModerationResultsProducer(client, queue, codec=codec),
+    )
+
+
+async def log_backlog(consumer: RedisStreamMessageConsumer, interval: float) -> None:
+    """Log the backlog of the consumer group periodically."""
+    logger = getLogger("main.queue")
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            logger.info("Backlog of messages: %s", await consumer.lag())
+        except Exception as exc:
+            logger.warning("Can't get backlog of messages.\nexc: %s", exc)
+
+
+def get_queue_depth_collector(
+    config: Config,
+    client: redis.asyncio.Redis,
+    mod_res_producer: RoutingModerationResultProducer,
+) -> Callable[[], Awaitable[None]]:
+    """
+    Return the collector of the depth of the messages and results queues.
+
+    The depth of the results is summed over the default queue
+    and the queues of the bot instances the results have been routed to.
+    """
+    streams: bool = config.queue.backend == "streams"
+    default_results: str = (
+        "moderation_results:stream" if streams else "moderation_results"
+    )
+
+    async def collect() -> None:
+        QUEUE_DEPTH.set(
+            await (
+                queue_depth(client, "messages:stream", "moderation")
+                if streams
+                else queue_depth(client, "messages")
+            ),
+            "messages",
+        )
+        total: int = 0
+        for queue in dict.fromkeys([default_results, *mod_res_producer.routes]):
+            total += await queue_depth(client, queue, "bot" if streams else None)
+        QUEUE_DEPTH.set(total, "moderation_results")
+
+    return collect
+
+
+def get_stages_collector(moderator: BaseModerator) -> Callable[[], Awaitable[None]]:
+    """Return the collector of the stats of the moderation stages."""
+
+    async def collect() -> None:
+        for stage in iter_stages(moderator):
+            for name, value in stage.stats().items():
+                MODERATION_STAGE.set(value, type(stage).__name__, name)
+
+    return collect
+
+
+def get_retry_scheduler(
+    config: Config,
+    client: redis.asyncio.Redis,
+    msg_producer: BaseMessageProducer,
+    dead_letters: Optional[BaseDeadLetterQueue] = None,
+) -> BaseRetryScheduler:
+    """Return the retry scheduler chosen in the config."""
+    kwargs: Dict[str, Any] = dict(
+        msg_producer=msg_producer,
+        delay_limits=config.moderation_config.random_delay_limits,
+        delay_denominator=config.moderation_config.delay_denominator,
+        max_num_retries=config.moderation_config.max_num_retries,
+    )
+    if config.moderation_config.retry_scheduler == "local":
+        return LocalRetryScheduler(**kwargs)
+    return RedisRetryScheduler(client, dead_letters=dead_letters, **kwargs)
+
+
+def get_dead_letters(
+    config: Config, client: redis.asyncio.Redis
+) -> Optional[BaseDeadLetterQueue]:
+    """Return the dead-letter queue chosen in the config or None if it is disabled."""
+    if not config.dead_letters.enabled:
+        return None
+    if config.dead_letters.backend == "local":
+        return LocalDeadLetterQueue(max_len=config.dead_letters.max_len)
+    return RedisDeadLetterQueue(client, max_len=config.dead_letters.max_len)
+
+
+def get_classifier_store(
+    config: Config, client: redis.asyncio.Redis
+) -> BaseClassifierStore:
+    """Return the store of the classifiers chosen in the config."""
+    if config.classifier.backend == "local":
+        return LocalClassifierStore(
+            max_verdicts=config.classifier.max_verdicts,
+            keep_versions=config.classifier.keep_versions,
+        )
+    return RedisClassifierStore(
+        client,
+        max_verdicts=config.classifier.max_verdicts,
+        keep_versions=config.classifier.keep_versions,
+    )
+
+
+def get_near_duplicate_index(
+    config: Config, client: redis.asyncio.Redis
+) -> BaseNearDuplicateIndex:
+    """Return the near-duplicate index chosen in the config."""
+    if config.near_duplicates.index == "local":
+        return LocalNearDuplicateIndex(
+            threshold=config.near_duplicates.threshold,
+            ttl=config.near_duplicates.ttl,
+            max_size=config.near_duplicates.local_size,
+        )
+    return RedisNearDuplicateIndex(
+        client,
+        threshold=config.near_duplicates.threshold,
+        ttl=config.near_duplicates.ttl,
+        max_bucket_size=config.near_duplicates.bucket_size,
+    )
+
+
+def get_token_budget(
+    config: Config, client: redis.asyncio.Redis
+) -> Optional[BaseTokenBudget]:
+    """Return the token budget chosen in the config or None if it is disabled."""
+    if not config.token_budget.enabled:
+        return None
+    if config.token_budget.backend == "local":
+        return LocalTokenBudget(config.token_budget)
+    return RedisTokenBudget(client, config.token_budget)
+
+
+def get_rate_limiter(config: Config, client: redis.asyncio.Redis) -> BaseRateLimiter:
+    """Return the rate limiter of requests to LLM chosen in the config."""
+    if config.rate_limit.backend == "local":
+        return LocalRateLimiter(config.rate_limit)
+    return RedisRateLimiter(client, config.rate_limit)
+
+
+def get_circuit_breaker(
+    config: Config, client: redis.asyncio.Redis, name: str
+) -> BaseCircuitBreaker:
+    """Return the circuit breaker of the service chosen in the config."""
+    if config.circuit_breaker.backend == "local":
+        return LocalCircuitBreaker(config.circuit_breaker, name)
+    return RedisCircuitBreaker(client, config.circuit_breaker, name)
+
+
+def get_guarded_llm_api(
+    config: Config, client: redis.asyncio.Redis, llm_api: BaseLLMAPI, name: str
+) -> BaseLLMAPI:
+    """
+    Return LLM API with the hedging and the circuit breaker enabled in the config.
+
+    Every model has its own circuit. The slow requests are hedged inside
+    the circuit breaker, so a won hedge is not counted as a slow call.
+    """
+    if config.hedging.enabled:
+        llm_api = HedgedLLMAPI(llm_api, config.hedging)
+    if config.circuit_breaker.enabled:
+        llm_api = CircuitBreakerLLMAPI(
+            llm_api, get_circuit_breaker(config, client, name)
+        )
+    return llm_api
+
+
+def get_moderator(
+    config: Config,
+    client: redis.asyncio.Redis,
+    llm_api: BaseLLMAPI,
+    fallback_api: Optional[BaseLLMAPI] = None,
+    lite_api: Optional[BaseLLMAPI] = None,
+) -> BaseModerator:
+    """
+    Return LLM moderator with the stages enabled in the config in front of it.
+
+    With lite_api, the messages are moderated by the lite model first
+    and only the uncertain ones by llm_api. With the circuit breaker enabled,
+    the messages are moderated with fallback_api (if any) while it is open.
+    """
+    token_budget: Optional[BaseTokenBudget] = get_token_budget(config, client)
+    rate_limiter: BaseRateLimiter = get_rate_limiter(config, client)
+    moderator: BaseModerator = LLMModerator(
+        llm_api=get_guarded_llm_api(config, client, llm_api, "llm"),
+        config=config.moderation_config,
+        rate_limiter=rate_limiter,
+        token_budget=token_budget,
+    )
+    if lite_api is not None:
+        moderator = CascadeModerator(
+            LLMModerator(
+                llm_api=get_guarded_llm_api(config, client, lite_api, "llm_lite"),
+                config=config.moderation_config,
+                rate_limiter=rate_limiter,
+                token_budget=token_budget,
+                with_confidence=True,
+            ),
+            moderator,
+            config.cascade,
+            token_budget,
+        )
+    if config.circuit_breaker.enabled and fallback_api is not None:
+        # the fallback has its own circuit, the messages are parked if it is open too
+        moderator = FallbackModerator(
+            moderator,
+            LLMModerator(
+                llm_api=get_guarded_llm_api(
+                    config, client, fallback_api, "llm_fallback"
+                ),
+                config=config.moderation_config,
+                rate_limiter=rate_limiter,
+                token_budget=token_budget,
+            ),
+        )
+    if token_budget is not None:
+        # the cheaper stages answer for free, so only LLM is degraded
+        moderator = BudgetModerator(
+            moderator, token_budget, config.token_budget.sample_rate
+        )
+    if config.freshness.enabled and config.freshness.stale_path == "cheap":
+        # the stale messages get only the answers of the stages in front of LLM
+        moderator = FreshnessModerator(moderator, config.freshness.max_age)
+    if config.classifier.enabled:
+        # the classifier learns from the verdicts of LLM behind it
+        moderator = ClassifierModerator(
+            moderator,
+            get_classifier_store(config, client),
+            threshold=config.classifier.threshold,
+            audit_rate=config.classifier.audit_rate,
+            reload_interval=config.classifier.reload_interval,
+            log_verdicts=config.classifier.log_verdicts,
+        )
+    if config.near_duplicates.enabled:
+        moderator = NearDuplicateModerator(
+            moderator,
+            get_near_duplicate_index(config, client),
+            min_features=config.near_duplicates.min_features,
+        )
+    if config.verdict_cache.enabled:
+        moderator = CachedModerator(
+            moderator,
+            TwoLevelVerdictCache(
+                LRUVerdictCache(config.verdict_cache.local_size),
+                RedisVerdictCache(client, config.verdict_cache.ttl),
+            ),
+        )
+    if config.prefilter.enabled:
+        moderator = PrefilterModerator(
+            moderator,
+            load_lexicon(config.prefilter.lexicon_path or DEFAULT_LEXICON_PATH),
+            max_short_words=config.prefilter.max_short_words,
+        )
+    if config.freshness.enabled and config.freshness.stale_path != "cheap":
+        moderator = FreshnessModerator(moderator, config.freshness.max_age)
+    return moderator
 
 
 async def main():
@@ -29,35 +398,92 @@ async def main():
     logging.config.dictConfig(log_config)
     logger = getLogger("main")
 
-    # LLM API
-    llm_api: YandexGPTAPI = YandexGPTAPI(config)
-
-    # LLM Moderator
-    moderator: LLMModerator = LLMModerator(
-        llm_api=llm_api, config=config.moderation_config
-    )
-
     # Redis client
     client = None
     pool = None
+    llm_api: Optional[YandexGPTAPI] = None
+    fallback_api: Optional[YandexGPTAPI] = None
+    lite_api: Optional[YandexGPTAPI] = None
+    backlog_logger: Optional[asyncio.Task] = None
+    metrics_server: Optional[MetricsServer] = None
     try:
         pool = redis.asyncio.ConnectionPool.from_url(config.redis.url)
         client = redis.asyncio.Redis(connection_pool=pool)
 
-        msg_consumer = RedisMessageConsumer(client)
-        mod_res_produces = RedisModerationResultsProducer(client)
+        # LLM API: get IAM token before the first request
+        llm_api = YandexGPTAPI(config, client)
+        await llm_api.start()
+        if (
+            config.circuit_breaker.enabled
+            and config.circuit_breaker.open_path == "fallback"
+        ):
+            fallback_api = YandexGPTAPI(
+                config, client, model=config.circuit_breaker.fallback_model
+            )
+            await fallback_api.start()
+        if config.cascade.enabled:
+            lite_api = YandexGPTAPI(config, client, model=config.cascade.lite_model)
+            await lite_api.start()
+
+        # Moderator: chain of stages in front of LLM
+        moderator: BaseModerator = get_moderator(
+            config, client, llm_api, fallback_api, lite_api
+        )
+
+        msg_consumer = get_msg_consumer(config, client)
+        mod_res_produces = get_mod_res_producer(config, client)
+        dead_letters = get_dead_letters(config, client)
+        retry_scheduler = get_retry_scheduler(
+            config, client, get_msg_producer(config, client), dead_letters
+        )
+        if isinstance(msg_consumer, RedisStreamMessageConsumer):
+            backlog_logger = asyncio.create_task(
+                log_backlog(msg_consumer, config.queue.lag_log_interval)
+            )
 
         moderation_manager = ModerationManager(
             msg_consumer=msg_consumer,
             mod_res_producer=mod_res_produces,
             moderator=moderator,
+            concurrency=config.moderation_config.concurrency,
+            retry_scheduler=retry_scheduler,
+            batch_size=config.moderation_config.batch_size,
+            batch_timeout=config.moderation_config.batch_timeout,
+            dead_letters=dead_letters,
         )
 
+        # metrics
+        if config.metrics.enabled:
+            REGISTRY.add_collector(
+                get_queue_depth_collector(config, client, mod_res_produces)
+            )
+            REGISTRY.add_collector(get_stages_collector(moderator))
+            metrics_server = MetricsServer(config.metrics.host, config.metrics.port)
+            await metrics_server.start()
+
+        # graceful shutdown: finish the messages already taken from the queue
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            with suppress(NotImplementedError):
+                loop.add_signal_handler(sig, moderation_manager.stop)
+
         # run moderation
         logger.info("Start moderation.")
         await moderation_manager.run()
+        for stage in iter_stages(moderator):
+            logger.info("Stage %s: %s", type(stage).__name__, stage.stats())
 
     finally:
+        if metrics_server is not None:
+            await metrics_server.close()
+        if backlog_logger is not None:
+            backlog_logger.cancel()
+        if llm_api is not None:
+            await llm_api.close()
+        if fallback_api is not None:
+            await fallback_api.close()
+        if lite_api is not None:
+            await lite_api.close()
         if client is not None:
             await client.close()
         if pool is not None:
@@ -0,0 +1,212 @@
+"""The module responsible for the lifecycle of IAM tokens."""
+
+import asyncio
+import json
+import random
+import time
+import uuid
+from dataclasses import asdict, dataclass
+from logging import getLogger
+from typing import Awaitable, Callable, Optional
+
+import redis.asyncio
+
+logger = getLogger("main.api.iam")
+
+# Delete the lock only if it is held by the caller.
+RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+@dataclass
+class IAMToken(object):
+    """IAM token with its expiration time (Unix time in seconds)."""
+
+    token: str
+    expires_at: float
+
+    def expires_in(self) -> float:
+        """Return the number of seconds until the expiration."""
+        return self.expires_at - time.time()
+
+
+class IAMTokenManager(object):
+    """
+    Manager of the IAM token shared by all server replicas.
+
+    The token is fetched at startup and refreshed in the background
+    refresh_margin seconds before the expiration (or in the middle
+    of the lifetime for short-lived tokens). Concurrent refreshes
+    collapse into one request: inside the process by a shared task,
+    between the replicas by a lock in Redis. The current token is published
+    in Redis, so a replica that starts or meets an expired token
+    takes the token of the others instead of requesting a new one.
+    """
+
+    def __init__(
+        self,
+        fetch_token: Callable[[], Awaitable[IAMToken]],
+        redis_client: Optional[redis.asyncio.Redis] = None,
+        refresh_margin: float = 3600,
+        key: str = "iam_token",
+        lock_timeout: float = 30,
+        retry_delay: float = 5,
+    ):
+        """
+        Init class.
+
+        :param fetch_token: Coroutine function requesting a new token.
+        :param redis_client: Redis client or None to keep the token in the process.
+        :param refresh_margin: How many seconds before the expiration
+        the token is refreshed.
+        :param key: Key of the token in Redis.
+        :param lock_timeout: Timeout of the refresh lock in Redis in seconds.
+        :param retry_delay: Delay after a failed background refresh in seconds.
+        """
+        self.__fetch_token = fetch_token
+        self.__client = redis_client
+        self.__refresh_margin = refresh_margin
+        self.__key = key
+        self.__lock_key = f"{key}:lock"
+        self.__lock_timeout = lock_timeout
+        self.__retry_delay = retry_delay
+
+        self.__release_lock = (
+            redis_client.register_script(RELEASE_LOCK_SCRIPT)
+            if redis_client is not None
+            else None
+        )
+
+        self.__token: Optional[IAMToken] = None
+        self.__refreshing: Optional[asyncio.Task] = None
+        self.__background: Optional[asyncio.Task] = None
+
+    @property
+    def token(self) -> Optional[IAMToken]:
+        """Return the current token."""
+        return self.__token
+
+    async def start(self) -> None:
+        """Get the token and start refreshing it in the background."""
+        await self.get_token()
+        if self.__background is None:
+            self.__background = asyncio.create_task(self.__run())
+
+    async def close(self) -> None:
+        """Stop refreshing the token."""
+        for task in (self.__background, self.__refreshing):
+            if task is not None:
+                task.cancel()
+                await asyncio.wait((task,))
+        self.__background = None
+        self.__refreshing = None
+
+    async def get_token(self) -> str:
+        """Return the valid token, refreshing it if it is missing or expired."""
+        if self.__token is None or self.__token.expires_in() <= 0:
+            await self.refresh(stale=self.__token.token if self.__token else None)
+        assert self.__token is not None
+        return self.__token.token
+
+    async def refresh(self, stale: Optional[str] = None) -> None:
+        """
+        Refresh the token.
+
+        All concurrent calls wait for one refresh.
+
+        :param stale: The token that turned out to be invalid. If the current
+        token is already another one, it is not refreshed.
+        None refreshes the token unconditionally.
+        """
+        if (
+            stale is not None
+            and self.__token is not None
+            and self.__token.token != stale
+            and self.__token.expires_in() > 0
+        ):
+            return
+        if self.__refreshing is None or self.__refreshing.done():
+            self.__refreshing = asyncio.create_task(self.__refresh(stale))
+        await asyncio.shield(self.__refreshing)
+
+    async def __refresh(self, stale: Optional[str]) -> None:
+        """Take the shared token or request a new one."""
+        if self.__client is None:
+            self.__token = await self.__fetch_token()
+            return
+
+        deadline: float = time.monotonic() + self.__lock_timeout
+        while True:
+            shared: Optional[IAMToken] = await self.__get_shared()
+            if self.__is_fresh(shared, stale):
+                self.__token = shared
+                return
+
+            lock: str = uuid.uuid4().hex
+            if await self.__client.set(
+                self.__lock_key, lock, nx=True, px=int(self.__lock_timeout * 1000)
+            ):
+                try:
+                    self.__token = await self.__fetch_token()
+                    await self.__publish(self.__token)
+                    logger.info("IAM token is refreshed.")
+                    return
+                finally:
+                    assert self.__release_lock is not None
+                    await self.__release_lock(keys=[self.__lock_key], args=[lock])
+
+            # another replica is refreshing the token
+            if time.monotonic() > deadline:
+                self.__token = await self.__fetch_token()
+                return
+            await asyncio.sleep(0.1)
+
+    def __is_fresh(self, token: Optional[IAMToken], stale: Optional[str]) -> bool:
+        """Check that the token can be used instead of refreshing."""
+        return (
+            token is not None
+            and token.token != stale
+            and token.expires_in() > 0
+            and (self.__token is None or token.expires_at >= self.__token.expires_at)
+        )
+
+    async def __get_shared(self) -> Optional[IAMToken]:
+        """Return the token published in Redis or None."""
+        assert self.__client is not None
+        value = await self.__client.get(self.__key)
+        if value is None:
+            return None
+        return IAMToken(**json.loads(value))
+
+    async def __publish(self, token: IAMToken) -> None:
+        """Publish the token in Redis until its expiration."""
+        assert self.__client is not None
+        ttl: int = int(token.expires_in())
+        if ttl > 0:
+            await self.__client.set(self.__key, json.dumps(asdict(token)), ex=ttl)
+
+    def __next_refresh_delay(self) -> float:
+        """Return the delay before the next background refresh."""
+        if self.__token is None:
+            return 0
+        expires_in: float = self.__token.expires_in()
+        # the jitter spreads the refreshes of the replicas,
+        # a short-lived token is refreshed in the middle of its lifetime
+        jitter: float = random.uniform(0, min(60, self.__refresh_margin / 10))
+        return max(0.0, expires_in - self.__refresh_margin + jitter, expires_in / 2)
+
+    async def __run(self) -> None:
+        """Refresh the token before the expiration."""
+        while True:
+            await asyncio.sleep(self.__next_refresh_delay())
+            try:
+                await self.refresh(
+                    stale=self.__token.token if self.__token is not None else None
+                )
+            except Exception as exc:
+                logger.error("Can't refresh IAM token.\nexc: %s", exc)
+                await asyncio.sleep(self.__retry_delay)
@@ -1,20 +1,43 @@
 """The module responsible for the basic interface of interaction with LLM."""
 
 from abc import ABC, abstractmethod
+from dataclasses import dataclass
 from typing import List
 
 from server.services.prompts import Prompt
 
 
+@dataclass
+class LLMResponse(object):
+    """LLM answers together with the number of tokens spent on them."""
+
+    answers: List[Prompt]
+    input_tokens: int = 0
+    completion_tokens: int = 0
+
+    @property
+    def total_tokens(self) -> int:
+        """Return the total number of tokens."""
+        return self.input_tokens + self.completion_tokens
+
+
 class BaseLLMAPI(ABC):
     """The basic interface for working with LLM."""
 
     @abstractmethod
-    def auth(self) -> None:
+    async def auth(self) -> None:
         """Auth to LLM API."""
         pass
 
     @abstractmethod
-    def send_prompts(self, chat: List[Prompt]) -> List[Prompt]:
+    async def send_prompts(self, chat: List[Prompt]) -> LLMResponse:
         """Send messages to LLM."""
         pass
+
+    async def start(self) -> None:
+        """Prepare the API for requests (e.g. get the credentials)."""
+        pass
+
+    async def close(self) -> None:
+        """Release the resources (connections, sessions) held by the API."""
+        pass
@@ -0,0 +1,100 @@
+"""The module responsible for the circuit breaker around the LLM API."""
+
+import time
+from logging import getLogger
+from typing import List
+
+from server.services.circuit_breakers.base import BaseCircuitBreaker
+from server.services.excs import (
+    APIAuthException,
+    APIException,
+    CircuitOpen,
+    TooManyRequests,
+)
+from server.services.prompts import Prompt
+
+from .base import BaseLLMAPI, LLMResponse
+
+logger = getLogger("main.services.api.circuit_breaker")
+
+
+def is_failure(exc: Exception) -> bool:
+    """
+    Return True if the exception means that the service is unavailable.
+
+    401 and 429 mean that the service answers, they are handled
+    by the re-authentication and the rate limiter.
+    """
+    if isinstance(exc, (APIAuthException, TooManyRequests)):
+        return False
+    if isinstance(exc, APIException):
+        # 0 - the request failed on the network level or timed out
+        return exc.status_code == 0 or exc.status_code >= 500
+    return True
+
+
+class CircuitBreakerLLMAPI(BaseLLMAPI):
+    """
+    LLM API with a circuit breaker.
+
+    While the circuit is open, send_prompts raises CircuitOpen
+    without a request, so the moderation of the messages is postponed
+    instead of waiting for a failing service. If the state
+    of the circuit is unavailable (e.g. Redis is down), the requests are made.
+    """
+
+    def __init__(self, llm_api: BaseLLMAPI, breaker: BaseCircuitBreaker):
+        """
+        Init class.
+
+        :param llm_api: The protected LLM API.
+        :param breaker: The circuit breaker.
+        """
+        self.__llm_api = llm_api
+        self.__breaker = breaker
+        self.service_name: str = getattr(
+            llm_api, "service_name", type(llm_api).__name__
+        )
+
+    async def auth(self) -> None:
+        """Auth to LLM API."""
+        await self.__llm_api.auth()
+
+    async def start(self) -> None:
+        """Prepare the API for requests."""
+        await self.__llm_api.start()
+
+    async def close(self) -> None:
+        """Release the resources held by the API."""
+        await self.__llm_api.close()
+
+    async def __record(self, failure: bool) -> None:
+        """Count the finished request in the circuit breaker."""
+        try:
+            await self.__breaker.record(failure)
+        except Exception as exc:
+            logger.warning("Can't update the circuit breaker.\nexc: %s", exc)
+
+    async def send_prompts(self, chat: List[Prompt]) -> LLMResponse:
+        """
+        Send messages to LLM if the circuit is not open.
+
+        :raise CircuitOpen: If the circuit is open.
+        """
+        try:
+            retry_after: float = await self.__breaker.allow()
+        except Exception as exc:
+            logger.warning("Can't check the circuit breaker.\nexc: %s", exc)
+            retry_after = 0
+        if retry_after > 0:
+            raise CircuitOpen(self.service_name, retry_after)
+
+        start: float = time.perf_counter()
+        try:
+            response: LLMResponse = await self.__llm_api.send_prompts(chat)
+        except Exception as exc:
+            await self.__record(is_failure(exc))
+            raise
+        slow_call: float = self.__breaker.slow_call
+        await self.__record(slow_call > 0 and time.perf_counter() - start > slow_call)
+        return response
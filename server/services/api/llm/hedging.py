@@ -0,0 +1,147 @@
+"""The module responsible for the hedged requests to LLM."""
+
+import asyncio
+from collections import deque
+from logging import getLogger
+from typing import Deque, List, Optional, Set
+
+from metrics.registry import REGISTRY
+from server.config.app_config import HedgingConfig
+from server.services.prompts import Prompt
+
+from .base import BaseLLMAPI, LLMResponse
+
+logger = getLogger("main.services.api.hedging")
+
+LLM_HEDGES = REGISTRY.counter(
+    "llm_hedges_total",
+    "Hedged requests to LLM by outcome: won (the hedge answered first),"
+    " lost (the first request answered first) or skipped (no budget).",
+    ("outcome",),
+)
+LLM_HEDGE_DELAY = REGISTRY.gauge(
+    "llm_hedge_delay_seconds", "The time after which the request to LLM is hedged."
+)
+
+
+class HedgedLLMAPI(BaseLLMAPI):
+    """
+    LLM API hedging the slow requests.
+
+    If the request has not been answered within the percentile of the latency
+    of the recent requests, the same request is sent once more, the first answer
+    is used and the other request is cancelled. Every request earns budget
+    hedges, and a hedge is sent only if a whole one is earned, so the extra
+    requests are at most the budget share of the requests. The cancelled
+    request may still be billed by the service.
+    """
+
+    def __init__(self, llm_api: BaseLLMAPI, config: HedgingConfig):
+        """
+        Init class.
+
+        :param llm_api: LLM API.
+        :param config: Config for the hedging.
+        """
+        self.__llm_api = llm_api
+        self.__config = config
+        self.service_name: str = getattr(
+            llm_api, "service_name", type(llm_api).__name__
+        )
+
+        self.__latencies: Deque[float] = deque(maxlen=max(1, config.samples))
+        self.__new_latencies: int = 0
+        self.__delay: Optional[float] = None
+        # one hedge is allowed before the budget is earned
+        self.__credits: float = 1.0
+
+    @property
+    def delay(self) -> Optional[float]:
+        """Return the time after which the request is hedged (None - no hedging)."""
+        return self.__delay
+
+    async def auth(self) -> None:
+        """Auth to LLM API."""
+        await self.__llm_api.auth()
+
+    async def start(self) -> None:
+        """Prepare the API for requests."""
+        await self.__llm_api.start()
+
+    async def close(self) -> None:
+        """Release the resources held by the API."""
+        await self.__llm_api.close()
+
+    def __observe(self, latency: float) -> None:
+        """Remember the latency and update the hedge delay from time to time."""
+        self.__latencies.append(latency)
+        self.__new_latencies += 1
+        if len(self.__latencies) < self.__config.min_samples:
+            return
+        if self.__delay is not None and self.__new_latencies < 50:
+            return
+        self.__new_latencies = 0
+        latencies: List[float] = sorted(self.__latencies)
+        index: int = min(
+            len(latencies) - 1, int(len(latencies) * self.__config.percentile)
+        )
+        self.__delay = max(self.__config.min_delay, latencies[index])
+        LLM_HEDGE_DELAY.set(self.__delay)
+
+    def __take_credit(self) -> bool:
+        """Spend one hedge of the budget if it is earned."""
+        if self.__credits < 1:
+            return False
+        self.__credits -= 1
+        return True
+
+    async def __timed(self, chat: List[Prompt]) -> LLMResponse:
+        """Send the prompts and remember the latency of the answer."""
+        loop = asyncio.get_running_loop()
+        start: float = loop.time()
+        response: LLMResponse = await self.__llm_api.send_prompts(chat)
+        self.__observe(loop.time() - start)
+        return response
+
+    async def send_prompts(self, chat: List[Prompt]) -> LLMResponse:
+        """Send messages to LLM, hedging the request if it is slow."""
+        self.__credits = min(
+            self.__credits + self.__config.budget, self.__config.max_burst
+        )
+        first: "asyncio.Task[LLMResponse]" = asyncio.create_task(self.__timed(chat))
+        if self.__delay is None:
+            return await first
+
+        try:
+            done, _ = await asyncio.wait((first,), timeout=self.__delay)
+        except asyncio.CancelledError:
+            first.cancel()
+            raise
+        if done:
+            return first.result()
+        if not self.__take_credit():
+            LLM_HEDGES.inc("skipped")
+            return await first
+
+        logger.debug("Hedge the request after %.2f s.", self.__delay)
+        hedge: "asyncio.Task[LLMResponse]" = asyncio.create_task(self.__timed(chat))
+        pending: "Set[asyncio.Task[LLMResponse]]" = {first, hedge}
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for request in (first, hedge):
+                    if request not in done:
+                        continue
+                    if request.exception() is None:
+                        LLM_HEDGES.inc("won" if request is hedge else "lost")
+                        return request.result()
+                    # the other request may still answer
+                    error = error or request.exception()
+        finally:
+            for request in pending:
+                request.cancel()
+        assert error is not None
+        raise error
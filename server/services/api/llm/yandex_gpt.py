@@ -1,59 +1,186 @@
 """The module responsible for working with the YandexGPT API."""
 
+import asyncio
+import time
+from datetime import datetime
+from json.decoder import JSONDecodeError
 from logging import getLogger
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Tuple
 
-import requests
-from requests import Response
+import aiohttp
+import redis.asyncio
 
+from metrics.registry import REGISTRY
 from server.config.app_config import Config
+from server.services.api.iam_token_manager import IAMToken, IAMTokenManager
 from server.services.excs import APIAuthException, APIException, TooManyRequests
 
-from .base import BaseLLMAPI, Prompt
+from .base import BaseLLMAPI, LLMResponse, Prompt
 
 logger = getLogger("main.api.YandexGPT")
 
+LLM_REQUEST_SECONDS = REGISTRY.histogram(
+    "llm_request_seconds", "Latency of the requests to LLM.", ("outcome",)
+)
+LLM_TOKENS = REGISTRY.counter(
+    "llm_tokens_total", "Tokens spent on the requests to LLM.", ("direction",)
+)
+
 
 class YandexGPTAPI(BaseLLMAPI):
-    """A class for working with YandexGPT."""
+    """
+    A class for working with YandexGPT.
+
+    All requests go through one long-lived aiohttp session, so the TCP/TLS
+    connections are kept alive and reused between requests.
+    The session is created lazily inside the running event loop
+    and must be released with the close method.
+    The IAM token is managed by IAMTokenManager: the start method fetches it
+    (or takes the one published by other replicas in Redis)
+    and keeps it fresh in the background.
+    """
 
     service_name: str = "YandexGPT"
-    refresh_url: str = "https://iam.api.cloud.yandex.net/iam/v1/tokens"
-    base_url: str = "https://llm.api.cloud.yandex.net/foundationModels/v1/completion"
-    __iam_token: str = ""
+    # IAM tokens live for 12 hours
+    default_token_lifetime: float = 12 * 60 * 60
 
-    def __init__(self, config: Config):
+    def __init__(
+        self,
+        config: Config,
+        redis_client: Optional[redis.asyncio.Redis] = None,
+        model: Optional[str] = None,
+    ):
         """
         Init class.
 
         :param config: app config.
+        :param redis_client: Redis client for sharing the IAM token
+        between the replicas or None.
+        :param model: The name of the model (e.g. yandexgpt-lite),
+        the model from the config by default.
         """
         self.__oauth_token = config.yandex_gpt.oauth_token
         self.__catalog_id = config.yandex_gpt.catalog_id
         self.__temperature = config.yandex_gpt.temperature
         self.__max_tokens = config.yandex_gpt.max_tokens
+        self.__connection_limit = config.yandex_gpt.connection_limit
+        self.__request_timeout = config.yandex_gpt.request_timeout
+        self.__keepalive_timeout = config.yandex_gpt.keepalive_timeout
+        self.__completion_url = config.yandex_gpt.completion_url
+        self.__iam_url = config.yandex_gpt.iam_url
+        self.__model = model or config.yandex_gpt.model
+
+        self.__session: Optional[aiohttp.ClientSession] = None
+        self.__tokens = IAMTokenManager(
+            self.__fetch_iam_token,
+            redis_client,
+            refresh_margin=config.yandex_gpt.iam_refresh_margin,
+            key="iam_token:yandex_gpt",
+        )
+        self.__rejected_token: Optional[str] = None
+
+    def __get_session(self) -> aiohttp.ClientSession:
+        """Return the pooled HTTP session, creating it on first use."""
+        if self.__session is None or self.__session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.__connection_limit,
+                keepalive_timeout=self.__keepalive_timeout,
+            )
+            self.__session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.__request_timeout),
+            )
+        return self.__session
 
-    def auth(self) -> None:
-        """Get IAM token."""
+    async def start(self) -> None:
+        """Get IAM token and start refreshing it in the background."""
+        await self.__tokens.start()
+
+    async def close(self) -> None:
+        """Stop refreshing IAM token, close the HTTP session and connections."""
+        await self.__tokens.close()
+        if self.__session is not None and not self.__session.closed:
+            await self.__session.close()
+        self.__session = None
+
+    async def auth(self) -> None:
+        """
+        Refresh IAM token.
+
+        If the token rejected by YandexGPT has already been refreshed
+        by another coroutine or replica, the refreshed token is used.
+        """
+        await self.__tokens.refresh(stale=self.__rejected_token)
+
+    async def __fetch_iam_token(self) -> IAMToken:
+        """Request a new IAM token."""
         logger.debug("Try auth on %s.", self.service_name)
-        resp: Response = requests.post(
-            self.refresh_url, json={"yandexPassportOauthToken": self.__oauth_token}
+        status, resp_json = await self.__post(
+            self.__iam_url, json={"yandexPassportOauthToken": self.__oauth_token}
+        )
+        if status != 200:
+            raise APIAuthException(
+                service_name=self.service_name,
+                status_code=status,
+                json_str=resp_json,
+            )
+        if not isinstance(resp_json, dict) or not isinstance(
+            resp_json.get("iamToken"), str
+        ):
+            raise self.__malformed(status, resp_json)
+        try:
+            expires_at: float = datetime.fromisoformat(
+                resp_json["expiresAt"]
+            ).timestamp()
+        except (KeyError, TypeError, ValueError):
+            expires_at = time.time() + self.default_token_lifetime
+        return IAMToken(token=resp_json["iamToken"], expires_at=expires_at)
+
+    def __malformed(self, status: int, body: Any) -> APIException:
+        """Get the exception for the response whose body is not as expected."""
+        return APIException(
+            service_name=self.service_name,
+            status_code=status,
+            msg="Malformed response",
+            json_str=str(body)[:1000],
         )
-        # Update the IAM token for all instances
-        YandexGPTAPI.__iam_token = resp.json()["iamToken"]
 
-    def __get_headers(self) -> Dict[str, str]:
+    async def __post(self, url: str, **kwargs: Any) -> Tuple[int, Any]:
+        """
+        Make a POST request through the pooled session.
+
+        :param url: URL.
+        :param kwargs: Keyword arguments for aiohttp.ClientSession.post.
+        :return: Status code and the response body as JSON
+        (or as text if the body is not JSON).
+        :raise APIException: If the request failed on the network level or timed out.
+        """
+        try:
+            async with self.__get_session().post(url, **kwargs) as response:
+                try:
+                    body = await response.json(content_type=None)
+                except JSONDecodeError:
+                    body = await response.text()
+                return response.status, body
+        except (aiohttp.ClientError, asyncio.TimeoutError) as exc:
+            raise APIException(
+                service_name=self.service_name,
+                status_code=0,
+                msg=f"Request failed: {exc!r}",
+            )
+
+    def __get_headers(self, iam_token: str) -> Dict[str, str]:
         """Get headers."""
         return {
             "Accept": "application/json",
-            "Authorization": f"Bearer {self.__iam_token}",
+            "Authorization": f"Bearer {iam_token}",
             "x-data-logging-enabled": "false",
         }
 
     def __get_data(self) -> Dict[str, Any]:
         """Get data for POST request."""
         return {
-            "modelUri": f"gpt://{self.__catalog_id}/yandexgpt",
+            "modelUri": f"gpt://{self.__catalog_id}/{self.__model}",
             "completionOptions": {
                 "stream": False,
                 "temperature": self.__temperature,
@@ -62,46 +189,69 @@ class YandexGPTAPI(BaseLLMAPI):
             },
         }
 
-    def send_prompts(self, chat: List[Prompt]) -> List[Prompt]:
+    async def send_prompts(self, chat: List[Prompt]) -> LLMResponse:
         """
         Send prompts to YandexGPT.
 
         :param chat: Messages history.
-        :return: A list of responses from YandexGPT in the form of prompts.
-        :raise APIException: If response status code is not 200.
+        :return: A list of responses from YandexGPT in the form of prompts
+        with the usage of tokens.
+        :raise APIException: If response status code is not 200,
+        the body of the response is malformed
+        or the request failed on the network level.
         If APIException.status_code == 401, use auth method for updating IAM token.
         """
+        iam_token: str = await self.__tokens.get_token()
         data = self.__get_data()
         data["messages"] = [prompt.to_dict() for prompt in chat]
         logger.debug("Send prompts")
-        response: Response = requests.post(
-            self.base_url,
-            headers=self.__get_headers(),
-            json=data,
+        start: float = time.perf_counter()
+        try:
+            status, response_json = await self.__post(
+                self.__completion_url,
+                headers=self.__get_headers(iam_token),
+                json=data,
+            )
+        except APIException:
+            LLM_REQUEST_SECONDS.observe(time.perf_counter() - start, "network_error")
+            raise
+        LLM_REQUEST_SECONDS.observe(
+            time.perf_counter() - start, "ok" if status == 200 else str(status)
         )
 
-        if response.status_code == 401:
+        if status == 401:
+            self.__rejected_token = iam_token
             raise APIAuthException(
-                service_name=self.service_name, json_str=response.json()
+                service_name=self.service_name, json_str=response_json
             )
-        elif response.status_code == 429:
+        elif status == 429:
             raise TooManyRequests(
-                service_name=self.service_name, json_str=response.json()
+                service_name=self.service_name, json_str=response_json
             )
-        if response.status_code != 200:
+        if status != 200:
             raise APIException(
                 service_name=self.service_name,
-                status_code=response.status_code,
-                json_str=response.json(),
+                status_code=status,
+                json_str=response_json,
             )
 
-        response_json = response.json()
+        try:
+            usage: Dict[str, str] = response_json["result"]["usage"]
+            llm_answers: List[Dict[str, Any]] = response_json["result"]["alternatives"]
+            llm_response = LLMResponse(
+                answers=[Prompt(**llm_answer["message"]) for llm_answer in llm_answers],
+                input_tokens=int(usage["inputTextTokens"]),
+                completion_tokens=int(usage["completionTokens"]),
+            )
+        except (KeyError, TypeError, ValueError):
+            # e.g. the body is the text of an error page of a proxy
+            raise self.__malformed(status, response_json)
         logger.debug(
             "LLM usage: inputTextTokens: %s, completionTokens: %s, totalTokens: %s",
-            str(response_json["result"]["usage"]["inputTextTokens"]),
-            str(response_json["result"]["usage"]["completionTokens"]),
-            str(response_json["result"]["usage"]["totalTokens"]),
+            llm_response.input_tokens,
+            llm_response.completion_tokens,
+            usage.get("totalTokens"),
         )
-
-        llm_answers: List[Dict[str, Any]] = response_json["result"]["alternatives"]
-        return [Prompt(**llm_answer["message"]) for llm_answer in llm_answers]
+        LLM_TOKENS.inc("input", amount=llm_response.input_tokens)
+        LLM_TOKENS.inc("output", amount=llm_response.completion_tokens)
+        return llm_response
@@ -0,0 +1 @@
+"""The package responsible for the circuit breakers of requests to LLM."""
@@ -0,0 +1,180 @@
+"""The module responsible for the interface of the circuit breakers."""
+
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from logging import getLogger
+from typing import Optional, Tuple
+
+from metrics.registry import REGISTRY
+from server.config.app_config import CircuitBreakerConfig
+
+logger = getLogger("main.services.circuit_breaker")
+
+CLOSED: str = "closed"
+HALF_OPEN: str = "half_open"
+OPEN: str = "open"
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+CIRCUIT_BREAKER_STATE = REGISTRY.gauge(
+    "circuit_breaker_state",
+    "The state of the circuit breaker seen by the replica:"
+    " 0 - closed, 1 - half-open, 2 - open.",
+    ("name",),
+)
+CIRCUIT_BREAKER_REJECTED = REGISTRY.counter(
+    "circuit_breaker_rejected_total",
+    "Requests not made because the circuit is open.",
+    ("name",),
+)
+
+
+@dataclass
+class CircuitBreakerState(object):
+    """
+    The state of the circuit breaker.
+
+    closed - the requests and the failures are counted in a fixed window,
+    the circuit opens when the share of the failures is too high;
+    open - no requests are made for open_duration seconds;
+    half_open - up to probes requests are made, the circuit closes
+    when all of them succeed and opens again on the first failure.
+    The probes that are not finished in open_duration seconds are forgotten.
+    RedisCircuitBreaker implements the same logic in Lua.
+    """
+
+    state: str = CLOSED
+    window_start: float = 0.0
+    requests: int = 0
+    failures: int = 0
+    opened_at: float = 0.0
+    probes: int = 0
+    successes: int = 0
+    probe_at: float = 0.0
+
+    def __reset_window(self, now: float) -> None:
+        """Start a new window of the counters."""
+        self.window_start = now
+        self.requests = 0
+        self.failures = 0
+
+    def __open(self, now: float) -> None:
+        """Open the circuit."""
+        self.state = OPEN
+        self.opened_at = now
+
+    def allow(self, config: CircuitBreakerConfig, now: float) -> float:
+        """
+        Ask for a request.
+
+        :return: 0 if the request can be made, otherwise the time to wait.
+        """
+        if self.state == OPEN:
+            wait: float = self.opened_at + config.open_duration - now
+            if wait > 0:
+                return wait
+            self.state = HALF_OPEN
+            self.probes = 0
+            self.successes = 0
+        if self.state == HALF_OPEN:
+            if now - self.probe_at >= config.open_duration:
+                # the probes are lost (e.g. the replica crashed)
+                self.probes = 0
+            if self.probes >= config.probes:
+                return max(0.001, self.probe_at + config.open_duration - now)
+            self.probes += 1
+            self.probe_at = now
+            return 0.0
+        if now - self.window_start >= config.window:
+            self.__reset_window(now)
+        return 0.0
+
+    def record(self, config: CircuitBreakerConfig, now: float, failure: bool) -> None:
+        """Count the finished request."""
+        if self.state == HALF_OPEN:
+            if failure:
+                self.__open(now)
+                return
+            self.successes += 1
+            if self.successes >= config.probes:
+                self.state = CLOSED
+                self.__reset_window(now)
+            return
+        if self.state == OPEN:
+            # the request was made before the circuit opened
+            return
+        if now - self.window_start >= config.window:
+            self.__reset_window(now)
+        self.requests += 1
+        self.failures += int(failure)
+        if (
+            self.requests >= config.min_requests
+            and self.failures >= config.failure_rate * self.requests
+        ):
+            self.__open(now)
+
+
+class BaseCircuitBreaker(ABC):
+    """
+    The basic interface of the circuit breaker.
+
+    Before each request allow must be called, and after the request
+    record with the outcome. The transitions are logged once per replica.
+    """
+
+    def __init__(self, config: CircuitBreakerConfig, name: str = "llm"):
+        """
+        Init class.
+
+        :param config: Config for the circuit breaker.
+        :param name: The name of the protected service.
+        """
+        self._config = config
+        self._name = name
+        self.__last_state: Optional[str] = None
+
+    @property
+    def slow_call(self) -> float:
+        """Return the latency in seconds counted as a failure (0 - never)."""
+        return self._config.slow_call
+
+    def _observe(self, state: str) -> None:
+        """Log the change of the state and update the metric."""
+        CIRCUIT_BREAKER_STATE.set(STATE_VALUES.get(state, 0), self._name)
+        if state == self.__last_state:
+            return
+        if state == OPEN:
+            logger.warning(
+                "Circuit of %s is open, no requests for %s s.",
+                self._name,
+                self._config.open_duration,
+            )
+        else:
+            logger.info("Circuit of %s is %s.", self._name, state.replace("_", "-"))
+        self.__last_state = state
+
+    @abstractmethod
+    async def _allow(self) -> Tuple[str, float]:
+        """Ask for a request and return the state and the time to wait."""
+        pass
+
+    @abstractmethod
+    async def _record(self, failure: bool) -> str:
+        """Count the finished request and return the state."""
+        pass
+
+    async def allow(self) -> float:
+        """
+        Ask for a request.
+
+        :return: 0 if the request can be made, otherwise the time
+        after which the circuit can let requests through.
+        """
+        state, wait = await self._allow()
+        self._observe(state)
+        if wait > 0:
+            CIRCUIT_BREAKER_REJECTED.inc(self._name)
+        return wait
+
+    async def record(self, failure: bool) -> None:
+        """Count the finished request."""
+        self._observe(await self._record(failure))
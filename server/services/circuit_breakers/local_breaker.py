@@ -0,0 +1,42 @@
+"""The module responsible for the in-process circuit breaker."""
+
+import time
+from typing import Tuple
+
+from server.config.app_config import CircuitBreakerConfig
+
+from .base import BaseCircuitBreaker, CircuitBreakerState
+
+
+class LocalCircuitBreaker(BaseCircuitBreaker):
+    """
+    In-process circuit breaker.
+
+    The failures are counted only in this process,
+    use RedisCircuitBreaker when several server replicas are running.
+    """
+
+    def __init__(self, config: CircuitBreakerConfig, name: str = "llm"):
+        """
+        Init class.
+
+        :param config: Config for the circuit breaker.
+        :param name: The name of the protected service.
+        """
+        super().__init__(config, name)
+        self.__state = CircuitBreakerState()
+
+    @property
+    def state(self) -> str:
+        """Return the state of the circuit."""
+        return self.__state.state
+
+    async def _allow(self) -> Tuple[str, float]:
+        """Ask for a request and return the state and the time to wait."""
+        wait: float = self.__state.allow(self._config, time.monotonic())
+        return self.__state.state, wait
+
+    async def _record(self, failure: bool) -> str:
+        """Count the finished request and return the state."""
+        self.__state.record(self._config, time.monotonic(), failure)
+        return self.__state.state
@@ -0,0 +1,160 @@
+"""The module responsible for the Redis-based circuit breaker shared by all replicas."""
+
+from typing import Tuple
+
+import redis.asyncio
+
+from server.config.app_config import CircuitBreakerConfig
+
+from .base import BaseCircuitBreaker
+
+# The same logic as CircuitBreakerState, executed atomically in Redis.
+# The time is taken from the Redis server, so the clocks of the replicas
+# do not have to be in sync.
+CIRCUIT_BREAKER_SCRIPT = """
+local op = ARGV[1]
+local failure = ARGV[2] == '1'
+local window = tonumber(ARGV[3])
+local min_requests = tonumber(ARGV[4])
+local failure_rate = tonumber(ARGV[5])
+local open_duration = tonumber(ARGV[6])
+local max_probes = tonumber(ARGV[7])
+
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+
+local fields = redis.call(
+    'HMGET', KEYS[1], 'state', 'window_start', 'requests', 'failures',
+    'opened_at', 'probes', 'successes', 'probe_at'
+)
+local state = fields[1] or 'closed'
+local window_start = tonumber(fields[2]) or 0
+local requests = tonumber(fields[3]) or 0
+local failures = tonumber(fields[4]) or 0
+local opened_at = tonumber(fields[5]) or 0
+local probes = tonumber(fields[6]) or 0
+local successes = tonumber(fields[7]) or 0
+local probe_at = tonumber(fields[8]) or 0
+
+local wait = 0
+if op == 'allow' then
+    if state == 'open' then
+        wait = opened_at + open_duration - now
+        if wait <= 0 then
+            wait = 0
+            state = 'half_open'
+            probes = 0
+            successes = 0
+        end
+    end
+    if state == 'half_open' and wait == 0 then
+        if now - probe_at >= open_duration then
+            probes = 0
+        end
+        if probes >= max_probes then
+            wait = math.max(0.001, probe_at + open_duration - now)
+        else
+            probes = probes + 1
+            probe_at = now
+        end
+    elseif state == 'closed' and now - window_start >= window then
+        window_start = now
+        requests = 0
+        failures = 0
+    end
+elseif op == 'record' then
+    if state == 'half_open' then
+        if failure then
+            state = 'open'
+            opened_at = now
+        else
+            successes = successes + 1
+            if successes >= max_probes then
+                state = 'closed'
+                window_start = now
+                requests = 0
+                failures = 0
+            end
+        end
+    elseif state == 'closed' then
+        if now - window_start >= window then
+            window_start = now
+            requests = 0
+            failures = 0
+        end
+        requests = requests + 1
+        if failure then
+            failures = failures + 1
+        end
+        if requests >= min_requests and failures >= failure_rate * requests then
+            state = 'open'
+            opened_at = now
+        end
+    end
+end
+
+redis.call(
+    'HSET', KEYS[1],
+    'state', state, 'window_start', window_start, 'requests', requests,
+    'failures', failures, 'opened_at', opened_at, 'probes', probes,
+    'successes', successes, 'probe_at', probe_at
+)
+redis.call('EXPIRE', KEYS[1], ARGV[8])
+return {state, tostring(wait)}
+"""
+
+
+class RedisCircuitBreaker(BaseCircuitBreaker):
+    """
+    Redis-based circuit breaker.
+
+    The state of the circuit is stored in one Redis hash and is changed
+    by a Lua script, so all server replicas open and close the circuit together.
+    """
+
+    def __init__(
+        self,
+        redis_client: redis.asyncio.Redis,
+        config: CircuitBreakerConfig,
+        name: str = "llm",
+        ttl: int = 3600,
+    ):
+        """
+        Init class.
+
+        :param redis_client: Redis client.
+        :param config: Config for the circuit breaker.
+        :param name: The name of the protected service, the state is stored
+        in the hash circuit_breaker:{name}.
+        :param ttl: The state is removed after ttl seconds without requests.
+        """
+        super().__init__(config, name)
+        self.__key = f"circuit_breaker:{name}"
+        self.__ttl = max(ttl, int(config.window + config.open_duration) + 1)
+        self.__script = redis_client.register_script(CIRCUIT_BREAKER_SCRIPT)
+
+    async def __call(self, op: str, failure: bool) -> Tuple[str, float]:
+        """Call the script with the operation."""
+        state, wait = await self.__script(
+            keys=[self.__key],
+            args=[
+                op,
+                int(failure),
+                self._config.window,
+                self._config.min_requests,
+                self._config.failure_rate,
+                self._config.open_duration,
+                self._config.probes,
+                self.__ttl,
+            ],
+        )
+        return state.decode() if isinstance(state, bytes) else state, float(wait)
+
+    async def _allow(self) -> Tuple[str, float]:
+        """Ask for a request and return the state and the time to wait."""
+        return await self.__call("allow", False)
+
+    async def _record(self, failure: bool) -> str:
+        """Count the finished request and return the state."""
+        state, _ = await self.__call("record", failure)
+        return state
@@ -0,0 +1 @@
+"""The package responsible for the local classifiers trained on the verdicts of LLM."""
@@ -0,0 +1,72 @@
+"""The module responsible for the interface of the stores of the classifiers."""
+
+from abc import ABC, abstractmethod
+from typing import List, Optional
+
+from .linear import LinearClassifier, Verdict
+
+
+class BaseClassifierStore(ABC):
+    """
+    The basic interface of the store of the classifiers and their training data.
+
+    The store keeps the log of the verdicts of LLM (at most max_verdicts
+    of the newest ones) and the versions of the models (at most keep_versions
+    of the newest ones besides the active one). The server moderates
+    with the active version, so a new model is rolled out and rolled back
+    by activating its version.
+    """
+
+    def __init__(self, max_verdicts: int = 200000, keep_versions: int = 10):
+        """
+        Init class.
+
+        :param max_verdicts: The maximum number of the kept verdicts.
+        :param keep_versions: The number of the kept versions of the models.
+        """
+        self._max_verdicts = max(1, max_verdicts)
+        self._keep_versions = max(1, keep_versions)
+
+    @abstractmethod
+    async def log_verdict(self, verdict: Verdict) -> None:
+        """Append the verdict to the log."""
+        pass
+
+    @abstractmethod
+    async def verdicts(self, limit: int = 0) -> List[Verdict]:
+        """Return up to limit (0 - all) of the newest verdicts."""
+        pass
+
+    @abstractmethod
+    async def count_verdicts(self) -> int:
+        """Return the number of the logged verdicts."""
+        pass
+
+    @abstractmethod
+    async def save_model(self, model: LinearClassifier) -> None:
+        """Save the model under its version without activating it."""
+        pass
+
+    @abstractmethod
+    async def load_model(self, version: str) -> Optional[LinearClassifier]:
+        """Return the model of the version or None if there is no such version."""
+        pass
+
+    @abstractmethod
+    async def versions(self) -> List[str]:
+        """Return the saved versions from the oldest to the newest."""
+        pass
+
+    @abstractmethod
+    async def activate(self, version: str) -> None:
+        """
+        Make the version active.
+
+        :raise KeyError: If there is no such version.
+        """
+        pass
+
+    @abstractmethod
+    async def active_version(self) -> Optional[str]:
+        """Return the active version or None if no model is active."""
+        pass
@@ -0,0 +1,232 @@
+"""The module responsible for the linear classifier on hashed character n-grams."""
+
+import json
+import math
+import random
+import zlib
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Sequence, Tuple, Union
+
+from server.services.normalization import normalize_text
+
+LABELS: Tuple[str, ...] = ("generated_by_llm", "toxic")
+NGRAM_SIZES: Tuple[int, ...] = (2, 3, 4)
+
+
+@dataclass
+class Verdict(object):
+    """The text of the message with the verdict of LLM on it, a training sample."""
+
+    text: str
+    generated_by_llm: bool
+    toxic: bool
+
+    def to_json(self) -> str:
+        """Return the verdict in JSON."""
+        return json.dumps(asdict(self), ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, data: Union[str, bytes]) -> "Verdict":
+        """Return the verdict from JSON."""
+        return cls(**json.loads(data))
+
+
+def features(text: str, dim: int) -> Dict[int, float]:
+    """
+    Return the hashed features of the text.
+
+    The features are the character n-grams of the normalized text
+    (they cross the borders of words, so the punctuation and the style count)
+    and its words, hashed into dim buckets by CRC32, which does not depend
+    on the seed of the hash of Python. The values are normalized,
+    so long and short texts have features of the same scale.
+
+    :param text: Text of the message.
+    :param dim: The number of the buckets.
+    :return: The values of the features by the buckets.
+    """
+    text = f" {normalize_text(text)} "
+    grams: List[str] = text.split()
+    for size in NGRAM_SIZES:
+        for start in range(len(text) - size + 1):
+            stop: int = start + size
+            grams.append(text[start:stop])
+    buckets = {zlib.crc32(gram.encode("utf-8")) % dim for gram in grams}
+    if not buckets:
+        return dict()
+    value: float = 1 / math.sqrt(len(buckets))
+    return {bucket: value for bucket in buckets}
+
+
+def sigmoid(value: float) -> float:
+    """Return the logistic function of the value."""
+    if value < -30:
+        return 0.0
+    return 1 / (1 + math.exp(-value))
+
+
+@dataclass
+class LinearClassifier(object):
+    """
+    The logistic regression for every label on the same hashed features.
+
+    The weights are sparse: the buckets absent in the weights of a label
+    have the zero weight. meta keeps the details of the training
+    (the number of the samples, the quality on the holdout).
+    """
+
+    version: str
+    dim: int
+    weights: Dict[str, Dict[int, float]]
+    bias: Dict[str, float]
+    meta: Dict[str, Any] = field(default_factory=dict)
+
+    def predict(self, text: str) -> Dict[str, float]:
+        """Return the probability of every label for the text."""
+        text_features: Dict[int, float] = features(text, self.dim)
+        probabilities: Dict[str, float] = dict()
+        for label in LABELS:
+            weights: Dict[int, float] = self.weights[label]
+            score: float = self.bias[label] + sum(
+                weights.get(bucket, 0.0) * value
+                for bucket, value in text_features.items()
+            )
+            probabilities[label] = sigmoid(score)
+        return probabilities
+
+    def to_json(self) -> str:
+        """Return the model in JSON."""
+        return json.dumps(
+            {
+                "version": self.version,
+                "dim": self.dim,
+                "weights": {
+                    label: {str(bucket): weight for bucket, weight in weights.items()}
+                    for label, weights in self.weights.items()
+                },
+                "bias": self.bias,
+                "meta": self.meta,
+            },
+            ensure_ascii=False,
+        )
+
+    @classmethod
+    def from_json(cls, data: Union[str, bytes]) -> "LinearClassifier":
+        """Return the model from JSON."""
+        fields = json.loads(data)
+        fields["weights"] = {
+            label: {int(bucket): weight for bucket, weight in weights.items()}
+            for label, weights in fields["weights"].items()
+        }
+        return cls(**fields)
+
+
+def train(
+    verdicts: Sequence[Verdict],
+    version: str,
+    dim: int = 2**18,
+    epochs: int = 5,
+    learning_rate: float = 0.5,
+    l2: float = 1e-6,
+    seed: int = 0,
+) -> LinearClassifier:
+    """
+    Train the classifier on the verdicts by the stochastic gradient descent.
+
+    The L2 regularization is applied to the weights of the features
+    of every sample only, and the weights close to zero are dropped,
+    so the model stays small.
+
+    :param verdicts: The texts with the verdicts of LLM.
+    :param version: The version of the model.
+    :param dim: The number of the buckets of the features.
+    :param epochs: The number of the passes over the verdicts.
+    :param learning_rate: The initial step of the descent.
+    :param l2: The strength of the L2 regularization.
+    :param seed: Seed of the shuffling.
+    :return: The trained model.
+    """
+    samples: List[Tuple[Dict[int, float], Dict[str, bool]]] = [
+        (
+            features(verdict.text, dim),
+            {"generated_by_llm": verdict.generated_by_llm, "toxic": verdict.toxic},
+        )
+        for verdict in verdicts
+    ]
+    weights: Dict[str, Dict[int, float]] = {label: dict() for label in LABELS}
+    bias: Dict[str, float] = {label: 0.0 for label in LABELS}
+    shuffler = random.Random(seed)
+    step: int = 0
+    for _ in range(epochs):
+        shuffler.shuffle(samples)
+        for text_features, labels in samples:
+            step += 1
+            rate: float = learning_rate / math.sqrt(1 + step / 1000)
+            for label in LABELS:
+                label_weights: Dict[int, float] = weights[label]
+                score: float = bias[label] + sum(
+                    label_weights.get(bucket, 0.0) * value
+                    for bucket, value in text_features.items()
+                )
+                error: float = sigmoid(score) - float(labels[label])
+                bias[label] -= rate * error
+                for bucket, value in text_features.items():
+                    weight: float = label_weights.get(bucket, 0.0)
+                    label_weights[bucket] = weight - rate * (
+                        error * value + l2 * weight
+                    )
+
+    for label in LABELS:
+        weights[label] = {
+            bucket: round(weight, 6)
+            for bucket, weight in weights[label].items()
+            if abs(weight) >= 1e-4
+        }
+    return LinearClassifier(
+        version=version,
+        dim=dim,
+        weights=weights,
+        bias=bias,
+        meta={"samples": len(samples), "epochs": epochs},
+    )
+
+
+def evaluate(
+    model: LinearClassifier, verdicts: Sequence[Verdict], threshold: float
+) -> Dict[str, float]:
+    """
+    Return the quality of the model on the verdicts at the threshold.
+
+    coverage is the share of the verdicts the model is confident about
+    (the probabilities of all labels are not below threshold or not above
+    1 - threshold), accuracy is the share of them on which the model agrees
+    with LLM on all labels.
+    """
+    confident: int = 0
+    correct: int = 0
+    for verdict in verdicts:
+        probabilities: Dict[str, float] = model.predict(verdict.text)
+        if not is_confident(probabilities, threshold):
+            continue
+        confident += 1
+        correct += int(
+            decide(probabilities) == (verdict.generated_by_llm, verdict.toxic)
+        )
+    return {
+        "threshold": threshold,
+        "coverage": confident / len(verdicts) if verdicts else 0.0,
+        "accuracy": correct / confident if confident else 0.0,
+    }
+
+
+def is_confident(probabilities: Dict[str, float], threshold: float) -> bool:
+    """Return True if the probabilities of all labels are far enough from 0.5."""
+    return all(
+        probability >= threshold or probability <= 1 - threshold
+        for probability in probabilities.values()
+    )
+
+
+def decide(probabilities: Dict[str, float]) -> Tuple[bool, bool]:
+    """Return the verdict (generated_by_llm, toxic) by the probabilities."""
+    return probabilities["generated_by_llm"] >= 0.5, probabilities["toxic"] >= 0.5
@@ -0,0 +1,63 @@
+"""The module responsible for the in-process store of the classifiers."""
+
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+from .base import BaseClassifierStore
+from .linear import LinearClassifier, Verdict
+
+
+class LocalClassifierStore(BaseClassifierStore):
+    """
+    In-process store of the classifiers.
+
+    The verdicts and the models are lost if the process stops and can't be used
+    by the training CLI. Use it for local runs and tests,
+    RedisClassifierStore is preferred in production.
+    """
+
+    def __init__(self, *args, **kwargs):
+        """Init class. The arguments are the same as in BaseClassifierStore."""
+        super().__init__(*args, **kwargs)
+        self.__verdicts: Deque[Verdict] = deque(maxlen=self._max_verdicts)
+        self.__models: Dict[str, LinearClassifier] = dict()
+        self.__active: Optional[str] = None
+
+    async def log_verdict(self, verdict: Verdict) -> None:
+        """Append the verdict to the log."""
+        self.__verdicts.append(verdict)
+
+    async def verdicts(self, limit: int = 0) -> List[Verdict]:
+        """Return up to limit (0 - all) of the newest verdicts."""
+        verdicts: List[Verdict] = list(reversed(self.__verdicts))
+        return verdicts[:limit] if limit else verdicts
+
+    async def count_verdicts(self) -> int:
+        """Return the number of the logged verdicts."""
+        return len(self.__verdicts)
+
+    async def save_model(self, model: LinearClassifier) -> None:
+        """Save the model under its version without activating it."""
+        self.__models.pop(model.version, None)
+        self.__models[model.version] = model
+        for version in list(self.__models)[: -self._keep_versions]:
+            if version != self.__active:
+                del self.__models[version]
+
+    async def load_model(self, version: str) -> Optional[LinearClassifier]:
+        """Return the model of the version or None if there is no such version."""
+        return self.__models.get(version)
+
+    async def versions(self) -> List[str]:
+        """Return the saved versions from the oldest to the newest."""
+        return list(self.__models)
+
+    async def activate(self, version: str) -> None:
+        """Make the version active."""
+        if version not in self.__models:
+            raise KeyError(version)
+        self.__active = version
+
+    async def active_version(self) -> Optional[str]:
+        """Return the active version or None if no model is active."""
+        return self.__active
@@ -0,0 +1,108 @@
+"""The module responsible for the Redis-based store of the classifiers."""
+
+import time
+from typing import Any, List, Optional
+
+import redis.asyncio
+
+from producer_consumer.redis_values import decode_value
+
+from .base import BaseClassifierStore
+from .linear import LinearClassifier, Verdict
+
+
+class RedisClassifierStore(BaseClassifierStore):
+    """
+    Redis-based store of the classifiers.
+
+    The verdicts are kept in the list {key}:verdicts (the newest first),
+    the models in the strings {key}:model:{version} with the versions
+    in the sorted set {key}:versions by the time of saving,
+    and the active version in {key}:active, so the training CLI
+    and all server replicas share them.
+    """
+
+    def __init__(
+        self,
+        redis_client: redis.asyncio.Redis,
+        *args,
+        key: str = "classifier",
+        **kwargs,
+    ):
+        """
+        Init class.
+
+        :param redis_client: Redis client.
+        :param key: The prefix of the keys of the store.
+        The rest arguments are the same as in BaseClassifierStore.
+        """
+        super().__init__(*args, **kwargs)
+        self.__client = redis_client
+        self.__key = key
+
+    def __model_key(self, version: str) -> str:
+        """Return the key of the model of the version."""
+        return f"{self.__key}:model:{version}"
+
+    async def log_verdict(self, verdict: Verdict) -> None:
+        """Append the verdict to the log, dropping the oldest over max_verdicts."""
+        key: str = f"{self.__key}:verdicts"
+        async with self.__client.pipeline(transaction=False) as pipe:
+            pipe.lpush(key, verdict.to_json())
+            pipe.ltrim(key, 0, self._max_verdicts - 1)
+            await pipe.execute()
+
+    async def verdicts(self, limit: int = 0) -> List[Verdict]:
+        """Return up to limit (0 - all) of the newest verdicts."""
+        items: List[Any] = await self.__client.lrange(
+            f"{self.__key}:verdicts", 0, limit - 1 if limit else -1
+        )
+        return [Verdict.from_json(item) for item in items]
+
+    async def count_verdicts(self) -> int:
+        """Return the number of the logged verdicts."""
+        return await self.__client.llen(f"{self.__key}:verdicts")
+
+    async def save_model(self, model: LinearClassifier) -> None:
+        """Save the model and drop the oldest versions over keep_versions."""
+        versions_key: str = f"{self.__key}:versions"
+        async with self.__client.pipeline(transaction=False) as pipe:
+            pipe.set(self.__model_key(model.version), model.to_json())
+            pipe.zadd(versions_key, {model.version: time.time()})
+            await pipe.execute()
+
+        active: Optional[str] = await self.active_version()
+        members: List[Any] = await self.__client.zrange(
+            versions_key, 0, -self._keep_versions - 1
+        )
+        stale: List[str] = [
+            decode_value(version)
+            for version in members
+            if decode_value(version) != active
+        ]
+        if stale:
+            async with self.__client.pipeline(transaction=False) as pipe:
+                pipe.delete(*(self.__model_key(version) for version in stale))
+                pipe.zrem(versions_key, *stale)
+                await pipe.execute()
+
+    async def load_model(self, version: str) -> Optional[LinearClassifier]:
+        """Return the model of the version or None if there is no such version."""
+        data = await self.__client.get(self.__model_key(version))
+        return None if data is None else LinearClassifier.from_json(data)
+
+    async def versions(self) -> List[str]:
+        """Return the saved versions from the oldest to the newest."""
+        members: List[Any] = await self.__client.zrange(f"{self.__key}:versions", 0, -1)
+        return [decode_value(version) for version in members]
+
+    async def activate(self, version: str) -> None:
+        """Make the version active."""
+        if not await self.__client.exists(self.__model_key(version)):
+            raise KeyError(version)
+        await self.__client.set(f"{self.__key}:active", version)
+
+    async def active_version(self) -> Optional[str]:
+        """Return the active version or None if no model is active."""
+        version = await self.__client.get(f"{self.__key}:active")
+        return None if version is None else decode_value(version)
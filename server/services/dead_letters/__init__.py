@@ -0,0 +1 @@
+"""The package responsible for the messages whose moderation failed for good."""
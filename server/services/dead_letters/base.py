@@ -0,0 +1,83 @@
+"""The module responsible for the interface of the dead-letter queues."""
+
+import json
+from abc import ABC, abstractmethod
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Sequence, Union
+
+from schemas.messages import MessageSchema
+
+
+@dataclass
+class DeadLetter(object):
+    """
+    The message whose moderation failed for good.
+
+    error is the class of the exception, attempt is the number
+    of the retries made, failed_at is the unix time of the failure.
+    """
+
+    msg: MessageSchema
+    error: str
+    attempt: int
+    failed_at: float
+    detail: str = ""
+
+    def to_json(self) -> str:
+        """Return the letter in JSON."""
+        return json.dumps(asdict(self), ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, data: Union[str, bytes]) -> "DeadLetter":
+        """Return the letter from JSON."""
+        fields = json.loads(data)
+        fields["msg"] = MessageSchema(**fields["msg"])
+        return cls(**fields)
+
+
+class BaseDeadLetterQueue(ABC):
+    """
+    The basic interface of the dead-letter queue.
+
+    The queue keeps the letters by the class of the exception,
+    so they can be taken back for replay by the error and the age.
+    At most max_len letters of one error are kept, the oldest are dropped.
+    """
+
+    def __init__(self, max_len: int = 100000):
+        """
+        Init class.
+
+        :param max_len: The maximum number of the letters of one error.
+        """
+        self._max_len = max(1, max_len)
+
+    @abstractmethod
+    async def put(self, letter: DeadLetter) -> None:
+        """Put the letter into the queue."""
+        pass
+
+    @abstractmethod
+    async def take(
+        self,
+        limit: int,
+        errors: Optional[Sequence[str]] = None,
+        failed_after: float = 0,
+        failed_before: float = float("inf"),
+    ) -> List[DeadLetter]:
+        """
+        Remove up to limit of the oldest letters from the queue and return them.
+
+        A letter is returned to one caller only.
+
+        :param limit: The maximum number of the letters.
+        :param errors: The classes of the exceptions (None - all).
+        :param failed_after: Take the letters failed after the unix time.
+        :param failed_before: Take the letters failed before the unix time.
+        """
+        pass
+
+    @abstractmethod
+    async def count(self) -> Dict[str, int]:
+        """Return the number of the letters by the class of the exception."""
+        pass
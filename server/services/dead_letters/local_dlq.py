@@ -0,0 +1,57 @@
+"""The module responsible for the in-process dead-letter queue."""
+
+from collections import deque
+from typing import Deque, Dict, List, Optional, Sequence
+
+from .base import BaseDeadLetterQueue, DeadLetter
+
+
+class LocalDeadLetterQueue(BaseDeadLetterQueue):
+    """
+    In-process dead-letter queue.
+
+    The letters are lost if the process stops and can't be replayed
+    from another process. Use it for local runs and tests,
+    RedisDeadLetterQueue is preferred in production.
+    """
+
+    def __init__(self, *args, **kwargs):
+        """Init class. The arguments are the same as in BaseDeadLetterQueue."""
+        super().__init__(*args, **kwargs)
+        self.__letters: Dict[str, Deque[DeadLetter]] = dict()
+
+    async def put(self, letter: DeadLetter) -> None:
+        """Put the letter into the queue."""
+        self.__letters.setdefault(letter.error, deque(maxlen=self._max_len)).append(
+            letter
+        )
+
+    async def take(
+        self,
+        limit: int,
+        errors: Optional[Sequence[str]] = None,
+        failed_after: float = 0,
+        failed_before: float = float("inf"),
+    ) -> List[DeadLetter]:
+        """Remove up to limit of the oldest letters from the queue and return them."""
+        taken: List[DeadLetter] = []
+        for error in list(self.__letters) if errors is None else errors:
+            letters: Optional[Deque[DeadLetter]] = self.__letters.get(error)
+            if not letters or len(taken) >= limit:
+                continue
+            kept: List[DeadLetter] = []
+            for letter in letters:
+                if (
+                    len(taken) < limit
+                    and failed_after <= letter.failed_at <= failed_before
+                ):
+                    taken.append(letter)
+                else:
+                    kept.append(letter)
+            letters.clear()
+            letters.extend(kept)
+        return taken
+
+    async def count(self) -> Dict[str, int]:
+        """Return the number of the letters by the class of the exception."""
+        return {error: len(letters) for error, letters in self.__letters.items()}
@@ -0,0 +1,108 @@
+"""The module responsible for the Redis-based dead-letter queue."""
+
+import uuid
+from typing import Dict, List, Optional, Sequence
+
+import redis.asyncio
+
+from producer_consumer.redis_values import decode_value
+
+from .base import BaseDeadLetterQueue, DeadLetter
+
+# Atomically take up to ARGV[3] members with the score between ARGV[1] and ARGV[2]
+# so that two replays never push the same letter twice.
+POP_RANGE_SCRIPT = """
+local items = redis.call(
+    'ZRANGEBYSCORE', KEYS[1], ARGV[1], ARGV[2], 'LIMIT', 0, ARGV[3]
+)
+if #items > 0 then
+    redis.call('ZREM', KEYS[1], unpack(items))
+end
+return items
+"""
+
+
+class RedisDeadLetterQueue(BaseDeadLetterQueue):
+    """
+    Redis-based dead-letter queue.
+
+    The letters of every error are stored in a sorted set with the time
+    of the failure as the score ({key}:{error}), and the errors are stored
+    in the set {key}:errors, so the letters survive restarts
+    and can be replayed from any process.
+    """
+
+    def __init__(
+        self,
+        redis_client: redis.asyncio.Redis,
+        *args,
+        key: str = "dead_letters",
+        **kwargs,
+    ):
+        """
+        Init class.
+
+        :param redis_client: Redis client.
+        :param key: The prefix of the keys of the queue.
+        The rest arguments are the same as in BaseDeadLetterQueue.
+        """
+        super().__init__(*args, **kwargs)
+        self.__client = redis_client
+        self.__key = key
+        self.__pop_range = self.__client.register_script(POP_RANGE_SCRIPT)
+
+    def __letters_key(self, error: str) -> str:
+        """Return the key of the letters of the error."""
+        return f"{self.__key}:{error}"
+
+    async def __errors(self) -> List[str]:
+        """Return the errors that have letters."""
+        return sorted(
+            decode_value(error)
+            for error in await self.__client.smembers(f"{self.__key}:errors")
+        )
+
+    async def put(self, letter: DeadLetter) -> None:
+        """Put the letter into the queue, dropping the oldest letters over max_len."""
+        key: str = self.__letters_key(letter.error)
+        # the unique prefix keeps equal letters from merging into one member
+        member: str = f"{uuid.uuid4().hex}:{letter.to_json()}"
+        async with self.__client.pipeline(transaction=False) as pipe:
+            pipe.zadd(key, {member: letter.failed_at})
+            pipe.zremrangebyrank(key, 0, -self._max_len - 1)
+            pipe.sadd(f"{self.__key}:errors", letter.error)
+            await pipe.execute()
+
+    async def take(
+        self,
+        limit: int,
+        errors: Optional[Sequence[str]] = None,
+        failed_after: float = 0,
+        failed_before: float = float("inf"),
+    ) -> List[DeadLetter]:
+        """Remove up to limit of the oldest letters from the queue and return them."""
+        taken: List[DeadLetter] = []
+        for error in await self.__errors() if errors is None else errors:
+            if len(taken) >= limit:
+                break
+            members: List[bytes] = await self.__pop_range(
+                keys=[self.__letters_key(error)],
+                args=[
+                    failed_after,
+                    "+inf" if failed_before == float("inf") else failed_before,
+                    limit - len(taken),
+                ],
+            )
+            taken.extend(
+                DeadLetter.from_json(member.split(b":", 1)[1]) for member in members
+            )
+        return taken
+
+    async def count(self) -> Dict[str, int]:
+        """Return the number of the letters by the class of the exception."""
+        errors: List[str] = await self.__errors()
+        async with self.__client.pipeline(transaction=False) as pipe:
+            for error in errors:
+                pipe.zcard(self.__letters_key(error))
+            counts: List[int] = await pipe.execute()
+        return dict(zip(errors, counts))
@@ -0,0 +1,139 @@
+"""The module responsible for replaying the dead letters into the moderation queue."""
+
+import asyncio
+import time
+from collections import Counter
+from dataclasses import replace
+from logging import getLogger
+from typing import Awaitable, Callable, List, Optional, Sequence
+
+from metrics.registry import REGISTRY
+from producer_consumer.messages.base import BaseMessageProducer
+from schemas.messages import MessageSchema
+
+from .base import BaseDeadLetterQueue, DeadLetter
+
+logger = getLogger("main.services.dead_letters.replay")
+
+DEAD_LETTERS_REPLAYED = REGISTRY.counter(
+    "dead_letters_replayed_total",
+    "Dead letters put back into the moderation queue by the class of the exception.",
+    ("error",),
+)
+
+
+class DeadLetterReplayer(object):
+    """
+    Replayer of the dead letters.
+
+    The letters are put back into the moderation queue at most rate messages
+    per second, and while the queue holds max_backlog messages or more
+    the replay waits, so the recovery after an outage of LLM
+    does not cause a new storm of 429. The replayed messages get their retries
+    back (attempt is reset).
+    """
+
+    def __init__(
+        self,
+        dead_letters: BaseDeadLetterQueue,
+        msg_producer: BaseMessageProducer,
+        rate: float = 1,
+        batch_size: int = 10,
+        backlog: Optional[Callable[[], Awaitable[int]]] = None,
+        max_backlog: int = 0,
+        poll_interval: float = 1,
+    ):
+        """
+        Init class.
+
+        :param dead_letters: The dead-letter queue.
+        :param msg_producer: Producer of the moderation queue.
+        :param rate: The maximum number of messages per second (0 - no limit).
+        :param batch_size: The maximum number of messages put at once.
+        :param backlog: Coroutine function returning the depth
+        of the moderation queue.
+        :param max_backlog: The depth of the queue at which the replay waits
+        (0 - the depth is not checked).
+        :param poll_interval: How often to check the depth of the queue
+        while waiting in seconds.
+        """
+        self.__dead_letters = dead_letters
+        self.__msg_producer = msg_producer
+        self.__rate = rate
+        # a slow replay puts the messages one by one instead of bursts
+        self.__batch_size = max(
+            1, min(batch_size, int(rate)) if rate > 0 else batch_size
+        )
+        self.__backlog = backlog
+        self.__max_backlog = max_backlog
+        self.__poll_interval = poll_interval
+        self.replayed: Counter[str] = Counter()
+
+    async def __wait_for_backlog(self) -> None:
+        """Wait until the depth of the moderation queue is below max_backlog."""
+        if self.__backlog is None or self.__max_backlog <= 0:
+            return
+        while (depth := await self.__backlog()) >= self.__max_backlog:
+            logger.debug("Moderation queue holds %s messages, wait.", depth)
+            await asyncio.sleep(self.__poll_interval)
+
+    @staticmethod
+    def __revive(letter: DeadLetter, drop_deadline: bool) -> MessageSchema:
+        """Return the message of the letter ready for moderation."""
+        if drop_deadline:
+            return replace(letter.msg, attempt=0, deadline=0.0)
+        return replace(letter.msg, attempt=0)
+
+    async def replay(
+        self,
+        errors: Optional[Sequence[str]] = None,
+        min_age: float = 0,
+        max_age: float = 0,
+        limit: int = 0,
+        drop_deadline: bool = False,
+    ) -> int:
+        """
+        Put the dead letters back into the moderation queue.
+
+        :param errors: The classes of the exceptions to replay (None - all).
+        :param min_age: Replay the letters failed at least min_age seconds ago.
+        :param max_age: Replay the letters failed at most max_age seconds ago
+        (0 - any age).
+        :param limit: The maximum number of the letters (0 - all).
+        :param drop_deadline: Moderate the messages even after their deadline.
+        :return: The number of the replayed letters.
+        """
+        now: float = time.time()
+        failed_after: float = now - max_age if max_age else 0
+        failed_before: float = now - min_age
+        total: int = 0
+        while not limit or total < limit:
+            await self.__wait_for_backlog()
+            count: int = (
+                min(self.__batch_size, limit - total) if limit else self.__batch_size
+            )
+            letters: List[DeadLetter] = await self.__dead_letters.take(
+                count, errors, failed_after, failed_before
+            )
+            if not letters:
+                break
+            start: float = time.monotonic()
+            try:
+                await self.__msg_producer.upload_many(
+                    [self.__revive(letter, drop_deadline) for letter in letters]
+                )
+            except Exception:
+                # the letters are not lost if the queue is unavailable
+                for letter in letters:
+                    await self.__dead_letters.put(letter)
+                raise
+            for letter in letters:
+                self.replayed[letter.error] += 1
+                DEAD_LETTERS_REPLAYED.inc(letter.error)
+            total += len(letters)
+            logger.info("Replayed %s dead letters.", total)
+            if self.__rate > 0:
+                await asyncio.sleep(
+                    max(0.0, len(letters) / self.__rate - (time.monotonic() - start))
+                )
+        return total
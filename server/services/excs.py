@@ -85,6 +85,25 @@ class TooManyRequests(APIException):
         super().__init__(service_name, status_code, msg, json_str)
 
 
+class CircuitOpen(APIException):
+    """The exception is for requests not made because the circuit is open."""
+
+    def __init__(self, service_name: str, retry_after: float):
+        """
+        Init class.
+
+        :param service_name: Name of API service.
+        :param retry_after: The time in seconds after which the circuit
+        can let requests through.
+        """
+        super().__init__(service_name, 503, msg="Circuit is open.")
+        self.retry_after = retry_after
+
+    def __str__(self) -> str:
+        """Return str of exception."""
+        return f"Circuit of {self.service_name} is open for {self.retry_after:.1f} s."
+
+
 class PromptError(Exception):
     """The exception is for errors related to incorrect prompt logic."""
 
@@ -159,3 +178,19 @@ class IncorrectFormatError(PromptError):
                 (res_str, f"Expected:\n{self.expected}\nReceived:\n{self.received}")
             )
         return res_str
+
+
+class ModerationSkipped(Exception):
+    """The exception is for messages that are deliberately not moderated."""
+
+    def __init__(self, reason: str):
+        """
+        Init class.
+
+        :param reason: The reason of skipping (e.g. the degradation mode).
+        """
+        self.reason = reason
+
+    def __str__(self) -> str:
+        """Return str of exception."""
+        return f"Moderation is skipped: {self.reason}"
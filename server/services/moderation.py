@@ -1,16 +1,62 @@
 """The module responsible for the general logic of message moderation."""
 
+import asyncio
+import random
+import time
+from dataclasses import replace
 from logging import getLogger
+from typing import Dict, List, Optional
 
+from metrics.registry import REGISTRY
 from producer_consumer.messages.base import BaseMessageConsumer
 from producer_consumer.moderation_results.base import BaseModerationResultProducer
 from schemas.messages import MessageSchema, ModerationResultSchema
 
-from .excs import APIAuthException, APIException, PromptError, TooManyRequests
-from .moderators.base import BaseModerator
+from .dead_letters.base import BaseDeadLetterQueue, DeadLetter
+from .excs import (
+    APIAuthException,
+    APIException,
+    CircuitOpen,
+    ModerationSkipped,
+    PromptError,
+    TooManyRequests,
+)
+from .moderators.base import BaseModerator, ModerationOutcome
+from .schedulers.base import BaseRetryScheduler
 
 logger = getLogger("main.moderation")
 
+MODERATION_ERRORS = REGISTRY.counter(
+    "moderation_errors_total",
+    "Messages failed to be moderated by the class of the exception.",
+    ("exception",),
+)
+MODERATION_RETRIES = REGISTRY.counter(
+    "moderation_retries_total", "Messages handed over to the retry scheduler."
+)
+MODERATION_MESSAGES = REGISTRY.counter(
+    "moderation_messages_total",
+    "Processed messages by outcome: "
+    "uploaded, not_uploaded, skipped, retried or failed.",
+    ("outcome",),
+)
+MODERATION_PARKED = REGISTRY.counter(
+    "moderation_parked_total",
+    "Messages postponed in the retry scheduler while the circuit is open.",
+)
+MODERATION_DEAD_LETTERS = REGISTRY.counter(
+    "moderation_dead_letters_total",
+    "Messages put into the dead-letter queue by the class of the exception.",
+    ("exception",),
+)
+MODERATION_SCHEDULER_RESTARTS = REGISTRY.counter(
+    "moderation_scheduler_restarts_total",
+    "Restarts of the retry scheduler after it failed.",
+)
+MODERATION_BATCH_SECONDS = REGISTRY.histogram(
+    "moderation_batch_seconds", "Time of moderation of a batch of messages."
+)
+
 
 class ModerationManager(object):
     """The class responsible for moderation."""
@@ -20,6 +66,12 @@ class ModerationManager(object):
         msg_consumer: BaseMessageConsumer,
         mod_res_producer: BaseModerationResultProducer,
         moderator: BaseModerator,
+        concurrency: int = 1,
+        retry_scheduler: Optional[BaseRetryScheduler] = None,
+        batch_size: int = 1,
+        batch_timeout: float = 0.5,
+        dead_letters: Optional[BaseDeadLetterQueue] = None,
+        scheduler_restart_delay: float = 1,
     ):
         """
         Init class.
@@ -28,10 +80,305 @@ class ModerationManager(object):
         must have a locking mechanism when the queue is empty.
         :param mod_res_producer: Moderation results producer.
         :param moderator: Moderator object.
+        :param concurrency: The maximum number of requests to moderate messages
+        at the same time.
+        :param retry_scheduler: Scheduler of delayed retries for the messages
+        that failed due to APIAuthException or TooManyRequests.
+        If None, such messages are dropped.
+        :param batch_size: The maximum number of messages moderated in one request.
+        :param batch_timeout: The maximum time to wait for a batch to be filled.
+        :param dead_letters: The queue of the messages whose moderation failed
+        for good (e.g. the retries are exhausted), so they can be replayed later.
+        If None, such messages are dropped.
+        The messages that got CircuitOpen are parked in the retry scheduler
+        until the circuit can let requests through.
+        :param scheduler_restart_delay: The delay in seconds before restarting
+        the retry scheduler if it fails.
         """
         self.__msg_consumer = msg_consumer
         self.__mod_res_producer = mod_res_producer
         self.__moderator = moderator
+        self.__concurrency = max(1, concurrency)
+        self.__retry_scheduler = retry_scheduler
+        self.__batch_size = max(1, batch_size)
+        self.__batch_timeout = batch_timeout
+        self.__dead_letters = dead_letters
+        self.__scheduler_restart_delay = scheduler_restart_delay
+
+        self.__stop_event = asyncio.Event()
+        # the tasks of moderation and the numbers of their messages
+        self.__in_flight: Dict[asyncio.Task, int] = dict()
+        self.__batch: List[MessageSchema] = []
+        self.__batch_timer: Optional[asyncio.TimerHandle] = None
+        self.__scheduler: Optional[asyncio.Task] = None
+        self.__scheduler_restart: Optional[asyncio.TimerHandle] = None
+
+    def stop(self) -> None:
+        """
+        Ask the manager to stop.
+
+        The manager stops taking new messages out of the queue,
+        waits for the messages that are already being moderated and returns from run.
+        If it is called before run, run returns without taking any message.
+        """
+        logger.info("Stop moderation.")
+        self.__stop_event.set()
+
+    def __start_scheduler(self) -> None:
+        """Run the retry scheduler in the background and restart it if it fails."""
+        self.__scheduler_restart = None
+        if self.__retry_scheduler is None or self.__stop_event.is_set():
+            return
+        self.__scheduler = asyncio.create_task(self.__retry_scheduler.run())
+        self.__scheduler.add_done_callback(self.__on_scheduler_done)
+
+    def __on_scheduler_done(self, task: asyncio.Task) -> None:
+        """Log the failure of the retry scheduler and restart it after a delay."""
+        if task.cancelled() or self.__stop_event.is_set():
+            return
+        logger.error(
+            "The retry scheduler stopped, restart in %s seconds.\nexc: %s",
+            self.__scheduler_restart_delay,
+            task.exception(),
+        )
+        MODERATION_SCHEDULER_RESTARTS.inc()
+        self.__scheduler_restart = asyncio.get_running_loop().call_later(
+            self.__scheduler_restart_delay, self.__start_scheduler
+        )
+
+    async def __stop_scheduler(self) -> None:
+        """Stop the retry scheduler."""
+        if self.__scheduler_restart is not None:
+            self.__scheduler_restart.cancel()
+            self.__scheduler_restart = None
+        if self.__scheduler is not None:
+            self.__scheduler.cancel()
+            await asyncio.wait((self.__scheduler,))
+            self.__scheduler = None
+
+    async def __retry(self, msg: MessageSchema) -> bool:
+        """
+        Hand the message over to the retry scheduler.
+
+        :return: True if the retry is scheduled.
+        """
+        if self.__retry_scheduler is None:
+            return False
+        try:
+            scheduled: bool = await self.__retry_scheduler.retry(msg)
+        except Exception as exc:
+            logger.error("Can't schedule retry.\nexc: %s", str(exc))
+            return False
+        if scheduled:
+            MODERATION_RETRIES.inc()
+        return scheduled
+
+    async def __park(self, msg: MessageSchema, exc: CircuitOpen) -> bool:
+        """
+        Postpone the message until the circuit can let requests through.
+
+        The attempt of the message is not spent, and the delays are spread,
+        so the parked messages do not return all at once.
+
+        :return: True if the message is parked.
+        """
+        if self.__retry_scheduler is None:
+            return False
+        delay: float = exc.retry_after * random.uniform(1, 1.5)
+        if msg.deadline and time.time() + delay > msg.deadline:
+            return False
+        try:
+            await self.__retry_scheduler.schedule(msg, delay)
+        except Exception as schedule_exc:
+            logger.error("Can't park message.\nexc: %s", str(schedule_exc))
+            return False
+        MODERATION_PARKED.inc()
+        return True
+
+    async def __bury(self, msg: MessageSchema, exc: Exception) -> None:
+        """Put the message whose moderation failed for good into the dead letters."""
+        if self.__dead_letters is None:
+            return
+        try:
+            await self.__dead_letters.put(
+                DeadLetter(
+                    msg=msg,
+                    error=type(exc).__name__,
+                    attempt=msg.attempt,
+                    failed_at=time.time(),
+                    detail=str(exc)[:1000],
+                )
+            )
+        except Exception as put_exc:
+            logger.error("Can't put message into dead letters.\nexc: %s", put_exc)
+            return
+        MODERATION_DEAD_LETTERS.inc(type(exc).__name__)
+
+    async def __handle(
+        self, msg: MessageSchema, outcome: ModerationOutcome
+    ) -> Optional[ModerationResultSchema]:
+        """
+        Handle the exception of moderation.
+
+        The handled messages are counted as retried if they are handed over
+        to the retry scheduler, and as failed otherwise.
+
+        :return: The result of moderation to upload or None if the exception
+        is handled.
+        """
+        retried: bool = False
+        try:
+            if isinstance(outcome, Exception):
+                MODERATION_ERRORS.inc(type(outcome).__name__)
+                raise outcome
+            moderation_result: ModerationResultSchema = outcome
+        except CircuitOpen as exc:
+            # the service is down, the error is logged once by the circuit breaker
+            retried = await self.__park(msg, exc)
+            if not retried:
+                await self.__bury(msg, exc)
+        except APIAuthException as exc:
+            retried = await self.__retry(msg)
+            if not retried:
+                logger.error("Can't auth on %s.", exc.service_name)
+                await self.__bury(msg, exc)
+        except TooManyRequests as exc:
+            retried = await self.__retry(msg)
+            if not retried:
+                logger.error("Service %s is overloaded.", exc.service_name)
+                await self.__bury(msg, exc)
+        except APIException as exc:
+            logger.error(
+                "Unexpected error working with the %s API.\nexc: %s",
+                exc.service_name,
+                str(exc),
+            )
+            await self.__bury(msg, exc)
+        except PromptError as exc:
+            logger.error("A logical error of the prompt.\nexc: %s", str(exc))
+            await self.__bury(msg, exc)
+        except Exception as exc:
+            logger.error("Unexpected error.\nexc: %s", str(exc))
+            await self.__bury(msg, exc)
+        else:
+            # the result goes back to the chat and the queue of the message
+            return replace(
+                moderation_result, chat_id=msg.chat_id, reply_to=msg.reply_to
+            )
+        MODERATION_MESSAGES.inc("retried" if retried else "failed")
+        return None
+
+    async def __ack(self, msg: MessageSchema) -> None:
+        """Acknowledge that the message is processed."""
+        try:
+            await self.__msg_consumer.ack(msg)
+        except Exception as exc:
+            logger.error("Can't acknowledge message.\nexc: %s", str(exc))
+
+    async def __process(self, msgs: List[MessageSchema]) -> None:
+        """Moderate the messages and upload the results of moderation."""
+        # moderate
+        logger.debug("Moderate %s messages.", len(msgs))
+        outcomes: List[ModerationOutcome]
+        start: float = time.perf_counter()
+        try:
+            if len(msgs) == 1:
+                outcomes = [await self.__moderator.moderate(msgs[0])]
+            else:
+                outcomes = await self.__moderator.moderate_many(msgs)
+        except Exception as exc:
+            outcomes = [exc for _ in msgs]
+        MODERATION_BATCH_SECONDS.observe(time.perf_counter() - start)
+
+        moderated: List[MessageSchema] = []
+        results: List[ModerationResultSchema] = []
+        for msg, outcome in zip(msgs, outcomes):
+            if isinstance(outcome, ModerationSkipped):
+                # the message is not moderated deliberately, no result is sent
+                logger.debug("%s", outcome)
+                MODERATION_MESSAGES.inc("skipped")
+                await self.__ack(msg)
+                continue
+            result: Optional[ModerationResultSchema] = await self.__handle(msg, outcome)
+            if result is None:
+                await self.__ack(msg)
+            else:
+                moderated.append(msg)
+                results.append(result)
+        if not results:
+            return
+
+        # upload
+        logger.debug("Upload %s moderation results.", len(results))
+        try:
+            await self.__mod_res_producer.upload_many(results)
+        except Exception as exc:
+            # the messages are not acknowledged, so they can be redelivered
+            logger.error("Can't upload moderation results.\nexc: %s", str(exc))
+            MODERATION_MESSAGES.inc("not_uploaded", amount=len(results))
+            return
+        MODERATION_MESSAGES.inc("uploaded", amount=len(results))
+        for msg in moderated:
+            await self.__ack(msg)
+
+    def __flush(self, slots: asyncio.Semaphore) -> None:
+        """Start moderation of the accumulated batch of messages."""
+        if self.__batch_timer is not None:
+            self.__batch_timer.cancel()
+            self.__batch_timer = None
+        if not self.__batch:
+            return
+
+        msgs, self.__batch = self.__batch, []
+
+        def release_slots(done: asyncio.Task) -> None:
+            for _ in range(len(msgs)):
+                slots.release()
+
+        task = asyncio.create_task(self.__process(msgs))
+        self.__in_flight[task] = len(msgs)
+        task.add_done_callback(self.__in_flight.pop)
+        task.add_done_callback(release_slots)
+
+    async def __read(self, slots: asyncio.Semaphore) -> None:
+        """
+        Take messages out of the queue and start their moderation.
+
+        A new message is extracted only when there is a free slot,
+        so the number of messages taken out of the queue is bounded.
+        All free slots are filled with one extract_many call.
+        The messages are moderated in batches of batch_size. A batch that is
+        not full is sent anyway after batch_timeout since its first message.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            # reserve all free slots and extract up to that many messages at once
+            await slots.acquire()
+            reserved: int = 1
+            while not slots.locked():
+                await slots.acquire()
+                reserved += 1
+            try:
+                # extract
+                logger.debug("Extract up to %s messages.", reserved)
+                msgs: List[MessageSchema] = await self.__msg_consumer.extract_many(
+                    reserved
+                )
+            except BaseException:
+                for _ in range(reserved):
+                    slots.release()
+                raise
+            for _ in range(reserved - len(msgs)):
+                slots.release()
+
+            for msg in msgs:
+                self.__batch.append(msg)
+                if len(self.__batch) >= self.__batch_size:
+                    self.__flush(slots)
+                elif self.__batch_timer is None:
+                    self.__batch_timer = loop.call_later(
+                        self.__batch_timeout, self.__flush, slots
+                    )
 
     async def run(self):
         """
@@ -39,34 +386,42 @@ class ModerationManager(object):
 
         The function takes messages out of the queue in an infinite loop,
         moderates them, and saves the result of moderation to another queue.
+        Up to concurrency batches of batch_size messages
+        are moderated at the same time.
+        The retry scheduler (if any) runs alongside and puts the delayed
+        messages back into the queue, it is restarted if it fails.
+        After stop is called, the function stops taking new messages,
+        waits for the moderation of the messages already taken and returns.
         :return: None
         """
-        while True:
-            # extract
-            logger.debug("Extract message.")
-            msg: MessageSchema = await self.__msg_consumer.extract()
-
-            # moderate
-            try:
-                logger.debug("Moderate message.")
-                moderation_result: ModerationResultSchema = self.__moderator.moderate(
-                    msg
-                )
-            except APIAuthException as exc:
-                logger.error("Can't auth on %s.", exc.service_name)
-            except TooManyRequests as exc:
-                logger.error("Service %s is overloaded.", exc.service_name)
-            except APIException as exc:
-                logger.error(
-                    "Unexpected error working with the %s API.\nexc: %s",
-                    exc.service_name,
-                    str(exc),
+        if self.__stop_event.is_set():
+            # stop is called before run
+            self.__stop_event.clear()
+            return
+        self.__start_scheduler()
+        slots = asyncio.Semaphore(self.__concurrency * self.__batch_size)
+        reader = asyncio.create_task(self.__read(slots))
+        stop_waiter = asyncio.create_task(self.__stop_event.wait())
+        try:
+            await asyncio.wait(
+                (reader, stop_waiter), return_when=asyncio.FIRST_COMPLETED
+            )
+        finally:
+            reader.cancel()
+            stop_waiter.cancel()
+            await asyncio.wait((reader,))
+            self.__flush(slots)
+            if self.__in_flight:
+                logger.info(
+                    "Wait for %s messages in moderation.",
+                    sum(self.__in_flight.values()),
                 )
-            except PromptError as exc:
-                logger.error("A logical error of the prompt.\nexc: %s", str(exc))
-            except Exception as exc:
-                logger.error("Unexpected error.\nexc: %s", str(exc))
-            else:
-                # upload
-                logger.debug("Upload moderation result.")
-                await self.__mod_res_producer.upload(moderation_result)
+                await asyncio.gather(*self.__in_flight, return_exceptions=True)
+            await self.__stop_scheduler()
+            # the manager can be run again
+            self.__stop_event.clear()
+
+        if not reader.cancelled():
+            exc = reader.exception()
+            if exc is not None:
+                raise exc
@@ -1,14 +1,147 @@
 """The module responsible for the interface of all moderators."""
 
+import asyncio
 from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Union
 
 from schemas.messages import MessageSchema, ModerationResultSchema
 
+# The result of moderation of one message in a batch:
+# the moderation result or the exception that occurred.
+ModerationOutcome = Union[ModerationResultSchema, Exception]
+
+
+@dataclass(slots=True)
+class ScoredModerationResultSchema(ModerationResultSchema):
+    """
+    The moderation result with the confidence of LLM in it (from 0 to 1).
+
+    The confidence is used inside the server only (see CascadeModerator)
+    and is not put into the queue of the results.
+    """
+
+    confidence: float = 0.0
+
 
 class BaseModerator(ABC):
     """The moderator's basic interface."""
 
     @abstractmethod
-    def moderate(self, msg: MessageSchema) -> ModerationResultSchema:
+    async def moderate(self, msg: MessageSchema) -> ModerationResultSchema:
         """Moderate msg."""
         pass
+
+    async def moderate_many(self, msgs: List[MessageSchema]) -> List[ModerationOutcome]:
+        """
+        Moderate several msgs.
+
+        By default the msgs are moderated one by one concurrently.
+        The exceptions are returned in place of results, as in asyncio.gather
+        with return_exceptions=True.
+
+        :param msgs: Messages.
+        :return: Outcomes in the same order as msgs.
+        """
+        outcomes: List[ModerationOutcome] = []
+        for outcome in await asyncio.gather(
+            *(self.moderate(msg) for msg in msgs), return_exceptions=True
+        ):
+            if not isinstance(outcome, (ModerationResultSchema, Exception)):
+                # BaseException (e.g. cancellation) must not be swallowed
+                raise outcome
+            outcomes.append(outcome)
+        return outcomes
+
+
+class BaseModerationStage(BaseModerator):
+    """
+    The basic interface of a moderation stage.
+
+    A stage answers the messages it is confident about itself
+    and escalates the rest to the next moderator, so the stages can be chained
+    in front of an expensive moderator (e.g. LLMModerator).
+    A stage can also absorb a message with an exception (e.g. ModerationSkipped),
+    the exception is raised for it instead of the result.
+    """
+
+    def __init__(self, next_moderator: BaseModerator):
+        """
+        Init class.
+
+        :param next_moderator: The moderator for the escalated messages.
+        """
+        self._next_moderator = next_moderator
+        self.absorbed: int = 0
+        self.escalated: int = 0
+
+    @property
+    def next_moderator(self) -> BaseModerator:
+        """Return the moderator for the escalated messages."""
+        return self._next_moderator
+
+    def stats(self) -> Dict[str, float]:
+        """Return the counters of the stage."""
+        total: int = self.absorbed + self.escalated
+        return {
+            "absorbed": self.absorbed,
+            "escalated": self.escalated,
+            "absorbed_fraction": self.absorbed / total if total else 0.0,
+        }
+
+    @abstractmethod
+    async def lookup(self, msg: MessageSchema) -> Optional[ModerationOutcome]:
+        """Return the confident outcome of moderation or None to escalate the msg."""
+        pass
+
+    async def remember(
+        self, msg: MessageSchema, result: ModerationResultSchema
+    ) -> None:
+        """Handle the result of moderation of the escalated msg."""
+        pass
+
+    async def moderate(self, msg: MessageSchema) -> ModerationResultSchema:
+        """Moderate msg by the stage or by the next moderator."""
+        outcome: Optional[ModerationOutcome] = await self.lookup(msg)
+        if outcome is not None:
+            self.absorbed += 1
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        self.escalated += 1
+        result: ModerationResultSchema = await self._next_moderator.moderate(msg)
+        await self.remember(msg, result)
+        return result
+
+    async def moderate_many(self, msgs: List[MessageSchema]) -> List[ModerationOutcome]:
+        """Moderate msgs by the stage and escalate the rest in one call."""
+        results: List[Optional[ModerationOutcome]] = [
+            await self.lookup(msg) for msg in msgs
+        ]
+        escalated: List[MessageSchema] = [
+            msg for msg, result in zip(msgs, results) if result is None
+        ]
+        self.absorbed += len(msgs) - len(escalated)
+        self.escalated += len(escalated)
+
+        next_outcomes = iter(
+            await self._next_moderator.moderate_many(escalated) if escalated else []
+        )
+        outcomes: List[ModerationOutcome] = []
+        for msg, result in zip(msgs, results):
+            if result is not None:
+                outcomes.append(result)
+                continue
+            outcome: ModerationOutcome = next(next_outcomes)
+            if isinstance(outcome, ModerationResultSchema):
+                await self.remember(msg, outcome)
+            outcomes.append(outcome)
+        return outcomes
+
+
+def iter_stages(moderator: BaseModerator) -> Iterator[BaseModerationStage]:
+    """Iterate over the stages of the chain of moderators."""
+    while isinstance(moderator, BaseModerationStage):
+        yield moderator
+        moderator = moderator.next_moderator
@@ -0,0 +1,100 @@
+"""The module responsible for keeping the chats within their budgets of LLM tokens."""
+
+import zlib
+from collections import Counter
+from logging import getLogger
+from typing import Dict, Optional
+
+from metrics.registry import REGISTRY
+from schemas.budgets import TokenBudgetSchema
+from schemas.messages import MessageSchema, ModerationResultSchema
+from server.services.excs import ModerationSkipped
+from server.services.token_budgets.base import NORMAL_MODE, BaseTokenBudget
+
+from .base import BaseModerationStage, BaseModerator, ModerationOutcome
+
+logger = getLogger("main.services.moderator.budget")
+
+BUDGET_SKIPPED = REGISTRY.counter(
+    "token_budget_skipped_total",
+    "Messages not moderated because of the token budget by degradation mode.",
+    ("mode",),
+)
+
+
+class BudgetModerator(BaseModerationStage):
+    """
+    The moderation stage that degrades the coverage of the chats over budget.
+
+    While the chat is within its budget, all messages are escalated.
+    After the fraction of the budget configured for a mode is spent:
+    sample - only sample_rate of the messages are escalated (chosen by the hash
+    of the message, so a retried message gets the same decision);
+    untrusted - only the messages of the users without enough clean verdicts
+    in the chat (new users and the users without the user id) are escalated;
+    pause - no messages are escalated.
+    The rest of the messages are absorbed with ModerationSkipped.
+    If the budget is unavailable (e.g. Redis is down), the messages are escalated.
+    """
+
+    def __init__(
+        self, next_moderator: BaseModerator, budget: BaseTokenBudget, sample_rate: float
+    ):
+        """
+        Init class.
+
+        :param next_moderator: The moderator for the escalated messages.
+        :param budget: The token budget of the chats.
+        :param sample_rate: The fraction of the messages escalated in sample mode.
+        """
+        super().__init__(next_moderator)
+        self.__budget = budget
+        self.__sample_rate = sample_rate
+        self.skipped: Counter[str] = Counter()
+
+    def stats(self) -> Dict[str, float]:
+        """Return the counters of the stage and the skipped messages by mode."""
+        stats: Dict[str, float] = super().stats()
+        stats.update((f"skipped_{mode}", count) for mode, count in self.skipped.items())
+        return stats
+
+    def __sampled(self, msg: MessageSchema) -> bool:
+        """Return True if the message gets into the sample."""
+        digest: int = zlib.crc32(f"{msg.chat_id}:{msg.id}".encode())
+        return digest < self.__sample_rate * 2**32
+
+    async def __admit(self, msg: MessageSchema, mode: str) -> bool:
+        """Return True if the message is moderated in the mode."""
+        if mode == "sample":
+            return self.__sampled(msg)
+        if mode == "untrusted":
+            return not msg.user_id or not await self.__budget.is_trusted(
+                msg.chat_id, msg.user_id
+            )
+        return False
+
+    async def lookup(self, msg: MessageSchema) -> Optional[ModerationOutcome]:
+        """Return ModerationSkipped if the chat is over budget or None."""
+        try:
+            budget: TokenBudgetSchema = await self.__budget.get(msg.chat_id)
+            mode: str = self.__budget.get_mode(budget)
+            if mode == NORMAL_MODE or await self.__admit(msg, mode):
+                return None
+        except Exception as exc:
+            logger.warning("Can't check the token budget.\nexc: %s", exc)
+            return None
+        self.skipped[mode] += 1
+        BUDGET_SKIPPED.inc(mode)
+        logger.debug("Chat %s is over budget, skip message (%s).", msg.chat_id, mode)
+        return ModerationSkipped(reason=f"chat {msg.chat_id} is in {mode} mode")
+
+    async def remember(
+        self, msg: MessageSchema, result: ModerationResultSchema
+    ) -> None:
+        """Count the verdict for the trust of the user."""
+        if not msg.user_id:
+            return
+        try:
+            await self.__budget.record_verdict(msg.chat_id, msg.user_id, result.toxic)
+        except Exception as exc:
+            logger.warning("Can't record the verdict of the user.\nexc: %s", exc)
@@ -0,0 +1,112 @@
+"""The module responsible for moderation with the cache of verdicts."""
+
+import asyncio
+from logging import getLogger
+from typing import Dict, List, Optional
+
+from schemas.messages import MessageSchema, ModerationResultSchema
+from server.services.normalization import text_key
+from server.services.verdict_caches.base import BaseVerdictCache, Verdict
+
+from .base import BaseModerationStage, BaseModerator, ModerationOutcome
+
+logger = getLogger("main.services.moderator.cached")
+
+
+class CachedModerator(BaseModerationStage):
+    """
+    The moderation stage that reuses the verdicts for equal messages.
+
+    The key of the verdict is the hash of the normalized text of the message.
+    The equal messages that are moderated at the same time are sent
+    to the next moderator only once. Only the verdict is shared: if the first
+    message gets an exception (e.g. ModerationSkipped by the budget of its chat),
+    the equal messages are moderated on their own.
+    """
+
+    def __init__(self, next_moderator: BaseModerator, cache: BaseVerdictCache):
+        """
+        Init class.
+
+        :param next_moderator: The moderator for the messages missing in the cache.
+        :param cache: Verdict cache.
+        """
+        super().__init__(next_moderator)
+        self.__cache = cache
+        self.__pending: Dict[str, asyncio.Future] = dict()
+
+    async def lookup(self, msg: MessageSchema) -> Optional[ModerationResultSchema]:
+        """Return the cached verdict for the msg or None."""
+        verdict: Optional[Verdict] = await self.__cache.get(text_key(msg.text))
+        if verdict is None:
+            return None
+        logger.debug("Verdict is found in the cache.")
+        return verdict.to_result(msg.id)
+
+    async def remember(
+        self, msg: MessageSchema, result: ModerationResultSchema
+    ) -> None:
+        """Save the verdict for the msg."""
+        await self.__cache.set(text_key(msg.text), Verdict.from_result(result))
+
+    async def moderate(self, msg: MessageSchema) -> ModerationResultSchema:
+        """Moderate msg, waiting for the equal msg if it is already moderated."""
+        key: str = text_key(msg.text)
+        pending: Optional[asyncio.Future] = self.__pending.get(key)
+        if pending is not None:
+            try:
+                result: ModerationResultSchema = await asyncio.shield(pending)
+            except Exception:
+                # the outcome of another chat (e.g. its budget) is not shared
+                return await super().moderate(msg)
+            self.absorbed += 1
+            return Verdict.from_result(result).to_result(msg.id)
+
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.__pending[key] = future
+        try:
+            result = await super().moderate(msg)
+        except Exception as exc:
+            future.set_exception(exc)
+            # mark the exception as retrieved if nobody waited for the same msg
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            if not future.done():
+                future.cancel()
+            del self.__pending[key]
+
+    async def moderate_many(self, msgs: List[MessageSchema]) -> List[ModerationOutcome]:
+        """Moderate msgs, sending the equal msgs to the next moderator once."""
+        unique: Dict[str, MessageSchema] = dict()
+        for msg in msgs:
+            unique.setdefault(text_key(msg.text), msg)
+        if len(unique) == len(msgs):
+            return await super().moderate_many(msgs)
+
+        outcomes: Dict[str, ModerationOutcome] = dict(
+            zip(unique, await super().moderate_many(list(unique.values())))
+        )
+        result: List[Optional[ModerationOutcome]] = []
+        # the equal msgs of the msgs that got an exception are moderated on their own
+        retried: List[int] = []
+        for i, msg in enumerate(msgs):
+            key: str = text_key(msg.text)
+            outcome: ModerationOutcome = outcomes[key]
+            if unique[key] is msg:
+                result.append(outcome)
+            elif isinstance(outcome, ModerationResultSchema):
+                self.absorbed += 1
+                result.append(Verdict.from_result(outcome).to_result(msg.id))
+            else:
+                retried.append(i)
+                result.append(None)
+        if retried:
+            for i, outcome in zip(
+                retried, await super().moderate_many([msgs[i] for i in retried])
+            ):
+                result[i] = outcome
+        return [outcome for outcome in result if outcome is not None]
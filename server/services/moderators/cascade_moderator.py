@@ -0,0 +1,161 @@
+"""The module responsible for moderating by a lite LLM model before the full one."""
+
+from collections import Counter
+from logging import getLogger
+from typing import Dict, List, Optional
+
+from metrics.registry import REGISTRY
+from schemas.messages import MessageSchema, ModerationResultSchema
+from server.config.app_config import CascadeConfig
+from server.services.excs import (
+    APIAuthException,
+    CircuitOpen,
+    ModerationSkipped,
+    TooManyRequests,
+)
+from server.services.token_budgets.base import BaseTokenBudget
+
+from .base import BaseModerator, ModerationOutcome, ScoredModerationResultSchema
+
+logger = getLogger("main.services.moderator.cascade")
+
+CASCADE_MODERATED = REGISTRY.counter(
+    "cascade_moderated_total",
+    "Messages moderated by the tier of the cascade of LLM models.",
+    ("tier",),
+)
+CASCADE_ESCALATIONS = REGISTRY.counter(
+    "cascade_escalations_total",
+    "Messages escalated to the full model by reason: low_confidence,"
+    " trusted_toxic (a toxic verdict on a trusted user) or error.",
+    ("reason",),
+)
+
+# The outcomes of the lite model that are not its errors: the message is skipped
+# deliberately or is deferred to a retry, so the full model is not asked.
+PASSED_THROUGH = (ModerationSkipped, CircuitOpen, APIAuthException, TooManyRequests)
+
+
+class CascadeModerator(BaseModerator):
+    """
+    The moderator asking a lite LLM model first and the full model if unsure.
+
+    The lite moderator has to return ScoredModerationResultSchema
+    (LLMModerator with with_confidence). Its verdict is used if the confidence
+    is not below the threshold of the chat. Otherwise, as well as on a toxic
+    verdict on a trusted user or an error of the lite model, the message
+    is moderated by the full moderator, whose outcome is final.
+    A skip or a deferral of the message (ModerationSkipped, CircuitOpen,
+    APIAuthException, TooManyRequests) is returned as is.
+    """
+
+    def __init__(
+        self,
+        lite: BaseModerator,
+        full: BaseModerator,
+        config: CascadeConfig,
+        token_budget: Optional[BaseTokenBudget] = None,
+    ):
+        """
+        Init class.
+
+        :param lite: The moderator with the lite model.
+        :param full: The moderator with the full model.
+        :param config: Config for the cascade.
+        :param token_budget: Token budget with the trust of the users.
+        If None, the trust is not checked.
+        """
+        self.__lite = lite
+        self.__full = full
+        self.__config = config
+        self.__token_budget = token_budget if config.trust_check else None
+        self.tiers: Counter[str] = Counter()
+        self.escalations: Counter[str] = Counter()
+
+    def stats(self) -> Dict[str, float]:
+        """Return the messages moderated by every tier and the escalations."""
+        total: int = sum(self.tiers.values())
+        stats: Dict[str, float] = {
+            "lite": self.tiers["lite"],
+            "full": self.tiers["full"],
+            "lite_fraction": self.tiers["lite"] / total if total else 0.0,
+        }
+        stats.update(
+            (f"escalated_{reason}", count) for reason, count in self.escalations.items()
+        )
+        return stats
+
+    async def __is_trusted(self, msg: MessageSchema) -> bool:
+        """Return True if the author of the msg is trusted in the chat."""
+        if self.__token_budget is None or not msg.user_id:
+            return False
+        try:
+            return await self.__token_budget.is_trusted(msg.chat_id, msg.user_id)
+        except Exception as exc:
+            logger.warning("Can't check the trust of the user.\nexc: %s", exc)
+            return False
+
+    async def __escalation(
+        self, msg: MessageSchema, outcome: ModerationOutcome
+    ) -> Optional[str]:
+        """Return the reason to moderate the msg by the full model or None."""
+        if isinstance(outcome, Exception):
+            logger.debug("Lite model failed, escalate message.\nexc: %s", outcome)
+            return "error"
+        confidence: float = (
+            outcome.confidence
+            if isinstance(outcome, ScoredModerationResultSchema)
+            else 0.0
+        )
+        threshold: float = self.__config.chat_thresholds.get(
+            msg.chat_id, self.__config.threshold
+        )
+        if confidence < threshold:
+            return "low_confidence"
+        if outcome.toxic and await self.__is_trusted(msg):
+            return "trusted_toxic"
+        return None
+
+    async def moderate(self, msg: MessageSchema) -> ModerationResultSchema:
+        """Moderate msg by the lite model or by the full one."""
+        outcome: ModerationOutcome = (await self.moderate_many([msg]))[0]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    async def moderate_many(self, msgs: List[MessageSchema]) -> List[ModerationOutcome]:
+        """Moderate msgs by the lite model and escalate the uncertain ones at once."""
+        outcomes: List[ModerationOutcome] = await self.__lite.moderate_many(msgs)
+        escalated: List[int] = []
+        passed: int = 0
+        for i, (msg, outcome) in enumerate(zip(msgs, outcomes)):
+            if isinstance(outcome, PASSED_THROUGH):
+                passed += 1
+                continue
+            reason: Optional[str] = await self.__escalation(msg, outcome)
+            if reason is None:
+                assert isinstance(outcome, ModerationResultSchema)
+                # the confidence is not put into the queue of the results
+                outcomes[i] = ModerationResultSchema(
+                    msg_id=outcome.msg_id,
+                    generated_by_llm=outcome.generated_by_llm,
+                    toxic=outcome.toxic,
+                )
+                continue
+            escalated.append(i)
+            self.escalations[reason] += 1
+            CASCADE_ESCALATIONS.inc(reason)
+
+        answered: int = len(msgs) - len(escalated) - passed
+        self.tiers["lite"] += answered
+        CASCADE_MODERATED.inc("lite", amount=answered)
+        if not escalated:
+            return outcomes
+        self.tiers["full"] += len(escalated)
+        CASCADE_MODERATED.inc("full", amount=len(escalated))
+        full_outcomes: List[ModerationOutcome] = await self.__full.moderate_many(
+            [msgs[i] for i in escalated]
+        )
+        for i, outcome in zip(escalated, full_outcomes):
+            outcomes[i] = outcome
+        return outcomes
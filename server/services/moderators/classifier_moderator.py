@@ -0,0 +1,163 @@
+"""The module responsible for moderating by the local classifier."""
+
+import time
+import zlib
+from logging import getLogger
+from typing import Dict, Optional
+
+from metrics.registry import REGISTRY
+from schemas.messages import MessageSchema, ModerationResultSchema
+from server.services.classifiers.base import BaseClassifierStore
+from server.services.classifiers.linear import (
+    LinearClassifier,
+    Verdict,
+    decide,
+    is_confident,
+)
+
+from .base import BaseModerationStage, BaseModerator
+
+logger = getLogger("main.services.moderator.classifier")
+
+CLASSIFIER_MODERATED = REGISTRY.counter(
+    "classifier_moderated_total",
+    "Messages seen by the local classifier by outcome: answered, uncertain"
+    " (escalated) or audit (confident, but escalated to check the classifier).",
+    ("outcome",),
+)
+CLASSIFIER_AUDITS = REGISTRY.counter(
+    "classifier_audits_total",
+    "Audited verdicts of the local classifier by the agreement with LLM.",
+    ("outcome",),
+)
+CLASSIFIER_MODEL = REGISTRY.gauge(
+    "classifier_model_info", "1 for the loaded version of the classifier.", ("version",)
+)
+
+
+class ClassifierModerator(BaseModerationStage):
+    """
+    The moderation stage answering by the local classifier.
+
+    The messages on which the classifier is confident (the probabilities
+    of all labels are not below threshold or not above 1 - threshold)
+    are answered locally, the rest are escalated, and the verdicts
+    of the escalated messages are logged in the store as the training data.
+    audit_rate of the confident messages (chosen by the hash of the message)
+    are escalated too, to measure the agreement with LLM and to keep
+    the training data unbiased.
+    The active version of the model is checked in the store every
+    reload_interval seconds, so a new model is rolled out without a restart.
+    Until a model is activated, all messages are escalated.
+    """
+
+    def __init__(
+        self,
+        next_moderator: BaseModerator,
+        store: BaseClassifierStore,
+        threshold: float = 0.95,
+        audit_rate: float = 0.05,
+        reload_interval: float = 60,
+        log_verdicts: bool = True,
+    ):
+        """
+        Init class.
+
+        :param next_moderator: The moderator for the escalated messages.
+        :param store: The store of the models and the verdicts.
+        :param threshold: The probability from which the classifier is confident.
+        :param audit_rate: The share of the confident messages escalated anyway.
+        :param reload_interval: Seconds between the checks of the active version.
+        :param log_verdicts: Log the verdicts of the escalated messages.
+        """
+        super().__init__(next_moderator)
+        self.__store = store
+        self.__threshold = threshold
+        self.__audit_rate = audit_rate
+        self.__reload_interval = reload_interval
+        self.__log_verdicts = log_verdicts
+        self.__model: Optional[LinearClassifier] = None
+        self.__checked_at: float = float("-inf")
+
+    @property
+    def version(self) -> Optional[str]:
+        """Return the version of the loaded model or None."""
+        return None if self.__model is None else self.__model.version
+
+    async def reload(self, force: bool = False) -> None:
+        """Load the active model if it has changed since the last check."""
+        now: float = time.monotonic()
+        if not force and now - self.__checked_at < self.__reload_interval:
+            return
+        self.__checked_at = now
+        try:
+            version: Optional[str] = await self.__store.active_version()
+            if version is None or version == self.version:
+                return
+            model: Optional[LinearClassifier] = await self.__store.load_model(version)
+        except Exception as exc:
+            logger.warning("Can't reload the classifier.\nexc: %s", exc)
+            return
+        if model is None:
+            logger.warning(
+                "The active version %s of the classifier is absent.", version
+            )
+            return
+        if self.__model is not None:
+            CLASSIFIER_MODEL.set(0, self.__model.version)
+        self.__model = model
+        CLASSIFIER_MODEL.set(1, model.version)
+        logger.info("The classifier %s is loaded.", model.version)
+
+    def __audited(self, msg: MessageSchema) -> bool:
+        """Return True if the confident verdict on the message is checked by LLM."""
+        digest: int = zlib.crc32(f"audit:{msg.chat_id}:{msg.id}".encode())
+        return digest < self.__audit_rate * 2**32
+
+    def __predict(self, msg: MessageSchema) -> Optional[Dict[str, float]]:
+        """Return the confident probabilities of the labels or None."""
+        if self.__model is None:
+            return None
+        probabilities: Dict[str, float] = self.__model.predict(msg.text)
+        if not is_confident(probabilities, self.__threshold):
+            return None
+        return probabilities
+
+    async def lookup(self, msg: MessageSchema) -> Optional[ModerationResultSchema]:
+        """Return the verdict of the classifier if it is confident or None."""
+        await self.reload()
+        if self.__model is None:
+            return None
+        probabilities: Optional[Dict[str, float]] = self.__predict(msg)
+        if probabilities is None:
+            CLASSIFIER_MODERATED.inc("uncertain")
+            return None
+        if self.__audited(msg):
+            CLASSIFIER_MODERATED.inc("audit")
+            return None
+        CLASSIFIER_MODERATED.inc("answered")
+        generated_by_llm, toxic = decide(probabilities)
+        return ModerationResultSchema(
+            msg_id=msg.id, generated_by_llm=generated_by_llm, toxic=toxic
+        )
+
+    async def remember(
+        self, msg: MessageSchema, result: ModerationResultSchema
+    ) -> None:
+        """Compare the audited verdict with LLM and log the verdict."""
+        if self.__audited(msg):
+            probabilities: Optional[Dict[str, float]] = self.__predict(msg)
+            if probabilities is not None:
+                agree: bool = decide(probabilities) == (
+                    result.generated_by_llm,
+                    result.toxic,
+                )
+                CLASSIFIER_AUDITS.inc("agree" if agree else "disagree")
+        if not self.__log_verdicts:
+            return
+        try:
+            await self.__store.log_verdict(
+                Verdict(msg.text, result.generated_by_llm, result.toxic)
+            )
+        except Exception as exc:
+            logger.warning("Can't log the verdict.\nexc: %s", exc)
@@ -0,0 +1,62 @@
+"""The module responsible for moderating by another moderator while LLM is down."""
+
+from logging import getLogger
+from typing import List
+
+from metrics.registry import REGISTRY
+from schemas.messages import MessageSchema, ModerationResultSchema
+from server.services.excs import CircuitOpen
+
+from .base import BaseModerator, ModerationOutcome
+
+logger = getLogger("main.services.moderator.fallback")
+
+FALLBACK_MESSAGES = REGISTRY.counter(
+    "fallback_moderated_total",
+    "Messages moderated by the fallback moderator while the circuit is open.",
+)
+
+
+class FallbackModerator(BaseModerator):
+    """
+    The moderator switching to the fallback moderator while the circuit is open.
+
+    The messages are moderated by the main moderator, and the messages
+    that got CircuitOpen are moderated by the fallback one
+    (e.g. LLMModerator with a lighter model).
+    """
+
+    def __init__(self, moderator: BaseModerator, fallback: BaseModerator):
+        """
+        Init class.
+
+        :param moderator: The main moderator.
+        :param fallback: The moderator used while the circuit is open.
+        """
+        self.__moderator = moderator
+        self.__fallback = fallback
+
+    async def moderate(self, msg: MessageSchema) -> ModerationResultSchema:
+        """Moderate msg by the main moderator or by the fallback one."""
+        try:
+            return await self.__moderator.moderate(msg)
+        except CircuitOpen as exc:
+            logger.debug("%s Moderate by the fallback.", exc)
+        FALLBACK_MESSAGES.inc()
+        return await self.__fallback.moderate(msg)
+
+    async def moderate_many(self, msgs: List[MessageSchema]) -> List[ModerationOutcome]:
+        """Moderate msgs by the main moderator and the rest by the fallback one."""
+        outcomes: List[ModerationOutcome] = await self.__moderator.moderate_many(msgs)
+        rejected: List[int] = [
+            i for i, outcome in enumerate(outcomes) if isinstance(outcome, CircuitOpen)
+        ]
+        if not rejected:
+            return outcomes
+        FALLBACK_MESSAGES.inc(amount=len(rejected))
+        fallback_outcomes: List[ModerationOutcome] = (
+            await self.__fallback.moderate_many([msgs[i] for i in rejected])
+        )
+        for i, outcome in zip(rejected, fallback_outcomes):
+            outcomes[i] = outcome
+        return outcomes
@@ -0,0 +1,65 @@
+"""The module responsible for skipping the stale messages."""
+
+import time
+from logging import getLogger
+from typing import Optional
+
+from metrics.registry import REGISTRY
+from schemas.messages import MessageSchema
+from server.services.excs import ModerationSkipped
+
+from .base import BaseModerationStage, BaseModerator, ModerationOutcome
+
+logger = getLogger("main.services.moderator.freshness")
+
+MESSAGE_AGE_SECONDS = REGISTRY.histogram(
+    "message_age_seconds",
+    "Time from putting the message into the queue to its moderation.",
+    buckets=(0.1, 0.5, 1, 5, 10, 30, 60, 300, 900, 3600, 4 * 3600),
+)
+STALE_MESSAGES = REGISTRY.counter(
+    "stale_messages_skipped_total", "Messages skipped after their deadline."
+)
+
+
+class FreshnessModerator(BaseModerationStage):
+    """
+    The moderation stage that skips the messages after their deadline.
+
+    The result of moderation of a stale message is useless (the reaction
+    would come too late), so the message is absorbed with ModerationSkipped
+    instead of being sent to the next moderator. The messages without
+    a deadline get the deadline max_age seconds after they are put
+    into the queue (if max_age and the enqueue time are set).
+    """
+
+    def __init__(self, next_moderator: BaseModerator, max_age: float = 0):
+        """
+        Init class.
+
+        :param next_moderator: The moderator for the fresh messages.
+        :param max_age: The deadline in seconds after putting into the queue
+        of the messages without their own deadline. 0 - no deadline.
+        """
+        super().__init__(next_moderator)
+        self.__max_age = max_age
+
+    def __deadline(self, msg: MessageSchema) -> float:
+        """Return the deadline of the message or 0 if there is no deadline."""
+        if msg.deadline:
+            return msg.deadline
+        if self.__max_age and msg.enqueued_at:
+            return msg.enqueued_at + self.__max_age
+        return 0.0
+
+    async def lookup(self, msg: MessageSchema) -> Optional[ModerationOutcome]:
+        """Return ModerationSkipped if the message is stale or None."""
+        now: float = time.time()
+        if msg.enqueued_at:
+            MESSAGE_AGE_SECONDS.observe(max(0.0, now - msg.enqueued_at))
+        deadline: float = self.__deadline(msg)
+        if not deadline or now <= deadline:
+            return None
+        STALE_MESSAGES.inc()
+        logger.debug("Message is %.0f s past its deadline.", now - deadline)
+        return ModerationSkipped(reason="the message is past its deadline")
@@ -1,29 +1,53 @@
 """The module responsible for moderation through LLM."""
 
 import json
-import random
 import time
 from dataclasses import asdict
 from json.decoder import JSONDecodeError
 from logging import getLogger
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 
+from metrics.registry import REGISTRY
 from schemas.messages import MessageSchema, ModerationResultSchema
 from server.config.app_config import ModerationConfig
-from server.services.api.llm.base import BaseLLMAPI
+from server.services.api.llm.base import BaseLLMAPI, LLMResponse
 from server.services.excs import (
     APIAuthException,
+    APIException,
     IncorrectEncodingError,
     IncorrectFormatError,
     PromptError,
     TooManyRequests,
 )
 from server.services.prompts import PROMPTS, Prompt
+from server.services.rate_limiters.base import BaseRateLimiter, estimate_tokens
+from server.services.token_budgets.base import BaseTokenBudget, split_tokens
 
-from .base import BaseModerator
+from .base import BaseModerator, ModerationOutcome, ScoredModerationResultSchema
 
 logger = getLogger("main.services.moderator")
 
+LLM_MODERATOR_EVENTS = REGISTRY.counter(
+    "llm_moderator_events_total",
+    "Re-authentications, 429 backoffs and fallbacks of batches to single requests.",
+    ("event",),
+)
+RATE_LIMIT_WAIT_SECONDS = REGISTRY.histogram(
+    "llm_rate_limit_wait_seconds", "Time waiting for the rate limiter of LLM."
+)
+
+
+def scored(result: ModerationResultSchema, confidence: Any) -> ModerationResultSchema:
+    """Return the result with the confidence from LLM (0 if it is not a number)."""
+    if isinstance(confidence, bool) or not isinstance(confidence, (int, float)):
+        confidence = 0.0
+    return ScoredModerationResultSchema(
+        msg_id=result.msg_id,
+        generated_by_llm=result.generated_by_llm,
+        toxic=result.toxic,
+        confidence=min(1.0, max(0.0, float(confidence))),
+    )
+
 
 class LLMModerator(BaseModerator):
     """The class responsible for moderation of messages using LLM."""
@@ -31,25 +55,44 @@ class LLMModerator(BaseModerator):
     prompt_wint_user_msg: str = (
         "=== Начало сообщения для анализа ===\n{user_msg}\n=== Конец сообщения ==="
     )
+    prompt_with_user_msgs: str = (
+        "=== Начало сообщений для анализа ===\n{user_msgs}\n=== Конец сообщений ==="
+    )
 
-    def __init__(self, llm_api: BaseLLMAPI, config: ModerationConfig):
+    def __init__(
+        self,
+        llm_api: BaseLLMAPI,
+        config: ModerationConfig,
+        rate_limiter: Optional[BaseRateLimiter] = None,
+        token_budget: Optional[BaseTokenBudget] = None,
+        with_confidence: bool = False,
+    ):
         """
         Init class.
 
         :param llm_api: BaseLLMAPI object.
         :param config: Config for moderation.
+        :param rate_limiter: Rate limiter of requests to LLM.
+        If None, the requests are not limited.
+        :param token_budget: Token budget charged with the tokens spent
+        on the messages of every chat. If None, the tokens are not counted.
+        :param with_confidence: Ask LLM for the confidence in the verdict
+        and return ScoredModerationResultSchema.
         """
         self.__llm_api = llm_api
-        self.__delay_limits = config.random_delay_limits
-        self.__default_delay: float = self.__update_default_delay()
-        self.__delay = self.__default_delay
-        self.__max_num_retries = config.max_num_retries
-        self.__delay_dominator = config.delay_denominator
-
-        self.__retries: int = 0
-
-    def __update_default_delay(self) -> float:
-        return random.uniform(*self.__delay_limits)
+        self.__rate_limiter = rate_limiter
+        self.__token_budget = token_budget
+        self.__with_confidence = with_confidence
+        self.__prompt: Prompt = PROMPTS[
+            "confidence_moderation_prompt" if with_confidence else "moderation_prompt"
+        ]
+        self.__batch_prompt: Prompt = PROMPTS[
+            (
+                "batch_confidence_moderation_prompt"
+                if with_confidence
+                else "batch_moderation_prompt"
+            )
+        ]
 
     @classmethod
     def __process_llm_answer(
@@ -70,7 +113,9 @@ class LLMModerator(BaseModerator):
                 msg="LLM returned an answer that cannot be decoded from JSON.",
             )
 
-    def __moderation_process(self, message: MessageSchema) -> ModerationResultSchema:
+    async def __moderation_process(
+        self, message: MessageSchema
+    ) -> ModerationResultSchema:
         """
         Moderate msg.
 
@@ -85,23 +130,27 @@ class LLMModerator(BaseModerator):
         logger.debug("Start moderating message.")
 
         prompts: List[Prompt] = [
-            PROMPTS["moderation_prompt"],
+            self.__prompt,
             Prompt(
                 role="user",
                 text=self.prompt_wint_user_msg.format(user_msg=message.text),
             ),
         ]
 
-        answers: List[Prompt] = self.__llm_api.send_prompts(prompts)
+        response: LLMResponse = await self.__send_prompts(prompts, [message])
+        answers: List[Prompt] = response.answers
 
         if len(answers) != 1:
             raise PromptError(msg="LLM returned more than 1 answer.", prompts=prompts)
         processed_answer: Dict[str, Any] = self.__process_llm_answer(
             prompts, answers[0], message
         )
+        confidence: Any = (
+            processed_answer.pop("confidence", None) if self.__with_confidence else None
+        )
 
         try:
-            return ModerationResultSchema(**processed_answer)
+            result = ModerationResultSchema(**processed_answer)
         except TypeError:
             raise IncorrectFormatError(
                 prompts=prompts,
@@ -109,75 +158,228 @@ class LLMModerator(BaseModerator):
                 expected=str(asdict(ModerationResultSchema("1", True, True))),
                 received=str(processed_answer),
             )
+        return scored(result, confidence) if self.__with_confidence else result
+
+    @classmethod
+    def __process_batch_answer(
+        cls,
+        prompts: List[Prompt],
+        answer: Prompt,
+        messages: List[MessageSchema],
+        with_confidence: bool = False,
+    ) -> Dict[int, ModerationResultSchema]:
+        """
+        Decode the answer from LLM on a batch of messages.
+
+        :return: Moderation results by positions of the messages in the batch.
+        The messages that LLM skipped or answered in the wrong format are absent.
+        :raise IncorrectEncodingError: If the answer cannot be decoded from JSON.
+        :raise IncorrectFormatError: If the answer is not a JSON array.
+        """
+        logger.debug("Decode llm answer on batch.")
+        answer_json_str: str = answer.text.strip("`").strip()
+        answer_json_str = answer_json_str.removeprefix("json").strip()
+
+        try:
+            processed_answer: Any = json.loads(answer_json_str)
+        except JSONDecodeError:
+            raise IncorrectEncodingError(
+                prompts=prompts,
+                answer=answer,
+                msg="LLM returned an answer that cannot be decoded from JSON.",
+            )
+        if not isinstance(processed_answer, list):
+            raise IncorrectFormatError(
+                prompts=prompts,
+                msg="LLM returned an answer on batch that is not a JSON array",
+                received=str(processed_answer),
+            )
+
+        results: Dict[int, ModerationResultSchema] = dict()
+        for item in processed_answer:
+            if (
+                isinstance(item, dict)
+                and str(item.get("id")).isdigit()
+                and int(item["id"]) < len(messages)
+                and isinstance(item.get("generated_by_llm"), bool)
+                and isinstance(item.get("toxic"), bool)
+            ):
+                result = ModerationResultSchema(
+                    msg_id=messages[int(item["id"])].id,
+                    generated_by_llm=item["generated_by_llm"],
+                    toxic=item["toxic"],
+                )
+                results[int(item["id"])] = (
+                    scored(result, item.get("confidence"))
+                    if with_confidence
+                    else result
+                )
+        return results
+
+    async def __batch_moderation_process(
+        self, messages: List[MessageSchema]
+    ) -> Dict[int, ModerationResultSchema]:
+        """
+        Moderate several msgs with one request to LLM.
+
+        :param messages: User messages.
+        :return: Moderation results by positions of the messages in the batch.
+        :raise PromptError: If LLM returned more than 1 answer
+        or an answer that cannot be decoded.
+        """
+        logger.debug("Start moderating batch of %s messages.", len(messages))
+
+        user_msgs: str = json.dumps(
+            # the messages of different chats can have equal ids,
+            # so the messages are identified by the position in the batch
+            [{"id": i, "text": message.text} for i, message in enumerate(messages)],
+            ensure_ascii=False,
+            indent=1,
+        )
+        prompts: List[Prompt] = [
+            self.__batch_prompt,
+            Prompt(
+                role="user",
+                text=self.prompt_with_user_msgs.format(user_msgs=user_msgs),
+            ),
+        ]
+
+        response: LLMResponse = await self.__send_prompts(prompts, messages)
+        if len(response.answers) != 1:
+            raise PromptError(msg="LLM returned more than 1 answer.", prompts=prompts)
+        return self.__process_batch_answer(
+            prompts, response.answers[0], messages, self.__with_confidence
+        )
 
-    def __sleep(self, retry_backoff: bool = False) -> None:
+    async def __charge(self, messages: List[MessageSchema], tokens: int) -> None:
+        """Charge the budgets of the chats of the messages with the tokens."""
+        if self.__token_budget is None:
+            return
+        try:
+            for chat_id, chat_tokens in split_tokens(tokens, messages).items():
+                await self.__token_budget.spend(chat_id, chat_tokens)
+        except Exception as exc:
+            logger.warning("Can't charge the token budget.\nexc: %s", exc)
+
+    async def __send_prompts(
+        self, prompts: List[Prompt], messages: List[MessageSchema]
+    ) -> LLMResponse:
         """
-        Make a delay.
+        Send prompts to LLM within the limits of the rate limiter.
 
-        :param retry_backoff: If True, the delay will
-        increase by a factor of self.__delay_dominator.
-        :return: None
+        The tokens of the response are charged to the chats of the messages.
         """
-        self.__retries += 1
-        if retry_backoff:
-            logger.debug("Make delay %s.", str(self.__delay))
-            time.sleep(self.__delay)
-            self.__delay *= self.__delay_dominator
-        else:
-            logger.debug("Make delay %s.", str(self.__default_delay))
-            time.sleep(self.__default_delay)
-
-    def moderate(self, message: MessageSchema) -> ModerationResultSchema:
+        if self.__rate_limiter is None:
+            try:
+                response: LLMResponse = await self.__llm_api.send_prompts(prompts)
+            except TooManyRequests:
+                LLM_MODERATOR_EVENTS.inc("too_many_requests")
+                raise
+            await self.__charge(messages, response.total_tokens)
+            return response
+
+        estimated_tokens: int = estimate_tokens(prompts)
+        start: float = time.perf_counter()
+        await self.__rate_limiter.acquire(estimated_tokens)
+        RATE_LIMIT_WAIT_SECONDS.observe(time.perf_counter() - start)
+        try:
+            response = await self.__llm_api.send_prompts(prompts)
+        except TooManyRequests:
+            LLM_MODERATOR_EVENTS.inc("too_many_requests")
+            await self.__rate_limiter.penalize()
+            raise
+        await self.__rate_limiter.adjust(estimated_tokens, response.total_tokens)
+        await self.__charge(messages, response.total_tokens)
+        return response
+
+    async def moderate(self, message: MessageSchema) -> ModerationResultSchema:
         """
         Moderate msg.
 
-        The function is trying to moderate the message.
-        If APIAuthException and TooManyRequests occur during operation,
-        the function delays and tries to moderate the message again.
-        If an APIAuthException occurs, the function makes a standard delay,
-        tries to authenticate and make the request again.
-        If a TooManyRequests exception occurs, the function makes an exponential
-        delay and repeats the request again. The number of attempts is limited.
-        If other exceptions occur or the attempt limit is exceeded,
-        the exception is thrown further.
+        The function makes one attempt to moderate the message.
+        If an APIAuthException occurs, the function re-authenticates
+        and throws the exception further, so the caller can schedule a retry.
+        A TooManyRequests exception tightens the rate limiter
+        and is thrown further.
+        The moderator keeps no retry state, so it can moderate several messages
+        at the same time.
 
         :param message: User message.
         :return: Result of moderation.
         """
         try:
             logger.debug("Start process moderating the message.")
-            result: ModerationResultSchema = self.__moderation_process(message)
-            self.__sleep()
+            result: ModerationResultSchema = await self.__moderation_process(message)
         except APIAuthException as exc:
             logger.warning(
-                "Authorization error on the %s service." " Trying to auth again...",
+                "Authorization error on the %s service. Trying to auth again...",
                 exc.service_name,
             )
-            if self.__retries >= self.__max_num_retries:
-                raise
-
-            # delay
-            self.__sleep()
-            # re-auth
-            self.__llm_api.auth()
-            # moderate again
-            return self.moderate(message)
+            LLM_MODERATOR_EVENTS.inc("reauth")
+            await self.__llm_api.auth()
+            raise
         except TooManyRequests as exc:
             logger.warning(
-                "There are too many requests to the %s service."
-                " Trying to make a request again...",
+                "There are too many requests to the %s service.", exc.service_name
+            )
+            raise
+
+        return result
+
+    async def moderate_many(
+        self, messages: List[MessageSchema]
+    ) -> List[ModerationOutcome]:
+        """
+        Moderate several msgs with one request to LLM.
+
+        All messages are packed into one prompt, so the system prompt is sent once.
+        If the answer is malformed or some messages are missing in it,
+        these messages are moderated one by one.
+        APIException (including APIAuthException and TooManyRequests)
+        is returned for every message of the batch.
+
+        :param messages: User messages.
+        :return: Outcomes in the same order as messages.
+        """
+        if len(messages) < 2:
+            return await super().moderate_many(messages)
+
+        try:
+            results: Dict[int, ModerationResultSchema] = (
+                await self.__batch_moderation_process(messages)
+            )
+        except APIAuthException as exc:
+            logger.warning(
+                "Authorization error on the %s service. Trying to auth again...",
                 exc.service_name,
             )
-            if self.__retries >= self.__max_num_retries:
-                raise
+            LLM_MODERATOR_EVENTS.inc("reauth")
+            await self.__llm_api.auth()
+            return [exc for _ in messages]
+        except APIException as exc:
+            return [exc for _ in messages]
+        except PromptError as exc:
+            logger.warning(
+                "LLM returned a malformed answer on batch,"
+                " moderate messages one by one.\nexc: %s",
+                str(exc),
+            )
+            LLM_MODERATOR_EVENTS.inc("batch_malformed")
+            results = dict()
 
-            # exponential delay
-            self.__sleep(retry_backoff=True)
-            # moderate again
-            return self.moderate(message)
-        else:
-            return result
-        finally:
-            self.__retries = 0
-            self.__default_delay = self.__update_default_delay()
-            self.__delay = self.__default_delay
+        missing: List[MessageSchema] = [
+            message for i, message in enumerate(messages) if i not in results
+        ]
+        if missing and results:
+            logger.warning(
+                "LLM skipped %s of %s messages in the answer on batch,"
+                " moderate them one by one.",
+                len(missing),
+                len(messages),
+            )
+            LLM_MODERATOR_EVENTS.inc("batch_partial")
+        single_outcomes = iter(await super().moderate_many(missing))
+        return [
+            results[i] if i in results else next(single_outcomes)
+            for i in range(len(messages))
+        ]
@@ -0,0 +1,97 @@
+"""The module responsible for moderation with the near-duplicate index."""
+
+from collections import OrderedDict
+from logging import getLogger
+from typing import List, Optional, Tuple
+
+from schemas.messages import MessageSchema, ModerationResultSchema
+from server.services.near_duplicates.base import BaseNearDuplicateIndex
+from server.services.near_duplicates.simhash import features, simhash
+from server.services.verdict_caches.base import Verdict
+
+from .base import BaseModerationStage, BaseModerator
+
+logger = getLogger("main.services.moderator.near_duplicate")
+
+# The maximum number of the signatures of the escalated msgs waiting for remember.
+MAX_KEPT_SIGNATURES = 10000
+
+
+class NearDuplicateModerator(BaseModerationStage):
+    """
+    The moderation stage that reuses the verdicts for similar messages.
+
+    Spam bots vary their messages with links, numbers, emoji and the order
+    of sentences, so the messages are compared by SimHash signatures
+    of their words. Short messages are always escalated: they have too few
+    features for a reliable signature. The signature computed in lookup
+    is kept until remember of the escalated message, so it is computed once.
+    """
+
+    def __init__(
+        self,
+        next_moderator: BaseModerator,
+        index: BaseNearDuplicateIndex,
+        min_features: int = 10,
+    ):
+        """
+        Init class.
+
+        :param next_moderator: The moderator for the messages without duplicates.
+        :param index: Index of the signatures of the moderated messages.
+        :param min_features: The minimal number of features of a message.
+        """
+        super().__init__(next_moderator)
+        self.__index = index
+        self.__min_features = min_features
+        # id of the escalated msg -> its text and signature
+        self.__signatures: OrderedDict[int, Tuple[str, Optional[int]]] = OrderedDict()
+
+    def __signature(self, msg: MessageSchema) -> Optional[int]:
+        """Return the signature of the msg or None if the msg is too short."""
+        text_features: List[str] = features(msg.text)
+        if len(text_features) < self.__min_features:
+            return None
+        return simhash(text_features)
+
+    def __keep_signature(self, msg: MessageSchema, signature: Optional[int]) -> None:
+        """Keep the signature of the escalated msg for remember."""
+        self.__signatures[id(msg)] = (msg.text, signature)
+        # the msgs that failed in the next moderator are never remembered
+        while len(self.__signatures) > MAX_KEPT_SIGNATURES:
+            self.__signatures.popitem(last=False)
+
+    def __pop_signature(self, msg: MessageSchema) -> Optional[int]:
+        """Return the signature kept in lookup or compute it."""
+        kept: Optional[Tuple[str, Optional[int]]] = self.__signatures.pop(id(msg), None)
+        if kept is not None and kept[0] is msg.text:
+            return kept[1]
+        return self.__signature(msg)
+
+    async def lookup(self, msg: MessageSchema) -> Optional[ModerationResultSchema]:
+        """Return the verdict of a similar message or None."""
+        signature: Optional[int] = self.__signature(msg)
+        if signature is None:
+            return None
+        try:
+            verdict: Optional[Verdict] = await self.__index.find(signature)
+        except Exception as exc:
+            logger.warning("Can't search near duplicates.\nexc: %s", exc)
+            verdict = None
+        if verdict is None:
+            self.__keep_signature(msg, signature)
+            return None
+        logger.debug("Near duplicate is found.")
+        return verdict.to_result(msg.id)
+
+    async def remember(
+        self, msg: MessageSchema, result: ModerationResultSchema
+    ) -> None:
+        """Save the signature of the msg with its verdict."""
+        signature: Optional[int] = self.__pop_signature(msg)
+        if signature is None:
+            return
+        try:
+            await self.__index.add(signature, Verdict.from_result(result))
+        except Exception as exc:
+            logger.warning("Can't save near duplicate.\nexc: %s", exc)
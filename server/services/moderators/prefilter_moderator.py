@@ -0,0 +1,74 @@
+"""The module responsible for the cheap local pre-moderation."""
+
+from collections import Counter
+from logging import getLogger
+from typing import Dict, List, Optional
+
+from schemas.messages import MessageSchema, ModerationResultSchema
+from server.services.prefilters.aho_corasick import AhoCorasick
+from server.services.prefilters.folding import fold_pattern, fold_text
+
+from .base import BaseModerationStage, BaseModerator
+
+logger = getLogger("main.services.moderator.prefilter")
+
+
+class PrefilterModerator(BaseModerationStage):
+    """
+    The moderation stage that answers the obvious messages without LLM.
+
+    The rules are checked in order:
+    1. The message contains a pattern of the lexicon - toxic.
+    2. The message has no letters (emoji, punctuation, numbers) - human.
+    3. The message is not longer than max_short_words words - human.
+    The rest of the messages are escalated.
+    A short message answered by the rule 3 is considered not toxic, although
+    it may contain an insult missing in the lexicon, so the rule is disabled
+    by default.
+    """
+
+    def __init__(
+        self,
+        next_moderator: BaseModerator,
+        lexicon: List[str],
+        max_short_words: int = 0,
+    ):
+        """
+        Init class.
+
+        :param next_moderator: The moderator for the escalated messages.
+        :param lexicon: Patterns of toxic words (see fold_pattern).
+        :param max_short_words: The maximum number of words in a short reply
+        (0 - the rule is disabled).
+        """
+        super().__init__(next_moderator)
+        self.__matcher = AhoCorasick(fold_pattern(pattern) for pattern in lexicon)
+        self.__max_short_words = max_short_words
+        self.rules: Counter[str] = Counter()
+
+    def stats(self) -> Dict[str, float]:
+        """Return the counters of the stage and of its rules."""
+        stats: Dict[str, float] = super().stats()
+        stats.update((f"rule_{rule}", count) for rule, count in self.rules.items())
+        return stats
+
+    def __rule(self, text: str) -> Optional[str]:
+        """Return the name of the rule matching the text or None."""
+        if self.__matcher.contains_any(fold_text(text)):
+            return "lexicon"
+        if not any(char.isalpha() for char in text):
+            return "no_letters"
+        if len(text.split()) <= self.__max_short_words:
+            return "short"
+        return None
+
+    async def lookup(self, msg: MessageSchema) -> Optional[ModerationResultSchema]:
+        """Return the verdict of the matching rule or None."""
+        rule: Optional[str] = self.__rule(msg.text)
+        if rule is None:
+            return None
+        self.rules[rule] += 1
+        logger.debug("Message is moderated by the rule %s.", rule)
+        return ModerationResultSchema(
+            msg_id=msg.id, generated_by_llm=False, toxic=rule == "lexicon"
+        )
@@ -0,0 +1 @@
+"""The package responsible for the search of near-duplicate messages."""
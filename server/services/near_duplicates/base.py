@@ -0,0 +1,52 @@
+"""The module responsible for the interface of the near-duplicate indexes."""
+
+from abc import ABC, abstractmethod
+from typing import List, Optional
+
+from server.services.verdict_caches.base import Verdict
+
+from .simhash import SIGNATURE_BITS, band_masks
+
+
+class BaseNearDuplicateIndex(ABC):
+    """
+    The basic interface of the index of SimHash signatures with verdicts.
+
+    The signatures are similar if the share of their equal bits is not less
+    than the threshold. The candidates are searched by LSH: the signature is
+    split into max_distance + 1 bands, and similar signatures share at least
+    one band. The lower the threshold, the narrower the bands and the more
+    candidates have to be checked.
+    """
+
+    def __init__(self, threshold: float, ttl: float):
+        """
+        Init class.
+
+        :param threshold: Minimal similarity of the signatures (0..1].
+        :param ttl: Time to live of the signatures in seconds.
+        """
+        self._max_distance: int = int((1 - threshold) * SIGNATURE_BITS)
+        self._masks: List[int] = band_masks(self._max_distance + 1)
+        self._ttl = ttl
+
+    def _bands(self, signature: int) -> List[int]:
+        """Return the keys of LSH buckets of the signature."""
+        return [
+            band << SIGNATURE_BITS | signature & mask
+            for band, mask in enumerate(self._masks)
+        ]
+
+    def _distance(self, first: int, second: int) -> int:
+        """Return the number of different bits of the signatures."""
+        return (first ^ second).bit_count()
+
+    @abstractmethod
+    async def find(self, signature: int) -> Optional[Verdict]:
+        """Return the verdict of the most similar signature or None."""
+        pass
+
+    @abstractmethod
+    async def add(self, signature: int, verdict: Verdict) -> None:
+        """Save the verdict of the signature."""
+        pass
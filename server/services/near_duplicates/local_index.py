@@ -0,0 +1,85 @@
+"""The module responsible for the in-process near-duplicate index."""
+
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Set, Tuple
+
+from server.services.verdict_caches.base import Verdict
+
+from .base import BaseNearDuplicateIndex
+
+
+class LocalNearDuplicateIndex(BaseNearDuplicateIndex):
+    """
+    In-process near-duplicate index.
+
+    The signatures are kept in the order of addition, so the expired ones
+    and the oldest ones above max_size are evicted from the beginning.
+    """
+
+    def __init__(
+        self,
+        threshold: float,
+        ttl: float,
+        max_size: int,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Init class.
+
+        :param threshold: Minimal similarity of the signatures (0..1].
+        :param ttl: Time to live of the signatures in seconds.
+        :param max_size: The maximum number of signatures in the index.
+        :param clock: Source of the current time in seconds.
+        """
+        super().__init__(threshold, ttl)
+        self.__max_size = max(1, max_size)
+        self.__clock = clock
+        # signature -> (verdict, expiration time)
+        self.__entries: OrderedDict[int, Tuple[Verdict, float]] = OrderedDict()
+        # LSH bucket -> signatures
+        self.__buckets: Dict[int, Set[int]] = dict()
+
+    def __len__(self) -> int:
+        """Return the number of signatures in the index."""
+        return len(self.__entries)
+
+    def __evict(self) -> None:
+        """Remove the expired signatures and the oldest ones above max_size."""
+        now: float = self.__clock()
+        while self.__entries:
+            signature, (_, expires_at) = next(iter(self.__entries.items()))
+            if expires_at > now and len(self.__entries) <= self.__max_size:
+                break
+            del self.__entries[signature]
+            for band in self._bands(signature):
+                bucket: Set[int] = self.__buckets[band]
+                bucket.discard(signature)
+                if not bucket:
+                    del self.__buckets[band]
+
+    async def find(self, signature: int) -> Optional[Verdict]:
+        """Return the verdict of the most similar signature or None."""
+        self.__evict()
+        entry: Optional[Tuple[Verdict, float]] = self.__entries.get(signature)
+        if entry is not None:
+            return entry[0]
+
+        best: Optional[int] = None
+        best_distance: int = self._max_distance + 1
+        for band in self._bands(signature):
+            for candidate in self.__buckets.get(band, ()):
+                distance: int = self._distance(signature, candidate)
+                if distance < best_distance:
+                    best, best_distance = candidate, distance
+        return None if best is None else self.__entries[best][0]
+
+    async def add(self, signature: int, verdict: Verdict) -> None:
+        """Save the verdict of the signature."""
+        if signature in self.__entries:
+            del self.__entries[signature]
+        else:
+            for band in self._bands(signature):
+                self.__buckets.setdefault(band, set()).add(signature)
+        self.__entries[signature] = (verdict, self.__clock() + self._ttl)
+        self.__evict()
@@ -0,0 +1,80 @@
+"""The module responsible for the Redis-based near-duplicate index."""
+
+import time
+from typing import Any, List, Optional
+
+import redis.asyncio
+
+from server.services.verdict_caches.base import Verdict
+
+from .base import BaseNearDuplicateIndex
+
+
+class RedisNearDuplicateIndex(BaseNearDuplicateIndex):
+    """
+    Redis-based near-duplicate index shared by all server replicas.
+
+    Every LSH bucket is a sorted set of "signature:verdict" members
+    scored by the expiration time, so a lookup takes one pipelined
+    round trip. The expired members and the oldest members above
+    max_bucket_size are trimmed on every addition, and the buckets themselves
+    expire after ttl without additions.
+    """
+
+    def __init__(
+        self,
+        redis_client: redis.asyncio.Redis,
+        threshold: float,
+        ttl: float,
+        prefix: str = "near_duplicates:",
+        max_bucket_size: int = 1000,
+    ):
+        """
+        Init class.
+
+        :param redis_client: Redis client.
+        :param threshold: Minimal similarity of the signatures (0..1].
+        :param ttl: Time to live of the signatures in seconds.
+        :param prefix: Prefix of the keys in Redis.
+        :param max_bucket_size: The maximum number of signatures in one bucket.
+        """
+        super().__init__(threshold, ttl)
+        self.__client = redis_client
+        self.__prefix = prefix
+        self.__max_bucket_size = max(1, max_bucket_size)
+
+    def __keys(self, signature: int) -> List[str]:
+        """Return the keys of LSH buckets of the signature in Redis."""
+        return [f"{self.__prefix}{band:x}" for band in self._bands(signature)]
+
+    async def find(self, signature: int) -> Optional[Verdict]:
+        """Return the verdict of the most similar signature or None."""
+        async with self.__client.pipeline(transaction=False) as pipe:
+            for key in self.__keys(signature):
+                pipe.zrangebyscore(key, time.time(), "+inf")
+            buckets: List[List[Any]] = await pipe.execute()
+
+        best: Optional[str] = None
+        best_distance: int = self._max_distance + 1
+        for bucket in buckets:
+            for member in bucket:
+                if isinstance(member, bytes):
+                    member = member.decode()
+                candidate, verdict = member.split(":")
+                distance: int = self._distance(signature, int(candidate, 16))
+                if distance < best_distance:
+                    best, best_distance = verdict, distance
+        return None if best is None else Verdict.decode(best)
+
+    async def add(self, signature: int, verdict: Verdict) -> None:
+        """Save the verdict of the signature."""
+        now: float = time.time()
+        member: str = f"{signature:x}:{verdict.encode()}"
+        async with self.__client.pipeline(transaction=False) as pipe:
+            for key in self.__keys(signature):
+                pipe.zadd(key, {member: now + self._ttl})
+                pipe.zremrangebyscore(key, "-inf", now)
+                # the members expiring first are the oldest
+                pipe.zremrangebyrank(key, 0, -self.__max_bucket_size - 1)
+                pipe.expire(key, int(self._ttl) + 1)
+            await pipe.execute()
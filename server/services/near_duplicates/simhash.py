@@ -0,0 +1,77 @@
+"""The module responsible for SimHash signatures of message texts."""
+
+import hashlib
+import re
+from collections import Counter
+from typing import List
+
+from server.services.normalization import normalize_text
+
+SIGNATURE_BITS = 64
+
+URLS = re.compile(r"(?:https?://|www\.|t\.me/)\S+")
+MENTIONS = re.compile(r"@\w+")
+DIGITS = re.compile(r"\d")
+WORDS = re.compile(r"\w+")
+
+
+def features(text: str, shingle_size: int = 4) -> List[str]:
+    """
+    Return the features of the text for SimHash.
+
+    The links, mentions and digits are replaced with placeholders and
+    everything except words (emoji, punctuation) is dropped, so the spam
+    that differs only in them has equal features.
+    The features are the character shingles of every word, they do not cross
+    the borders of words, so reordering of words and sentences does not change
+    the features.
+
+    :param text: Text of the message.
+    :param shingle_size: The number of characters in a shingle.
+    :return: Features of the text.
+    """
+    text = normalize_text(text)
+    text = DIGITS.sub("0", MENTIONS.sub(" user ", URLS.sub(" url ", text)))
+    result: List[str] = []
+    for word in WORDS.findall(text):
+        word = f" {word} "
+        for start in range(max(1, len(word) - shingle_size + 1)):
+            stop: int = start + shingle_size
+            result.append(word[start:stop])
+    return result
+
+
+def simhash(text_features: List[str]) -> int:
+    """Return 64-bit SimHash signature of the features of a text."""
+    weights: List[int] = [0] * SIGNATURE_BITS
+    for feature, weight in Counter(text_features).items():
+        feature_hash: int = int.from_bytes(
+            hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big"
+        )
+        for i in range(SIGNATURE_BITS):
+            weights[i] += weight if feature_hash >> i & 1 else -weight
+    return sum(1 << i for i, weight in enumerate(weights) if weight > 0)
+
+
+def similarity(first: int, second: int) -> float:
+    """Return the share of equal bits of the signatures."""
+    return 1 - (first ^ second).bit_count() / SIGNATURE_BITS
+
+
+def band_masks(num_bands: int) -> List[int]:
+    """
+    Split the bits of the signature into num_bands bands.
+
+    If two signatures differ in less than num_bands bits, at least one
+    of their bands is equal, so the bands are used as the keys of LSH buckets.
+
+    :param num_bands: The number of bands.
+    :return: Bit masks of the bands.
+    """
+    masks: List[int] = []
+    start: int = 0
+    for band in range(num_bands):
+        end: int = SIGNATURE_BITS * (band + 1) // num_bands
+        masks.append(((1 << (end - start)) - 1) << start)
+        start = end
+    return masks
@@ -0,0 +1,31 @@
+"""The module responsible for the normalization of message texts."""
+
+import hashlib
+import re
+import unicodedata
+
+# Zero-width characters, BOM and emoji variation selectors.
+INVISIBLE_CHARS = re.compile(
+    "[\u180e\u200b-\u200f\u2060-\u2064\ufeff\ufe00-\ufe0f\U000e0100-\U000e01ef]"
+)
+WHITESPACES = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize the text of the message.
+
+    The text is brought to the NFKC form, casefolded, the invisible characters
+    and emoji variation selectors are removed and the whitespaces are collapsed,
+    so that visually equal messages have equal normalized texts.
+    """
+    text = unicodedata.normalize("NFKC", text)
+    text = INVISIBLE_CHARS.sub("", text).casefold()
+    return WHITESPACES.sub(" ", text).strip()
+
+
+def text_key(text: str) -> str:
+    """Return the hash of the normalized text."""
+    return hashlib.blake2b(
+        normalize_text(text).encode("utf-8"), digest_size=16
+    ).hexdigest()
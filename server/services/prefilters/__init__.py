@@ -0,0 +1 @@
+"""The package responsible for the cheap local pre-moderation of messages."""
@@ -0,0 +1,71 @@
+"""The module responsible for the Aho-Corasick multi-pattern matcher."""
+
+from collections import deque
+from typing import Deque, Dict, Iterable, Iterator, List
+
+
+class AhoCorasick(object):
+    """
+    Aho-Corasick automaton for the search of many patterns in one pass.
+
+    The automaton is compiled once, after that the search takes time linear
+    in the length of the text regardless of the number of patterns.
+    """
+
+    def __init__(self, patterns: Iterable[str]):
+        """
+        Init class.
+
+        :param patterns: Patterns for the search (empty ones are ignored).
+        """
+        self.__transitions: List[Dict[str, int]] = [dict()]
+        self.__fails: List[int] = [0]
+        self.__outputs: List[List[str]] = [[]]
+        for pattern in patterns:
+            if pattern:
+                self.__add(pattern)
+        self.__compile()
+
+    def __add(self, pattern: str) -> None:
+        """Add the pattern to the trie."""
+        state: int = 0
+        for char in pattern:
+            next_state = self.__transitions[state].get(char)
+            if next_state is None:
+                next_state = len(self.__transitions)
+                self.__transitions[state][char] = next_state
+                self.__transitions.append(dict())
+                self.__fails.append(0)
+                self.__outputs.append([])
+            state = next_state
+        self.__outputs[state].append(pattern)
+
+    def __compile(self) -> None:
+        """Build the fail links of the trie in the breadth-first order."""
+        queue: Deque[int] = deque(self.__transitions[0].values())
+        while queue:
+            state: int = queue.popleft()
+            for char, next_state in self.__transitions[state].items():
+                queue.append(next_state)
+                fail: int = self.__fails[state]
+                while fail and char not in self.__transitions[fail]:
+                    fail = self.__fails[fail]
+                fail = self.__transitions[fail].get(char, 0)
+                self.__fails[next_state] = fail if fail != next_state else 0
+                self.__outputs[next_state].extend(self.__outputs[fail])
+
+    def search(self, text: str) -> Iterator[str]:
+        """Iterate over the patterns found in the text in the order of their ends."""
+        transitions = self.__transitions
+        fails = self.__fails
+        outputs = self.__outputs
+        state: int = 0
+        for char in text:
+            while state and char not in transitions[state]:
+                state = fails[state]
+            state = transitions[state].get(char, 0)
+            yield from outputs[state]
+
+    def contains_any(self, text: str) -> bool:
+        """Return True if at least one pattern is found in the text."""
+        return next(self.search(text), None) is not None
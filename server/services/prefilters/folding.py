@@ -0,0 +1,57 @@
+"""The module responsible for folding the obfuscations of words."""
+
+import re
+from typing import Dict
+
+from server.services.normalization import normalize_text
+
+# Latin letters, digits and symbols that are used instead of similar
+# Cyrillic letters to obfuscate words.
+LOOKALIKES: Dict[str, str] = {
+    "a": "а",
+    "c": "с",
+    "e": "е",
+    "h": "н",
+    "i": "и",
+    "k": "к",
+    "m": "м",
+    "n": "п",
+    "o": "о",
+    "p": "р",
+    "r": "г",
+    "t": "т",
+    "u": "и",
+    "x": "х",
+    "y": "у",
+    "0": "о",
+    "1": "и",
+    "3": "з",
+    "4": "ч",
+    "6": "б",
+    "@": "а",
+    "ё": "е",
+}
+LOOKALIKES_TABLE = str.maketrans(LOOKALIKES)
+SEPARATORS = re.compile(r"[^\w\s]|_")
+REPEATS = re.compile(r"(\w)\1+")
+
+
+def fold_text(text: str) -> str:
+    """
+    Fold the obfuscations of the words in the text.
+
+    The text is normalized, the lookalikes are replaced with Cyrillic letters,
+    the separators inside words ("х.у.й", "х*й") are removed and the repeated
+    letters are collapsed. The result is padded with spaces,
+    so " " marks the borders of words.
+    """
+    text = normalize_text(text).translate(LOOKALIKES_TABLE)
+    text = REPEATS.sub(r"\1", SEPARATORS.sub("", text))
+    return f" {text} "
+
+
+def fold_pattern(pattern: str) -> str:
+    """Fold the pattern of the lexicon as fold_text folds the texts."""
+    start: str = " " if pattern.startswith("^") else ""
+    end: str = " " if pattern.endswith("$") else ""
+    return start + fold_text(pattern.strip("^$")).strip() + end
@@ -0,0 +1,21 @@
+"""The module responsible for the lexicon of the prefilter."""
+
+from pathlib import Path
+from typing import List, Union
+
+DEFAULT_LEXICON_PATH = Path(__file__).with_name("lexicon.txt")
+
+
+def load_lexicon(path: Union[str, Path] = DEFAULT_LEXICON_PATH) -> List[str]:
+    """
+    Load the patterns of the lexicon.
+
+    :param path: Path to the file with one pattern per line.
+    :return: Patterns without empty lines and comments.
+    """
+    with open(path, encoding="utf-8") as file:
+        return [
+            line.strip()
+            for line in file
+            if line.strip() and not line.lstrip().startswith("#")
+        ]
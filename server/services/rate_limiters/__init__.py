@@ -0,0 +1 @@
+"""The package responsible for limiting the rate of requests to LLM."""
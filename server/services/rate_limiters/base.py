@@ -0,0 +1,150 @@
+"""The module responsible for the interface of the rate limiters."""
+
+import asyncio
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from logging import getLogger
+from typing import List
+
+from server.config.app_config import RateLimitConfig
+from server.services.prompts import Prompt
+
+logger = getLogger("main.services.rate_limiter")
+
+# Rough number of characters per token for the estimate before the request.
+# The real number of tokens is reported after the request.
+CHARS_PER_TOKEN: int = 3
+COMPLETION_TOKENS_ESTIMATE: int = 30
+
+
+def estimate_tokens(prompts: List[Prompt]) -> int:
+    """Estimate the number of tokens that the request with the prompts will cost."""
+    return (
+        sum(len(prompt.text) for prompt in prompts) // CHARS_PER_TOKEN
+        + COMPLETION_TOKENS_ESTIMATE
+    )
+
+
+@dataclass
+class TokenBucketsState(object):
+    """
+    The state of two token buckets: requests per second and tokens per minute.
+
+    Both rates are multiplied by factor. The factor is decreased on 429
+    and linearly recovers back to 1 after a quiet period without 429.
+    RedisRateLimiter implements the same logic in Lua.
+    """
+
+    requests: float = 0.0
+    tokens: float = 0.0
+    updated_at: float = 0.0
+    factor: float = 1.0
+    factor_updated_at: float = 0.0
+    penalized_at: float = 0.0
+
+    def __recover(self, config: RateLimitConfig, now: float) -> None:
+        """Recover the factor after the quiet period."""
+        recovery_start: float = self.penalized_at + config.quiet_period
+        if now > recovery_start:
+            since: float = max(recovery_start, self.factor_updated_at)
+            self.factor = min(1.0, self.factor + config.recovery_rate * (now - since))
+        self.factor_updated_at = now
+
+    def __refill(self, config: RateLimitConfig, now: float) -> None:
+        """Refill the buckets for the time passed since the last update."""
+        self.__recover(config, now)
+        requests_rate: float = config.requests_per_second * self.factor
+        tokens_capacity: float = config.tokens_per_minute * self.factor
+        if self.updated_at == 0:
+            # the buckets are full at the start
+            self.requests = max(1.0, requests_rate)
+            self.tokens = tokens_capacity
+        else:
+            elapsed: float = max(0.0, now - self.updated_at)
+            self.requests = min(
+                max(1.0, requests_rate), self.requests + elapsed * requests_rate
+            )
+            self.tokens = min(
+                tokens_capacity, self.tokens + elapsed * tokens_capacity / 60
+            )
+        self.updated_at = now
+
+    def acquire(self, config: RateLimitConfig, now: float, tokens: int) -> float:
+        """
+        Take one request and the tokens from the buckets.
+
+        :return: 0 if the request is allowed, otherwise the time to wait
+        before the next attempt.
+        """
+        self.__refill(config, now)
+        requests_rate: float = config.requests_per_second * self.factor
+        tokens_capacity: float = config.tokens_per_minute * self.factor
+        tokens_needed: float = min(float(tokens), tokens_capacity)
+
+        wait: float = 0.0
+        if config.requests_per_second > 0 and self.requests < 1:
+            wait = max(wait, (1 - self.requests) / requests_rate)
+        if config.tokens_per_minute > 0 and self.tokens < tokens_needed:
+            wait = max(wait, (tokens_needed - self.tokens) * 60 / tokens_capacity)
+        if wait == 0:
+            self.requests -= 1
+            self.tokens -= tokens_needed
+        return wait
+
+    def adjust(self, config: RateLimitConfig, tokens: int) -> None:
+        """Take the difference between the real and estimated tokens."""
+        self.tokens = max(-config.tokens_per_minute * self.factor, self.tokens - tokens)
+
+    def penalize(self, config: RateLimitConfig, now: float) -> None:
+        """Decrease the rates after 429 response."""
+        self.__refill(config, now)
+        self.factor = max(config.min_factor, self.factor * config.decrease_factor)
+        self.penalized_at = now
+        self.factor_updated_at = now
+        self.requests = min(self.requests, 0.0)
+
+
+class BaseRateLimiter(ABC):
+    """
+    The basic interface of the rate limiter of requests to LLM.
+
+    Before each request acquire must be called, it waits until
+    the request fits into the limits. After the request the real number
+    of tokens is reported with adjust, and 429 responses are reported with penalize.
+    """
+
+    def __init__(self, config: RateLimitConfig):
+        """
+        Init class.
+
+        :param config: Config for the rate limiter.
+        """
+        self._config = config
+
+    @abstractmethod
+    async def try_acquire(self, tokens: int) -> float:
+        """
+        Try to take one request and the tokens.
+
+        :return: 0 if the request is allowed, otherwise the time to wait.
+        """
+        pass
+
+    @abstractmethod
+    async def adjust(self, estimated_tokens: int, used_tokens: int) -> None:
+        """Correct the tokens bucket with the real number of tokens."""
+        pass
+
+    @abstractmethod
+    async def penalize(self) -> None:
+        """Tighten the limits after 429 response."""
+        pass
+
+    async def acquire(self, tokens: int) -> None:
+        """Wait until one request with the tokens fits into the limits."""
+        while True:
+            wait: float = await self.try_acquire(tokens)
+            if wait <= 0:
+                return
+            logger.debug("Rate limit, wait %s s.", str(wait))
+            await asyncio.sleep(wait)
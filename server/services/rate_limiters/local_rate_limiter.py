@@ -0,0 +1,46 @@
+"""The module responsible for the in-process rate limiter."""
+
+import time
+
+from server.config.app_config import RateLimitConfig
+
+from .base import BaseRateLimiter, TokenBucketsState
+
+
+class LocalRateLimiter(BaseRateLimiter):
+    """
+    In-process rate limiter.
+
+    The limits are applied only to this process,
+    use RedisRateLimiter when several server replicas are running.
+    """
+
+    def __init__(self, config: RateLimitConfig):
+        """
+        Init class.
+
+        :param config: Config for the rate limiter.
+        """
+        super().__init__(config)
+        self.__state = TokenBucketsState()
+
+    @property
+    def factor(self) -> float:
+        """Return the current share of the configured limits."""
+        return self.__state.factor
+
+    async def try_acquire(self, tokens: int) -> float:
+        """
+        Try to take one request and the tokens.
+
+        :return: 0 if the request is allowed, otherwise the time to wait.
+        """
+        return self.__state.acquire(self._config, time.monotonic(), tokens)
+
+    async def adjust(self, estimated_tokens: int, used_tokens: int) -> None:
+        """Correct the tokens bucket with the real number of tokens."""
+        self.__state.adjust(self._config, used_tokens - estimated_tokens)
+
+    async def penalize(self) -> None:
+        """Tighten the limits after 429 response."""
+        self.__state.penalize(self._config, time.monotonic())
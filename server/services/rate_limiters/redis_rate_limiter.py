@@ -0,0 +1,150 @@
+"""The module responsible for the Redis-based rate limiter shared by all replicas."""
+
+import redis.asyncio
+
+from server.config.app_config import RateLimitConfig
+
+from .base import BaseRateLimiter
+
+# The same logic as TokenBucketsState, executed atomically in Redis.
+# The time is taken from the Redis server, so the clocks of the replicas
+# do not have to be in sync.
+TOKEN_BUCKETS_SCRIPT = """
+local op = ARGV[1]
+local amount = tonumber(ARGV[2])
+local rps = tonumber(ARGV[3])
+local tpm = tonumber(ARGV[4])
+local decrease_factor = tonumber(ARGV[5])
+local min_factor = tonumber(ARGV[6])
+local quiet_period = tonumber(ARGV[7])
+local recovery_rate = tonumber(ARGV[8])
+
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+
+local state = redis.call(
+    'HMGET', KEYS[1], 'requests', 'tokens', 'updated_at',
+    'factor', 'factor_updated_at', 'penalized_at'
+)
+local requests = tonumber(state[1]) or 0
+local tokens = tonumber(state[2]) or 0
+local updated_at = tonumber(state[3]) or 0
+local factor = tonumber(state[4]) or 1
+local factor_updated_at = tonumber(state[5]) or 0
+local penalized_at = tonumber(state[6]) or 0
+
+-- recover the factor after the quiet period
+local recovery_start = penalized_at + quiet_period
+if now > recovery_start then
+    local since = math.max(recovery_start, factor_updated_at)
+    factor = math.min(1, factor + recovery_rate * (now - since))
+end
+factor_updated_at = now
+
+-- refill the buckets
+local requests_rate = rps * factor
+local requests_capacity = math.max(1, requests_rate)
+local tokens_capacity = tpm * factor
+if updated_at == 0 then
+    requests = requests_capacity
+    tokens = tokens_capacity
+else
+    local elapsed = math.max(0, now - updated_at)
+    requests = math.min(requests_capacity, requests + elapsed * requests_rate)
+    tokens = math.min(tokens_capacity, tokens + elapsed * tokens_capacity / 60)
+end
+updated_at = now
+
+local wait = 0
+if op == 'acquire' then
+    local tokens_needed = math.min(amount, tokens_capacity)
+    if rps > 0 and requests < 1 then
+        wait = math.max(wait, (1 - requests) / requests_rate)
+    end
+    if tpm > 0 and tokens < tokens_needed then
+        wait = math.max(wait, (tokens_needed - tokens) * 60 / tokens_capacity)
+    end
+    if wait == 0 then
+        requests = requests - 1
+        tokens = tokens - tokens_needed
+    end
+elseif op == 'adjust' then
+    tokens = math.max(-tokens_capacity, tokens - amount)
+elseif op == 'penalize' then
+    factor = math.max(min_factor, factor * decrease_factor)
+    penalized_at = now
+    requests = math.min(requests, 0)
+end
+
+redis.call(
+    'HSET', KEYS[1],
+    'requests', requests, 'tokens', tokens, 'updated_at', updated_at,
+    'factor', factor, 'factor_updated_at', factor_updated_at,
+    'penalized_at', penalized_at
+)
+redis.call('EXPIRE', KEYS[1], ARGV[9])
+return tostring(wait)
+"""
+
+
+class RedisRateLimiter(BaseRateLimiter):
+    """
+    Redis-based rate limiter.
+
+    The state of the buckets is stored in one Redis hash and is changed
+    by a Lua script, so all server replicas share the same limits.
+    """
+
+    def __init__(
+        self,
+        redis_client: redis.asyncio.Redis,
+        config: RateLimitConfig,
+        key: str = "rate_limit:llm",
+        ttl: int = 3600,
+    ):
+        """
+        Init class.
+
+        :param redis_client: Redis client.
+        :param config: Config for the rate limiter.
+        :param key: The name of the hash with the state of the buckets.
+        :param ttl: The state is removed after ttl seconds without requests.
+        """
+        super().__init__(config)
+        self.__key = key
+        self.__ttl = ttl
+        self.__script = redis_client.register_script(TOKEN_BUCKETS_SCRIPT)
+
+    async def __call(self, op: str, amount: float) -> float:
+        """Call the script with the operation."""
+        wait = await self.__script(
+            keys=[self.__key],
+            args=[
+                op,
+                amount,
+                self._config.requests_per_second,
+                self._config.tokens_per_minute,
+                self._config.decrease_factor,
+                self._config.min_factor,
+                self._config.quiet_period,
+                self._config.recovery_rate,
+                self.__ttl,
+            ],
+        )
+        return float(wait)
+
+    async def try_acquire(self, tokens: int) -> float:
+        """
+        Try to take one request and the tokens.
+
+        :return: 0 if the request is allowed, otherwise the time to wait.
+        """
+        return await self.__call("acquire", tokens)
+
+    async def adjust(self, estimated_tokens: int, used_tokens: int) -> None:
+        """Correct the tokens bucket with the real number of tokens."""
+        await self.__call("adjust", used_tokens - estimated_tokens)
+
+    async def penalize(self) -> None:
+        """Tighten the limits after 429 response."""
+        await self.__call("penalize", 0)
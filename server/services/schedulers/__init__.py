@@ -0,0 +1 @@
+"""The package responsible for delayed retries of message moderation."""
@@ -0,0 +1,81 @@
+"""The module responsible for the interface of the retry schedulers."""
+
+import random
+import time
+from abc import ABC, abstractmethod
+from dataclasses import replace
+from logging import getLogger
+from typing import Tuple
+
+from producer_consumer.messages.base import BaseMessageProducer
+from schemas.messages import MessageSchema
+
+logger = getLogger("main.services.scheduler")
+
+
+class BaseRetryScheduler(ABC):
+    """
+    The basic interface of the retry scheduler.
+
+    The scheduler keeps the messages whose moderation failed for a while
+    and then puts them back into the moderation queue,
+    so the workers do not wait for the retry and moderate other messages.
+    The backoff state lives in the message itself (MessageSchema.attempt).
+    """
+
+    def __init__(
+        self,
+        msg_producer: BaseMessageProducer,
+        delay_limits: Tuple[float, float],
+        delay_denominator: float,
+        max_num_retries: int,
+    ):
+        """
+        Init class.
+
+        :param msg_producer: Producer of the moderation queue.
+        :param delay_limits: Limits of the random delay before the first retry.
+        :param delay_denominator: The delay increases by this factor
+        with each next attempt.
+        :param max_num_retries: The maximum number of retries of one message.
+        """
+        self._msg_producer = msg_producer
+        self.__delay_limits = delay_limits
+        self.__delay_denominator = delay_denominator
+        self.__max_num_retries = max_num_retries
+
+    def get_delay(self, attempt: int) -> float:
+        """Return the exponential delay before the retry number attempt + 1."""
+        return random.uniform(*self.__delay_limits) * (
+            self.__delay_denominator**attempt
+        )
+
+    async def retry(self, msg: MessageSchema) -> bool:
+        """
+        Schedule the next attempt to moderate the message.
+
+        :param msg: Message whose moderation failed.
+        :return: False if the retries limit is exhausted or the retry
+        would be after the deadline of the message and the message
+        was not scheduled, otherwise True.
+        """
+        if msg.attempt >= self.__max_num_retries:
+            return False
+
+        delay: float = self.get_delay(msg.attempt)
+        if msg.deadline and time.time() + delay > msg.deadline:
+            logger.debug("Retry would be after the deadline of the message.")
+            return False
+        logger.debug("Retry message in %s s.", str(delay))
+        await self.schedule(replace(msg, attempt=msg.attempt + 1), delay)
+        return True
+
+    @abstractmethod
+    async def schedule(self, msg: MessageSchema, delay: float) -> None:
+        """Put the message back into the moderation queue after the delay."""
+        pass
+
+    @abstractmethod
+    async def run(self) -> None:
+        """Move the messages whose delay has expired into the moderation queue."""
+        pass
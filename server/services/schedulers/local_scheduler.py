@@ -0,0 +1,96 @@
+"""The module responsible for the in-process retry scheduler."""
+
+import asyncio
+import heapq
+import itertools
+import time
+from logging import getLogger
+from typing import List, Optional, Tuple
+
+from schemas.messages import MessageSchema
+
+from .base import BaseRetryScheduler
+
+logger = getLogger("main.services.scheduler.local")
+
+
+class LocalRetryScheduler(BaseRetryScheduler):
+    """
+    In-process retry scheduler.
+
+    The delayed messages are kept in a heap ordered by the due time,
+    so they are lost if the process stops. Use it for local runs,
+    RedisRetryScheduler is preferred in production.
+    A message that can't be uploaded is put back into the heap
+    and retried after retry_delay seconds.
+    """
+
+    def __init__(self, *args, retry_delay: float = 1, **kwargs):
+        """
+        Init class.
+
+        :param retry_delay: The delay in seconds before retrying a failed upload.
+        The rest arguments are the same as in BaseRetryScheduler.
+        """
+        super().__init__(*args, **kwargs)
+        self.__retry_delay = retry_delay
+        self.__heap: List[Tuple[float, int, MessageSchema]] = []
+        self.__counter = itertools.count()
+        self.__new_item: Optional[asyncio.Event] = None
+
+    def __len__(self) -> int:
+        """Return the number of the delayed messages."""
+        return len(self.__heap)
+
+    def __get_event(self) -> asyncio.Event:
+        """Return the event about a new delayed message."""
+        if self.__new_item is None:
+            self.__new_item = asyncio.Event()
+        return self.__new_item
+
+    async def schedule(self, msg: MessageSchema, delay: float) -> None:
+        """Put the message back into the moderation queue after the delay."""
+        heapq.heappush(
+            self.__heap, (time.monotonic() + delay, next(self.__counter), msg)
+        )
+        self.__get_event().set()
+
+    async def run(self) -> None:
+        """Move the messages whose delay has expired into the moderation queue."""
+        new_item = self.__get_event()
+        try:
+            while True:
+                now = time.monotonic()
+                failed: bool = False
+                while self.__heap and self.__heap[0][0] <= now:
+                    entry: Tuple[float, int, MessageSchema] = heapq.heappop(self.__heap)
+                    try:
+                        await self._msg_producer.upload(entry[2])
+                    except Exception as exc:
+                        heapq.heappush(self.__heap, entry)
+                        logger.error(
+                            "Can't upload delayed message, retry in %s seconds."
+                            "\nexc: %s",
+                            self.__retry_delay,
+                            exc,
+                        )
+                        failed = True
+                        break
+
+                if failed:
+                    await asyncio.sleep(self.__retry_delay)
+                    continue
+
+                timeout: Optional[float] = (
+                    self.__heap[0][0] - now if self.__heap else None
+                )
+                new_item.clear()
+                try:
+                    await asyncio.wait_for(new_item.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            if self.__heap:
+                logger.warning(
+                    "%s delayed messages are lost on shutdown.", len(self.__heap)
+                )
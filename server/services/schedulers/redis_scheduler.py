@@ -0,0 +1,181 @@
+"""The module responsible for the Redis-based retry scheduler."""
+
+import asyncio
+import json
+import time
+import uuid
+from dataclasses import asdict
+from logging import getLogger
+from typing import Dict, List, Optional
+
+import redis.asyncio
+
+from schemas.messages import MessageSchema
+
+from ..dead_letters.base import BaseDeadLetterQueue, DeadLetter
+from .base import BaseRetryScheduler
+
+logger = getLogger("main.services.scheduler.redis")
+
+# Atomically take up to ARGV[2] members with the score <= ARGV[1]
+# so that several server replicas never move the same message twice.
+# The members are returned with their scores, so they can be put back.
+POP_DUE_SCRIPT = """
+local items = redis.call(
+    'ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'WITHSCORES', 'LIMIT', 0, ARGV[2]
+)
+if #items > 0 then
+    local members = {}
+    for i = 1, #items, 2 do
+        members[#members + 1] = items[i]
+    end
+    redis.call('ZREM', KEYS[1], unpack(members))
+end
+return items
+"""
+
+
+class RedisRetryScheduler(BaseRetryScheduler):
+    """
+    Redis-based retry scheduler.
+
+    The delayed messages are stored in a sorted set with the due time as the score,
+    so they survive restarts and are shared by all server replicas.
+    The due messages that can't be uploaded are put back at their due time
+    and the moving is retried with a backoff. The messages that can't be
+    decoded (e.g. written by another version of the schema) are put into
+    the dead letters with the payload in the detail.
+    """
+
+    def __init__(
+        self,
+        redis_client: redis.asyncio.Redis,
+        *args,
+        key: str = "messages:delayed",
+        poll_interval: float = 0.5,
+        batch_size: int = 100,
+        max_backoff: float = 30,
+        dead_letters: Optional[BaseDeadLetterQueue] = None,
+        **kwargs,
+    ):
+        """
+        Init class.
+
+        :param redis_client: Redis client.
+        :param key: The name of the sorted set with the delayed messages.
+        :param poll_interval: How often to check for the messages whose delay expired.
+        :param batch_size: The maximum number of messages moved at once.
+        :param max_backoff: The maximum delay in seconds before retrying
+        a failed move.
+        :param dead_letters: The queue of the messages that can't be decoded.
+        If None, such messages are dropped.
+        The rest arguments are the same as in BaseRetryScheduler.
+        """
+        super().__init__(*args, **kwargs)
+        self.__client = redis_client
+        self.__key = key
+        self.__poll_interval = poll_interval
+        self.__batch_size = batch_size
+        self.__max_backoff = max_backoff
+        self.__dead_letters = dead_letters
+        self.__pop_due = self.__client.register_script(POP_DUE_SCRIPT)
+
+    async def schedule(self, msg: MessageSchema, delay: float) -> None:
+        """Put the message back into the moderation queue after the delay."""
+        # the unique prefix keeps equal messages from merging into one member
+        member: str = f"{uuid.uuid4().hex}:{json.dumps(asdict(msg))}"
+        await self.__client.zadd(self.__key, {member: time.time() + delay})
+
+    async def __bury(self, member: bytes, exc: Exception) -> None:
+        """Put the member that can't be decoded into the dead letters."""
+        payload: str = member.decode(errors="replace")
+        logger.error("Can't decode delayed message.\nexc: %s", exc)
+        if self.__dead_letters is None:
+            return
+        await self.__dead_letters.put(
+            DeadLetter(
+                msg=MessageSchema(id="", text=""),
+                error=type(exc).__name__,
+                attempt=0,
+                failed_at=time.time(),
+                detail=payload,
+            )
+        )
+
+    async def __postpone_or_bury(
+        self, member: bytes, exc: Exception, pending: Dict[bytes, float]
+    ) -> None:
+        """
+        Put the member that can't be decoded into the dead letters.
+
+        If the dead letters are unavailable, the member is postponed
+        by max_backoff, so it does not hold back the due messages.
+        """
+        try:
+            await self.__bury(member, exc)
+        except Exception as bury_exc:
+            logger.error(
+                "Can't put delayed message into dead letters.\nexc: %s", bury_exc
+            )
+            pending[member] = time.time() + self.__max_backoff
+        else:
+            del pending[member]
+
+    async def __move_due(self) -> int:
+        """
+        Move the due messages into the moderation queue.
+
+        :return: The number of the taken members.
+        """
+        items: List[bytes] = await self.__pop_due(
+            keys=[self.__key], args=[time.time(), self.__batch_size]
+        )
+        # the members not moved yet with their due time
+        pending: Dict[bytes, float] = {
+            member: float(score) for member, score in zip(items[::2], items[1::2])
+        }
+        try:
+            msgs: List[MessageSchema] = []
+            decoded: List[bytes] = []
+            for member in list(pending):
+                try:
+                    _, msg_json = member.split(b":", 1)
+                    msgs.append(MessageSchema(**json.loads(msg_json)))
+                    decoded.append(member)
+                except (ValueError, TypeError) as exc:
+                    await self.__postpone_or_bury(member, exc, pending)
+            await self._msg_producer.upload_many(msgs)
+            for member in decoded:
+                del pending[member]
+        finally:
+            if pending:
+                try:
+                    await self.__client.zadd(self.__key, pending)
+                except Exception as exc:
+                    logger.error(
+                        "%s delayed messages are lost.\nexc: %s", len(pending), exc
+                    )
+        return len(items) // 2
+
+    async def run(self) -> None:
+        """Move the messages whose delay has expired into the moderation queue."""
+        failures: int = 0
+        while True:
+            try:
+                moved: int = await self.__move_due()
+            except Exception as exc:
+                failures += 1
+                delay: float = min(
+                    self.__poll_interval * 2**failures, self.__max_backoff
+                )
+                logger.error(
+                    "Can't move delayed messages, retry in %s seconds.\nexc: %s",
+                    delay,
+                    exc,
+                )
+                await asyncio.sleep(delay)
+                continue
+            failures = 0
+
+            if moved < self.__batch_size:
+                await asyncio.sleep(self.__poll_interval)
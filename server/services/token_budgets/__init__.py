@@ -0,0 +1 @@
+"""The package responsible for the budgets of LLM tokens of the chats."""
@@ -0,0 +1,88 @@
+"""The module responsible for the interface of the token budgets."""
+
+from abc import ABC, abstractmethod
+from typing import Dict, List
+
+from schemas.budgets import TokenBudgetSchema
+from schemas.messages import MessageSchema
+from server.config.app_config import TokenBudgetConfig
+
+# the chat within its budget is moderated without degradation
+NORMAL_MODE: str = "normal"
+
+
+def split_tokens(tokens: int, messages: List[MessageSchema]) -> Dict[str, int]:
+    """
+    Split the tokens of one request between the chats of the messages.
+
+    The tokens are split in proportion to the length of the texts,
+    the remainder of the rounding goes to the first chat.
+    """
+    weights: Dict[str, int] = dict()
+    for message in messages:
+        weights[message.chat_id] = weights.get(message.chat_id, 0) + len(message.text)
+        weights[message.chat_id] += 1
+    total: int = sum(weights.values())
+    if not total:
+        return dict()
+    shares: Dict[str, int] = {
+        chat_id: tokens * weight // total for chat_id, weight in weights.items()
+    }
+    first: str = next(iter(shares))
+    shares[first] += tokens - sum(shares.values())
+    return shares
+
+
+class BaseTokenBudget(ABC):
+    """
+    The basic interface of the token budget.
+
+    The tokens spent on the messages of every chat are counted in fixed
+    windows of window seconds aligned to the Unix epoch. The degradation
+    mode of the chat depends on the fraction of its budget spent
+    in the current window (see TokenBudgetConfig.modes).
+    The budget also counts the clean verdicts of the users in the chats:
+    a user with trust_after clean verdicts in a row is trusted.
+    """
+
+    def __init__(self, config: TokenBudgetConfig):
+        """
+        Init class.
+
+        :param config: Config for the token budgets.
+        """
+        self._config = config
+
+    def get_limit(self, chat_id: str) -> int:
+        """Return the limit of the chat per window (0 - no limit)."""
+        return self._config.chat_limits.get(chat_id, self._config.limit)
+
+    def get_mode(self, budget: TokenBudgetSchema) -> str:
+        """Return the degradation mode of the chat with the budget."""
+        mode: str = NORMAL_MODE
+        if not budget.limit:
+            return mode
+        for fraction, name in self._config.modes:
+            if budget.spent_fraction >= fraction:
+                mode = name
+        return mode
+
+    @abstractmethod
+    async def spend(self, chat_id: str, tokens: int) -> TokenBudgetSchema:
+        """Add the tokens to the spending of the chat and return its budget."""
+        pass
+
+    @abstractmethod
+    async def get(self, chat_id: str) -> TokenBudgetSchema:
+        """Return the budget of the chat in the current window."""
+        pass
+
+    @abstractmethod
+    async def record_verdict(self, chat_id: str, user_id: str, toxic: bool) -> None:
+        """Count the verdict on the message of the user in the chat."""
+        pass
+
+    @abstractmethod
+    async def is_trusted(self, chat_id: str, user_id: str) -> bool:
+        """Return True if the user has enough clean verdicts in the chat."""
+        pass
@@ -0,0 +1,69 @@
+"""The module responsible for the in-process token budget."""
+
+import time
+from typing import Dict, Tuple
+
+from schemas.budgets import TokenBudgetSchema
+from server.config.app_config import TokenBudgetConfig
+
+from .base import BaseTokenBudget
+
+
+class LocalTokenBudget(BaseTokenBudget):
+    """
+    In-process token budget.
+
+    The tokens are counted only in this process and are lost on restart,
+    use RedisTokenBudget when several server replicas are running.
+    The trust of at most max_users users is kept, the oldest are forgotten.
+    """
+
+    def __init__(self, config: TokenBudgetConfig, max_users: int = 100000):
+        """
+        Init class.
+
+        :param config: Config for the token budgets.
+        :param max_users: The maximum number of the users with counted verdicts.
+        """
+        super().__init__(config)
+        self.__max_users = max(1, max_users)
+        # chat id -> (spent tokens, the end of the window)
+        self.__spent: Dict[str, Tuple[int, float]] = dict()
+        self.__clean: Dict[Tuple[str, str], int] = dict()
+
+    def __window_end(self) -> float:
+        """Return the end of the current window."""
+        window: int = self._config.window
+        return (time.time() // window + 1) * window
+
+    async def spend(self, chat_id: str, tokens: int) -> TokenBudgetSchema:
+        """Add the tokens to the spending of the chat and return its budget."""
+        budget: TokenBudgetSchema = await self.get(chat_id)
+        budget.spent += tokens
+        self.__spent[chat_id] = (budget.spent, budget.window_end)
+        return budget
+
+    async def get(self, chat_id: str) -> TokenBudgetSchema:
+        """Return the budget of the chat in the current window."""
+        window_end: float = self.__window_end()
+        spent, spent_window_end = self.__spent.get(chat_id, (0, window_end))
+        return TokenBudgetSchema(
+            chat_id=chat_id,
+            spent=spent if spent_window_end == window_end else 0,
+            limit=self.get_limit(chat_id),
+            window_end=window_end,
+        )
+
+    async def record_verdict(self, chat_id: str, user_id: str, toxic: bool) -> None:
+        """Count the verdict on the message of the user in the chat."""
+        key: Tuple[str, str] = (chat_id, user_id)
+        # the user moves to the end, so the users without messages are forgotten
+        clean: int = 0 if toxic else self.__clean.get(key, 0) + 1
+        self.__clean.pop(key, None)
+        if len(self.__clean) >= self.__max_users:
+            self.__clean.pop(next(iter(self.__clean)))
+        self.__clean[key] = clean
+
+    async def is_trusted(self, chat_id: str, user_id: str) -> bool:
+        """Return True if the user has enough clean verdicts in the chat."""
+        return self.__clean.get((chat_id, user_id), 0) >= self._config.trust_after
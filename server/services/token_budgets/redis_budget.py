@@ -0,0 +1,107 @@
+"""The module responsible for the Redis-based token budget shared by all replicas."""
+
+from typing import Any, List
+
+import redis.asyncio
+
+from schemas.budgets import TokenBudgetSchema
+from server.config.app_config import TokenBudgetConfig
+
+from .base import BaseTokenBudget
+
+# Add the tokens to the spending of the chat in the current window.
+# The window is taken from the time of the Redis server, so the clocks
+# of the replicas do not have to be in sync. The hash is kept for one more
+# window after the end of the window, so the bot can read the last spending.
+SPEND_SCRIPT = """
+local tokens = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local limit = tonumber(ARGV[3])
+
+local time = redis.call('TIME')
+local window_end = (math.floor(tonumber(time[1]) / window) + 1) * window
+
+local state = redis.call('HMGET', KEYS[1], 'spent', 'window_end')
+local spent = tonumber(state[1]) or 0
+if tonumber(state[2]) ~= window_end then
+    spent = 0
+end
+
+if tokens > 0 then
+    spent = spent + tokens
+    redis.call(
+        'HSET', KEYS[1],
+        'spent', spent, 'limit', limit, 'window', window, 'window_end', window_end
+    )
+    redis.call('EXPIREAT', KEYS[1], window_end + window)
+end
+return {spent, window_end}
+"""
+
+
+class RedisTokenBudget(BaseTokenBudget):
+    """
+    Redis-based token budget.
+
+    The spending of every chat is stored in the hash prefix + chat id
+    (spent, limit, window and window_end), so all server replicas share
+    the budgets and the bot can read the remaining budget of its chats.
+    The clean verdicts of the users are counted in the hash
+    prefix + "trust:" + chat id, it expires after trust_ttl seconds
+    without messages in the chat.
+    """
+
+    def __init__(
+        self,
+        redis_client: redis.asyncio.Redis,
+        config: TokenBudgetConfig,
+        prefix: str = "token_budget:",
+    ):
+        """
+        Init class.
+
+        :param redis_client: Redis client.
+        :param config: Config for the token budgets.
+        :param prefix: Prefix of the keys in Redis.
+        """
+        super().__init__(config)
+        self.__client = redis_client
+        self.__prefix = prefix
+        self.__script = redis_client.register_script(SPEND_SCRIPT)
+
+    async def __call(self, chat_id: str, tokens: int) -> TokenBudgetSchema:
+        """Call the script and return the budget of the chat."""
+        limit: int = self.get_limit(chat_id)
+        response: List[Any] = await self.__script(
+            keys=[self.__prefix + chat_id], args=[tokens, self._config.window, limit]
+        )
+        return TokenBudgetSchema(
+            chat_id=chat_id,
+            spent=int(response[0]),
+            limit=limit,
+            window_end=float(response[1]),
+        )
+
+    async def spend(self, chat_id: str, tokens: int) -> TokenBudgetSchema:
+        """Add the tokens to the spending of the chat and return its budget."""
+        return await self.__call(chat_id, tokens)
+
+    async def get(self, chat_id: str) -> TokenBudgetSchema:
+        """Return the budget of the chat in the current window."""
+        return await self.__call(chat_id, 0)
+
+    async def record_verdict(self, chat_id: str, user_id: str, toxic: bool) -> None:
+        """Count the verdict on the message of the user in the chat."""
+        key: str = f"{self.__prefix}trust:{chat_id}"
+        async with self.__client.pipeline(transaction=False) as pipe:
+            if toxic:
+                pipe.hset(key, user_id, 0)
+            else:
+                pipe.hincrby(key, user_id, 1)
+            pipe.expire(key, self._config.trust_ttl)
+            await pipe.execute()
+
+    async def is_trusted(self, chat_id: str, user_id: str) -> bool:
+        """Return True if the user has enough clean verdicts in the chat."""
+        clean = await self.__client.hget(f"{self.__prefix}trust:{chat_id}", user_id)
+        return int(clean or 0) >= self._config.trust_after
@@ -0,0 +1 @@
+"""The package responsible for caching the moderation verdicts."""
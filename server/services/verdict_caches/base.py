@@ -0,0 +1,47 @@
+"""The module responsible for the interface of the verdict caches."""
+
+from abc import ABC, abstractmethod
+from typing import NamedTuple, Optional
+
+from schemas.messages import ModerationResultSchema
+
+
+class Verdict(NamedTuple):
+    """Moderation verdict that does not depend on a particular message."""
+
+    generated_by_llm: bool
+    toxic: bool
+
+    @classmethod
+    def from_result(cls, result: ModerationResultSchema) -> "Verdict":
+        """Get the verdict from the moderation result."""
+        return cls(result.generated_by_llm, result.toxic)
+
+    def to_result(self, msg_id: str) -> ModerationResultSchema:
+        """Get the moderation result for the message."""
+        return ModerationResultSchema(
+            msg_id=msg_id, generated_by_llm=self.generated_by_llm, toxic=self.toxic
+        )
+
+    def encode(self) -> str:
+        """Encode the verdict in two characters."""
+        return f"{int(self.generated_by_llm)}{int(self.toxic)}"
+
+    @classmethod
+    def decode(cls, value: str) -> "Verdict":
+        """Decode the verdict encoded with encode."""
+        return cls(value[0] == "1", value[1] == "1")
+
+
+class BaseVerdictCache(ABC):
+    """The basic interface of the verdict cache."""
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[Verdict]:
+        """Return the verdict by the key or None."""
+        pass
+
+    @abstractmethod
+    async def set(self, key: str, verdict: Verdict) -> None:
+        """Save the verdict by the key."""
+        pass
@@ -0,0 +1,39 @@
+"""The module responsible for the in-process LRU verdict cache."""
+
+from collections import OrderedDict
+from typing import Optional
+
+from .base import BaseVerdictCache, Verdict
+
+
+class LRUVerdictCache(BaseVerdictCache):
+    """In-process verdict cache that evicts the least recently used verdicts."""
+
+    def __init__(self, max_size: int):
+        """
+        Init class.
+
+        :param max_size: The maximum number of verdicts in the cache.
+        """
+        self.__max_size = max(1, max_size)
+        self.__verdicts: OrderedDict[str, Verdict] = OrderedDict()
+        self.evictions: int = 0
+
+    def __len__(self) -> int:
+        """Return the number of verdicts in the cache."""
+        return len(self.__verdicts)
+
+    async def get(self, key: str) -> Optional[Verdict]:
+        """Return the verdict by the key or None."""
+        verdict: Optional[Verdict] = self.__verdicts.get(key)
+        if verdict is not None:
+            self.__verdicts.move_to_end(key)
+        return verdict
+
+    async def set(self, key: str, verdict: Verdict) -> None:
+        """Save the verdict by the key."""
+        self.__verdicts[key] = verdict
+        self.__verdicts.move_to_end(key)
+        while len(self.__verdicts) > self.__max_size:
+            self.__verdicts.popitem(last=False)
+            self.evictions += 1
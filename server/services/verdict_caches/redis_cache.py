@@ -0,0 +1,41 @@
+"""The module responsible for the Redis-based verdict cache."""
+
+from typing import Optional
+
+import redis.asyncio
+
+from .base import BaseVerdictCache, Verdict
+
+
+class RedisVerdictCache(BaseVerdictCache):
+    """
+    Redis-based verdict cache shared by all server replicas.
+
+    Every verdict expires after ttl seconds, so the size of the cache
+    is bounded by the number of distinct messages during ttl.
+    """
+
+    def __init__(
+        self, redis_client: redis.asyncio.Redis, ttl: int, prefix: str = "verdict:"
+    ):
+        """
+        Init class.
+
+        :param redis_client: Redis client.
+        :param ttl: Time to live of the verdicts in seconds.
+        :param prefix: Prefix of the keys in Redis.
+        """
+        self.__client = redis_client
+        self.__ttl = ttl
+        self.__prefix = prefix
+
+    async def get(self, key: str) -> Optional[Verdict]:
+        """Return the verdict by the key or None."""
+        value = await self.__client.get(self.__prefix + key)
+        if value is None:
+            return None
+        return Verdict.decode(value.decode() if isinstance(value, bytes) else value)
+
+    async def set(self, key: str, verdict: Verdict) -> None:
+        """Save the verdict by the key."""
+        await self.__client.set(self.__prefix + key, verdict.encode(), ex=self.__ttl)
@@ -0,0 +1,71 @@
+"""The module responsible for the two-level verdict cache."""
+
+from logging import getLogger
+from typing import Dict, Optional
+
+from .base import BaseVerdictCache, Verdict
+from .lru_cache import LRUVerdictCache
+
+logger = getLogger("main.services.verdict_cache")
+
+
+class TwoLevelVerdictCache(BaseVerdictCache):
+    """
+    Two-level verdict cache: in-process LRU in front of a shared cache.
+
+    A verdict found in the shared cache is copied into the local one.
+    The errors of the shared cache are logged and treated as misses,
+    so the cache never breaks moderation.
+    """
+
+    def __init__(self, local: LRUVerdictCache, shared: Optional[BaseVerdictCache]):
+        """
+        Init class.
+
+        :param local: In-process cache.
+        :param shared: Cache shared by the replicas (e.g. RedisVerdictCache).
+        """
+        self.__local = local
+        self.__shared = shared
+        self.local_hits: int = 0
+        self.shared_hits: int = 0
+        self.misses: int = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Return the counters of the cache."""
+        return {
+            "local_hits": self.local_hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "local_size": len(self.__local),
+            "local_evictions": self.__local.evictions,
+        }
+
+    async def get(self, key: str) -> Optional[Verdict]:
+        """Return the verdict by the key or None."""
+        verdict: Optional[Verdict] = await self.__local.get(key)
+        if verdict is not None:
+            self.local_hits += 1
+            return verdict
+
+        if self.__shared is not None:
+            try:
+                verdict = await self.__shared.get(key)
+            except Exception as exc:
+                logger.warning("Can't get verdict from shared cache.\nexc: %s", exc)
+            if verdict is not None:
+                self.shared_hits += 1
+                await self.__local.set(key, verdict)
+                return verdict
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, verdict: Verdict) -> None:
+        """Save the verdict by the key."""
+        await self.__local.set(key, verdict)
+        if self.__shared is not None:
+            try:
+                await self.__shared.set(key, verdict)
+            except Exception as exc:
+                logger.warning("Can't save verdict to shared cache.\nexc: %s", exc)
@@ -21,15 +21,19 @@ def config() -> Config:
     return get_config()
 
 
-@pytest.fixture(scope="session")
+@pytest.fixture(scope="function")
 def llm_api(config: Config) -> BaseLLMAPI:
-    """Get BaseLLMAPI object."""
-    llm_api_ = YandexGPTAPI(config)
-    llm_api_.auth()
-    return llm_api_
+    """
+    Get BaseLLMAPI object.
 
+    The HTTP session of the API is bound to an event loop,
+    so the object is created for each test and must be authenticated
+    and closed inside the test's event loop.
+    """
+    return YandexGPTAPI(config)
 
-@pytest.fixture(scope="session")
+
+@pytest.fixture(scope="function")
 def llm_moderator(llm_api: BaseLLMAPI, config: Config) -> LLMModerator:
     """Get LLMModerator object."""
     return LLMModerator(llm_api, config.moderation_config)
@@ -0,0 +1 @@
+"""Tests of the metrics package."""
@@ -0,0 +1,63 @@
+"""The module responsible for testing the registry of the metrics."""
+
+import asyncio
+
+import pytest
+
+from metrics.registry import Registry
+
+
+def test_render_counter_and_gauge() -> None:
+    """Test that the counters and gauges are rendered with their labels."""
+    registry = Registry()
+    counter = registry.counter("events_total", "Events.", ("event",))
+    gauge = registry.gauge("depth", "Depth.", ("queue",))
+
+    counter.inc("reauth")
+    counter.inc("reauth", amount=2)
+    gauge.set(1.5, 'a"b')
+
+    text = asyncio.run(registry.render())
+
+    assert "# TYPE events_total counter" in text
+    assert 'events_total{event="reauth"} 3' in text
+    assert 'depth{queue="a\\"b"} 1.5' in text
+
+
+def test_histogram_buckets_are_cumulative() -> None:
+    """Test that the buckets of the histogram accumulate the counts."""
+    registry = Registry()
+    histogram = registry.histogram("latency", "Latency.", buckets=(0.1, 1))
+
+    for value in (0.05, 0.1, 0.5, 3):
+        histogram.observe(value)
+
+    text = asyncio.run(registry.render())
+
+    assert 'latency_bucket{le="0.1"} 2' in text
+    assert 'latency_bucket{le="1"} 3' in text
+    assert 'latency_bucket{le="+Inf"} 4' in text
+    assert "latency_sum 3.65" in text
+    assert "latency_count 4" in text
+
+
+def test_metric_is_registered_once() -> None:
+    """Test that the metric with the same name is shared."""
+    registry = Registry()
+
+    assert registry.counter("calls", "Calls.") is registry.counter("calls", "Calls.")
+    with pytest.raises(ValueError):
+        registry.gauge("calls", "Calls.")
+
+
+def test_collectors_are_called_on_render() -> None:
+    """Test that the collectors update the metrics before the scrape."""
+    registry = Registry()
+    gauge = registry.gauge("backlog", "Backlog.")
+
+    async def collect() -> None:
+        gauge.set(7)
+
+    registry.add_collector(collect)
+
+    assert "backlog 7" in asyncio.run(registry.render())
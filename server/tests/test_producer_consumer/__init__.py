@@ -0,0 +1 @@
+"""Tests of the producer/consumer package."""
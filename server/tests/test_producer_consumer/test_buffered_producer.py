@@ -0,0 +1,107 @@
+"""The module responsible for testing the buffered message producer."""
+
+import asyncio
+from typing import List
+
+from producer_consumer.messages.base import BaseMessageProducer
+from producer_consumer.messages.buffered_pc import BufferedMessageProducer
+from schemas.messages import MessageSchema
+
+
+class RecordingProducer(BaseMessageProducer):
+    """Producer remembering the uploaded batches."""
+
+    def __init__(self, failures: int = 0):
+        """Init class, the first failures uploads fail."""
+        self.batches: List[List[str]] = []
+        self.failures = failures
+
+    async def upload(self, msg: MessageSchema) -> None:
+        """Upload message."""
+        await self.upload_many([msg])
+
+    async def upload_many(self, msgs: List[MessageSchema]) -> None:
+        """Remember the ids of the uploaded messages."""
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("Redis is unavailable")
+        self.batches.append([msg.id for msg in msgs])
+
+
+def make_msgs(count: int) -> List[MessageSchema]:
+    """Return the messages with the ids from 0 to count."""
+    return [MessageSchema(id=str(i), text="text") for i in range(count)]
+
+
+def test_flush_by_size_and_delay() -> None:
+    """Test that full batches are flushed at once and the rest after the delay."""
+
+    async def run() -> None:
+        inner = RecordingProducer()
+        producer = BufferedMessageProducer(inner, max_batch=3, max_delay=0.05)
+        await producer.start()
+        await producer.upload_many(make_msgs(4))
+        await asyncio.sleep(0.01)
+        assert inner.batches == [["0", "1", "2"]]
+        await asyncio.sleep(0.1)
+        assert inner.batches == [["0", "1", "2"], ["3"]]
+        await producer.close()
+
+    asyncio.run(run())
+
+
+def test_single_message_is_flushed_after_delay() -> None:
+    """Test that a message uploaded to an idle producer waits max_delay at most."""
+
+    async def run() -> None:
+        inner = RecordingProducer()
+        producer = BufferedMessageProducer(inner, max_batch=100, max_delay=0.01)
+        await producer.start()
+        await asyncio.sleep(0.02)
+        await producer.upload(make_msgs(1)[0])
+        await asyncio.sleep(0.05)
+        assert inner.batches == [["0"]]
+        await producer.upload(make_msgs(2)[1])
+        await asyncio.sleep(0.05)
+        assert inner.batches == [["0"], ["1"]]
+        await producer.close()
+
+    asyncio.run(run())
+
+
+def test_backpressure_and_flush_on_close() -> None:
+    """Test that upload waits for a full buffer and close uploads the rest."""
+
+    async def run() -> None:
+        inner = RecordingProducer()
+        producer = BufferedMessageProducer(inner, max_batch=2, max_buffer=2)
+        await producer.upload_many(make_msgs(2))
+
+        upload = asyncio.create_task(producer.upload(make_msgs(3)[2]))
+        await asyncio.sleep(0.01)
+        assert not upload.done()
+
+        await producer.flush()
+        await upload
+        await producer.close()
+        assert inner.batches == [["0", "1"], ["2"]]
+        assert len(producer) == 0
+
+    asyncio.run(run())
+
+
+def test_failed_flush_is_retried() -> None:
+    """Test that the messages of a failed flush are uploaded later."""
+
+    async def run() -> None:
+        inner = RecordingProducer(failures=1)
+        producer = BufferedMessageProducer(
+            inner, max_batch=2, max_delay=0.01, retry_delay=0.01
+        )
+        await producer.start()
+        await producer.upload_many(make_msgs(2))
+        await asyncio.sleep(0.05)
+        await producer.close()
+        assert inner.batches == [["0", "1"]]
+
+    asyncio.run(run())
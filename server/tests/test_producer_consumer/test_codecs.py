@@ -0,0 +1,95 @@
+"""The module responsible for testing the codecs of the queue payloads."""
+
+import json
+import struct
+import zlib
+
+import pytest
+
+from producer_consumer.codecs.versioned_codec import (
+    get_message_codec,
+    get_moderation_result_codec,
+)
+from schemas.messages import MessageSchema, ModerationResultSchema
+
+
+@pytest.mark.parametrize("text", ["привет", "", "длинный текст " * 100])
+def test_binary_message_round_trip(text: str) -> None:
+    """Test that the message is encoded and decoded without changes."""
+    codec = get_message_codec("binary", compress_threshold=64)
+    msg = MessageSchema(
+        "42",
+        text,
+        attempt=3,
+        chat_id="-100",
+        reply_to="q:a",
+        user_id="7",
+        enqueued_at=1700000000.25,
+        deadline=1700003600.25,
+    )
+
+    data = codec.encode(msg)
+
+    assert codec.decode(data) == msg
+    assert len(data) < len(get_message_codec("json").encode(msg))
+
+
+def test_binary_result_is_compact() -> None:
+    """Test that the moderation result is packed into a few bytes."""
+    codec = get_moderation_result_codec("binary")
+    result = ModerationResultSchema("42", generated_by_llm=True, toxic=False)
+
+    data = codec.encode(result)
+
+    assert codec.decode(data) == result
+    assert len(data) == 10
+
+
+def test_formats_coexist_during_rollout() -> None:
+    """Test that every codec reads the old JSON and the binary payloads."""
+    msg = MessageSchema("1", "text", chat_id="-1")
+    old_payload = json.dumps({"id": "1", "text": "text", "attempt": 0})
+    newer_payload = json.dumps(
+        {"id": "1", "text": "text", "attempt": 0, "chat_id": "-1", "extra": 1}
+    )
+
+    for codec in (get_message_codec("json"), get_message_codec("binary")):
+        assert codec.decode(old_payload.encode()) == MessageSchema("1", "text")
+        assert codec.decode(newer_payload) == msg
+        assert codec.decode(get_message_codec("binary").encode(msg)) == msg
+    with pytest.raises(ValueError):
+        get_message_codec().decode(b"\x07garbage")
+
+
+def test_payload_with_unknown_flags_is_rejected() -> None:
+    """Test that a payload of an unknown layout is not misread as the text."""
+    data = bytearray(get_message_codec("binary").encode(MessageSchema("1", "text")))
+    data[1] |= 0x80
+
+    with pytest.raises(ValueError):
+        get_message_codec().decode(bytes(data))
+
+
+def test_payloads_of_previous_binary_versions_are_decoded() -> None:
+    """Test that the payload without the user id and times is read as version 1."""
+    text = "длинный текст " * 100
+    old_payload = b"".join(
+        [
+            # version 1, compressed, attempt 2
+            struct.pack("<BBI", 1, 1, 2),
+            *(struct.pack("<H", len(value)) + value for value in (b"42", b"-1", b"")),
+            zlib.compress(text.encode()),
+        ]
+    )
+    msg = MessageSchema("42", text, attempt=2, chat_id="-1", user_id="7", deadline=1)
+    new_payload = get_message_codec("binary").encode(msg)
+
+    assert new_payload[0] == 2
+    for codec in (get_message_codec("json"), get_message_codec("binary")):
+        assert codec.decode(old_payload) == MessageSchema(
+            "42", text, attempt=2, chat_id="-1"
+        )
+        assert codec.decode(new_payload) == msg
+    # version 1 had no user id, so the flag is not read as one
+    with pytest.raises(ValueError):
+        get_message_codec().decode(bytes([1, 2]) + old_payload[2:])
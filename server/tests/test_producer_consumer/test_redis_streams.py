@@ -0,0 +1,53 @@
+"""The module responsible for testing the consumer of Redis Streams."""
+
+import asyncio
+from typing import Any, List, Tuple
+
+from producer_consumer.redis_streams import RedisStreamConsumer
+
+
+class PendingStreamClient(object):
+    """Redis client with a consumer group whose entries are all pending."""
+
+    def __init__(self, pending: int):
+        """Init class with the pending entries of a crashed consumer."""
+        self.pending: List[Tuple[bytes, dict]] = [
+            (f"1-{i}".encode(), {b"data": str(i).encode()}) for i in range(pending)
+        ]
+        self.claims: List[int] = []
+
+    async def xgroup_create(self, *args, **kwargs) -> None:
+        """Create the group."""
+        pass
+
+    async def xautoclaim(
+        self, name, group, consumer, min_idle_time, start_id, count
+    ) -> List[Any]:
+        """Return up to count pending entries from start_id with the next cursor."""
+        self.claims.append(count)
+        start: int = 0 if start_id == "0-0" else int(start_id.split("-")[1])
+        stop: int = min(start + count, len(self.pending))
+        entries = self.pending[start:stop]
+        cursor: bytes = b"0-0" if stop == len(self.pending) else f"1-{stop}".encode()
+        return [cursor, entries, []]
+
+    async def xreadgroup(self, *args, **kwargs) -> List[Any]:
+        """Return no new entries."""
+        return []
+
+
+def test_pending_entries_are_reclaimed_in_one_pass() -> None:
+    """Test that all pending entries of a crashed consumer are reclaimed at once."""
+    client = PendingStreamClient(pending=250)
+    consumer: RedisStreamConsumer[bytes] = RedisStreamConsumer(
+        client,  # type: ignore[arg-type]
+        "messages",
+        "moderation",
+        decode=lambda data: data if isinstance(data, bytes) else data.encode(),
+        claim_idle=60,
+    )
+
+    items = asyncio.run(consumer.extract_many(1000))
+
+    assert items == [str(i).encode() for i in range(250)]
+    assert client.claims == [100, 100, 100]
@@ -0,0 +1,91 @@
+"""The module responsible for testing the hedged requests to LLM."""
+
+import asyncio
+from typing import List
+
+import pytest
+
+from server.config.app_config import HedgingConfig
+from server.services.api.llm.base import BaseLLMAPI, LLMResponse
+from server.services.api.llm.hedging import HedgedLLMAPI
+from server.services.prompts import Prompt
+
+
+@pytest.fixture(scope="function")
+def hedging_config() -> HedgingConfig:
+    """Get config hedging after the median latency of 4 requests."""
+    return HedgingConfig(
+        enabled=True,
+        percentile=0.5,
+        min_delay=0.01,
+        budget=0.5,
+        max_burst=1,
+        samples=4,
+        min_samples=4,
+    )
+
+
+class SlowLLMAPI(BaseLLMAPI):
+    """LLM API answering with the given latency of every request."""
+
+    def __init__(self, latencies: List[float]):
+        """Init class."""
+        self.latencies = latencies
+        self.requests = 0
+        self.cancelled = 0
+
+    async def auth(self) -> None:
+        """Auth to LLM API."""
+        pass
+
+    async def send_prompts(self, chat: List[Prompt]) -> LLMResponse:
+        """Answer with the number of the request after its latency."""
+        self.requests += 1
+        number: int = self.requests
+        try:
+            await asyncio.sleep(self.latencies[(number - 1) % len(self.latencies)])
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return LLMResponse([Prompt(role="assistant", text=str(number))])
+
+
+def test_slow_request_is_hedged(hedging_config: HedgingConfig) -> None:
+    """Test that the hedge answers first and the slow request is cancelled."""
+
+    async def run() -> None:
+        llm_api = SlowLLMAPI([0.01, 0.01, 0.01, 0.01, 1, 0.01])
+        api = HedgedLLMAPI(llm_api, hedging_config)
+        chat: List[Prompt] = [Prompt(role="user", text="test")]
+        for _ in range(4):
+            await api.send_prompts(chat)
+        assert api.delay is not None
+
+        loop = asyncio.get_running_loop()
+        start: float = loop.time()
+        response: LLMResponse = await api.send_prompts(chat)
+        assert response.answers[0].text == "6"
+        assert loop.time() - start < 0.5
+        assert llm_api.requests == 6
+        await asyncio.sleep(0)
+        assert llm_api.cancelled == 1
+
+    asyncio.run(run())
+
+
+def test_hedges_are_limited_by_budget(hedging_config: HedgingConfig) -> None:
+    """Test that a hedge is sent only after the budget is earned."""
+
+    async def run() -> None:
+        llm_api = SlowLLMAPI([0.01, 0.01, 0.01, 0.01, 0.1])
+        api = HedgedLLMAPI(llm_api, hedging_config)
+        chat: List[Prompt] = [Prompt(role="user", text="test")]
+        for _ in range(4):
+            await api.send_prompts(chat)
+        llm_api.latencies = [0.1]
+        # with the budget of 0.5 every second slow request is hedged
+        for _ in range(4):
+            await api.send_prompts(chat)
+        assert llm_api.requests == 4 + 4 + 2
+
+    asyncio.run(run())
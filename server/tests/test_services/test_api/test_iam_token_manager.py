@@ -0,0 +1,56 @@
+"""The module responsible for testing iam_token_manager.py."""
+
+import asyncio
+import time
+from typing import List
+
+from server.services.api.iam_token_manager import IAMToken, IAMTokenManager
+
+
+class TokenFetcher(object):
+    """Fetcher of numbered tokens that counts the requests."""
+
+    def __init__(self, lifetime: float = 3600):
+        """Init class."""
+        self.lifetime = lifetime
+        self.requests: int = 0
+
+    async def __call__(self) -> IAMToken:
+        """Return a new token."""
+        self.requests += 1
+        await asyncio.sleep(0.01)
+        return IAMToken(f"token-{self.requests}", time.time() + self.lifetime)
+
+
+def test_concurrent_refreshes_collapse() -> None:
+    """Test that the token is requested once for all waiting coroutines."""
+    fetcher = TokenFetcher()
+    manager = IAMTokenManager(fetcher)
+
+    async def run() -> List[str]:
+        tokens = await asyncio.gather(*(manager.get_token() for _ in range(10)))
+        await asyncio.gather(*(manager.refresh(stale="token-1") for _ in range(10)))
+        # the rejected token has already been refreshed
+        await manager.refresh(stale="token-1")
+        return list(tokens) + [await manager.get_token()]
+
+    tokens = asyncio.run(run())
+
+    assert fetcher.requests == 2
+    assert tokens == ["token-1"] * 10 + ["token-2"]
+
+
+def test_token_is_refreshed_in_background_before_expiration() -> None:
+    """Test that the background task replaces the token before it expires."""
+    fetcher = TokenFetcher(lifetime=0.2)
+    manager = IAMTokenManager(fetcher, refresh_margin=0.1)
+
+    async def run() -> str:
+        await manager.start()
+        try:
+            await asyncio.sleep(0.25)
+            return await manager.get_token()
+        finally:
+            await manager.close()
+
+    assert asyncio.run(run()) != "token-1"
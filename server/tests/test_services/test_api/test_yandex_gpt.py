@@ -1,31 +1,89 @@
 """The module responsible for testing the work with the Yandex GPT API."""
 
+import asyncio
+from dataclasses import replace
 from typing import List
 
 import pytest
+from aiohttp import web
 
 from server.config.app_config import Config
 from server.services.api.llm.yandex_gpt import YandexGPTAPI
+from server.services.excs import APIException
 from server.services.prompts import Prompt
 
 
 def test_yandex_gpt_auth(config: Config):
     """Test authentication."""
-    try:
+
+    async def auth() -> None:
         llm_api = YandexGPTAPI(config)
-        llm_api.auth()
+        try:
+            await llm_api.auth()
+        finally:
+            await llm_api.close()
+
+    try:
+        asyncio.run(auth())
     except Exception as exc:
         pytest.fail(str(exc))
 
 
 def test_send_simple_prompt(config: Config, simple_prompt: Prompt):
     """Test sending simple prompt."""
-    try:
+
+    async def send_prompt() -> List[Prompt]:
         llm_api = YandexGPTAPI(config)
-        llm_api.auth()
+        try:
+            await llm_api.auth()
+            return (await llm_api.send_prompts([simple_prompt])).answers
+        finally:
+            await llm_api.close()
 
-        answers: List[Prompt] = llm_api.send_prompts([simple_prompt])
+    try:
+        answers: List[Prompt] = asyncio.run(send_prompt())
         for answer in answers:
             print(answer.text)
     except Exception as exc:
         pytest.fail(str(exc))
+
+
+@pytest.mark.parametrize(
+    "body",
+    ["<html>Bad Gateway</html>", '{"result": {}}', '{"result": {"usage": []}}'],
+)
+def test_malformed_response_raises_api_exception(config: Config, body: str):
+    """Test that a 200 response with an unexpected body raises APIException."""
+
+    async def handle(request: web.Request) -> web.Response:
+        if request.path == "/iam":
+            return web.json_response({"iamToken": "token"})
+        return web.Response(text=body)
+
+    async def send_prompt() -> None:
+        app = web.Application()
+        app.router.add_post("/{path}", handle)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port: int = runner.addresses[0][1]
+        llm_api = YandexGPTAPI(
+            replace(
+                config,
+                yandex_gpt=replace(
+                    config.yandex_gpt,
+                    completion_url=f"http://127.0.0.1:{port}/completion",
+                    iam_url=f"http://127.0.0.1:{port}/iam",
+                ),
+            )
+        )
+        try:
+            await llm_api.send_prompts([Prompt(role="user", text="text")])
+        finally:
+            await llm_api.close()
+            await runner.cleanup()
+
+    with pytest.raises(APIException) as exc_info:
+        asyncio.run(send_prompt())
+    assert exc_info.value.status_code == 200
@@ -0,0 +1,119 @@
+"""The module responsible for testing the circuit breakers."""
+
+import asyncio
+from typing import List
+
+import pytest
+
+from server.config.app_config import CircuitBreakerConfig
+from server.services.api.llm.base import BaseLLMAPI, LLMResponse
+from server.services.api.llm.circuit_breaker import CircuitBreakerLLMAPI
+from server.services.circuit_breakers.base import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreakerState,
+)
+from server.services.circuit_breakers.local_breaker import LocalCircuitBreaker
+from server.services.excs import APIException, CircuitOpen, TooManyRequests
+from server.services.prompts import Prompt
+
+
+@pytest.fixture(scope="function")
+def breaker_config() -> CircuitBreakerConfig:
+    """Get config opening the circuit at a half of 4 requests failed."""
+    return CircuitBreakerConfig(
+        enabled=True,
+        backend="local",
+        window=60,
+        min_requests=4,
+        failure_rate=0.5,
+        slow_call=0,
+        open_duration=30,
+        probes=2,
+        open_path="park",
+        fallback_model="",
+    )
+
+
+def test_circuit_opens_and_closes_after_probes(
+    breaker_config: CircuitBreakerConfig,
+) -> None:
+    """Test the transitions closed -> open -> half-open -> closed."""
+    state = CircuitBreakerState()
+    for failure in (False, True, False, True):
+        assert state.allow(breaker_config, 100.0) == 0
+        state.record(breaker_config, 100.0, failure)
+    assert state.state == OPEN
+    assert state.allow(breaker_config, 110.0) == pytest.approx(20)
+
+    # only the probes are let through
+    assert state.allow(breaker_config, 130.0) == 0
+    assert state.allow(breaker_config, 130.0) == 0
+    assert state.state == HALF_OPEN
+    assert state.allow(breaker_config, 131.0) > 0
+    state.record(breaker_config, 131.0, False)
+    state.record(breaker_config, 131.0, False)
+    assert state.state == CLOSED
+
+
+def test_failed_probe_opens_circuit_again(
+    breaker_config: CircuitBreakerConfig,
+) -> None:
+    """Test that the circuit opens again after a failed probe."""
+    state = CircuitBreakerState(state=OPEN, opened_at=100.0)
+    assert state.allow(breaker_config, 130.0) == 0
+    state.record(breaker_config, 131.0, True)
+    assert state.state == OPEN
+    assert state.allow(breaker_config, 140.0) == pytest.approx(21)
+
+
+def test_failures_are_counted_in_window(breaker_config: CircuitBreakerConfig) -> None:
+    """Test that the failures of the previous window are forgotten."""
+    state = CircuitBreakerState()
+    for now, failure in ((100.0, True), (100.0, True), (161.0, False), (161.0, True)):
+        state.allow(breaker_config, now)
+        state.record(breaker_config, now, failure)
+    assert state.state == CLOSED
+
+
+class FailingLLMAPI(BaseLLMAPI):
+    """LLM API raising the given exceptions."""
+
+    def __init__(self, errors: List[Exception]):
+        """Init class."""
+        self.errors = errors
+        self.requests = 0
+
+    async def auth(self) -> None:
+        """Auth to LLM API."""
+        pass
+
+    async def send_prompts(self, chat: List[Prompt]) -> LLMResponse:
+        """Raise the next exception."""
+        self.requests += 1
+        raise self.errors[(self.requests - 1) % len(self.errors)]
+
+
+def test_open_circuit_rejects_requests(breaker_config: CircuitBreakerConfig) -> None:
+    """Test that 5xx open the circuit and 429 is not counted as a failure."""
+
+    async def run() -> None:
+        llm_api = FailingLLMAPI(
+            [
+                APIException("test", 500),
+                TooManyRequests("test"),
+                APIException("test", 0),
+            ]
+        )
+        api = CircuitBreakerLLMAPI(llm_api, LocalCircuitBreaker(breaker_config))
+        for _ in range(4):
+            with pytest.raises(APIException) as exc_info:
+                await api.send_prompts([])
+            assert not isinstance(exc_info.value, CircuitOpen)
+        with pytest.raises(CircuitOpen) as exc_info:
+            await api.send_prompts([])
+        assert exc_info.value.retry_after == pytest.approx(30, abs=1)
+        assert llm_api.requests == 4
+
+    asyncio.run(run())
@@ -0,0 +1,98 @@
+"""The module responsible for testing the local classifier."""
+
+import asyncio
+from dataclasses import replace
+from typing import List
+
+import pytest
+
+from schemas.messages import MessageSchema, ModerationResultSchema
+from server.services.classifiers.linear import LinearClassifier, Verdict, train
+from server.services.classifiers.local_store import LocalClassifierStore
+from server.services.moderators.base import BaseModerator
+from server.services.moderators.classifier_moderator import ClassifierModerator
+
+
+@pytest.fixture(scope="module")
+def verdicts() -> List[Verdict]:
+    """Get the verdicts on the ordinary, toxic and generated messages."""
+    result: List[Verdict] = []
+    for n in range(100):
+        result.append(Verdict(f"Привет) Чем занят вечером? {n}", False, False))
+        result.append(Verdict(f"Ты вообще тупой? Уже {n} раз объясняю", False, True))
+        result.append(
+            Verdict(
+                f"Здравствуйте! Благодарю вас за ваш вопрос номер {n}.", True, False
+            )
+        )
+    return result
+
+
+class HumanModerator(BaseModerator):
+    """Moderator that marks every message as written by a human."""
+
+    def __init__(self):
+        """Init class."""
+        self.texts: List[str] = []
+
+    async def moderate(self, msg: MessageSchema) -> ModerationResultSchema:
+        """Moderate msg."""
+        self.texts.append(msg.text)
+        return ModerationResultSchema(msg.id, generated_by_llm=False, toxic=False)
+
+
+def test_classifier_learns_verdicts(verdicts: List[Verdict]) -> None:
+    """Test that the trained model repeats the verdicts and survives JSON."""
+    model = train(verdicts, version="1", dim=2**12)
+    restored = LinearClassifier.from_json(model.to_json())
+
+    toxic = restored.predict("Ты вообще тупой? Уже 1000 раз объясняю")
+    generated = restored.predict("Здравствуйте! Благодарю вас за ваш вопрос номер 7.")
+
+    assert toxic["toxic"] > 0.9 and toxic["generated_by_llm"] < 0.1
+    assert generated["generated_by_llm"] > 0.9 and generated["toxic"] < 0.1
+    assert restored.predict("Привет) Чем занят") == model.predict("Привет) Чем занят")
+
+
+def test_stage_answers_after_model_is_activated(verdicts: List[Verdict]) -> None:
+    """Test that the verdicts are logged and the activated model is hot-reloaded."""
+
+    async def run() -> None:
+        store = LocalClassifierStore()
+        next_moderator = HumanModerator()
+        moderator = ClassifierModerator(
+            next_moderator, store, threshold=0.9, audit_rate=0, reload_interval=0
+        )
+        msg = MessageSchema("1", "Ты вообще тупой? Уже 1000 раз объясняю")
+
+        assert await moderator.moderate(msg) == ModerationResultSchema(
+            "1", False, False
+        )
+        assert await store.count_verdicts() == 1
+
+        await store.save_model(train(verdicts, version="1", dim=2**12))
+        await store.activate("1")
+
+        assert await moderator.moderate(msg) == ModerationResultSchema("1", False, True)
+        assert moderator.version == "1"
+        assert next_moderator.texts == [msg.text]
+
+    asyncio.run(run())
+
+
+def test_store_keeps_active_version(verdicts: List[Verdict]) -> None:
+    """Test that the old versions are dropped except the active one."""
+
+    async def run() -> None:
+        store = LocalClassifierStore(keep_versions=1)
+        model = train(verdicts[:3], version="1", dim=2**8, epochs=1)
+        await store.save_model(model)
+        await store.activate("1")
+        for version in ("2", "3"):
+            await store.save_model(replace(model, version=version))
+
+        assert await store.versions() == ["1", "3"]
+        with pytest.raises(KeyError):
+            await store.activate("2")
+
+    asyncio.run(run())
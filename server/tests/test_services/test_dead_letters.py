@@ -0,0 +1,86 @@
+"""The module responsible for testing the dead-letter queue and its replay."""
+
+import asyncio
+import time
+from typing import List
+
+from producer_consumer.messages.base import BaseMessageProducer
+from schemas.messages import MessageSchema
+from server.services.dead_letters.base import DeadLetter
+from server.services.dead_letters.local_dlq import LocalDeadLetterQueue
+from server.services.dead_letters.replay import DeadLetterReplayer
+
+
+class ListMessageProducer(BaseMessageProducer):
+    """Message producer into a list."""
+
+    def __init__(self):
+        """Init class."""
+        self.msgs: List[MessageSchema] = []
+
+    async def upload(self, msg: MessageSchema) -> None:
+        """Upload message."""
+        self.msgs.append(msg)
+
+
+def make_letter(msg_id: str, error: str, age: float) -> DeadLetter:
+    """Return the letter of the message failed age seconds ago."""
+    return DeadLetter(
+        msg=MessageSchema(id=msg_id, text="text", attempt=3, deadline=1.0),
+        error=error,
+        attempt=3,
+        failed_at=time.time() - age,
+    )
+
+
+def test_letter_json_round_trip() -> None:
+    """Test that the letter is restored from JSON without changes."""
+    letter = make_letter("1", "PromptError", age=0)
+
+    assert DeadLetter.from_json(letter.to_json()) == letter
+
+
+def test_replay_filters_by_error_and_age() -> None:
+    """Test that only the matching letters are replayed with their retries back."""
+
+    async def run() -> None:
+        dead_letters = LocalDeadLetterQueue()
+        for letter in (
+            make_letter("old", "TooManyRequests", age=7200),
+            make_letter("new", "TooManyRequests", age=10),
+            make_letter("prompt", "PromptError", age=10),
+        ):
+            await dead_letters.put(letter)
+        producer = ListMessageProducer()
+        replayer = DeadLetterReplayer(dead_letters, producer, rate=0)
+
+        replayed = await replayer.replay(
+            errors=["TooManyRequests"], max_age=3600, drop_deadline=True
+        )
+
+        assert replayed == 1
+        assert [(msg.id, msg.attempt, msg.deadline) for msg in producer.msgs] == [
+            ("new", 0, 0.0)
+        ]
+        assert await dead_letters.count() == {"TooManyRequests": 1, "PromptError": 1}
+
+    asyncio.run(run())
+
+
+def test_replay_is_rate_limited() -> None:
+    """Test that the letters are put back not faster than the rate."""
+
+    async def run() -> None:
+        dead_letters = LocalDeadLetterQueue()
+        for i in range(4):
+            await dead_letters.put(make_letter(str(i), "PromptError", age=0))
+        producer = ListMessageProducer()
+        replayer = DeadLetterReplayer(dead_letters, producer, rate=100, batch_size=2)
+
+        start = time.monotonic()
+        await replayer.replay()
+
+        assert len(producer.msgs) == 4
+        assert time.monotonic() - start >= 0.03
+
+    asyncio.run(run())
@@ -0,0 +1,413 @@
+"""The module responsible for testing the module moderation.py."""
+
+import asyncio
+from collections import defaultdict
+from typing import Dict, List
+
+from producer_consumer.messages.base import BaseMessageConsumer, BaseMessageProducer
+from producer_consumer.moderation_results.base import BaseModerationResultProducer
+from producer_consumer.moderation_results.routing import (
+    RoutingModerationResultProducer,
+)
+from schemas.messages import MessageSchema, ModerationResultSchema
+from server.services.dead_letters.local_dlq import LocalDeadLetterQueue
+from server.services.dead_letters.replay import DeadLetterReplayer
+from server.services.excs import TooManyRequests
+from server.services.moderation import MODERATION_MESSAGES, ModerationManager
+from server.services.moderators.base import BaseModerator, ModerationOutcome
+from server.services.schedulers.local_scheduler import LocalRetryScheduler
+
+
+class QueueMessageConsumer(BaseMessageConsumer):
+    """Message consumer over asyncio.Queue, blocks when the queue is empty."""
+
+    def __init__(self, msgs: List[MessageSchema]):
+        """Init class."""
+        self.msgs: asyncio.Queue[MessageSchema] = asyncio.Queue()
+        for msg in msgs:
+            self.msgs.put_nowait(msg)
+        self.acked: List[str] = []
+
+    async def extract(self) -> MessageSchema:
+        """Extract message."""
+        return await self.msgs.get()
+
+    async def ack(self, msg: MessageSchema) -> None:
+        """Acknowledge message."""
+        self.acked.append(msg.id)
+
+
+class QueueMessageProducer(BaseMessageProducer):
+    """Message producer into the queue of QueueMessageConsumer."""
+
+    def __init__(self, consumer: QueueMessageConsumer):
+        """Init class."""
+        self.consumer = consumer
+
+    async def upload(self, msg: MessageSchema) -> None:
+        """Upload message."""
+        self.consumer.msgs.put_nowait(msg)
+
+
+class ListModerationResultProducer(BaseModerationResultProducer):
+    """Moderation results producer into a list."""
+
+    def __init__(self):
+        """Init class."""
+        self.results: List[ModerationResultSchema] = []
+
+    async def upload(self, mod_result: ModerationResultSchema) -> None:
+        """Upload moderation result."""
+        self.results.append(mod_result)
+
+
+class FlakyModerationResultProducer(ListModerationResultProducer):
+    """Moderation results producer that fails on the given messages."""
+
+    def __init__(self, failing_ids: List[str]):
+        """Init class."""
+        super().__init__()
+        self.failing_ids = failing_ids
+
+    async def upload(self, mod_result: ModerationResultSchema) -> None:
+        """Upload moderation result."""
+        if mod_result.msg_id in self.failing_ids:
+            raise ConnectionError("Redis is unavailable")
+        await super().upload(mod_result)
+
+
+class SlowModerator(BaseModerator):
+    """Moderator that answers after a delay and counts simultaneous calls."""
+
+    def __init__(self, delay: float):
+        """Init class."""
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def moderate(self, msg: MessageSchema) -> ModerationResultSchema:
+        """Moderate msg."""
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(self.delay)
+        self.in_flight -= 1
+        return ModerationResultSchema(msg.id, False, False)
+
+
+def test_concurrency_is_bounded_and_stop_drains() -> None:
+    """Test that no more than concurrency msgs are moderated and stop waits them."""
+    msgs = [MessageSchema(id=str(i), text="text") for i in range(10)]
+    consumer = QueueMessageConsumer(msgs)
+    producer = ListModerationResultProducer()
+    moderator = SlowModerator(delay=0.05)
+    manager = ModerationManager(consumer, producer, moderator, concurrency=3)
+
+    async def run() -> None:
+        task = asyncio.create_task(manager.run())
+        await asyncio.sleep(0.01)
+        # only the free slots are taken out of the queue
+        assert consumer.msgs.qsize() == 7
+        manager.stop()
+        await task
+
+    asyncio.run(run())
+
+    assert moderator.max_in_flight == 3
+    assert sorted(result.msg_id for result in producer.results) == ["0", "1", "2"]
+
+
+class OverloadedModerator(BaseModerator):
+    """Moderator that raises TooManyRequests the given number of times."""
+
+    def __init__(self, failures: int):
+        """Init class."""
+        self.failures = failures
+        self.attempts: List[int] = []
+
+    async def moderate(self, msg: MessageSchema) -> ModerationResultSchema:
+        """Moderate msg."""
+        self.attempts.append(msg.attempt)
+        if self.failures > 0:
+            self.failures -= 1
+            raise TooManyRequests(service_name="test")
+        return ModerationResultSchema(msg.id, False, False)
+
+
+def make_scheduler(
+    consumer: QueueMessageConsumer, max_num_retries: int
+) -> LocalRetryScheduler:
+    """Get a local retry scheduler with short delays."""
+    return LocalRetryScheduler(
+        msg_producer=QueueMessageProducer(consumer),
+        delay_limits=(0.01, 0.01),
+        delay_denominator=2,
+        max_num_retries=max_num_retries,
+    )
+
+
+def run_until_results(manager: ModerationManager, timeout: float) -> None:
+    """Run the manager for timeout seconds and stop it."""
+
+    async def run() -> None:
+        task = asyncio.create_task(manager.run())
+        await asyncio.sleep(timeout)
+        manager.stop()
+        await task
+
+    asyncio.run(run())
+
+
+def test_overloaded_msg_is_retried_with_backoff_state_in_msg() -> None:
+    """Test that the msg is retried through the scheduler with increasing attempt."""
+    consumer = QueueMessageConsumer([MessageSchema(id="1", text="text")])
+    producer = ListModerationResultProducer()
+    moderator = OverloadedModerator(failures=2)
+    manager = ModerationManager(
+        consumer,
+        producer,
+        moderator,
+        retry_scheduler=make_scheduler(consumer, max_num_retries=3),
+    )
+
+    run_until_results(manager, timeout=0.2)
+
+    assert moderator.attempts == [0, 1, 2]
+    assert [result.msg_id for result in producer.results] == ["1"]
+
+
+def test_msg_is_dropped_when_retries_are_exhausted() -> None:
+    """Test that the msg is not retried more than max_num_retries times."""
+    consumer = QueueMessageConsumer([MessageSchema(id="1", text="text")])
+    producer = ListModerationResultProducer()
+    moderator = OverloadedModerator(failures=10)
+    manager = ModerationManager(
+        consumer,
+        producer,
+        moderator,
+        retry_scheduler=make_scheduler(consumer, max_num_retries=1),
+    )
+
+    run_until_results(manager, timeout=0.2)
+
+    assert moderator.attempts == [0, 1]
+    assert producer.results == []
+
+
+class CrashingRetryScheduler(LocalRetryScheduler):
+    """Retry scheduler whose first run fails."""
+
+    def __init__(self, *args, **kwargs):
+        """Init class."""
+        super().__init__(*args, **kwargs)
+        self.runs = 0
+
+    async def run(self) -> None:
+        """Fail the first time, then move the delayed messages."""
+        self.runs += 1
+        if self.runs == 1:
+            raise ConnectionError("Redis is unavailable")
+        await super().run()
+
+
+def test_failed_scheduler_is_restarted() -> None:
+    """Test that the retries are delivered after the scheduler failed."""
+    consumer = QueueMessageConsumer([MessageSchema(id="1", text="text")])
+    producer = ListModerationResultProducer()
+    scheduler = CrashingRetryScheduler(
+        msg_producer=QueueMessageProducer(consumer),
+        delay_limits=(0.01, 0.01),
+        delay_denominator=2,
+        max_num_retries=3,
+    )
+    manager = ModerationManager(
+        consumer,
+        producer,
+        OverloadedModerator(failures=1),
+        retry_scheduler=scheduler,
+        scheduler_restart_delay=0.01,
+    )
+
+    run_until_results(manager, timeout=0.2)
+
+    assert scheduler.runs == 2
+    assert [result.msg_id for result in producer.results] == ["1"]
+
+
+def test_exhausted_msg_is_dead_lettered_and_replayed() -> None:
+    """Test that the dropped msg is kept in the dead letters and can be replayed."""
+    consumer = QueueMessageConsumer([MessageSchema(id="1", text="text")])
+    producer = ListModerationResultProducer()
+    dead_letters = LocalDeadLetterQueue()
+    manager = ModerationManager(
+        consumer,
+        producer,
+        OverloadedModerator(failures=2),
+        retry_scheduler=make_scheduler(consumer, max_num_retries=1),
+        dead_letters=dead_letters,
+    )
+
+    run_until_results(manager, timeout=0.2)
+
+    assert producer.results == []
+    assert asyncio.run(dead_letters.count()) == {"TooManyRequests": 1}
+
+    replayer = DeadLetterReplayer(dead_letters, QueueMessageProducer(consumer), rate=0)
+    assert asyncio.run(replayer.replay(errors=["TooManyRequests"])) == 1
+    run_until_results(manager, timeout=0.05)
+
+    assert [result.msg_id for result in producer.results] == ["1"]
+    assert asyncio.run(dead_letters.count()) == {"TooManyRequests": 0}
+
+
+class BatchRecordingModerator(BaseModerator):
+    """Moderator that records the sizes of the batches."""
+
+    def __init__(self):
+        """Init class."""
+        self.batch_sizes: List[int] = []
+
+    async def moderate(self, msg: MessageSchema) -> ModerationResultSchema:
+        """Moderate msg."""
+        self.batch_sizes.append(1)
+        return ModerationResultSchema(msg.id, False, False)
+
+    async def moderate_many(self, msgs: List[MessageSchema]) -> List[ModerationOutcome]:
+        """Moderate msgs."""
+        self.batch_sizes.append(len(msgs))
+        return [ModerationResultSchema(msg.id, False, False) for msg in msgs]
+
+
+def test_msgs_are_moderated_in_batches_with_flush_on_timeout() -> None:
+    """Test that full batches are sent at once and the rest after the timeout."""
+    msgs = [MessageSchema(id=str(i), text="text") for i in range(5)]
+    consumer = QueueMessageConsumer(msgs)
+    producer = ListModerationResultProducer()
+    moderator = BatchRecordingModerator()
+    manager = ModerationManager(
+        consumer, producer, moderator, batch_size=3, batch_timeout=0.05
+    )
+
+    run_until_results(manager, timeout=0.2)
+
+    assert moderator.batch_sizes == [3, 2]
+    assert sorted(result.msg_id for result in producer.results) == [
+        str(i) for i in range(5)
+    ]
+
+
+def test_msg_is_not_acked_if_result_is_not_uploaded() -> None:
+    """Test that only the messages with uploaded results are acknowledged."""
+    msgs = [MessageSchema(id=str(i), text="text") for i in range(3)]
+    consumer = QueueMessageConsumer(msgs)
+    producer = FlakyModerationResultProducer(failing_ids=["1"])
+    manager = ModerationManager(consumer, producer, SlowModerator(delay=0))
+
+    run_until_results(manager, timeout=0.05)
+
+    assert sorted(consumer.acked) == ["0", "2"]
+
+
+def test_results_are_routed_to_the_queues_of_the_msgs() -> None:
+    """Test that the results keep the chat and go to the queue of the msg."""
+    msgs = [
+        MessageSchema(
+            id="1", text="text", chat_id="-1", reply_to="moderation_results:a"
+        ),
+        MessageSchema(
+            id="1", text="text", chat_id="-2", reply_to="moderation_results:b"
+        ),
+        MessageSchema(id="2", text="text", chat_id="-3"),
+        MessageSchema(id="3", text="text", chat_id="-4", reply_to="other"),
+    ]
+    default = ListModerationResultProducer()
+    queues: Dict[str, ListModerationResultProducer] = defaultdict(
+        ListModerationResultProducer
+    )
+    producer = RoutingModerationResultProducer(default, queues.__getitem__)
+    manager = ModerationManager(
+        QueueMessageConsumer(msgs), producer, BatchRecordingModerator(), batch_size=4
+    )
+
+    run_until_results(manager, timeout=0.05)
+
+    assert [result.chat_id for result in queues["moderation_results:a"].results] == [
+        "-1"
+    ]
+    assert [result.chat_id for result in queues["moderation_results:b"].results] == [
+        "-2"
+    ]
+    # the results without reply_to or with a foreign queue go to the default queue
+    assert [result.chat_id for result in default.results] == ["-3", "-4"]
+    assert set(queues) == {"moderation_results:a", "moderation_results:b"}
+    assert sorted(producer.routes) == ["moderation_results:a", "moderation_results:b"]
+
+
+class FlakyMessageProducer(QueueMessageProducer):
+    """Message producer that fails the first upload."""
+
+    def __init__(self, consumer: QueueMessageConsumer):
+        """Init class."""
+        super().__init__(consumer)
+        self.failures = 1
+
+    async def upload(self, msg: MessageSchema) -> None:
+        """Upload message."""
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("Redis is unavailable")
+        await super().upload(msg)
+
+
+def test_local_scheduler_keeps_msg_when_upload_fails() -> None:
+    """Test that the delayed msg is uploaded again after a failed upload."""
+    consumer = QueueMessageConsumer([])
+    scheduler = LocalRetryScheduler(
+        msg_producer=FlakyMessageProducer(consumer),
+        delay_limits=(0.01, 0.01),
+        delay_denominator=2,
+        max_num_retries=3,
+        retry_delay=0.01,
+    )
+
+    async def run() -> None:
+        task = asyncio.create_task(scheduler.run())
+        await scheduler.schedule(MessageSchema(id="1", text="text"), 0)
+        msg = await asyncio.wait_for(consumer.msgs.get(), timeout=1)
+        task.cancel()
+        assert msg.id == "1"
+        assert len(scheduler) == 0
+
+    asyncio.run(run())
+
+
+def test_stop_before_run_is_not_lost() -> None:
+    """Test that run returns at once if stop is called before it."""
+    consumer = QueueMessageConsumer([MessageSchema(id="1", text="text")])
+    producer = ListModerationResultProducer()
+    manager = ModerationManager(consumer, producer, SlowModerator(delay=0))
+
+    async def run() -> None:
+        manager.stop()
+        await asyncio.wait_for(manager.run(), timeout=1)
+
+    asyncio.run(run())
+
+    assert producer.results == []
+
+
+def test_retried_msgs_are_not_counted_as_failed() -> None:
+    """Test that the msgs handed over to the retry scheduler are counted as retried."""
+    consumer = QueueMessageConsumer([MessageSchema(id="1", text="text")])
+    manager = ModerationManager(
+        consumer,
+        ListModerationResultProducer(),
+        OverloadedModerator(failures=10),
+        retry_scheduler=make_scheduler(consumer, max_num_retries=1),
+    )
+    retried: float = MODERATION_MESSAGES.get("retried")
+    failed: float = MODERATION_MESSAGES.get("failed")
+
+    run_until_results(manager, timeout=0.2)
+
+    assert MODERATION_MESSAGES.get("retried") - retried == 1
+    assert MODERATION_MESSAGES.get("failed") - failed == 1
@@ -0,0 +1,118 @@
+"""The module responsible for testing budget_moderator.py."""
+
+import asyncio
+from typing import Dict, List
+
+from schemas.messages import MessageSchema, ModerationResultSchema
+from server.config.app_config import TokenBudgetConfig
+from server.services.excs import ModerationSkipped
+from server.services.moderators.base import BaseModerator, ModerationOutcome
+from server.services.moderators.budget_moderator import BudgetModerator
+from server.services.token_budgets.base import split_tokens
+from server.services.token_budgets.local_budget import LocalTokenBudget
+
+
+class CleanModerator(BaseModerator):
+    """Moderator that marks every message as clean and counts the calls."""
+
+    def __init__(self):
+        """Init class."""
+        self.ids: List[str] = []
+
+    async def moderate(self, msg: MessageSchema) -> ModerationResultSchema:
+        """Moderate msg."""
+        self.ids.append(msg.id)
+        return ModerationResultSchema(msg.id, generated_by_llm=False, toxic=False)
+
+
+def make_budget(
+    modes: List, sample_rate: float = 0.5, trust_after: int = 2
+) -> LocalTokenBudget:
+    """Get the budget of 100 tokens per chat with the degradation modes."""
+    return LocalTokenBudget(
+        TokenBudgetConfig(
+            enabled=True,
+            backend="local",
+            window=3600,
+            limit=100,
+            chat_limits={"vip": 0},
+            modes=modes,
+            sample_rate=sample_rate,
+            trust_after=trust_after,
+            trust_ttl=3600,
+        )
+    )
+
+
+def test_chat_over_budget_is_paused() -> None:
+    """Test that only the chat over budget is not moderated in pause mode."""
+    budget = make_budget([(1.0, "pause")])
+    next_moderator = CleanModerator()
+    moderator = BudgetModerator(next_moderator, budget, sample_rate=0.5)
+    msgs = [
+        MessageSchema("1", "text", chat_id="a"),
+        MessageSchema("2", "text", chat_id="b"),
+        MessageSchema("3", "text", chat_id="vip"),
+    ]
+
+    async def run() -> List[ModerationOutcome]:
+        for chat_id in ("a", "vip"):
+            await budget.spend(chat_id, 100)
+        return await moderator.moderate_many(msgs)
+
+    outcomes = asyncio.run(run())
+
+    assert isinstance(outcomes[0], ModerationSkipped)
+    assert next_moderator.ids == ["2", "3"]
+    assert moderator.stats()["skipped_pause"] == 1
+
+
+def test_sample_mode_moderates_a_fraction() -> None:
+    """Test that about sample_rate of the messages are moderated in sample mode."""
+    budget = make_budget([(0.5, "sample")], sample_rate=0.25)
+    next_moderator = CleanModerator()
+    moderator = BudgetModerator(next_moderator, budget, sample_rate=0.25)
+    msgs = [MessageSchema(str(i), "text", chat_id="a") for i in range(1000)]
+
+    async def run() -> List[ModerationOutcome]:
+        await budget.spend("a", 60)
+        return await moderator.moderate_many(msgs)
+
+    asyncio.run(run())
+
+    assert 200 < len(next_moderator.ids) < 300
+
+
+def test_untrusted_mode_moderates_new_users() -> None:
+    """Test that only the users without enough clean verdicts are moderated."""
+    budget = make_budget([(1.0, "untrusted")], trust_after=2)
+    next_moderator = CleanModerator()
+    moderator = BudgetModerator(next_moderator, budget, sample_rate=0.5)
+
+    async def run() -> None:
+        for i in range(2):
+            msg = MessageSchema(f"old{i}", "t", chat_id="a", user_id="1")
+            await moderator.moderate(msg)
+        await budget.spend("a", 100)
+        await moderator.moderate(MessageSchema("new", "t", chat_id="a", user_id="2"))
+        try:
+            await moderator.moderate(MessageSchema("x", "t", chat_id="a", user_id="1"))
+        except ModerationSkipped:
+            pass
+
+    asyncio.run(run())
+
+    assert next_moderator.ids == ["old0", "old1", "new"]
+
+
+def test_split_tokens_between_chats() -> None:
+    """Test that the tokens of a batch are split by the length of the texts."""
+    msgs = [
+        MessageSchema("1", "a" * 29, chat_id="a"),
+        MessageSchema("2", "b" * 9, chat_id="b"),
+        MessageSchema("3", "c" * 59, chat_id="a"),
+    ]
+
+    shares: Dict[str, int] = split_tokens(101, msgs)
+
+    assert shares == {"a": 91, "b": 10}
@@ -0,0 +1,110 @@
+"""The module responsible for testing cached_moderator.py."""
+
+import asyncio
+from typing import List
+
+from schemas.messages import MessageSchema, ModerationResultSchema
+from server.services.excs import ModerationSkipped
+from server.services.moderators.base import BaseModerator, ModerationOutcome
+from server.services.moderators.cached_moderator import CachedModerator
+from server.services.verdict_caches.lru_cache import LRUVerdictCache
+from server.services.verdict_caches.two_level_cache import TwoLevelVerdictCache
+
+
+class CountingModerator(BaseModerator):
+    """Moderator that marks every message as toxic and counts the calls."""
+
+    def __init__(self):
+        """Init class."""
+        self.texts: List[str] = []
+
+    async def moderate(self, msg: MessageSchema) -> ModerationResultSchema:
+        """Moderate msg."""
+        self.texts.append(msg.text)
+        await asyncio.sleep(0.01)
+        return ModerationResultSchema(msg.id, generated_by_llm=False, toxic=True)
+
+
+def make_moderator(local_size: int = 10):
+    """Get the cached moderator and the moderator behind it."""
+    next_moderator = CountingModerator()
+    cache = TwoLevelVerdictCache(LRUVerdictCache(local_size), shared=None)
+    return CachedModerator(next_moderator, cache), next_moderator, cache
+
+
+def test_normalized_equal_messages_hit_cache() -> None:
+    """Test that the messages equal after normalization are moderated once."""
+    moderator, next_moderator, cache = make_moderator()
+
+    async def run() -> List[ModerationResultSchema]:
+        first = await moderator.moderate(MessageSchema("1", "Hello  World"))
+        second = await moderator.moderate(MessageSchema("2", "hello\u200b world "))
+        return [first, second]
+
+    results = asyncio.run(run())
+
+    assert next_moderator.texts == ["Hello  World"]
+    assert [result.msg_id for result in results] == ["1", "2"]
+    assert cache.stats()["local_hits"] == 1
+    assert moderator.absorbed == 1
+
+
+def test_concurrent_equal_messages_are_moderated_once() -> None:
+    """Test that the equal messages moderated at the same time share one call."""
+    moderator, next_moderator, _ = make_moderator()
+    msgs = [MessageSchema(str(i), "spam") for i in range(5)]
+
+    async def run() -> List[ModerationResultSchema]:
+        return await asyncio.gather(*(moderator.moderate(msg) for msg in msgs))
+
+    results = asyncio.run(run())
+
+    assert next_moderator.texts == ["spam"]
+    assert [result.msg_id for result in results] == [msg.id for msg in msgs]
+
+
+def test_batch_dedup_and_lru_eviction() -> None:
+    """Test that a batch is deduplicated and old verdicts are evicted."""
+    moderator, next_moderator, cache = make_moderator(local_size=2)
+    msgs = [MessageSchema(str(i), text) for i, text in enumerate("abac")]
+
+    outcomes = asyncio.run(moderator.moderate_many(msgs))
+
+    assert next_moderator.texts == ["a", "b", "c"]
+    assert [outcome.msg_id for outcome in outcomes] == ["0", "1", "2", "3"]
+    assert cache.stats()["local_size"] == 2
+    assert cache.stats()["local_evictions"] == 1
+
+
+class ChatBudgetModerator(CountingModerator):
+    """Moderator that skips the messages of the chat over its budget."""
+
+    async def moderate(self, msg: MessageSchema) -> ModerationResultSchema:
+        """Moderate msg."""
+        if msg.chat_id == "over_budget":
+            await asyncio.sleep(0.01)
+            raise ModerationSkipped("budget")
+        return await super().moderate(msg)
+
+
+def test_exception_of_equal_message_is_not_shared() -> None:
+    """Test that the skip of one chat is not applied to the equal msg of another."""
+    msgs = [
+        MessageSchema("1", "spam", chat_id="over_budget"),
+        MessageSchema("2", "spam", chat_id="fresh"),
+    ]
+
+    async def run(batch: bool) -> List[ModerationOutcome]:
+        moderator = CachedModerator(
+            ChatBudgetModerator(),
+            TwoLevelVerdictCache(LRUVerdictCache(10), shared=None),
+        )
+        if batch:
+            return await moderator.moderate_many(msgs)
+        return await BaseModerator.moderate_many(moderator, msgs)
+
+    for batch in (False, True):
+        outcomes = asyncio.run(run(batch))
+
+        assert isinstance(outcomes[0], ModerationSkipped)
+        assert outcomes[1] == ModerationResultSchema("2", False, True)
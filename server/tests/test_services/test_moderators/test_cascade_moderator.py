@@ -0,0 +1,172 @@
+"""The module responsible for testing cascade_moderator.py."""
+
+import asyncio
+import json
+from typing import List
+
+import pytest
+
+from schemas.messages import MessageSchema, ModerationResultSchema
+from server.config.app_config import CascadeConfig, Config
+from server.services.api.llm.base import BaseLLMAPI, LLMResponse
+from server.services.excs import (
+    APIException,
+    CircuitOpen,
+    ModerationSkipped,
+    TooManyRequests,
+)
+from server.services.moderators.base import BaseModerator
+from server.services.moderators.cascade_moderator import CascadeModerator
+from server.services.moderators.llm_moderator import LLMModerator
+from server.services.prompts import PROMPTS, Prompt
+
+
+class ScriptedLLMAPI(BaseLLMAPI):
+    """LLM API that returns the given answers one by one."""
+
+    def __init__(self, answers: List[str]):
+        """Init class."""
+        self.answers = list(answers)
+        self.requests: List[List[Prompt]] = []
+
+    async def auth(self) -> None:
+        """Auth to LLM API."""
+        pass
+
+    async def send_prompts(self, chat: List[Prompt]) -> LLMResponse:
+        """Send messages to LLM."""
+        self.requests.append(chat)
+        answer = self.answers.pop(0)
+        if answer == "500":
+            raise APIException(service_name="test", status_code=500)
+        if answer == "429":
+            raise TooManyRequests(service_name="test")
+        if answer == "open":
+            raise CircuitOpen(service_name="test", retry_after=1)
+        return LLMResponse(answers=[Prompt(role="assistant", text=answer)])
+
+
+class ToxicModerator(BaseModerator):
+    """Moderator that marks every message as toxic."""
+
+    def __init__(self):
+        """Init class."""
+        self.ids: List[str] = []
+
+    async def moderate(self, msg: MessageSchema) -> ModerationResultSchema:
+        """Moderate msg."""
+        self.ids.append(msg.id)
+        return ModerationResultSchema(msg.id, generated_by_llm=False, toxic=True)
+
+
+@pytest.fixture(scope="function")
+def cascade_config() -> CascadeConfig:
+    """Get config escalating the verdicts with the confidence below 0.8."""
+    return CascadeConfig(
+        enabled=True,
+        lite_model="lite",
+        threshold=0.8,
+        chat_thresholds={"strict": 0.95},
+        trust_check=False,
+    )
+
+
+def test_uncertain_verdicts_are_escalated(
+    config: Config, cascade_config: CascadeConfig
+) -> None:
+    """Test that the full model gets only the verdicts below the chat threshold."""
+    msgs = [
+        MessageSchema(id="1", text="text 1"),
+        MessageSchema(id="2", text="text 2"),
+        MessageSchema(id="3", text="text 3", chat_id="strict"),
+        MessageSchema(id="4", text="text 4"),
+    ]
+    answer = [
+        {"id": 0, "generated_by_llm": False, "toxic": False, "confidence": 0.9},
+        {"id": 1, "generated_by_llm": False, "toxic": False, "confidence": 0.3},
+        {"id": 2, "generated_by_llm": False, "toxic": False, "confidence": 0.9},
+        # no confidence - the verdict is not trusted
+        {"id": 3, "generated_by_llm": False, "toxic": False},
+    ]
+    llm_api = ScriptedLLMAPI([json.dumps(answer)])
+    full = ToxicModerator()
+    moderator = CascadeModerator(
+        LLMModerator(llm_api, config.moderation_config, with_confidence=True),
+        full,
+        cascade_config,
+    )
+
+    outcomes = asyncio.run(moderator.moderate_many(msgs))
+
+    assert llm_api.requests[0][0] == PROMPTS["batch_confidence_moderation_prompt"]
+    assert full.ids == ["2", "3", "4"]
+    assert outcomes == [
+        ModerationResultSchema("1", False, False),
+        ModerationResultSchema("2", False, True),
+        ModerationResultSchema("3", False, True),
+        ModerationResultSchema("4", False, True),
+    ]
+    # the confidence is not put into the queue of the results
+    assert type(outcomes[0]) is ModerationResultSchema
+    assert moderator.stats()["lite"] == 1
+    assert moderator.stats()["escalated_low_confidence"] == 3
+
+
+def test_error_of_lite_model_is_escalated(
+    config: Config, cascade_config: CascadeConfig
+) -> None:
+    """Test that the message is moderated by the full model if the lite one fails."""
+    full = ToxicModerator()
+    moderator = CascadeModerator(
+        LLMModerator(
+            ScriptedLLMAPI(["500"]), config.moderation_config, with_confidence=True
+        ),
+        full,
+        cascade_config,
+    )
+
+    result = asyncio.run(moderator.moderate(MessageSchema(id="1", text="text")))
+
+    assert result == ModerationResultSchema("1", False, True)
+    assert moderator.stats()["escalated_error"] == 1
+
+
+class SkippingModerator(BaseModerator):
+    """Moderator that skips every message."""
+
+    async def moderate(self, msg: MessageSchema) -> ModerationResultSchema:
+        """Moderate msg."""
+        raise ModerationSkipped("budget")
+
+
+@pytest.mark.parametrize("answer", ["429", "open"])
+def test_deferral_of_lite_model_is_not_escalated(
+    config: Config, cascade_config: CascadeConfig, answer: str
+) -> None:
+    """Test that a retry or parking of the message is not turned into escalation."""
+    full = ToxicModerator()
+    moderator = CascadeModerator(
+        LLMModerator(
+            ScriptedLLMAPI([answer]), config.moderation_config, with_confidence=True
+        ),
+        full,
+        cascade_config,
+    )
+
+    with pytest.raises((TooManyRequests, CircuitOpen)):
+        asyncio.run(moderator.moderate(MessageSchema(id="1", text="text")))
+
+    assert full.ids == []
+    assert moderator.stats()["full"] == 0
+
+
+def test_skip_of_lite_model_is_not_escalated(cascade_config: CascadeConfig) -> None:
+    """Test that a skipped message is not moderated by the full model."""
+    full = ToxicModerator()
+    moderator = CascadeModerator(SkippingModerator(), full, cascade_config)
+
+    outcomes = asyncio.run(moderator.moderate_many([MessageSchema("1", "text")]))
+
+    assert isinstance(outcomes[0], ModerationSkipped)
+    assert full.ids == []
+    assert moderator.stats()["lite"] == 0
@@ -0,0 +1,55 @@
+"""The module responsible for testing freshness_moderator.py."""
+
+import asyncio
+import time
+from typing import List
+
+from schemas.messages import MessageSchema, ModerationResultSchema
+from server.services.excs import ModerationSkipped
+from server.services.moderators.base import BaseModerator, ModerationOutcome
+from server.services.moderators.freshness_moderator import FreshnessModerator
+
+
+class CleanModerator(BaseModerator):
+    """Moderator that marks every message as clean and counts the calls."""
+
+    def __init__(self):
+        """Init class."""
+        self.ids: List[str] = []
+
+    async def moderate(self, msg: MessageSchema) -> ModerationResultSchema:
+        """Moderate msg."""
+        self.ids.append(msg.id)
+        return ModerationResultSchema(msg.id, generated_by_llm=False, toxic=False)
+
+
+def test_stale_messages_are_skipped() -> None:
+    """Test that only the messages past their deadline are skipped."""
+    next_moderator = CleanModerator()
+    moderator = FreshnessModerator(next_moderator, max_age=60)
+    now = time.time()
+    msgs = [
+        MessageSchema("fresh", "text", enqueued_at=now - 10, deadline=now + 50),
+        MessageSchema("stale", "text", enqueued_at=now - 70, deadline=now - 10),
+        MessageSchema("no_deadline", "text", enqueued_at=now - 70),
+        MessageSchema("unknown_age", "text"),
+    ]
+
+    outcomes: List[ModerationOutcome] = asyncio.run(moderator.moderate_many(msgs))
+
+    assert next_moderator.ids == ["fresh", "unknown_age"]
+    assert isinstance(outcomes[1], ModerationSkipped)
+    assert isinstance(outcomes[2], ModerationSkipped)
+    assert moderator.stats()["absorbed"] == 2
+
+
+def test_own_deadline_overrides_max_age() -> None:
+    """Test that the deadline of the message is preferred to max_age."""
+    next_moderator = CleanModerator()
+    moderator = FreshnessModerator(next_moderator, max_age=60)
+    now = time.time()
+    msg = MessageSchema("1", "text", enqueued_at=now - 600, deadline=now + 60)
+
+    result = asyncio.run(moderator.moderate(msg))
+
+    assert result.msg_id == "1"
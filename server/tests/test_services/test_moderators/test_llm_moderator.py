@@ -1,18 +1,35 @@
 """The module responsible for testing the module llm_moderator.py."""
 
+import asyncio
 import warnings
 from typing import List
 
 from schemas.messages import MessageSchema, ModerationResultSchema
+from server.services.api.llm.base import BaseLLMAPI
 from server.services.moderators.llm_moderator import LLMModerator
 
 
+def moderate_msgs(
+    llm_api: BaseLLMAPI, llm_moderator: LLMModerator, msgs: List[MessageSchema]
+) -> List[ModerationResultSchema]:
+    """Auth on LLM API and moderate msgs one by one in a new event loop."""
+
+    async def moderate() -> List[ModerationResultSchema]:
+        try:
+            await llm_api.auth()
+            return [await llm_moderator.moderate(msg) for msg in msgs]
+        finally:
+            await llm_api.close()
+
+    return asyncio.run(moderate())
+
+
 def test_moderation_user_msgs(
-    llm_moderator: LLMModerator, user_msgs: List[MessageSchema]
+    llm_api: BaseLLMAPI, llm_moderator: LLMModerator, user_msgs: List[MessageSchema]
 ) -> None:
     """Test class LLMModerator and method moderate on user msgs."""
-    for msg in user_msgs:
-        result: ModerationResultSchema = llm_moderator.moderate(msg)
+    results = moderate_msgs(llm_api, llm_moderator, user_msgs)
+    for msg, result in zip(user_msgs, results):
         if result.generated_by_llm is not False:
             warnings.warn(
                 f"LLM considers the message generated, "
@@ -28,11 +45,13 @@ def test_moderation_user_msgs(
 
 
 def test_moderation_generated_msgs(
-    llm_moderator: LLMModerator, llm_generated_msgs: List[MessageSchema]
+    llm_api: BaseLLMAPI,
+    llm_moderator: LLMModerator,
+    llm_generated_msgs: List[MessageSchema],
 ) -> None:
     """Test class LLMModerator and method moderate on generated msgs."""
-    for msg in llm_generated_msgs:
-        result = llm_moderator.moderate(msg)
+    results = moderate_msgs(llm_api, llm_moderator, llm_generated_msgs)
+    for msg, result in zip(llm_generated_msgs, results):
         if result.generated_by_llm is not True:
             warnings.warn(
                 f"LLM considers the message to be written by a real person,"
@@ -42,11 +61,11 @@ def test_moderation_generated_msgs(
 
 
 def test_moderation_toxic_msgs(
-    llm_moderator: LLMModerator, toxic_msgs: List[MessageSchema]
+    llm_api: BaseLLMAPI, llm_moderator: LLMModerator, toxic_msgs: List[MessageSchema]
 ) -> None:
     """Test class LLMModerator and method moderate on toxic msgs."""
-    for msg in toxic_msgs:
-        result = llm_moderator.moderate(msg)
+    results = moderate_msgs(llm_api, llm_moderator, toxic_msgs)
+    for msg, result in zip(toxic_msgs, results):
         if result.toxic is not True:
             warnings.warn(
                 f"LLM considers the message is not toxic, "
@@ -0,0 +1,116 @@
+"""The module responsible for testing batch moderation of llm_moderator.py."""
+
+import asyncio
+import json
+from typing import List
+
+import pytest
+
+from schemas.messages import MessageSchema, ModerationResultSchema
+from server.config.app_config import Config
+from server.services.api.llm.base import BaseLLMAPI, LLMResponse
+from server.services.excs import TooManyRequests
+from server.services.moderators.llm_moderator import LLMModerator
+from server.services.prompts import Prompt
+
+
+class ScriptedLLMAPI(BaseLLMAPI):
+    """LLM API that returns the given answers one by one."""
+
+    def __init__(self, answers: List[str]):
+        """Init class."""
+        self.answers = list(answers)
+        self.requests: List[List[Prompt]] = []
+
+    async def auth(self) -> None:
+        """Auth to LLM API."""
+        pass
+
+    async def send_prompts(self, chat: List[Prompt]) -> LLMResponse:
+        """Send messages to LLM."""
+        self.requests.append(chat)
+        answer = self.answers.pop(0)
+        if answer == "429":
+            raise TooManyRequests(service_name="test")
+        return LLMResponse(answers=[Prompt(role="assistant", text=answer)])
+
+
+@pytest.fixture(scope="function")
+def msgs() -> List[MessageSchema]:
+    """Get three messages."""
+    return [MessageSchema(id=str(i), text=f"text {i}") for i in range(3)]
+
+
+def test_batch_is_moderated_with_one_request(
+    config: Config, msgs: List[MessageSchema]
+) -> None:
+    """Test that all messages are moderated with one request."""
+    answer = [
+        {"id": msg.id, "generated_by_llm": False, "toxic": msg.id == "1"}
+        for msg in msgs
+    ]
+    llm_api = ScriptedLLMAPI([f"```json\n{json.dumps(answer)}\n```"])
+    moderator = LLMModerator(llm_api, config.moderation_config)
+
+    outcomes = asyncio.run(moderator.moderate_many(msgs))
+
+    assert len(llm_api.requests) == 1
+    assert outcomes == [
+        ModerationResultSchema("0", False, False),
+        ModerationResultSchema("1", False, True),
+        ModerationResultSchema("2", False, False),
+    ]
+
+
+def test_partial_answer_falls_back_to_single_requests(
+    config: Config, msgs: List[MessageSchema]
+) -> None:
+    """Test that the messages missing in the answer are moderated one by one."""
+    answer = [{"id": "0", "generated_by_llm": True, "toxic": False}]
+    single_answer = json.dumps({"generated_by_llm": False, "toxic": False})
+    llm_api = ScriptedLLMAPI([json.dumps(answer), single_answer, single_answer])
+    moderator = LLMModerator(llm_api, config.moderation_config)
+
+    outcomes = asyncio.run(moderator.moderate_many(msgs))
+
+    assert len(llm_api.requests) == 3
+    assert outcomes == [
+        ModerationResultSchema("0", True, False),
+        ModerationResultSchema("1", False, False),
+        ModerationResultSchema("2", False, False),
+    ]
+
+
+def test_too_many_requests_is_returned_for_every_msg(
+    config: Config, msgs: List[MessageSchema]
+) -> None:
+    """Test that 429 on the batch is not retried with single requests."""
+    llm_api = ScriptedLLMAPI(["429"])
+    moderator = LLMModerator(llm_api, config.moderation_config)
+
+    outcomes = asyncio.run(moderator.moderate_many(msgs))
+
+    assert len(llm_api.requests) == 1
+    assert all(isinstance(outcome, TooManyRequests) for outcome in outcomes)
+
+
+def test_msgs_of_different_chats_with_equal_ids(config: Config) -> None:
+    """Test that the msgs with equal ids from different chats are not mixed up."""
+    msgs = [
+        MessageSchema(id="7", text="hello", chat_id="-1"),
+        MessageSchema(id="7", text="idiot", chat_id="-2"),
+    ]
+    answer = [
+        {"id": "1", "generated_by_llm": False, "toxic": True},
+        {"id": "0", "generated_by_llm": False, "toxic": False},
+    ]
+    llm_api = ScriptedLLMAPI([json.dumps(answer)])
+    moderator = LLMModerator(llm_api, config.moderation_config)
+
+    outcomes = asyncio.run(moderator.moderate_many(msgs))
+
+    assert len(llm_api.requests) == 1
+    assert outcomes == [
+        ModerationResultSchema("7", False, False),
+        ModerationResultSchema("7", False, True),
+    ]
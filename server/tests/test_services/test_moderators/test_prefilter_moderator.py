@@ -0,0 +1,94 @@
+"""The module responsible for testing prefilter_moderator.py."""
+
+import asyncio
+from typing import List
+
+import pytest
+
+from schemas.messages import MessageSchema, ModerationResultSchema
+from server.services.moderators.base import BaseModerator, iter_stages
+from server.services.moderators.prefilter_moderator import PrefilterModerator
+from server.services.prefilters.aho_corasick import AhoCorasick
+from server.services.prefilters.lexicon import load_lexicon
+
+
+class HumanModerator(BaseModerator):
+    """Moderator that marks every message as written by a human."""
+
+    def __init__(self):
+        """Init class."""
+        self.texts: List[str] = []
+
+    async def moderate(self, msg: MessageSchema) -> ModerationResultSchema:
+        """Moderate msg."""
+        self.texts.append(msg.text)
+        return ModerationResultSchema(msg.id, generated_by_llm=False, toxic=False)
+
+
+def test_aho_corasick_finds_overlapping_patterns() -> None:
+    """Test that all patterns are found including the nested ones."""
+    matcher = AhoCorasick(["he", "she", "his", "hers"])
+
+    assert list(matcher.search("ushers")) == ["she", "he", "hers"]
+    assert not matcher.contains_any("ash")
+
+
+@pytest.mark.parametrize(
+    "text, toxic",
+    [
+        ("Ну ты и СУКА!!!", True),
+        ("ну ты и cyкa", True),
+        ("это х.у.й знает что", True),
+        ("бляяяя, опять дождь", True),
+        ("бляха-муха, опять дождь", False),
+        ("корабль отплывает без корабля", False),
+        ("надо употреблять больше воды", False),
+    ],
+)
+def test_lexicon_with_obfuscations(text: str, toxic: bool) -> None:
+    """Test that the lexicon matches obfuscated words only at word borders."""
+    next_moderator = HumanModerator()
+    moderator = PrefilterModerator(next_moderator, load_lexicon())
+
+    result = asyncio.run(moderator.moderate(MessageSchema("1", text)))
+
+    assert result.toxic is toxic
+    assert (next_moderator.texts == []) is toxic
+
+
+def test_obvious_human_messages_are_absorbed() -> None:
+    """Test that emoji-only and one-word replies are not escalated."""
+    next_moderator = HumanModerator()
+    moderator = PrefilterModerator(next_moderator, load_lexicon(), max_short_words=1)
+    msgs = [
+        MessageSchema("1", "👍🔥"),
+        MessageSchema("2", "Спасибо!"),
+        MessageSchema("3", "Спасибо, завтра посмотрю"),
+    ]
+
+    outcomes = asyncio.run(moderator.moderate_many(msgs))
+
+    assert next_moderator.texts == ["Спасибо, завтра посмотрю"]
+    assert outcomes == [
+        ModerationResultSchema(msg.id, generated_by_llm=False, toxic=False)
+        for msg in msgs
+    ]
+    assert [stage.stats() for stage in iter_stages(moderator)] == [
+        {
+            "absorbed": 2,
+            "escalated": 1,
+            "absorbed_fraction": 2 / 3,
+            "rule_no_letters": 1,
+            "rule_short": 1,
+        }
+    ]
+
+
+def test_short_messages_are_escalated_by_default() -> None:
+    """Test that a one-word insult missing in the lexicon is not cleared."""
+    next_moderator = HumanModerator()
+    moderator = PrefilterModerator(next_moderator, load_lexicon())
+
+    asyncio.run(moderator.moderate(MessageSchema("1", "идиот")))
+
+    assert next_moderator.texts == ["идиот"]
@@ -0,0 +1,104 @@
+"""The module responsible for testing the near-duplicate index and stage."""
+
+import asyncio
+from typing import List
+
+import pytest
+
+from schemas.messages import MessageSchema, ModerationResultSchema
+from server.services.moderators import near_duplicate_moderator
+from server.services.moderators.base import BaseModerator
+from server.services.moderators.near_duplicate_moderator import (
+    NearDuplicateModerator,
+)
+from server.services.near_duplicates.local_index import LocalNearDuplicateIndex
+from server.services.near_duplicates.simhash import features, simhash, similarity
+from server.services.verdict_caches.base import Verdict
+
+SPAM = (
+    "Заработок от 100000 руб в день без вложений! Пиши мне в лс 👉 "
+    "https://bit.ly/abc123 Только сегодня, места ограничены."
+)
+SPAM_VARIANT = (
+    "Только сегодня, места ограничены!! Заработок от 150000 руб в день "
+    "без вложений! Пиши мне в лс 🔥 https://t.me/xyz999"
+)
+HAM = "Привет всем, кто идёт сегодня на концерт? Давайте встретимся у входа."
+
+
+class ToxicModerator(BaseModerator):
+    """Moderator that marks every message as toxic and counts the calls."""
+
+    def __init__(self):
+        """Init class."""
+        self.texts: List[str] = []
+
+    async def moderate(self, msg: MessageSchema) -> ModerationResultSchema:
+        """Moderate msg."""
+        self.texts.append(msg.text)
+        return ModerationResultSchema(msg.id, generated_by_llm=False, toxic=True)
+
+
+def test_spam_variants_are_similar() -> None:
+    """Test that links, numbers, emoji and order of sentences are ignored."""
+    spam = simhash(features(SPAM))
+
+    assert similarity(spam, simhash(features(SPAM_VARIANT))) == 1.0
+    assert similarity(spam, simhash(features(HAM))) < 0.95
+
+
+def test_index_finds_similar_signatures_and_expires_them() -> None:
+    """Test that the index finds the signatures within threshold until ttl."""
+    now: List[float] = [0.0]
+    index = LocalNearDuplicateIndex(0.95, ttl=10, max_size=2, clock=lambda: now[0])
+    verdict = Verdict(generated_by_llm=False, toxic=True)
+
+    async def run() -> None:
+        await index.add(0xFFFF_0000_FFFF_0000, verdict)
+        assert await index.find(0xFFFF_0000_FFFF_0007) == verdict
+        assert await index.find(0xFFFF_0000_FFFF_000F) is None
+
+        await index.add(1, verdict)
+        await index.add(2, verdict)
+        assert len(index) == 2
+        assert await index.find(0xFFFF_0000_FFFF_0000) is None
+
+        now[0] = 10
+        assert await index.find(1) is None
+        assert len(index) == 0
+
+    asyncio.run(run())
+
+
+def test_stage_reuses_verdict_of_near_duplicate(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test that a near duplicate is not sent to the next moderator."""
+    signed: List[str] = []
+
+    def counting_simhash(text_features: List[str]) -> int:
+        signed.append(" ".join(text_features))
+        return simhash(text_features)
+
+    monkeypatch.setattr(near_duplicate_moderator, "simhash", counting_simhash)
+    next_moderator = ToxicModerator()
+    moderator = NearDuplicateModerator(
+        next_moderator, LocalNearDuplicateIndex(0.95, ttl=60, max_size=10)
+    )
+    msgs = [
+        MessageSchema("1", SPAM),
+        MessageSchema("2", SPAM_VARIANT),
+        MessageSchema("3", HAM),
+        MessageSchema("4", "ok"),
+    ]
+
+    async def run() -> List[ModerationResultSchema]:
+        return [await moderator.moderate(msg) for msg in msgs]
+
+    results = asyncio.run(run())
+
+    assert next_moderator.texts == [SPAM, HAM, "ok"]
+    assert results[1] == ModerationResultSchema("2", False, True)
+    assert (moderator.absorbed, moderator.escalated) == (1, 3)
+    # the signature of an escalated msg is computed once
+    assert len(signed) == 3
@@ -0,0 +1,72 @@
+"""The module responsible for testing the token buckets of the rate limiters."""
+
+import asyncio
+
+import pytest
+
+from server.config.app_config import RateLimitConfig
+from server.services.rate_limiters.base import TokenBucketsState
+from server.services.rate_limiters.local_rate_limiter import LocalRateLimiter
+
+
+@pytest.fixture(scope="function")
+def rate_limit_config() -> RateLimitConfig:
+    """Get config with 2 requests per second and 600 tokens per minute."""
+    return RateLimitConfig(
+        backend="local",
+        requests_per_second=2,
+        tokens_per_minute=600,
+        decrease_factor=0.5,
+        min_factor=0.1,
+        quiet_period=30,
+        recovery_rate=0.01,
+    )
+
+
+def test_requests_bucket(rate_limit_config: RateLimitConfig) -> None:
+    """Test that the requests over the rate wait for the refill."""
+    state = TokenBucketsState()
+    assert state.acquire(rate_limit_config, 100.0, 1) == 0
+    assert state.acquire(rate_limit_config, 100.0, 1) == 0
+    assert state.acquire(rate_limit_config, 100.0, 1) == pytest.approx(0.5)
+    assert state.acquire(rate_limit_config, 100.5, 1) == 0
+
+
+def test_tokens_bucket(rate_limit_config: RateLimitConfig) -> None:
+    """Test that the real usage of tokens is taken into account."""
+    state = TokenBucketsState()
+    assert state.acquire(rate_limit_config, 100.0, 100) == 0
+    state.adjust(rate_limit_config, 500)
+    # 600 - 600 tokens are spent, 100 tokens are refilled in 10 seconds
+    assert state.acquire(rate_limit_config, 101.0, 100) == pytest.approx(9)
+
+
+def test_penalize_and_recovery(rate_limit_config: RateLimitConfig) -> None:
+    """Test that 429 halves the rates and they recover after the quiet period."""
+    state = TokenBucketsState()
+    state.acquire(rate_limit_config, 100.0, 1)
+    state.penalize(rate_limit_config, 100.0)
+    assert state.factor == 0.5
+    state.penalize(rate_limit_config, 100.0)
+    assert state.factor == 0.25
+
+    state.acquire(rate_limit_config, 120.0, 1)
+    assert state.factor == 0.25
+    state.acquire(rate_limit_config, 140.0, 1)
+    assert state.factor == pytest.approx(0.35)
+    state.acquire(rate_limit_config, 1000.0, 1)
+    assert state.factor == 1
+
+
+def test_local_rate_limiter(rate_limit_config: RateLimitConfig) -> None:
+    """Test that the local rate limiter applies the limits and the penalty."""
+    rate_limiter = LocalRateLimiter(rate_limit_config)
+
+    async def run() -> float:
+        assert await rate_limiter.try_acquire(1) == 0
+        assert await rate_limiter.try_acquire(1) == 0
+        return await rate_limiter.try_acquire(1)
+
+    assert asyncio.run(run()) > 0
+    asyncio.run(rate_limiter.penalize())
+    assert rate_limiter.factor == pytest.approx(0.5)